@@ -7,41 +7,30 @@ __version__ = "2.1.0"
 
 import sys
 import os
-import json
-import shutil
-import zipfile
 import tempfile
-import hashlib
-import tarfile
-import threading
-import winreg  # Для Windows
-import subprocess
-from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
-from PyQt6.QtWidgets import *
-from PyQt6.QtCore import *
-from PyQt6.QtGui import *
-
-# Проверяем и импортируем дополнительные библиотеки
-LIBRARIES = {
-    'py7zr': ('py7zr', 'Для .7z архивов'),
-    'rarfile': ('rarfile', 'Для .rar архивов (чтение)'),
-    'pyzipper': ('pyzipper', 'Для паролей в ZIP архивах'),
-}
-
-for lib_name, (module_name, description) in LIBRARIES.items():
-    try:
-        globals()[f"HAS_{lib_name.upper()}"] = True
-        globals()[lib_name.upper()] = __import__(module_name)
-    except ImportError:
-        globals()[f"HAS_{lib_name.upper()}"] = False
-        print(f"ℹ️  {lib_name} не установлен: {description}")
+from typing import Optional, List
+
+# Движок архивов не зависит от PyQt6 и winreg: его можно импортировать
+# на сервере без дисплея. GUI загружается только при запуске окна.
+from nova_core import (ArchiveEntry, ArchiveError, ArchiveHandler,
+                       PasswordRequiredError, UnsupportedFormatError)
+
+# Дополнительные библиотеки не импортируются при запуске: каждая загружается
+# при первом обращении к своему формату (см. nova_core.backends).
+# Наличие проверяется через find_spec, без импорта самой библиотеки.
+from nova_core import backends
+
+LIBRARIES = {name: (backend.module, backend.description)
+             for name, backend in backends.BACKENDS.items()}
+
+HAS_PY7ZR = backends.is_available('py7zr')
+HAS_RARFILE = backends.is_available('rarfile')
+HAS_PYZIPPER = backends.is_available('pyzipper')
 
 # Инициализация переменных для библиотек
-HAS_7Z = globals().get('HAS_PY7ZR', False)
-HAS_RAR = globals().get('HAS_RARFILE', False)
-HAS_PYZIPPER = globals().get('HAS_PYZIPPER', False)
+HAS_7Z = HAS_PY7ZR
+HAS_RAR = HAS_RARFILE
 
 class ArchiveAssociation:
     """Класс для управления ассоциацией файлов в Windows"""
@@ -144,6 +133,8 @@ class ArchiveAssociation:
     def register_format(extension, file_type, description, exe_path, icon_path):
         """Регистрирует один формат файла"""
         try:
+            import winreg  # Только Windows
+
             # Ассоциируем расширение с типом файла
             with winreg.CreateKey(winreg.HKEY_CLASSES_ROOT, extension) as key:
                 winreg.SetValue(key, "", winreg.REG_SZ, file_type)
@@ -183,6 +174,8 @@ class ArchiveAssociation:
             return False
         
         try:
+            import winreg  # Только Windows
+
             formats = [
                 '.zip', '.sntr', '.nv', '.tar', '.rar', '.7z',
                 '.tar.gz', '.tar.bz2', '.tar.xz'
@@ -214,5 +207,92 @@ class ArchiveAssociation:
             print(f"Ошибка при удалении форматов: {e}")
             return False
 
-# ... (остальной код NovaArchiver остается таким же, как в предыдущем ответе)
-# Добавьте все остальные классы: PasswordDialog, SetPasswordDialog, ArchiveHandler, NovaArchiver
\ No newline at end of file
+# Классы интерфейса живут в пакете nova_gui и импортируются по требованию,
+# чтобы импорт этого модуля не тянул PyQt6
+_GUI_NAMES = ('PasswordDialog', 'SetPasswordDialog', 'NovaArchiver')
+
+
+def __getattr__(name):
+    if name in _GUI_NAMES:
+        import nova_gui
+        return getattr(nova_gui, name)
+    # Прежние глобальные имена модулей (PY7ZR, RARFILE, PYZIPPER) загружаются лениво
+    if name.lower() in LIBRARIES:
+        return backends.load(name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+HELP_TEXT = f"""Nova Archiver {__version__}
+
+Использование:
+  nova_archiver.py [архив]     Открыть архив в окне программы
+  nova_archiver.py --help      Показать эту справку
+  nova_archiver.py --version   Показать версию
+  nova_archiver.py --profile-startup
+                               Показать стоимость импорта библиотек форматов
+
+Команды без окна (подробнее: nova_archiver.py <команда> --help):
+  nova_archiver.py create <архив> <файлы...>
+                               Создать архив
+  nova_archiver.py extract <архив> [-o папка]
+                               Извлечь архив
+  nova_archiver.py list <архив> [--json]
+                               Показать содержимое архива
+  nova_archiver.py test <архив> [--manifest sha256]
+                               Проверить целостность архива
+  nova_archiver.py convert <архив> <новый архив>
+                               Перепаковать архив в другой формат
+  nova_archiver.py grep <образец> <архив...> [-i] [-E] [-l] [--index]
+                               Найти текст в файлах архива
+  nova_archiver.py batch <задания.jsonl> [--cpu N] [--io N]
+                               Выполнить задания из манифеста
+  nova_archiver.py watch <папки...> -o <папка архивов> [--roll-size 256M]
+                               Непрерывно упаковывать поступающие файлы
+"""
+
+
+def print_startup_profile():
+    """Печатает стоимость холодного импорта каждой библиотеки формата"""
+    print("Стоимость импорта (отдельный процесс на каждую библиотеку):")
+    report = backends.profile_imports(extra_modules=('nova_core', 'PyQt6.QtWidgets'))
+    for item in report:
+        if not item['available']:
+            print(f"  ℹ️  {item['name']:16} не установлен: {item['description']}")
+        elif item['seconds'] is None:
+            print(f"  ❌ {item['name']:16} ошибка импорта")
+        else:
+            print(f"  {item['name']:19} {item['seconds'] * 1000:8.1f} мс  "
+                  f"модулей: {item['modules']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа: разбирает аргументы и запускает окно программы"""
+    args = sys.argv[1:] if argv is None else list(argv)
+
+    # Команды без окна (nova test ...) не загружают PyQt6
+    from nova_core import cli
+    if args and args[0] in cli.COMMANDS:
+        return cli.main(args)
+
+    if '--help' in args or '-h' in args:
+        print(HELP_TEXT)
+        return 0
+    if '--version' in args:
+        print(f"Nova Archiver {__version__}")
+        return 0
+    if '--profile-startup' in args:
+        print_startup_profile()
+        return 0
+
+    archive = next((arg for arg in args if not arg.startswith('-')), None)
+    try:
+        from nova_gui import run_gui
+    except ImportError as e:
+        print(f"Не удалось загрузить интерфейс: {e}")
+        print("Установите PyQt6: pip install PyQt6")
+        return 1
+    return run_gui(archive)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
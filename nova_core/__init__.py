@@ -0,0 +1,36 @@
+# [file name]: nova_core/__init__.py
+"""
+Nova Core - движок архивов Nova Archiver без зависимостей от GUI
+
+Модуль не импортирует PyQt6 и winreg, поэтому подходит для серверов
+и пакетной обработки без дисплея.
+"""
+
+from .entries import ArchiveEntry
+from .errors import (ArchiveError, BackendMissingError, OperationCancelled,
+                     PasswordRequiredError, UnsupportedFormatError)
+from .formats import ZIP_EXTENSIONS, detect_format
+from .handler import ArchiveHandler
+from .jobs import Job, JobScheduler, default_scheduler
+from .streams import CHUNK_SIZE
+from .update import UpdateResult
+from .verify import MemberProblem, VerifyResult
+
+__all__ = [
+    'ArchiveEntry',
+    'ArchiveError',
+    'ArchiveHandler',
+    'BackendMissingError',
+    'CHUNK_SIZE',
+    'Job',
+    'JobScheduler',
+    'MemberProblem',
+    'OperationCancelled',
+    'PasswordRequiredError',
+    'UnsupportedFormatError',
+    'UpdateResult',
+    'VerifyResult',
+    'ZIP_EXTENSIONS',
+    'default_scheduler',
+    'detect_format',
+]
@@ -0,0 +1,130 @@
+# [file name]: nova_core/backends.py
+"""
+Реестр дополнительных библиотек форматов с загрузкой по требованию
+
+Библиотеки (py7zr, rarfile, pyzipper, pycryptodomex, zstandard, lz4) импортируются
+только при первом обращении к соответствующему формату. Проверка наличия библиотеки
+выполняется через importlib.util.find_spec и не импортирует ее.
+"""
+
+import importlib
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .errors import BackendMissingError
+
+
+class Backend(NamedTuple):
+    """Описание дополнительной библиотеки"""
+
+    module: str
+    description: str
+    formats: Tuple[str, ...]
+
+
+# Имя -> библиотека. Ключи совпадают с прежним словарем LIBRARIES
+BACKENDS: Dict[str, Backend] = {
+    'py7zr': Backend('py7zr', 'Для .7z архивов', ('7z',)),
+    'rarfile': Backend('rarfile', 'Для .rar архивов (чтение)', ('rar',)),
+    'pyzipper': Backend('pyzipper', 'Для паролей в ZIP архивах без отображения в память', ()),
+    'pycryptodomex': Backend('Cryptodome.Cipher.AES', 'Для шифрования AES в ZIP архивах',
+                             ('zip-aes',)),
+    'zstandard': Backend('zstandard', 'Для сжатия zstd (ZIP, .nv, .tar.zst)', ('tar.zst', 'zstd')),
+    'lz4': Backend('lz4.block', 'Для сжатия lz4 в .nv', ('lz4',)),
+}
+
+_available: Dict[str, bool] = {}
+_loaded: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def is_available(name: str) -> bool:
+    """Проверяет, установлена ли библиотека, не импортируя ее"""
+    if name not in _available:
+        module = BACKENDS[name].module if name in BACKENDS else name
+        try:
+            _available[name] = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            _available[name] = False
+    return _available[name]
+
+
+def load(name: str):
+    """Импортирует библиотеку при первом обращении и кэширует модуль"""
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    backend = BACKENDS.get(name)
+    with _lock:
+        if name not in _loaded:
+            try:
+                _loaded[name] = importlib.import_module(backend.module if backend else name)
+            except ImportError:
+                _available[name] = False
+                raise BackendMissingError(name, backend.description if backend else "") from None
+        return _loaded[name]
+
+
+def is_loaded(name: str) -> bool:
+    """Была ли библиотека уже импортирована в этом процессе"""
+    return name in _loaded
+
+
+def backend_for_format(fmt: str) -> Optional[str]:
+    """Имя библиотеки, необходимой для формата (None - хватает stdlib)"""
+    for name, backend in BACKENDS.items():
+        if fmt in backend.formats:
+            return name
+    return None
+
+
+_PROFILE_SNIPPET = (
+    "import sys, time\n"
+    "before = len(sys.modules)\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start, len(sys.modules) - before)\n"
+)
+
+
+def _measure_import(module: str) -> Tuple[Optional[float], int]:
+    """Время холодного импорта модуля (в отдельном процессе) и число подгруженных модулей"""
+    if getattr(sys, 'frozen', False):
+        # В собранном exe нет отдельного интерпретатора, меряем в текущем процессе
+        before = len(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(module)
+        return time.perf_counter() - start, len(sys.modules) - before
+
+    # Процесс запускается из папки с nova_core, чтобы пакет импортировался
+    # при любом текущем каталоге
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', _PROFILE_SNIPPET.format(module=module)],
+                            capture_output=True, text=True, cwd=root)
+    if result.returncode != 0:
+        return None, 0
+    seconds, count = result.stdout.split()
+    return float(seconds), int(count)
+
+
+def profile_imports(extra_modules: Tuple[str, ...] = ()) -> List[dict]:
+    """Измеряет стоимость импорта каждой библиотеки и дополнительных модулей"""
+    report = []
+    names = list(BACKENDS) + list(extra_modules)
+    for name in names:
+        module = BACKENDS[name].module if name in BACKENDS else name
+        available = is_available(name)
+        seconds, count = _measure_import(module) if available else (None, 0)
+        report.append({
+            'name': name,
+            'available': available,
+            'seconds': seconds,
+            'modules': count,
+            'description': BACKENDS[name].description if name in BACKENDS else "",
+        })
+    return report
@@ -0,0 +1,328 @@
+# [file name]: nova_core/batch.py
+"""
+Пакетное выполнение операций по манифесту заданий
+
+Манифест - JSON (список заданий или {"jobs": [...]}) или JSONL (задание в
+строке). Задание - команда и ее параметры, как у командной строки (у
+extract также принимается прежнее имя dest вместо output):
+
+    {"id": "logs", "command": "create", "archive": "logs.zip", "sources": ["/var/log"]}
+    {"command": "test", "archive": "db.nv", "manifest": "sha256"}
+    {"command": "extract", "archive": "db.nv", "output": "restore"}
+
+Относительные пути считаются от папки манифеста; "after": ["id", ...]
+откладывает задание до успешного завершения указанных. Задания выполняются
+одновременно в пределах общего бюджета: cpu - суммарное число потоков
+сжатия/распаковки, io - число заданий, одновременно читающих и пишущих
+диск. Итог по каждому заданию (время, объем, скорость) записывается в
+файл результатов JSON.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .errors import ArchiveError, OperationCancelled
+from .handler import ArchiveHandler
+from .jobs import Job, JobScheduler
+from .streams import ProgressCallback
+from .volumes import parse_size
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_ERROR = 'error'
+STATUS_CANCELLED = 'cancelled'
+
+# Параметры команд: имя -> является ли путем (пути разрешаются от папки манифеста)
+_COMMON = {'id': False, 'command': False, 'after': False, 'archive': True, 'password': False,
+           'workers': False}
+COMMAND_OPTIONS: Dict[str, Dict[str, bool]] = {
+    'create': {'sources': True, 'format': False, 'level': False, 'codec': False,
+               'long_distance': False, 'volume_size': False, 'solid_size': False},
+    'extract': {'output': True, 'members': False, 'memory_budget': False},
+    'list': {},
+    'test': {'manifest': False, 'resume': False},
+    'convert': {'output': True, 'format': False, 'level': False, 'codec': False,
+                'long_distance': False, 'output_password': False, 'volume_size': False,
+                'solid_size': False},
+}
+_REQUIRED = {'create': ('sources',), 'extract': ('output',), 'convert': ('output',)}
+# Прежние имена параметров: команда -> {старое имя: имя как у командной строки}
+_ALIASES = {'extract': {'dest': 'output'}}
+
+
+class BatchJob:
+    """Задание манифеста"""
+
+    def __init__(self, spec: Dict[str, Any], index: int, base: Path):
+        command = spec.get('command')
+        if command not in COMMAND_OPTIONS:
+            raise ArchiveError(f"Задание {index}: неизвестная команда {command!r}")
+        allowed = dict(_COMMON, **COMMAND_OPTIONS[command])
+        spec = dict(spec)
+        for old, new in _ALIASES.get(command, {}).items():
+            if old in spec:
+                if new in spec:
+                    raise ArchiveError(f"Задание {index}: указаны сразу {new} и {old}")
+                spec[new] = spec.pop(old)
+        unknown = sorted(set(spec) - set(allowed))
+        if unknown:
+            raise ArchiveError(f"Задание {index}: неизвестные параметры {', '.join(unknown)}")
+        for key in ('archive',) + _REQUIRED.get(command, ()):
+            if not spec.get(key):
+                raise ArchiveError(f"Задание {index}: не указан параметр {key}")
+        self.id = str(spec.get('id', index))
+        self.command = command
+        after = spec.get('after', [])
+        self.after = [str(item) for item in ([after] if isinstance(after, str) else after)]
+        self.options = {key: self._resolve(base, value) if allowed[key] else value
+                        for key, value in spec.items() if key not in ('id', 'command', 'after')}
+
+    @staticmethod
+    def _resolve(base: Path, value):
+        if isinstance(value, list):
+            return [str(base / item) for item in value]
+        return str(base / value)
+
+    def __repr__(self):
+        return f"BatchJob({self.id!r}, {self.command})"
+
+
+def load_manifest(path) -> List[BatchJob]:
+    """Читает манифест заданий (JSON или JSONL)"""
+    path = Path(path)
+    try:
+        text = path.read_text(encoding='utf-8')
+    except OSError as e:
+        raise ArchiveError(f"Не удалось прочитать манифест: {e}") from e
+    try:
+        data = json.loads(text)
+        specs = data['jobs'] if isinstance(data, dict) else data
+    except ValueError:
+        try:
+            specs = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError as e:
+            raise ArchiveError(f"Манифест не является JSON или JSONL: {e}") from e
+    except (KeyError, TypeError) as e:
+        raise ArchiveError("В манифесте нет списка заданий") from e
+    if isinstance(specs, dict):
+        specs = [specs]
+    base = path.parent
+    jobs = [BatchJob(spec, index, base) for index, spec in enumerate(specs, 1)]
+    seen = set()
+    for job in jobs:
+        if job.id in seen:
+            raise ArchiveError(f"В манифесте повторяется id задания {job.id}")
+        # Зависеть можно только от заданий выше по списку: так не бывает циклов
+        missing = [item for item in job.after if item not in seen]
+        if missing:
+            raise ArchiveError(f"Задание {job.id}: after ссылается на неизвестные или "
+                               f"более поздние задания: {', '.join(missing)}")
+        seen.add(job.id)
+    return jobs
+
+
+class ResourceBudget:
+    """Общий запас единиц ресурса (потоков процессора) на все задания"""
+
+    def __init__(self, total: int):
+        self.total = max(1, total)
+        self._free = self.total
+        self._cond = threading.Condition()
+
+    def acquire(self, amount: int) -> int:
+        """Ждет и забирает amount единиц (не больше всего запаса)"""
+        amount = max(1, min(amount, self.total))
+        with self._cond:
+            self._cond.wait_for(lambda: self._free >= amount)
+            self._free -= amount
+        return amount
+
+    def release(self, amount: int):
+        with self._cond:
+            self._free += amount
+            self._cond.notify_all()
+
+
+def _size(options: Dict[str, Any], name: str) -> Optional[int]:
+    """Размер из задания (volume_size, solid_size, memory_budget): число байт или
+    строка вида 650M"""
+    value = options.get(name)
+    return parse_size(value) if value else None
+
+
+def _run_create(job: BatchJob, progress, workers) -> Dict[str, Any]:
+    o = job.options
+    with ArchiveHandler.create(o['archive'], o['sources'], fmt=o.get('format'),
+                               level=o.get('level'), password=o.get('password'),
+                               progress=progress, workers=workers, codec=o.get('codec'),
+                               long_distance=o.get('long_distance', False),
+                               volume_size=_size(o, 'volume_size'),
+                               solid_size=_size(o, 'solid_size')) as archive:
+        return {'entries': len(archive.list_entries()),
+                'output_bytes': sum(p.stat().st_size for p in archive.volumes)}
+
+
+def _run_extract(job: BatchJob, progress, workers) -> Dict[str, Any]:
+    o = job.options
+    with ArchiveHandler(o['archive'], password=o.get('password')) as archive:
+        return {'entries': archive.extract(o['output'], o.get('members'), progress=progress,
+                                           workers=workers,
+                                           memory_budget=_size(o, 'memory_budget'))}
+
+
+def _run_list(job: BatchJob, progress, workers) -> Dict[str, Any]:
+    with ArchiveHandler(job.options['archive'], password=job.options.get('password')) as archive:
+        entries = archive.list_entries()
+        return {'entries': len(entries), 'input_bytes': sum(e.size for e in entries)}
+
+
+def _run_test(job: BatchJob, progress, workers) -> Dict[str, Any]:
+    o = job.options
+    with ArchiveHandler(o['archive'], password=o.get('password')) as archive:
+        result = archive.verify(progress, workers, manifest=o.get('manifest'),
+                                resume=o.get('resume', True))
+    summary = {'entries': result.checked + result.resumed,
+               'problems': [list(problem) for problem in result.problems]}
+    if not result.ok:
+        summary['status'] = STATUS_FAILED
+    return summary
+
+
+def _run_convert(job: BatchJob, progress, workers) -> Dict[str, Any]:
+    o = job.options
+    with ArchiveHandler(o['archive'], password=o.get('password')) as archive:
+        with archive.convert(o['output'], fmt=o.get('format'), level=o.get('level'),
+                             password=o.get('output_password'), progress=progress,
+                             workers=workers, codec=o.get('codec'),
+                             long_distance=o.get('long_distance', False),
+                             volume_size=_size(o, 'volume_size'),
+                             solid_size=_size(o, 'solid_size')) as converted:
+            return {'entries': len(archive.list_entries()),
+                    'output_bytes': sum(p.stat().st_size for p in converted.volumes)}
+
+
+RUNNERS: Dict[str, Callable[[BatchJob, ProgressCallback, int], Dict[str, Any]]] = {
+    'create': _run_create,
+    'extract': _run_extract,
+    'list': _run_list,
+    'test': _run_test,
+    'convert': _run_convert,
+}
+
+
+class BatchRunner:
+    """Выполняет задания манифеста одновременно в пределах бюджета.
+
+    cpu - суммарное число рабочих потоков всех заданий (по умолчанию все
+    ядра), io - сколько заданий выполняется одновременно. Задание без
+    "workers" получает cpu // io потоков.
+    """
+
+    def __init__(self, jobs: List[BatchJob], cpu: Optional[int] = None, io: int = 2,
+                 on_finished: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.jobs = jobs
+        self.cpu = ResourceBudget(cpu or os.cpu_count() or 1)
+        self.io = max(1, io)
+        self.on_finished = on_finished
+        self._scheduled: List[Job] = []
+        self._by_id: Dict[str, Job] = {}
+
+    def _blocked_by(self, job: BatchJob) -> Optional[str]:
+        """Ждет заданий из after; возвращает id первого невыполненного"""
+        for item in job.after:
+            dependency = self._by_id[item]
+            dependency.join()
+            if dependency.result is None or dependency.result['status'] != STATUS_OK:
+                return item
+        return None
+
+    def _execute(self, job: BatchJob, progress: ProgressCallback) -> Dict[str, Any]:
+        result = {'id': job.id, 'command': job.command, 'archive': job.options['archive'],
+                  'status': STATUS_OK}
+        # Задания из after стоят в очереди раньше, поэтому ожидание не блокирует их
+        blocked = self._blocked_by(job)
+        if blocked is not None:
+            result.update(status=STATUS_ERROR, error=f"Не выполнено задание {blocked}",
+                          seconds=0.0)
+            if self.on_finished is not None:
+                self.on_finished(result)
+            return result
+
+        wanted = job.options.get('workers') or max(1, self.cpu.total // self.io)
+        workers = self.cpu.acquire(wanted)
+        result['workers'] = workers
+        seen = [0]
+
+        def track(done, total, name=''):
+            seen[0] = max(seen[0], done)
+            progress(done, total, name)
+
+        started = time.time()
+        clock = time.perf_counter()
+        try:
+            result.update(RUNNERS[job.command](job, track, workers))
+        except OperationCancelled:
+            result['status'] = STATUS_CANCELLED
+        except (ArchiveError, OSError) as e:
+            result['status'] = STATUS_ERROR
+            result['error'] = str(e)
+        finally:
+            self.cpu.release(workers)
+        seconds = time.perf_counter() - clock
+        result.setdefault('input_bytes', seen[0])
+        result.update(started=started, seconds=round(seconds, 3),
+                      throughput_mb_s=round(result['input_bytes'] / seconds / 1e6, 2)
+                      if seconds > 0 else None)
+        if self.on_finished is not None:
+            self.on_finished(result)
+        return result
+
+    def run(self) -> Dict[str, Any]:
+        """Выполняет все задания и возвращает сводку с результатами"""
+        scheduler = JobScheduler(workers=self.io)
+        started = time.time()
+        clock = time.perf_counter()
+        try:
+            for job in self.jobs:
+                scheduled = scheduler.submit(self._execute, job, title=job.id)
+                self._scheduled.append(scheduled)
+                self._by_id[job.id] = scheduled
+            for scheduled in self._scheduled:
+                scheduled.join()
+        except KeyboardInterrupt:
+            self.cancel()
+            for scheduled in self._scheduled:
+                scheduled.join()
+        finally:
+            scheduler.shutdown(cancel=True)
+        results = []
+        for job, scheduled in zip(self.jobs, self._scheduled):
+            if scheduled.result is not None:
+                results.append(scheduled.result)
+            else:
+                results.append({'id': job.id, 'command': job.command,
+                                'archive': job.options['archive'],
+                                'status': STATUS_CANCELLED if scheduled.cancelled
+                                else STATUS_ERROR,
+                                'error': str(scheduled.error or '')})
+        counts = {status: sum(r['status'] == status for r in results)
+                  for status in (STATUS_OK, STATUS_FAILED, STATUS_ERROR, STATUS_CANCELLED)}
+        return {'started': started, 'seconds': round(time.perf_counter() - clock, 3),
+                'cpu_budget': self.cpu.total, 'io_budget': self.io,
+                'summary': counts, 'jobs': results}
+
+    def cancel(self):
+        for scheduled in self._scheduled:
+            scheduled.cancel()
+
+
+def write_results(report: Dict[str, Any], path):
+    """Записывает результаты пакета атомарно (через временный файл)"""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp, path)
@@ -0,0 +1,425 @@
+# [file name]: nova_core/bench.py
+"""
+Набор замеров производительности (nova bench)
+
+Синтетические наборы файлов (много мелких файлов, несколько огромных,
+несжимаемые данные, текст) генерируются из фиксированного зерна, поэтому
+на одной машине замеры повторяемы. Для каждого формата, уровня сжатия и
+числа потоков замеряются создание, чтение списка, проверка и извлечение:
+время, МБ/с, файлов/с, процессорное время и пиковая память. Отчет - JSON;
+сравнение с сохраненным отчетом (baseline) находит регрессии.
+"""
+
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import backends
+from .errors import ArchiveError
+from .formats import (FORMAT_7Z, FORMAT_NV2, FORMAT_TAR, FORMAT_TAR_BZ2, FORMAT_TAR_GZ,
+                      FORMAT_TAR_XZ, FORMAT_TAR_ZST, FORMAT_ZIP)
+from .handler import ArchiveHandler
+
+# Версия схемы отчета: отчеты разных версий не сравниваются
+REPORT_VERSION = 1
+DEFAULT_SEED = 20240601
+DEFAULT_THRESHOLD = 0.10
+# Меньшие изменения - шум: короткие замеры и колебания памяти не считаются регрессией
+MIN_COMPARED_SECONDS = 0.05
+MIN_COMPARED_GROWTH = 8 * 1024 * 1024
+
+OP_CREATE = 'create'
+OP_LIST = 'list'
+OP_TEST = 'test'
+OP_EXTRACT = 'extract'
+OPERATIONS = (OP_CREATE, OP_LIST, OP_TEST, OP_EXTRACT)
+
+# Имя в отчете -> (расширение, формат). Те же форматы, что регистрируются
+# в Windows (кроме .rar, который только читается), и .tar.zst
+BENCH_FORMATS: Dict[str, Tuple[str, str]] = {
+    'zip': ('.zip', FORMAT_ZIP),
+    'sntr': ('.sntr', FORMAT_ZIP),
+    'nv': ('.nv', FORMAT_NV2),
+    'tar': ('.tar', FORMAT_TAR),
+    'tar.gz': ('.tar.gz', FORMAT_TAR_GZ),
+    'tar.bz2': ('.tar.bz2', FORMAT_TAR_BZ2),
+    'tar.xz': ('.tar.xz', FORMAT_TAR_XZ),
+    'tar.zst': ('.tar.zst', FORMAT_TAR_ZST),
+    '7z': ('.7z', FORMAT_7Z),
+}
+DEFAULT_FORMATS = ('zip', 'sntr', 'nv', 'tar', 'tar.gz', 'tar.bz2', 'tar.xz', '7z')
+# Форматы без сжатия замеряются только с уровнем по умолчанию
+_LEVELLESS = (FORMAT_TAR,)
+_FORMAT_BACKENDS = {FORMAT_7Z: 'py7zr', FORMAT_TAR_ZST: 'zstandard'}
+
+# Постоянное время изменения файлов наборов: архивы получаются одинаковыми
+_CORPUS_MTIME = 1577836800
+_WORDS = ('archive', 'volume', 'member', 'stream', 'block', 'index', 'header', 'codec',
+          'deflate', 'window', 'buffer', 'chunk', 'offset', 'record', 'central', 'local',
+          'nova', 'level', 'thread', 'worker', 'error', 'warning', 'request', 'timeout',
+          'the', 'a', 'of', 'and', 'to', 'in', 'is', 'for', 'with', 'on', 'at', 'by')
+
+
+class Corpus(NamedTuple):
+    """Сгенерированный набор файлов"""
+
+    name: str
+    path: Path
+    files: int
+    bytes: int
+
+
+def _text(rnd: random.Random, size: int) -> bytes:
+    """Псевдотекст из слов и чисел размером size байт"""
+    lines = []
+    length = 0
+    while length < size:
+        words = rnd.choices(_WORDS, k=rnd.randint(4, 14))
+        line = f"{rnd.randint(0, 99999):05d} {' '.join(words)} id={rnd.getrandbits(32):08x}\n"
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines).encode('ascii')[:size]
+
+
+def _random(rnd: random.Random, size: int) -> bytes:
+    """Несжимаемые данные"""
+    return rnd.getrandbits(size * 8).to_bytes(size, 'little') if size else b''
+
+
+def _tiny(rnd, scale):
+    for index in range(max(1, int(2000 * scale))):
+        yield f"d{index % 20:02d}/f{index:05d}.txt", _text(rnd, rnd.randint(64, 1024))
+
+
+def _huge(rnd, scale):
+    # Огромные файлы пишутся кусками по 1 МБ, чтобы не держать их в памяти
+    size = max(1, int(32 * scale))
+    for index in range(2):
+        yield f"huge{index}.log", (_text(rnd, 1024 * 1024) for _ in range(size))
+
+
+def _incompressible(rnd, scale):
+    for index in range(4):
+        yield f"random{index}.bin", _random(rnd, max(1024, int(4 * 1024 * 1024 * scale)))
+
+
+def _prose(rnd, scale):
+    for index in range(max(1, int(100 * scale))):
+        yield f"t{index % 5}/doc{index:04d}.txt", _text(rnd, rnd.randint(40, 120) * 1024)
+
+
+# Имя набора -> генератор (имя файла, содержимое или куски содержимого)
+CORPORA: Dict[str, Callable[[random.Random, float], Iterable[Tuple[str, Any]]]] = {
+    'tiny': _tiny,
+    'huge': _huge,
+    'random': _incompressible,
+    'text': _prose,
+}
+
+
+def make_corpus(name: str, root, scale: float = 1.0, seed: int = DEFAULT_SEED) -> Corpus:
+    """Генерирует набор name в папку root/name (прежнее содержимое удаляется)"""
+    if name not in CORPORA:
+        raise ArchiveError(f"Неизвестный набор файлов: {name}")
+    path = Path(root) / name
+    if path.exists():
+        shutil.rmtree(path)
+    rnd = random.Random(f"{seed}:{name}")
+    files = size = 0
+    for relative, content in CORPORA[name](rnd, scale):
+        target = path / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, 'wb') as f:
+            for chunk in ([content] if isinstance(content, bytes) else content):
+                f.write(chunk)
+                size += len(chunk)
+        os.utime(target, (_CORPUS_MTIME, _CORPUS_MTIME))
+        files += 1
+    return Corpus(name, path, files, size)
+
+
+def _reset_peak_rss() -> bool:
+    """Сбрасывает пик памяти процесса (только Linux); False - сброс недоступен"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _current_rss() -> Optional[int]:
+    """Текущий объем резидентной памяти (только Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss() -> Optional[int]:
+    """Пиковый объем резидентной памяти процесса в байтах"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if sys.platform == 'win32':
+        return _windows_peak_rss()
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS сообщает байты, остальные системы - килобайты
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_rss() -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class Counters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+    counters = Counters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                                    counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+class Measurement(NamedTuple):
+    """Время, процессорное время и пик памяти одного замера"""
+
+    seconds: float
+    cpu_seconds: float
+    peak_rss: Optional[int]
+    # 'operation' - пик именно этой операции, 'process' - пик процесса с запуска
+    peak_scope: str
+    # Насколько пик операции превысил память процесса перед ней
+    rss_growth: Optional[int]
+
+
+def measure(func: Callable[[], Any]) -> Tuple[Any, Measurement]:
+    """Выполняет func и замеряет его"""
+    scope = 'operation' if _reset_peak_rss() else 'process'
+    before = _current_rss() if scope == 'operation' else None
+    cpu = time.process_time()
+    clock = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - clock
+    peak = _peak_rss()
+    growth = max(0, peak - before) if peak is not None and before is not None else None
+    return result, Measurement(seconds, time.process_time() - cpu, peak, scope, growth)
+
+
+def case_key(result: Dict[str, Any]) -> str:
+    """Ключ замера для сравнения отчетов"""
+    level = result['level'] if result['level'] is not None else 'default'
+    return (f"{result['corpus']}/{result['format']}/{level}/"
+            f"{result['workers']}/{result['operation']}")
+
+
+class BenchSuite:
+    """Прогон замеров по всем сочетаниям набора, формата, уровня и потоков.
+
+    levels - уровни сжатия (None - уровень формата по умолчанию), workers -
+    числа потоков. repeat - сколько раз повторять замер; в отчет идет
+    лучший (самый быстрый) результат. on_result получает каждый результат.
+    """
+
+    def __init__(self, formats: Iterable[str] = DEFAULT_FORMATS,
+                 corpora: Iterable[str] = tuple(CORPORA),
+                 levels: Iterable[Optional[int]] = (None,),
+                 workers: Optional[Iterable[int]] = None,
+                 operations: Iterable[str] = OPERATIONS, scale: float = 1.0,
+                 repeat: int = 1, seed: int = DEFAULT_SEED, work_dir=None,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.formats = list(formats)
+        unknown = [name for name in self.formats if name not in BENCH_FORMATS]
+        unknown += [name for name in corpora if name not in CORPORA]
+        unknown += [name for name in operations if name not in OPERATIONS]
+        if unknown:
+            raise ArchiveError(f"Неизвестные форматы, наборы или операции: {', '.join(unknown)}")
+        self.corpora = list(corpora)
+        self.levels = list(levels)
+        self.workers = sorted(set(workers or (1, os.cpu_count() or 1)))
+        self.operations = [op for op in OPERATIONS if op in set(operations)]
+        self.scale = scale
+        self.repeat = max(1, repeat)
+        self.seed = seed
+        self.work_dir = Path(work_dir) if work_dir else None
+        self.on_result = on_result
+
+    def run(self) -> Dict[str, Any]:
+        """Генерирует наборы, выполняет замеры и возвращает отчет"""
+        root = self.work_dir or Path(tempfile.mkdtemp(prefix='nova-bench-'))
+        root.mkdir(parents=True, exist_ok=True)
+        report: Dict[str, Any] = {
+            'version': REPORT_VERSION, 'started': time.time(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'cpu_count': os.cpu_count(),
+            'scale': self.scale, 'seed': self.seed, 'repeat': self.repeat,
+            'corpora': {}, 'skipped': [], 'results': [],
+        }
+        try:
+            formats = []
+            for name in self.formats:
+                backend = _FORMAT_BACKENDS.get(BENCH_FORMATS[name][1])
+                if backend is not None and not backends.is_available(backend):
+                    report['skipped'].append({'format': name,
+                                              'reason': f"не установлен {backend}"})
+                else:
+                    formats.append(name)
+            for corpus_name in self.corpora:
+                corpus = make_corpus(corpus_name, root / 'corpus', self.scale, self.seed)
+                report['corpora'][corpus_name] = {'files': corpus.files, 'bytes': corpus.bytes}
+                for name in formats:
+                    for level in self._levels(name):
+                        for workers in self.workers:
+                            report['results'].extend(
+                                self._run_case(corpus, name, level, workers, root))
+                shutil.rmtree(corpus.path)
+        finally:
+            if self.work_dir is None:
+                shutil.rmtree(root, ignore_errors=True)
+        report['seconds'] = round(time.time() - report['started'], 3)
+        return report
+
+    def _levels(self, name: str) -> List[Optional[int]]:
+        if BENCH_FORMATS[name][1] in _LEVELLESS:
+            return [None]
+        return self.levels
+
+    def _run_case(self, corpus: Corpus, name: str, level: Optional[int], workers: int,
+                  root: Path) -> List[Dict[str, Any]]:
+        extension, fmt = BENCH_FORMATS[name]
+        archive = root / f"{corpus.name}-{name.replace('.', '_')}{extension}"
+        output = root / 'extract'
+        operations: Dict[str, Callable[[], Any]] = {
+            OP_CREATE: lambda: ArchiveHandler.create(archive, [corpus.path], fmt=fmt,
+                                                     level=level, workers=workers).close(),
+            # Кэш списков отключен: замеряется разбор самого архива
+            OP_LIST: lambda: len(ArchiveHandler(archive, use_cache=False).list_entries()),
+            OP_TEST: lambda: ArchiveHandler(archive, use_cache=False).verify(
+                workers=workers, resume=False),
+            OP_EXTRACT: lambda: ArchiveHandler(archive, use_cache=False).extract(
+                output, workers=workers),
+        }
+        results = []
+        # Без созданного архива остальные операции замерять нечем
+        wanted = [OP_CREATE] + [op for op in self.operations if op != OP_CREATE]
+        try:
+            for operation in wanted:
+                result = {'corpus': corpus.name, 'format': name, 'level': level,
+                          'workers': workers, 'operation': operation,
+                          'files': corpus.files, 'bytes': corpus.bytes}
+                try:
+                    result.update(self._measure(operations[operation], operation, archive,
+                                                output, corpus))
+                except (ArchiveError, OSError) as e:
+                    result['error'] = str(e)
+                if operation in self.operations:
+                    results.append(result)
+                    if self.on_result is not None:
+                        self.on_result(result)
+                if 'error' in result and operation == OP_CREATE:
+                    break
+        finally:
+            shutil.rmtree(output, ignore_errors=True)
+            _remove_archive(archive)
+        return results
+
+    def _measure(self, func, operation: str, archive: Path, output: Path,
+                 corpus: Corpus) -> Dict[str, Any]:
+        best: Optional[Measurement] = None
+        for _ in range(self.repeat):
+            if operation == OP_CREATE:
+                _remove_archive(archive)
+            elif operation == OP_EXTRACT:
+                shutil.rmtree(output, ignore_errors=True)
+            outcome, measured = measure(func)
+            if operation == OP_TEST and not outcome.ok:
+                raise ArchiveError(f"Архив не прошел проверку: {outcome.problems[0].message}")
+            if best is None or measured.seconds < best.seconds:
+                best = measured
+        seconds = max(best.seconds, 1e-9)
+        values = {'seconds': round(best.seconds, 4), 'cpu_seconds': round(best.cpu_seconds, 4),
+                  'files_s': round(corpus.files / seconds, 1),
+                  # Чтение списка не обрабатывает данные файлов
+                  'mb_s': None if operation == OP_LIST else round(corpus.bytes / seconds / 1e6, 2),
+                  'peak_rss': best.peak_rss, 'peak_scope': best.peak_scope,
+                  'rss_growth': best.rss_growth}
+        if operation == OP_CREATE:
+            size = archive.stat().st_size
+            values.update(archive_bytes=size,
+                          ratio=round(size / corpus.bytes, 4) if corpus.bytes else None)
+        return values
+
+
+def _remove_archive(archive: Path):
+    try:
+        archive.unlink()
+    except OSError:
+        pass
+
+
+class Comparison(NamedTuple):
+    """Изменение показателя замера относительно базового отчета"""
+
+    key: str
+    metric: str
+    baseline: float
+    current: float
+    # Доля изменения: для скорости отрицательная - медленнее, для памяти положительная - больше
+    change: float
+    regression: bool
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Comparison]:
+    """Сравнивает отчет с базовым: скорость (МБ/с, для списка - файлов/с) и
+    прирост памяти за операцию.
+
+    Регрессия - падение скорости или рост памяти больше threshold (доля).
+    Сравниваются только замеры, которые есть в обоих отчетах; слишком
+    короткие замеры и малые изменения памяти регрессией не считаются.
+    """
+    if baseline.get('version') != report.get('version'):
+        raise ArchiveError("Базовый отчет другой версии, сравнение невозможно")
+    previous = {case_key(r): r for r in baseline.get('results', []) if 'error' not in r}
+    comparisons = []
+    for result in report.get('results', []):
+        old = previous.get(case_key(result))
+        if old is None or 'error' in result:
+            continue
+        speed = 'files_s' if result['operation'] == OP_LIST else 'mb_s'
+        if old.get(speed) and result.get(speed) is not None:
+            change = result[speed] / old[speed] - 1
+            measurable = min(old['seconds'], result['seconds']) >= MIN_COMPARED_SECONDS
+            comparisons.append(Comparison(case_key(result), speed, old[speed], result[speed],
+                                          round(change, 4),
+                                          measurable and change < -threshold))
+        # Пик процесса с запуска зависит от предыдущих замеров, сравнивается только прирост
+        if old.get('rss_growth') is not None and result.get('rss_growth') is not None:
+            grown = result['rss_growth'] - old['rss_growth']
+            change = grown / max(old['rss_growth'], 1)
+            comparisons.append(Comparison(case_key(result), 'rss_growth', old['rss_growth'],
+                                          result['rss_growth'], round(change, 4),
+                                          grown > MIN_COMPARED_GROWTH and change > threshold))
+    return comparisons
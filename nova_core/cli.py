@@ -0,0 +1,570 @@
+# [file name]: nova_core/cli.py
+"""
+Команды nova для работы без окна
+
+    nova create <архив> <файлы...> [-f формат] [-l уровень] [-c кодек] [-v размер тома]
+                [--solid размер блока]
+    nova extract <архив> [элементы...] [-o папка] [--memory-budget размер]
+    nova list <архив> [--json]
+    nova test <архив> [--manifest sha256] [--restart]
+    nova convert <архив> <новый архив> [-f формат] [-l уровень] [-c кодек] [-v размер]
+    nova grep <образец> <архив...> [-i] [-E] [-l] [--index]
+    nova batch <манифест.jsonl> [--results файл] [--cpu N] [--io N]
+    nova bench [-o отчет.json] [--baseline отчет.json] [--formats zip,7z] [--levels 1,9]
+    nova watch <папки...> -o <папка архивов> [-f nv2|tar.zst] [--roll-size 256M]
+               [--roll-time 300] [--fsync] [--remove] [--once]
+
+Любая команда, кроме bench, принимает --trace файл.json: время по фазам
+(чтение, распаковка, запись, метаданные...) и счетчики записываются в
+файл событий Chrome (или сводку JSON с --trace-format json).
+
+Коды возврата: 0 - успех, 1 - архив не прошел проверку (задание пакета
+не выполнено, grep ничего не нашел, bench нашел регрессии), 2 - ошибка.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+from . import trace
+from .batch import STATUS_OK, BatchRunner, load_manifest, write_results
+from .bench import (BENCH_FORMATS, CORPORA, DEFAULT_FORMATS, DEFAULT_THRESHOLD, OPERATIONS,
+                    BenchSuite, compare)
+from .codecs import CODECS
+from .errors import ArchiveError, OperationCancelled, PasswordRequiredError
+from .extract import DEFAULT_MEMORY_BUDGET
+from .formats import WRITABLE_FORMATS
+from .handler import ArchiveHandler
+from .jobs import default_scheduler
+from .search import DEFAULT_MAX_HITS
+from .solid import check_solid_size
+from .verify import DEFAULT_MANIFEST_ALGORITHM
+from .volumes import parse_size
+from .watch import (DEFAULT_EXCLUDE, DEFAULT_FORMAT, DEFAULT_PIPELINE, DEFAULT_PREFIX,
+                    DEFAULT_ROLL_SIZE, DEFAULT_ROLL_TIME, DEFAULT_SETTLE, WATCH_FORMATS,
+                    FolderArchiver)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_ERROR = 2
+
+
+class ConsoleProgress:
+    """Строка прогресса в stderr (только если это терминал)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.enabled = self.stream.isatty()
+        self._width = 0
+
+    def __call__(self, done, total, name: str = ''):
+        if not self.enabled:
+            return
+        percent = f"{done * 100 // total:3d}%" if total else '   '
+        line = f"{percent} {name}"[:100]
+        self.stream.write('\r' + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+
+    def clear(self):
+        if self.enabled and self._width:
+            self.stream.write('\r' + ' ' * self._width + '\r')
+            self.stream.flush()
+            self._width = 0
+
+
+def _run(title: str, func, *args, **kwargs):
+    """Выполняет операцию через общий планировщик с прогрессом в терминале"""
+    progress = ConsoleProgress()
+    job = default_scheduler().submit(func, *args, title=title, on_progress=progress, **kwargs)
+    try:
+        return job.wait()
+    finally:
+        progress.clear()
+
+
+def _volumes_note(archive: ArchiveHandler) -> str:
+    count = len(archive.volumes)
+    return f", томов: {count}" if count > 1 else ''
+
+
+def cmd_create(args) -> int:
+    archive = _run("Создание", ArchiveHandler.create, args.archive, args.sources,
+                   fmt=args.format, level=args.level, password=args.password,
+                   workers=args.workers, codec=args.codec, long_distance=args.long,
+                   volume_size=args.volume_size, solid_size=args.solid_size)
+    with archive:
+        print(f"Создан {archive.path} ({archive.format}), элементов: "
+              f"{len(archive.list_entries())}{_volumes_note(archive)}")
+    return EXIT_OK
+
+
+def cmd_extract(args) -> int:
+    with ArchiveHandler(args.archive, password=args.password) as archive:
+        count = _run("Извлечение", archive.extract, args.output, args.members or None,
+                     workers=args.workers, memory_budget=args.memory_budget)
+    print(f"Извлечено элементов: {count}")
+    return EXIT_OK
+
+
+def cmd_list(args) -> int:
+    with ArchiveHandler(args.archive, password=args.password) as archive:
+        entries = archive.list_entries()
+    if args.json:
+        for e in entries:
+            print(json.dumps({'name': e.name, 'size': e.size, 'compressed_size':
+                              e.compressed_size, 'mtime': e.mtime, 'crc': e.crc,
+                              'is_dir': e.is_dir, 'encrypted': e.encrypted,
+                              'method': e.method}, ensure_ascii=False))
+        return EXIT_OK
+    for e in entries:
+        modified = e.modified.strftime('%Y-%m-%d %H:%M') if e.modified else '-'
+        print(f"{e.size:>14} {modified:>16}  {e.name}")
+    files = [e for e in entries if not e.is_dir]
+    print(f"{sum(e.size for e in files):>14} {'':>16}  файлов: {len(files)}")
+    return EXIT_OK
+
+
+def cmd_test(args) -> int:
+    with ArchiveHandler(args.archive, password=args.password) as archive:
+        result = _run("Проверка", archive.verify, workers=args.workers,
+                      manifest=args.manifest, resume=not args.restart)
+    for problem in result.problems:
+        print(f"ОШИБКА {problem.name}: {problem.message}")
+    summary = f"Проверено файлов: {result.checked}"
+    if result.resumed:
+        summary += f" (и {result.resumed} в прерванном запуске)"
+    summary += f", ошибок: {len(result.problems)}"
+    print(summary)
+    if result.manifest_written:
+        print(f"Записан манифест {result.manifest}")
+    elif result.manifest:
+        print(f"Сверено с манифестом {result.manifest}")
+        if result.unlisted:
+            print(f"Нет в манифесте: {result.unlisted}")
+    return EXIT_OK if result.ok else EXIT_FAILED
+
+
+def cmd_convert(args) -> int:
+    with ArchiveHandler(args.archive, password=args.password) as archive:
+        converted = _run("Преобразование", archive.convert, args.output, fmt=args.format,
+                         level=args.level, password=args.output_password,
+                         workers=args.workers, codec=args.codec, long_distance=args.long,
+                         volume_size=args.volume_size, solid_size=args.solid_size)
+    with converted:
+        print(f"Создан {converted.path} ({converted.format}){_volumes_note(converted)}")
+    return EXIT_OK
+
+
+def cmd_grep(args) -> int:
+    found = False
+    for path in args.archives:
+        with ArchiveHandler(path, password=args.password) as archive:
+            result = _run("Поиск", archive.search, args.pattern, regex=args.regex,
+                          ignore_case=args.ignore_case, names_only=args.files_with_matches,
+                          workers=args.workers, use_index=args.index,
+                          max_hits=args.max_count)
+        # Как grep: имя архива печатается, только если архивов несколько
+        prefix = f"{path}:" if len(args.archives) > 1 else ''
+        if args.files_with_matches:
+            for name in result.matched:
+                print(f"{prefix}{name}")
+        else:
+            for hit in result.hits:
+                print(f"{prefix}{hit.name}:{hit.line}:{hit.text}")
+        for problem in result.problems:
+            print(f"{prefix}{problem.name}: {problem.message}", file=sys.stderr)
+        found = found or bool(result.matched)
+    return EXIT_OK if found else EXIT_FAILED
+
+
+def cmd_batch(args) -> int:
+    jobs = load_manifest(args.manifest)
+    lock = threading.Lock()
+
+    def report(result):
+        if args.quiet:
+            return
+        speed = result.get('throughput_mb_s')
+        line = (f"[{result['status']}] {result['id']} {result['command']} "
+                f"{result['seconds']:.2f} с")
+        if speed:
+            line += f", {speed} МБ/с"
+        if result.get('error'):
+            line += f": {result['error']}"
+        with lock:
+            print(line, flush=True)
+
+    runner = BatchRunner(jobs, cpu=args.cpu, io=args.io, on_finished=report)
+    report_data = runner.run()
+    results = args.results or f"{args.manifest}.results.json"
+    write_results(report_data, results)
+    summary = report_data['summary']
+    print(f"Заданий: {len(jobs)}, успешно: {summary[STATUS_OK]}, "
+          f"с ошибками: {len(jobs) - summary[STATUS_OK]}, за {report_data['seconds']:.1f} с. "
+          f"Результаты: {results}")
+    return EXIT_OK if summary[STATUS_OK] == len(jobs) else EXIT_FAILED
+
+
+def cmd_bench(args) -> int:
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except ValueError as e:
+            raise ArchiveError(f"Базовый отчет не является JSON: {e}") from e
+
+    def report(result):
+        if args.quiet:
+            return
+        level = result['level'] if result['level'] is not None else '-'
+        line = (f"{result['corpus']:<7} {result['format']:<8} ур. {level:<2} "
+                f"потоков {result['workers']:<3} {result['operation']:<8}")
+        if 'error' in result:
+            line += f" ошибка: {result['error']}"
+        else:
+            speed = f"{result['mb_s']:>9.1f} МБ/с" if result['mb_s'] is not None else ' ' * 14
+            line += f" {result['seconds']:>8.3f} с {speed} {result['files_s']:>10.0f} файлов/с"
+        print(line, flush=True)
+
+    suite = BenchSuite(formats=args.formats, corpora=args.corpora, levels=args.levels,
+                       workers=args.bench_workers, operations=args.operations,
+                       scale=args.scale, repeat=args.repeat, work_dir=args.dir,
+                       on_result=report)
+    data = suite.run()
+    for skipped in data['skipped']:
+        print(f"Пропущен формат {skipped['format']}: {skipped['reason']}")
+    regressions = []
+    if baseline is not None:
+        changes = compare(data, baseline, args.threshold / 100)
+        regressions = [c for c in changes if c.regression]
+        data['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold / 100,
+                              'changes': [c._asdict() for c in changes]}
+        for c in regressions:
+            print(f"РЕГРЕССИЯ {c.key} {c.metric}: {c.baseline} -> {c.current} "
+                  f"({c.change:+.1%})")
+        print(f"Сравнено замеров: {len(changes)}, регрессий: {len(regressions)}")
+    write_results(data, args.output)
+    errors = sum('error' in r for r in data['results'])
+    print(f"Замеров: {len(data['results'])}, с ошибками: {errors}, "
+          f"за {data['seconds']:.1f} с. Отчет: {args.output}")
+    if errors:
+        return EXIT_ERROR
+    return EXIT_FAILED if regressions else EXIT_OK
+
+
+def cmd_watch(args) -> int:
+    lock = threading.Lock()
+
+    def report(result):
+        line = (f"{result.archive.name}: файлов {result.files}, "
+                f"{result.bytes / 1e6:.1f} МБ -> {result.archive_bytes / 1e6:.1f} МБ "
+                f"за {result.seconds:.2f} с")
+        if result.vanished:
+            line += f", удалены до упаковки: {result.vanished}"
+        with lock:
+            print(line, flush=True)
+
+    def error(message):
+        with lock:
+            print(f"Ошибка: {message}", file=sys.stderr, flush=True)
+
+    archiver = FolderArchiver(args.folders, args.output, fmt=args.format,
+                              roll_size=args.roll_size, roll_time=args.roll_time,
+                              level=args.level, codec=args.codec, workers=args.workers,
+                              password=args.password, pipeline=args.pipeline,
+                              fsync=args.fsync, remove=args.remove, prefix=args.prefix,
+                              exclude=args.exclude or DEFAULT_EXCLUDE, settle=args.settle,
+                              poll=args.poll, on_roll=report, on_error=error)
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        # Ctrl+C и SIGTERM дописывают текущий пакет, а не бросают его
+        for name in ('SIGINT', 'SIGTERM'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), lambda *_: stop.set())
+    if not args.once:
+        print(f"Наблюдение за {', '.join(args.folders)} -> {archiver.output} "
+              f"(Ctrl+C - остановить)", file=sys.stderr, flush=True)
+    rolls = archiver.run(stop, once=args.once)
+    print(f"Записано архивов: {rolls}. Индекс: {archiver.index_path}", file=sys.stderr)
+    return EXIT_OK
+
+
+def _names(choices):
+    def parse(text: str) -> List[str]:
+        names = [name.strip() for name in text.split(',') if name.strip()]
+        unknown = [name for name in names if name not in choices]
+        if unknown or not names:
+            raise argparse.ArgumentTypeError(
+                f"ожидается список через запятую из: {', '.join(choices)}")
+        return names
+    return parse
+
+
+def _levels(text: str) -> List[Optional[int]]:
+    try:
+        return [None if item.strip() == 'default' else int(item)
+                for item in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("ожидаются уровни через запятую, "
+                                         "например 1,6,9 или default") from None
+
+
+def _counts(text: str) -> List[int]:
+    try:
+        counts = [int(item) for item in text.split(',')]
+    except ValueError:
+        counts = []
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError("ожидаются числа потоков через запятую, например 1,4")
+    return counts
+
+
+def _add_trace_options(parser: argparse.ArgumentParser):
+    parser.add_argument('--trace', metavar='ФАЙЛ',
+                        help="Записать трассу: время по фазам и счетчики операций")
+    parser.add_argument('--trace-format', choices=trace.TRACE_FORMATS,
+                        default=trace.TRACE_CHROME,
+                        help="chrome - события для chrome://tracing и Perfetto (по "
+                             "умолчанию), json - сводка и список событий")
+
+
+def _print_trace(tracer: trace.Tracer, path: str):
+    """Краткая сводка трассы в stderr: фазы по убыванию времени"""
+    summary = tracer.summary()
+    phases = sorted(summary['phases'].items(), key=lambda item: -item[1]['seconds'])
+    parts = []
+    for name, phase in phases[:6]:
+        part = f"{name} {phase['seconds']:.2f} с"
+        if phase['wait_seconds'] >= 0.01:
+            part += f" (ожидание {phase['wait_seconds']:.2f} с)"
+        parts.append(part)
+    print(f"Трасса {path}: {summary['elapsed']:.2f} с; " + ', '.join(parts), file=sys.stderr)
+
+
+def _add_write_options(parser: argparse.ArgumentParser):
+    parser.add_argument('-f', '--format', choices=WRITABLE_FORMATS,
+                        help="Формат (по умолчанию - по расширению)")
+    parser.add_argument('-l', '--level', type=int, help="Уровень сжатия")
+    parser.add_argument('-c', '--codec', choices=sorted(CODECS), help="Метод сжатия")
+    parser.add_argument('--long', action='store_true',
+                        help="Дальние совпадения zstd (окно 128 МБ)")
+    parser.add_argument('-v', '--volume-size', type=_volume_size, metavar='РАЗМЕР',
+                        help="Разбить на тома (ZIP и .nv v2), например 650M или 4.7G")
+    parser.add_argument('--solid', type=_solid_size, metavar='РАЗМЕР', dest='solid_size',
+                        help="Сплошные блоки (.nv v2 и 7z), например 16M: файл "
+                             "извлекается распаковкой только своего блока")
+
+
+def _volume_size(text: str) -> int:
+    try:
+        return parse_size(text)
+    except ArchiveError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _memory_budget(text: str) -> int:
+    try:
+        size = parse_size(text)
+    except ArchiveError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError("Объем памяти должен быть больше нуля")
+    return size
+
+
+def _solid_size(text: str) -> int:
+    try:
+        return check_solid_size(parse_size(text))
+    except ArchiveError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='nova', description="Nova Archiver без окна")
+    commands = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-j', '--workers', type=int, help="Число рабочих потоков")
+    common.add_argument('-p', '--password', help="Пароль архива")
+    _add_trace_options(common)
+
+    create = commands.add_parser('create', parents=[common], help="Создать архив")
+    create.add_argument('archive', help="Путь к новому архиву")
+    create.add_argument('sources', nargs='+', help="Файлы и папки")
+    _add_write_options(create)
+    create.set_defaults(func=cmd_create)
+
+    extract = commands.add_parser('extract', parents=[common], help="Извлечь архив")
+    extract.add_argument('archive', help="Путь к архиву")
+    extract.add_argument('members', nargs='*', help="Извлечь только эти элементы")
+    extract.add_argument('-o', '--output', default='.', help="Папка назначения")
+    extract.add_argument('--memory-budget', type=_memory_budget, metavar='РАЗМЕР',
+                         help="Предел распакованных данных в очередях записи при "
+                              "параллельном извлечении, например 256M (по умолчанию "
+                              f"{DEFAULT_MEMORY_BUDGET >> 20}M)")
+    # Элементы можно перечислять и после опций: extract a.zip -o out src/f1.txt
+    extract.set_defaults(func=cmd_extract, trailing='members')
+
+    listing = commands.add_parser('list', parents=[common], help="Показать содержимое")
+    listing.add_argument('archive', help="Путь к архиву")
+    listing.add_argument('--json', action='store_true', help="JSON-объект на строку")
+    listing.set_defaults(func=cmd_list)
+
+    test = commands.add_parser('test', parents=[common], help="Проверить целостность архива")
+    test.add_argument('archive', help="Путь к архиву")
+    test.add_argument('--manifest', nargs='?', const=DEFAULT_MANIFEST_ALGORITHM,
+                      metavar='АЛГОРИТМ',
+                      help="Сверить хэши с манифестом архива или записать его "
+                           f"(по умолчанию {DEFAULT_MANIFEST_ALGORITHM})")
+    test.add_argument('--restart', action='store_true',
+                      help="Проверить заново, не продолжая прерванную проверку")
+    test.set_defaults(func=cmd_test)
+
+    convert = commands.add_parser('convert', parents=[common],
+                                  help="Перепаковать архив в другой формат")
+    convert.add_argument('archive', help="Исходный архив")
+    convert.add_argument('output', help="Новый архив")
+    convert.add_argument('--output-password', help="Пароль нового архива")
+    _add_write_options(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    grep = commands.add_parser('grep', parents=[common], help="Найти текст в файлах архива")
+    grep.add_argument('pattern', help="Подстрока (или регулярное выражение с -E)")
+    grep.add_argument('archives', nargs='+', metavar='archive', help="Архивы")
+    grep.add_argument('-E', '--regex', action='store_true', help="Образец - регулярное выражение")
+    grep.add_argument('-i', '--ignore-case', action='store_true', help="Без учета регистра")
+    grep.add_argument('-l', '--files-with-matches', action='store_true',
+                      help="Только имена файлов с совпадениями")
+    grep.add_argument('-m', '--max-count', type=int, default=DEFAULT_MAX_HITS,
+                      help=f"Не больше N совпадений на файл (по умолчанию {DEFAULT_MAX_HITS})")
+    grep.add_argument('--index', action='store_true',
+                      help="Триграммный индекс в кэше: повторный поиск читает только "
+                           "подходящие файлы")
+    grep.set_defaults(func=cmd_grep)
+
+    batch = commands.add_parser('batch', help="Выполнить задания из манифеста JSON/JSONL")
+    batch.add_argument('manifest', help="Файл заданий")
+    batch.add_argument('--results', help="Файл результатов (по умолчанию "
+                                         "<манифест>.results.json)")
+    batch.add_argument('--cpu', type=int, help="Всего рабочих потоков на все задания "
+                                               "(по умолчанию - число ядер)")
+    batch.add_argument('--io', type=int, default=2,
+                       help="Сколько заданий выполнять одновременно (по умолчанию 2)")
+    batch.add_argument('-q', '--quiet', action='store_true',
+                       help="Не печатать итог каждого задания")
+    _add_trace_options(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    bench = commands.add_parser('bench', help="Замерить скорость форматов на "
+                                              "синтетических наборах файлов")
+    bench.add_argument('-o', '--output', default='nova-bench.json',
+                       help="Файл отчета JSON (по умолчанию nova-bench.json)")
+    bench.add_argument('--baseline', help="Сравнить с сохраненным отчетом")
+    bench.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD * 100,
+                       metavar='ПРОЦЕНТ',
+                       help="Регрессия - замедление или рост памяти больше чем на "
+                            f"столько процентов (по умолчанию {DEFAULT_THRESHOLD * 100:.0f}%%)")
+    bench.add_argument('--formats', type=_names(tuple(BENCH_FORMATS)),
+                       default=list(DEFAULT_FORMATS),
+                       help=f"Форматы через запятую (по умолчанию {','.join(DEFAULT_FORMATS)})")
+    bench.add_argument('--corpora', type=_names(tuple(CORPORA)), default=list(CORPORA),
+                       help=f"Наборы файлов (по умолчанию {','.join(CORPORA)})")
+    bench.add_argument('--levels', type=_levels, default=[None],
+                       help="Уровни сжатия через запятую (по умолчанию default)")
+    bench.add_argument('-j', '--workers', dest='bench_workers', type=_counts,
+                       help="Числа потоков через запятую (по умолчанию 1 и число ядер)")
+    bench.add_argument('--operations', type=_names(OPERATIONS), default=list(OPERATIONS),
+                       help=f"Операции (по умолчанию {','.join(OPERATIONS)})")
+    bench.add_argument('--scale', type=float, default=1.0,
+                       help="Множитель размера наборов (по умолчанию 1, около 90 МБ)")
+    bench.add_argument('--repeat', type=int, default=1,
+                       help="Повторов каждого замера, в отчет идет лучший")
+    bench.add_argument('--dir', help="Рабочая папка (по умолчанию временная, удаляется)")
+    bench.add_argument('-q', '--quiet', action='store_true',
+                       help="Не печатать каждый замер")
+    bench.set_defaults(func=cmd_bench)
+
+    watch = commands.add_parser('watch', parents=[common],
+                                help="Непрерывно упаковывать файлы, поступающие в папки")
+    watch.add_argument('folders', nargs='+', metavar='folder', help="Наблюдаемые папки")
+    watch.add_argument('-o', '--output', required=True, help="Папка архивов и индекса")
+    watch.add_argument('-f', '--format', choices=tuple(WATCH_FORMATS), default=DEFAULT_FORMAT,
+                       help=f"Формат архивов (по умолчанию {DEFAULT_FORMAT}, .nv)")
+    watch.add_argument('-l', '--level', type=int, help="Уровень сжатия")
+    watch.add_argument('-c', '--codec', choices=sorted(CODECS),
+                       help="Метод сжатия (ZIP и .nv v2)")
+    watch.add_argument('--roll-size', type=_volume_size, default=DEFAULT_ROLL_SIZE,
+                       metavar='РАЗМЕР', help="Новый архив после стольких байт, например "
+                                              "64M (по умолчанию 256M)")
+    watch.add_argument('--roll-time', type=float, default=DEFAULT_ROLL_TIME, metavar='СЕКУНД',
+                       help="Новый архив через столько секунд после первого файла "
+                            f"пакета (по умолчанию {DEFAULT_ROLL_TIME:.0f})")
+    watch.add_argument('--pipeline', type=int, default=DEFAULT_PIPELINE,
+                       help="Сколько архивов сжимать одновременно, пока собирается "
+                            f"следующий (по умолчанию {DEFAULT_PIPELINE})")
+    watch.add_argument('--fsync', action='store_true',
+                       help="Сбрасывать архив и индекс на диск перед тем, как считать "
+                            "их записанными")
+    watch.add_argument('--remove', action='store_true',
+                       help="Удалять исходные файлы после записи архива")
+    watch.add_argument('--prefix', default=DEFAULT_PREFIX,
+                       help=f"Начало имени архивов (по умолчанию {DEFAULT_PREFIX})")
+    watch.add_argument('--exclude', action='append', metavar='ШАБЛОН',
+                       help="Не упаковывать файлы с такими именами (можно несколько; по "
+                            f"умолчанию {' '.join(DEFAULT_EXCLUDE)})")
+    watch.add_argument('--settle', type=float, default=DEFAULT_SETTLE, metavar='СЕКУНД',
+                       help="Найденный обходом файл готов, если не менялся столько секунд")
+    watch.add_argument('--poll', action='store_true',
+                       help="Обходить папки по таймеру вместо inotify")
+    watch.add_argument('--once', action='store_true',
+                       help="Упаковать то, что уже есть, и завершиться")
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+
+COMMANDS = ('create', 'extract', 'list', 'test', 'convert', 'grep', 'batch', 'bench', 'watch')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Разбирает команду и выполняет ее"""
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra:
+        # Необязательный список (nargs='*') argparse заполняет до опций, остаток - сюда
+        trailing = getattr(args, 'trailing', None)
+        if trailing is None or any(item.startswith('-') for item in extra):
+            parser.error(f"unrecognized arguments: {' '.join(extra)}")
+        getattr(args, trailing).extend(extra)
+    trace_path = getattr(args, 'trace', None)
+    tracer = trace.start_trace() if trace_path else None
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Читатель вывода закрылся (nova grep ... | head): молча выходим, как grep.
+        # stdout уводится в devnull, чтобы Python не ругался при сбросе буфера на выходе
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+        return EXIT_OK
+    except (OperationCancelled, KeyboardInterrupt):
+        print("Операция отменена", file=sys.stderr)
+        return EXIT_ERROR
+    except PasswordRequiredError as e:
+        print(f"Нужен пароль (-p): {e}", file=sys.stderr)
+        return EXIT_ERROR
+    except (ArchiveError, OSError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if tracer is not None:
+            trace.stop_trace()
+            try:
+                tracer.write(trace_path, args.trace_format)
+                _print_trace(tracer, trace_path)
+            except OSError as e:
+                print(f"Не удалось записать трассу: {e}", file=sys.stderr)
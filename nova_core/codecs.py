@@ -0,0 +1,309 @@
+# [file name]: nova_core/codecs.py
+"""
+Кодеки сжатия для записи архивов
+
+Писатели ZIP, .nv v2 и TAR получают кодек по имени: store, deflate (zlib),
+zstd (ZIP метод 93, .tar.zst; библиотека zstandard) и lz4 (только .nv v2;
+библиотека lz4). Внешние библиотеки загружаются через backends по
+требованию.
+
+Автовыбор (should_store) отсеивает уже сжатые данные - jpg, mp4, zip, 7z
+и т.п. - по расширению, сигнатуре и пробному быстрому сжатию первого
+блока, чтобы не тратить процессор на данные, которые не сожмутся.
+"""
+
+import io
+import threading
+import zlib
+from typing import IO, Dict, Optional
+
+from . import backends
+from .errors import ArchiveError
+
+CODEC_STORE = 'store'
+CODEC_DEFLATE = 'deflate'
+CODEC_ZSTD = 'zstd'
+CODEC_LZ4 = 'lz4'
+
+# Размер пробы для автовыбора и порог: сжатие меньше чем на 3% - хранить как есть
+SAMPLE_SIZE = 64 * 1024
+STORE_RATIO = 0.97
+
+# Окно дальних совпадений zstd: 128 МБ - предел, который читают все декодеры по умолчанию
+LONG_DISTANCE_WINDOW_LOG = 27
+
+COMPRESSED_EXTENSIONS = frozenset((
+    '.7z', '.zip', '.rar', '.gz', '.tgz', '.bz2', '.xz', '.txz', '.zst', '.lz4', '.br',
+    '.sntr', '.nv', '.jar', '.apk', '.whl', '.docx', '.xlsx', '.pptx', '.odt', '.epub',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif', '.jxl',
+    '.mp4', '.m4v', '.mkv', '.mov', '.avi', '.webm', '.wmv',
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac',
+))
+
+# Сигнатуры сжатых форматов (смещение, байты)
+_COMPRESSED_SIGNATURES = (
+    (0, b'\xff\xd8\xff'),              # JPEG
+    (0, b'\x89PNG'),
+    (0, b'GIF8'),
+    (0, b'PK\x03\x04'),                # ZIP и офисные документы
+    (0, b'7z\xbc\xaf\x27\x1c'),
+    (0, b'Rar!\x1a\x07'),
+    (0, b'\x1f\x8b'),                  # gzip
+    (0, b'BZh'),
+    (0, b'\xfd7zXZ\x00'),
+    (0, b'\x28\xb5\x2f\xfd'),          # zstd
+    (0, b'\x04\x22\x4d\x18'),          # lz4
+    (0, b'NOVA\x02'),
+    (0, b'OggS'),
+    (0, b'fLaC'),
+    (0, b'\x1a\x45\xdf\xa3'),          # Matroska/WebM
+    (4, b'ftyp'),                      # MP4/MOV/HEIC
+)
+
+
+def should_store(sample: bytes, name: str = '', probe: bool = True) -> bool:
+    """Стоит ли сохранить данные без сжатия.
+
+    sample - начало файла (до SAMPLE_SIZE байт). Решение по расширению и
+    сигнатуре бесплатно; иначе проба сжимается zlib уровня 1 (если probe).
+    """
+    if len(sample) < 64:
+        return False
+    dot = name.rfind('.')
+    if dot != -1 and name[dot:].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    for offset, signature in _COMPRESSED_SIGNATURES:
+        if sample.startswith(signature, offset):
+            return True
+    if not probe:
+        return False
+    sample = sample[:SAMPLE_SIZE]
+    return len(zlib.compress(sample, 1)) >= len(sample) * STORE_RATIO
+
+
+class Codec:
+    """Кодек: сжатие блоков и потоков, распаковка"""
+
+    name = ''
+    description = ''
+    # Номер метода в ZIP и версия "needed to extract" (None - в ZIP не пишется)
+    zip_method: Optional[int] = None
+    zip_version = 20
+    # Номер кодека во фрагментах .nv v2
+    nv_id: Optional[int] = None
+    # Библиотека из backends (None - хватает stdlib)
+    backend: Optional[str] = None
+    default_level = 0
+    min_level = 0
+    max_level = 0
+
+    def available(self) -> bool:
+        return self.backend is None or backends.is_available(self.backend)
+
+    def module(self):
+        return backends.load(self.backend)
+
+    def clamp(self, level: Optional[int]) -> int:
+        if level is None:
+            return self.default_level
+        return max(self.min_level, min(self.max_level, level))
+
+    def compress(self, data, level: int, long_distance: bool = False) -> bytes:
+        """Сжимает данные в самостоятельный поток"""
+        raise NotImplementedError
+
+    def compress_block(self, data, level: int, final: bool, zdict: Optional[bytes] = None,
+                       long_distance: bool = False) -> bytes:
+        """Сжимает блок для параллельного сжатия; блоки склеиваются подряд.
+
+        По умолчанию каждый блок - отдельный кадр (zstd читает кадры подряд).
+        """
+        return self.compress(data, level, long_distance)
+
+    def decompress(self, data, size: int) -> bytes:
+        """Распаковывает данные, размер результата известен"""
+        raise NotImplementedError
+
+    def reader(self, raw: IO[bytes]) -> IO[bytes]:
+        """Поток распаковки поверх потока сжатых данных"""
+        raise NotImplementedError
+
+    def writer(self, raw: IO[bytes], level: int, long_distance: bool = False,
+               workers: int = 0) -> IO[bytes]:
+        """Поток сжатия поверх файла; close() дописывает хвост, но не закрывает raw"""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"Codec({self.name!r})"
+
+
+class StoreCodec(Codec):
+    name = CODEC_STORE
+    description = 'Без сжатия'
+    zip_method = 0
+    zip_version = 10
+    nv_id = 0
+
+    def compress(self, data, level, long_distance=False):
+        return bytes(data)
+
+    def decompress(self, data, size):
+        return bytes(data)
+
+    def reader(self, raw):
+        return raw
+
+
+class DeflateCodec(Codec):
+    name = CODEC_DEFLATE
+    description = 'Deflate (zlib)'
+    zip_method = 8
+    nv_id = 1
+    default_level = 6
+    min_level = 0
+    max_level = 9
+
+    def compress(self, data, level, long_distance=False):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+
+    def compress_block(self, data, level, final, zdict=None, long_distance=False):
+        # Блоки заканчиваются Z_SYNC_FLUSH, словарь - хвост предыдущего блока:
+        # склеенные блоки образуют один обычный deflate-поток (как в pigz)
+        if zdict:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 8,
+                                          zlib.Z_DEFAULT_STRATEGY, zdict)
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        out = compressor.compress(data)
+        return out + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    def decompress(self, data, size):
+        return zlib.decompress(data, -15, size or 1)
+
+    def reader(self, raw):
+        return io.BufferedReader(_InflateReader(raw))
+
+
+class _InflateReader(io.RawIOBase):
+    """Распаковка raw deflate из потока"""
+
+    def __init__(self, raw: IO[bytes]):
+        super().__init__()
+        self._raw = raw
+        self._inflater = zlib.decompressobj(-15)
+        self._tail = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._inflater.eof:
+            source = self._tail or self._raw.read(SAMPLE_SIZE)
+            if not source:
+                raise ArchiveError("Поток deflate обрезан")
+            out = self._inflater.decompress(source, len(buffer))
+            self._tail = self._inflater.unconsumed_tail
+            if out:
+                buffer[:len(out)] = out
+                return len(out)
+        return 0
+
+
+class ZstdCodec(Codec):
+    name = CODEC_ZSTD
+    description = 'Zstandard'
+    zip_method = 93
+    zip_version = 63
+    nv_id = 2
+    backend = 'zstandard'
+    default_level = 3
+    min_level = 1
+    max_level = 22
+
+    def __init__(self):
+        # Контексты zstd нельзя делить между потоками, держим свой в каждом
+        self._local = threading.local()
+
+    def _compressor(self, level: int, long_distance: bool, workers: int = 0):
+        zstd = self.module()
+        if long_distance:
+            params = zstd.ZstdCompressionParameters.from_level(
+                level, enable_ldm=True, window_log=LONG_DISTANCE_WINDOW_LOG, threads=workers)
+            return zstd.ZstdCompressor(compression_params=params)
+        return zstd.ZstdCompressor(level=level, threads=workers)
+
+    def compress(self, data, level, long_distance=False):
+        cache: Dict[tuple, object] = getattr(self._local, 'compressors', None)
+        if cache is None:
+            cache = self._local.compressors = {}
+        compressor = cache.get((level, long_distance))
+        if compressor is None:
+            compressor = cache[level, long_distance] = self._compressor(level, long_distance)
+        return compressor.compress(data)
+
+    def decompress(self, data, size):
+        zstd = self.module()
+        try:
+            return zstd.ZstdDecompressor().decompress(data, max_output_size=size or 1)
+        except zstd.ZstdError as e:
+            raise ArchiveError(f"Поврежденные данные zstd: {e}") from e
+
+    def reader(self, raw):
+        return io.BufferedReader(self.module().ZstdDecompressor(
+            max_window_size=1 << LONG_DISTANCE_WINDOW_LOG).stream_reader(
+                raw, read_across_frames=True, closefd=False))
+
+    def writer(self, raw, level, long_distance=False, workers=0):
+        return self._compressor(level, long_distance, workers).stream_writer(raw, closefd=False)
+
+
+class Lz4Codec(Codec):
+    name = CODEC_LZ4
+    description = 'LZ4 (быстрое сжатие, только .nv v2)'
+    nv_id = 3
+    backend = 'lz4'
+    default_level = 0
+    min_level = 0
+    max_level = 12
+
+    def compress(self, data, level, long_distance=False):
+        block = self.module()
+        if level >= 3:
+            return block.compress(data, mode='high_compression', compression=level,
+                                  store_size=False)
+        return block.compress(data, store_size=False)
+
+    def decompress(self, data, size):
+        block = self.module()
+        try:
+            return block.decompress(data, uncompressed_size=size)
+        except block.LZ4BlockError as e:
+            raise ArchiveError(f"Поврежденные данные lz4: {e}") from e
+
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in
+                            (StoreCodec(), DeflateCodec(), ZstdCodec(), Lz4Codec())}
+_BY_ZIP_METHOD = {c.zip_method: c for c in CODECS.values() if c.zip_method is not None}
+_BY_NV_ID = {c.nv_id: c for c in CODECS.values() if c.nv_id is not None}
+
+
+def get_codec(name: str) -> Codec:
+    """Кодек по имени; недоступная библиотека дает BackendMissingError"""
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ArchiveError(f"Неизвестный метод сжатия: {name}")
+    if codec.backend is not None:
+        codec.module()
+    return codec
+
+
+def codec_for_zip_method(method: int) -> Optional[Codec]:
+    return _BY_ZIP_METHOD.get(method)
+
+
+def codec_for_nv_id(codec_id: int) -> Codec:
+    codec = _BY_NV_ID.get(codec_id)
+    if codec is None:
+        raise ArchiveError(f"Неизвестный метод сжатия фрагмента: {codec_id}")
+    return codec
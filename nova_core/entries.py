@@ -0,0 +1,38 @@
+# [file name]: nova_core/entries.py
+"""
+Описание элемента архива, общее для всех форматов
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class ArchiveEntry:
+    """Элемент архива (файл или папка)"""
+
+    name: str
+    size: int = 0
+    compressed_size: int = 0
+    mtime: Optional[float] = None
+    crc: Optional[int] = None
+    is_dir: bool = False
+    encrypted: bool = False
+    method: str = ""
+    # Права Unix (st_mode или только биты прав); None - архив их не хранит
+    mode: Optional[int] = None
+
+    @property
+    def modified(self) -> Optional[datetime]:
+        """Дата изменения в виде datetime"""
+        if self.mtime is None:
+            return None
+        return datetime.fromtimestamp(self.mtime)
+
+    @property
+    def ratio(self) -> float:
+        """Степень сжатия в процентах (0 - не сжат)"""
+        if not self.size:
+            return 0.0
+        return max(0.0, 100.0 * (1 - self.compressed_size / self.size))
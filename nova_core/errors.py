@@ -0,0 +1,32 @@
+# [file name]: nova_core/errors.py
+"""
+Исключения движка архивов Nova
+"""
+
+
+class ArchiveError(Exception):
+    """Базовая ошибка операций с архивом"""
+
+
+class UnsupportedFormatError(ArchiveError):
+    """Формат архива не распознан или не поддерживается"""
+
+
+class BackendMissingError(ArchiveError):
+    """Для формата требуется библиотека, которая не установлена"""
+
+    def __init__(self, library: str, description: str = ""):
+        self.library = library
+        self.description = description
+        message = f"Библиотека {library} не установлена"
+        if description:
+            message += f" ({description})"
+        super().__init__(message)
+
+
+class PasswordRequiredError(ArchiveError):
+    """Архив защищен паролем, а пароль не указан или неверен"""
+
+
+class OperationCancelled(ArchiveError):
+    """Операция отменена пользователем"""
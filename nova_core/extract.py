@@ -0,0 +1,317 @@
+# [file name]: nova_core/extract.py
+"""
+Параллельное извлечение ZIP (.zip, .sntr, .nv) и несжатых TAR
+
+Элементы распаковываются в пуле потоков, а запись на диск идет через
+ограниченные очереди потоков ввода-вывода. Число открытых файлов и объем
+данных в памяти ограничены, а события прогресса выдаются строго в порядке
+элементов архива, как при последовательном извлечении.
+
+Папки создаются заранее одним проходом (по одному mkdir на папку), время
+изменения и права файла ставятся по открытому дескриптору, а время и права
+папок - в конце, когда их содержимое уже записано.
+"""
+
+import os
+import queue
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import trace
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .streams import CHUNK_SIZE, safe_join
+
+# Объем распакованных данных, одновременно находящихся в очередях записи
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+_OPEN = 0
+_DATA = 1
+_CLOSE = 2
+
+# futimens и fchmod: время и права ставятся без повторного поиска файла по пути
+_UTIME_FD = os.utime in os.supports_fd
+_CHMOD_FD = os.chmod in os.supports_fd
+# Восстанавливаются только биты rwx: setuid, setgid и sticky из архива не переносятся
+_MODE_MASK = 0o777
+
+
+def entry_mode(entry: ArchiveEntry) -> Optional[int]:
+    """Права для извлеченного элемента или None, если архив их не хранит"""
+    if not entry.mode:
+        return None
+    return entry.mode & _MODE_MASK or None
+
+
+def finish_file(handle: IO[bytes], target: Path, entry: ArchiveEntry):
+    """Закрывает извлеченный файл, поставив ему время изменения и права"""
+    mtime, mode = entry.mtime, entry_mode(entry)
+    try:
+        if mtime is not None and _UTIME_FD:
+            # Иначе запись остатка буфера при закрытии снова сдвинет время
+            handle.flush()
+            os.utime(handle.fileno(), (mtime, mtime))
+        if mode is not None and _CHMOD_FD:
+            os.chmod(handle.fileno(), mode)
+    finally:
+        handle.close()
+    if mtime is not None and not _UTIME_FD:
+        os.utime(target, (mtime, mtime))
+    if mode is not None and not _CHMOD_FD:
+        os.chmod(target, mode)
+
+
+def finish_dirs(dirs: List[Tuple[ArchiveEntry, Path]]):
+    """Время изменения и права папок - последним шагом, начиная с самых глубоких:
+    создание файлов внутри папки сбрасывает ее время, а права без записи не дали
+    бы создать в ней файлы"""
+    dirs = [(entry, target) for entry, target in dirs
+            if entry.mtime is not None or entry.mode]
+    if not dirs:
+        return
+    dirs.sort(key=lambda item: len(item[1].parts), reverse=True)
+    calls = 0
+    with trace.span(trace.PHASE_METADATA):
+        for entry, target in dirs:
+            mode = entry_mode(entry)
+            if mode is not None:
+                os.chmod(target, mode)
+                calls += 1
+            if entry.mtime is not None:
+                os.utime(target, (entry.mtime, entry.mtime))
+                calls += 1
+    trace.count(trace.METADATA_CALLS, calls)
+
+
+def make_dirs(dest, dirs: Iterable[Path]) -> int:
+    """Создает папки и их недостающих родителей внутри dest, возвращает число вызовов mkdir.
+
+    Каждая папка создается одним вызовом mkdir, родители раньше детей, без
+    проверок exists и повторных попыток, как у mkdir(parents=True) на каждую.
+    """
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    needed: Set[Path] = set()
+    for path in dirs:
+        while path != dest and path not in needed:
+            needed.add(path)
+            path = path.parent
+    for path in sorted(needed, key=lambda p: len(p.parts)):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            if not os.path.isdir(path):
+                raise ArchiveError(f"Вместо папки уже есть файл: {path}")
+    return len(needed)
+
+
+class FileSlice:
+    """Поток для чтения участка файла (данные элемента несжатого TAR)"""
+
+    def __init__(self, path, offset: int, size: int):
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._left = size
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._file.read(size)
+        self._left -= len(data)
+        trace.count(trace.BYTES_IN, len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParallelExtractor:
+    """Извлечение элементов архива в несколько потоков.
+
+    open_member(entry) должен быть потокобезопасным и возвращать поток чтения.
+    workers - потоки распаковки, io_threads - потоки записи на диск,
+    memory_budget - предел байт в очередях записи, max_open_files - предел
+    одновременно открытых извлекаемых файлов.
+    """
+
+    def __init__(self, open_member: Callable[[ArchiveEntry], IO[bytes]],
+                 workers: Optional[int] = None, io_threads: Optional[int] = None,
+                 memory_budget: Optional[int] = None, max_open_files: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE):
+        self.open_member = open_member
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.io_threads = max(1, io_threads or min(4, self.workers))
+        self.memory_budget = memory_budget or DEFAULT_MEMORY_BUDGET
+        self.max_open_files = max(1, max_open_files or self.workers * 4)
+        self.chunk_size = chunk_size
+
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def _fail(self, error: BaseException):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def extract(self, entries: List[ArchiveEntry], dest,
+                on_entry: Optional[Callable[[ArchiveEntry], None]] = None,
+                on_chunk: Optional[Callable[[int], None]] = None) -> int:
+        """Извлекает элементы в папку, возвращает их количество"""
+        self._stop.clear()
+        self._error = None
+        files = []
+        dirs: List[Tuple[ArchiveEntry, Path]] = []
+        for entry in entries:
+            target = safe_join(dest, entry.name)
+            if entry.is_dir:
+                dirs.append((entry, target))
+            else:
+                files.append((entry, target))
+
+        # Папки создаются заранее, чтобы потоки записи не делали этого наперегонки
+        with trace.span(trace.PHASE_METADATA):
+            calls = make_dirs(dest, [target for _, target in dirs] +
+                              [target.parent for _, target in files])
+        trace.count(trace.METADATA_CALLS, calls)
+        for entry, _ in dirs:
+            trace.count(trace.DIRS)
+            if on_entry is not None:
+                on_entry(entry)
+        if not files:
+            finish_dirs(dirs)
+            return len(entries)
+
+        queue_items = max(2, self.memory_budget // (self.chunk_size * self.io_threads))
+        write_queues = [queue.Queue(maxsize=queue_items) for _ in range(self.io_threads)]
+        events: queue.Queue = queue.Queue()
+        open_files = threading.BoundedSemaphore(self.max_open_files)
+        next_index = iter(range(len(files)))
+        index_lock = threading.Lock()
+
+        def decompress():
+            while not self._stop.is_set():
+                with index_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                entry, target = files[index]
+                out = write_queues[index % self.io_threads]
+                open_files.acquire()
+                out.put((_OPEN, index, target))
+                try:
+                    with self.open_member(entry) as src:
+                        while not self._stop.is_set():
+                            with trace.span(trace.PHASE_READ):
+                                chunk = src.read(self.chunk_size)
+                            if not chunk:
+                                break
+                            # Полная очередь - диск не успевает за распаковкой
+                            with trace.span(trace.PHASE_WRITE_QUEUE):
+                                out.put((_DATA, index, chunk))
+                except BaseException as e:
+                    self._fail(e)
+                finally:
+                    out.put((_CLOSE, index, entry))
+
+        def write(inbox: queue.Queue):
+            handles: Dict[int, IO[bytes]] = {}
+            while True:
+                item = inbox.get()
+                if item is None:
+                    return
+                kind, index, payload = item
+                try:
+                    if kind == _OPEN:
+                        if not self._stop.is_set():
+                            with trace.span(trace.PHASE_METADATA):
+                                handles[index] = open(payload, 'wb')
+                            trace.count(trace.OPEN_CALLS)
+                    elif kind == _DATA:
+                        handle = handles.get(index)
+                        if handle is not None:
+                            with trace.span(trace.PHASE_WRITE):
+                                handle.write(payload)
+                            trace.count(trace.WRITE_CALLS)
+                            trace.count(trace.BYTES_OUT, len(payload))
+                            events.put((_DATA, index, len(payload)))
+                    else:
+                        handle = handles.pop(index, None)
+                        open_files.release()
+                        if handle is not None:
+                            with trace.span(trace.PHASE_METADATA):
+                                finish_file(handle, files[index][1], payload)
+                            trace.count(trace.FILES)
+                        events.put((_CLOSE, index, None))
+                except BaseException as e:
+                    self._fail(e)
+                    handle = handles.pop(index, None)
+                    if handle is not None:
+                        handle.close()
+
+        writers = [threading.Thread(target=write, args=(q,), name=f'nova-write-{i}', daemon=True)
+                   for i, q in enumerate(write_queues)]
+        decompressors = [threading.Thread(target=decompress, name=f'nova-unzip-{i}', daemon=True)
+                         for i in range(min(self.workers, len(files)))]
+        for thread in writers + decompressors:
+            thread.start()
+
+        try:
+            self._report_in_order(files, events, on_entry, on_chunk)
+        finally:
+            self._stop.set()
+            for thread in decompressors:
+                thread.join()
+            for q in write_queues:
+                q.put(None)
+            for thread in writers:
+                thread.join()
+
+        if self._error is not None:
+            if isinstance(self._error, ArchiveError):
+                raise self._error
+            raise ArchiveError(f"Ошибка извлечения: {self._error}") from self._error
+        finish_dirs(dirs)
+        return len(entries)
+
+    def _report_in_order(self, files, events: queue.Queue, on_entry, on_chunk):
+        """Пересылает события прогресса в порядке элементов архива"""
+        head = 0
+        done = set()
+        pending: Dict[int, int] = defaultdict(int)
+        if on_entry is not None:
+            on_entry(files[0][0])
+        while head < len(files):
+            try:
+                kind, index, size = events.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if kind == _DATA:
+                if index == head:
+                    if on_chunk is not None:
+                        on_chunk(size)
+                else:
+                    pending[index] += size
+                continue
+            done.add(index)
+            while head in done:
+                done.discard(head)
+                head += 1
+                if head >= len(files):
+                    break
+                if on_entry is not None:
+                    on_entry(files[head][0])
+                size = pending.pop(head, 0)
+                if size and on_chunk is not None:
+                    on_chunk(size)
@@ -0,0 +1,74 @@
+# [file name]: nova_core/fingerprint.py
+"""
+Отпечаток файла архива и каталог кэша Nova
+
+Отпечаток (размер, mtime и хэш начала и конца файла) дешево вычисляется
+даже для многогигабайтных архивов и используется для проверки кэшей.
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+from .streams import is_url
+
+# Сколько байт с начала и с конца файла входит в частичный хэш
+PARTIAL_HASH_BYTES = 64 * 1024
+
+
+class Fingerprint(NamedTuple):
+    """Отпечаток файла"""
+
+    size: int
+    mtime_ns: int
+    partial_hash: str
+
+    def to_list(self) -> list:
+        return [self.size, self.mtime_ns, self.partial_hash]
+
+    @classmethod
+    def from_list(cls, values) -> 'Fingerprint':
+        return cls(int(values[0]), int(values[1]), str(values[2]))
+
+
+def partial_hash(path, size: int) -> str:
+    """SHA-1 первых и последних PARTIAL_HASH_BYTES байт файла"""
+    digest = hashlib.sha1(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if size > PARTIAL_HASH_BYTES:
+            f.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+def fingerprint(path) -> Fingerprint:
+    """Вычисляет отпечаток файла"""
+    st = os.stat(path)
+    return Fingerprint(st.st_size, st.st_mtime_ns, partial_hash(path, st.st_size))
+
+
+def cache_dir(*parts: str) -> Path:
+    """Каталог кэша Nova (создается при необходимости)"""
+    override = os.environ.get('NOVA_CACHE_DIR')
+    if override:
+        base = Path(override)
+    elif sys.platform == 'win32':
+        base = Path(os.environ.get('LOCALAPPDATA', Path.home())) / 'nova_archiver' / 'cache'
+    else:
+        base = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'nova_archiver'
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def archive_id(path) -> str:
+    """Полный путь архива или его адрес (архив на сервере)"""
+    return path if is_url(path) else os.path.abspath(os.fspath(path))
+
+
+def path_key(path) -> str:
+    """Имя файла кэша для пути или адреса архива"""
+    return hashlib.sha1(archive_id(path).encode('utf-8')).hexdigest()
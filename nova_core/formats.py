@@ -0,0 +1,120 @@
+# [file name]: nova_core/formats.py
+"""
+Определение формата архива по сигнатуре и расширению
+"""
+
+import os
+from typing import Optional
+
+from .errors import UnsupportedFormatError
+from .volumes import find_volumes
+
+FORMAT_ZIP = 'zip'
+FORMAT_TAR = 'tar'
+FORMAT_TAR_GZ = 'tar.gz'
+FORMAT_TAR_BZ2 = 'tar.bz2'
+FORMAT_TAR_XZ = 'tar.xz'
+FORMAT_TAR_ZST = 'tar.zst'
+FORMAT_7Z = '7z'
+FORMAT_RAR = 'rar'
+# Собственный контейнер .nv v2 с дедупликацией (обычный .nv - это ZIP)
+FORMAT_NV2 = 'nv2'
+
+# .sntr и .nv технически являются ZIP архивами
+ZIP_EXTENSIONS = ('.zip', '.sntr', '.nv')
+
+TAR_FORMATS = (FORMAT_TAR, FORMAT_TAR_GZ, FORMAT_TAR_BZ2, FORMAT_TAR_XZ, FORMAT_TAR_ZST)
+
+# Расширение -> формат (длинные расширения проверяются первыми)
+EXTENSIONS = [
+    ('.tar.gz', FORMAT_TAR_GZ),
+    ('.tar.bz2', FORMAT_TAR_BZ2),
+    ('.tar.xz', FORMAT_TAR_XZ),
+    ('.tar.zst', FORMAT_TAR_ZST),
+    ('.tgz', FORMAT_TAR_GZ),
+    ('.tbz2', FORMAT_TAR_BZ2),
+    ('.txz', FORMAT_TAR_XZ),
+    ('.tzst', FORMAT_TAR_ZST),
+    ('.tar', FORMAT_TAR),
+    ('.zip', FORMAT_ZIP),
+    ('.sntr', FORMAT_ZIP),
+    ('.nv', FORMAT_ZIP),
+    ('.7z', FORMAT_7Z),
+    ('.rar', FORMAT_RAR),
+]
+
+# Режимы tarfile для записи и чтения (.tar.zst tarfile не знает, поток
+# сжимает кодек zstd, а tarfile пишет в него как в обычный файл)
+TAR_WRITE_MODES = {
+    FORMAT_TAR: 'w',
+    FORMAT_TAR_GZ: 'w:gz',
+    FORMAT_TAR_BZ2: 'w:bz2',
+    FORMAT_TAR_XZ: 'w:xz',
+    FORMAT_TAR_ZST: 'w|',
+}
+
+WRITABLE_FORMATS = (FORMAT_ZIP, FORMAT_7Z, FORMAT_NV2) + TAR_FORMATS
+
+
+def format_from_name(path) -> Optional[str]:
+    """Определяет формат по расширению файла"""
+    name = os.fspath(path).lower()
+    for ext, fmt in EXTENSIONS:
+        if name.endswith(ext):
+            return fmt
+    return None
+
+
+def format_from_signature(header: bytes) -> Optional[str]:
+    """Определяет формат по первым байтам файла"""
+    if header.startswith(b'NOVA\x02\r\n\x1a'):
+        return FORMAT_NV2
+    if header[:4] in (b'PK\x03\x04', b'PK\x05\x06', b'PK\x07\x08', b'PK00'):
+        return FORMAT_ZIP
+    if header.startswith(b'7z\xbc\xaf\x27\x1c'):
+        return FORMAT_7Z
+    if header.startswith(b'Rar!\x1a\x07'):
+        return FORMAT_RAR
+    if header.startswith(b'\x1f\x8b'):
+        return FORMAT_TAR_GZ
+    if header.startswith(b'BZh'):
+        return FORMAT_TAR_BZ2
+    if header.startswith(b'\xfd7zXZ\x00'):
+        return FORMAT_TAR_XZ
+    if header.startswith(b'\x28\xb5\x2f\xfd'):
+        return FORMAT_TAR_ZST
+    if header[257:262] == b'ustar':
+        return FORMAT_TAR
+    return None
+
+
+def _read_header(path) -> bytes:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(512)
+    except OSError as e:
+        raise UnsupportedFormatError(f"Не удалось прочитать архив: {e}") from e
+
+
+def detect_format(path) -> str:
+    """Определяет формат существующего архива (сигнатура важнее расширения).
+
+    У многотомного архива сигнатура берется из первого тома: последний
+    том (archive.zip, archive.nv) начинается с середины данных.
+    """
+    fmt = format_from_signature(_read_header(path))
+    volumes = find_volumes(path)
+    if volumes is not None and fmt != FORMAT_NV2:
+        fmt = format_from_signature(_read_header(volumes[0])) or fmt
+    fmt = fmt or format_from_name(path)
+    if fmt is None:
+        raise UnsupportedFormatError(f"Неизвестный формат архива: {path}")
+    return fmt
+
+
+def target_format(path, fmt: Optional[str] = None) -> str:
+    """Определяет формат создаваемого архива"""
+    fmt = fmt or format_from_name(path)
+    if fmt not in WRITABLE_FORMATS:
+        raise UnsupportedFormatError(f"Запись в этот формат не поддерживается: {path}")
+    return fmt
@@ -0,0 +1,789 @@
+# [file name]: nova_core/handler.py
+"""
+ArchiveHandler - основной обработчик архивов без зависимостей от GUI
+"""
+
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path, PurePosixPath
+from typing import IO, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlsplit
+
+from . import trace
+from .entries import ArchiveEntry
+from .errors import ArchiveError, UnsupportedFormatError
+from .extract import FileSlice, ParallelExtractor
+from .fingerprint import Fingerprint, fingerprint
+from .formats import (FORMAT_7Z, FORMAT_NV2, FORMAT_TAR, FORMAT_ZIP, WRITABLE_FORMATS,
+                      detect_format, format_from_name, format_from_signature, target_format)
+from .listcache import ListingCache, default_cache
+from .memberstore import MemberStore
+from .preview import PreviewCache, default_preview_cache
+from .readers import ArchiveReader, open_reader
+from .remote import RangeReader, open_source
+from .search import (DEFAULT_MAX_HITS, ArchiveSearcher, Matcher, MemberScan, SearchResult,
+                     TrigramIndex, TrigramIndexBuilder)
+from .smallfiles import prefetch_small_files
+from .streams import ProgressCallback, is_url, iter_source_files, scan_sources
+from .update import (NV2_MTIME_TOLERANCE, UPDATABLE_FORMATS, ZIP_MTIME_TOLERANCE,
+                     UpdateResult, compact, copy_zip_members, dead_bytes, open_updater,
+                     plan_update, recover_zip_update, rewrap_supported, rewrap_zip)
+from .verify import (ArchiveVerifier, MemberProblem, VerifyCheckpoint, VerifyResult,
+                     check_algorithm, format_manifest, manifest_name, parse_manifest,
+                     verify_sequential)
+from .volumes import find_volumes, remove_volumes
+from .writers import check_7z_solid_support, open_writer
+from .zipmap import zip_volumes
+
+
+class _Progress:
+    """Накопитель прогресса в байтах для колбэка progress(done, total, name)"""
+
+    def __init__(self, total: int, callback: Optional[ProgressCallback]):
+        self.total = total
+        self.done = 0
+        self.name = ''
+        self._callback = callback
+
+    def entry(self, name: str):
+        self.name = name
+        if self._callback is not None:
+            with trace.span(trace.PHASE_PROGRESS):
+                self._callback(self.done, self.total, name)
+
+    def chunk(self, size: int):
+        self.done += size
+        if self._callback is not None:
+            with trace.span(trace.PHASE_PROGRESS):
+                self._callback(self.done, self.total, self.name)
+
+
+class ArchiveHandler:
+    """Обработчик архива: определение формата, просмотр, извлечение и создание.
+
+    Списки элементов сохраняются в постоянном кэше (listing_cache, по
+    умолчанию общий кэш процесса; use_cache=False отключает его).
+
+    path может быть адресом http(s)://: такой архив (ZIP или .nv v2)
+    читается запросами диапазонов, не скачиваясь, и доступен только для
+    чтения.
+    """
+
+    def __init__(self, path, password: Optional[str] = None, fmt: Optional[str] = None,
+                 use_cache: bool = True, listing_cache: Optional[ListingCache] = None):
+        self.url = path if is_url(path) else None
+        # У архива на сервере path - только имя файла из адреса
+        self.path = Path(path) if self.url is None else Path(
+            PurePosixPath(unquote(urlsplit(path).path)).name or 'archive')
+        self.password = password
+        self._remote: Optional[RangeReader] = None
+        self._reader = None
+        if self.url is not None:
+            use_cache = False
+            try:
+                self.format = fmt or self._remote_format()
+            except BaseException:
+                self.close()
+                raise
+        else:
+            self.format = fmt or detect_format(self.path)
+            if self.format == FORMAT_ZIP:
+                try:
+                    # Обновление, прерванное сбоем, оставило недописанный хвост
+                    recover_zip_update(self.path)
+                except OSError:
+                    pass
+        self._entries: Optional[List[ArchiveEntry]] = None
+        self._cached_print = None
+        self._store: Optional[MemberStore] = None
+        self._store_source = None
+        self._cache = (listing_cache or default_cache()) if use_cache else None
+
+    def _remote_format(self) -> str:
+        fmt = (format_from_signature(self.remote.read(0, 512)) or
+               format_from_name(urlsplit(self.url).path))
+        if fmt is None:
+            raise UnsupportedFormatError(f"Неизвестный формат архива: {self.url}")
+        return fmt
+
+    @property
+    def location(self):
+        """Путь архива или его адрес на сервере"""
+        return self.url or self.path
+
+    @property
+    def remote(self) -> Optional[RangeReader]:
+        """Источник диапазонов архива на сервере (открывается при первом обращении)"""
+        if self.url is not None and self._remote is None:
+            self._remote = open_source(self.url)
+        return self._remote
+
+    def _fingerprint(self) -> Fingerprint:
+        return self.remote.fingerprint() if self.url is not None else fingerprint(self.path)
+
+    @staticmethod
+    def detect_format(path) -> str:
+        """Определяет формат архива"""
+        return detect_format(path)
+
+    @staticmethod
+    def is_supported(path) -> bool:
+        """Проверяет, можно ли открыть файл как архив"""
+        try:
+            detect_format(path)
+            return True
+        except UnsupportedFormatError:
+            return False
+
+    @property
+    def volumes(self) -> List[Path]:
+        """Файлы архива: тома по порядку или единственный файл"""
+        if self.url is not None:
+            return [self.path]
+        paths = zip_volumes(self.path) if self.format == FORMAT_ZIP else find_volumes(self.path)
+        return paths or [self.path]
+
+    @property
+    def is_split(self) -> bool:
+        """Архив разбит на тома"""
+        return len(self.volumes) > 1
+
+    def _check_single(self):
+        if self.url is not None:
+            raise ArchiveError("Архив на сервере доступен только для чтения")
+        if self.is_split:
+            raise ArchiveError("Многотомный архив доступен только для чтения; "
+                               "преобразуйте его в обычный")
+
+    @property
+    def is_writable(self) -> bool:
+        """Можно ли изменять архив (удалять элементы, ставить пароль)"""
+        return self.format in WRITABLE_FORMATS and self.url is None and not self.is_split
+
+    @property
+    def reader(self) -> ArchiveReader:
+        """Читатель архива, открывается при первом обращении"""
+        if self._reader is None:
+            self._reader = open_reader(self.path, self.format, self.password, self.remote)
+        return self._reader
+
+    def set_session_password(self, password: Optional[str]):
+        """Задает пароль для чтения и переоткрывает архив"""
+        self.password = password
+        self._entries = None
+        self._store = self._store_source = None
+        self.close()
+
+    def list_entries(self) -> List[ArchiveEntry]:
+        """Возвращает список элементов архива (из кэша, если архив не менялся)"""
+        if self._entries is None and self._store is not None:
+            # Список уже прочитан в поколоночном виде
+            self._entries = self._store_source = self._store.entries()
+        if self._entries is None:
+            self._entries = self.cached_entries()
+        if self._entries is None:
+            self._entries = self._read_and_store()
+        return self._entries
+
+    def member_store(self) -> MemberStore:
+        """Список элементов в компактном поколоночном виде (для больших архивов).
+
+        Если списка нет ни в памяти, ни в кэше, читатель строит хранилище
+        сразу из каталога архива, без промежуточного списка ArchiveEntry.
+        """
+        if self._store is not None and self._store_source is self._entries:
+            return self._store
+        if self._entries is None and self.cached_entries() is None:
+            self._store = self._read_store()
+            self._store_source = None
+            return self._store
+        self._store = MemberStore.from_entries(self._entries)
+        self._store_source = self._entries
+        return self._store
+
+    @property
+    def from_cache(self) -> bool:
+        """Список взят из кэша и еще не сверен по частичному хэшу"""
+        return self._cached_print is not None
+
+    def cached_entries(self) -> Optional[List[ArchiveEntry]]:
+        """Список из кэша без чтения архива (проверяются только размер и mtime)"""
+        if self._cache is None:
+            return None
+        found = self._cache.lookup(self.path)
+        hit = found is not None and found[0] == self.format
+        trace.count(trace.cache_counter('listing', hit))
+        if not hit:
+            return None
+        self._cached_print = found[1]
+        self._entries = found[2]
+        return self._entries
+
+    def revalidate(self, progress: Optional[ProgressCallback] = None
+                   ) -> Optional[List[ArchiveEntry]]:
+        """Сверяет кэшированный список с архивом.
+
+        Возвращает новый список, если архив изменился, иначе None.
+        """
+        if self._cached_print is None:
+            return None
+        stored, self._cached_print = self._cached_print, None
+        if fingerprint(self.path) == stored:
+            return None
+        self._entries = self._read_and_store()
+        return self._entries
+
+    def _read_and_store(self) -> List[ArchiveEntry]:
+        with trace.span(trace.PHASE_LIST):
+            entries = self.reader.entries()
+        # Имена из зашифрованных архивов на диск не сохраняем
+        if self._cache is not None and not any(e.encrypted for e in entries):
+            try:
+                self._cache.store(self.path, self.format, fingerprint(self.path), entries)
+            except OSError:
+                pass
+        return entries
+
+    def _read_store(self) -> MemberStore:
+        with trace.span(trace.PHASE_LIST):
+            store = self.reader.member_store()
+        if self._cache is not None and not store.encrypted:
+            try:
+                self._cache.store(self.path, self.format, fingerprint(self.path),
+                                  store.iter_entries())
+            except OSError:
+                pass
+        return store
+
+    def needs_password(self) -> bool:
+        """Проверяет, защищен ли архив паролем"""
+        return self.reader.needs_password()
+
+    def open_member(self, name: str) -> IO[bytes]:
+        """Открывает элемент архива как поток"""
+        return self.reader.open(name)
+
+    @trace.traced_operation('preview')
+    def preview(self, name: str, progress: Optional[ProgressCallback] = None,
+                cache: Optional[PreviewCache] = None) -> Path:
+        """Извлекает элемент для просмотра через кэш просмотра и возвращает путь.
+
+        Повторное открытие того же элемента (по отпечатку архива, имени и
+        CRC) не распаковывает его заново.
+        """
+        entry = next((e for e in self.list_entries() if e.name == name and not e.is_dir), None)
+        if entry is None:
+            raise ArchiveError(f"Элемент не найден в архиве: {name}")
+        tracker = _Progress(entry.size, progress)
+        tracker.entry(name)
+        cache = cache or default_preview_cache()
+        return cache.fetch(self.location, entry, lambda: self.open_member(name), tracker.chunk,
+                           self._fingerprint())
+
+    @property
+    def supports_parallel_extract(self) -> bool:
+        """Можно ли распаковывать элементы независимо (ZIP, .nv v2 и несжатый TAR)"""
+        return self.format in (FORMAT_ZIP, FORMAT_TAR, FORMAT_NV2)
+
+    @trace.traced_operation('extract')
+    def extract(self, dest, members: Optional[Iterable[str]] = None,
+                progress: Optional[ProgressCallback] = None,
+                workers: Optional[int] = None,
+                memory_budget: Optional[int] = None) -> int:
+        """Извлекает архив (или выбранные элементы) в папку.
+
+        Для ZIP, .nv v2 и несжатого TAR элементы распаковываются в workers потоков
+        (по умолчанию все ядра, 1 - последовательно); memory_budget
+        ограничивает объем данных в очередях записи. Папка в members
+        извлекается вместе с содержимым; имя, которого нет в архиве, - ошибка.
+        """
+        members = self._select_members(members) if members is not None else None
+        dest = Path(dest)
+        dest.mkdir(parents=True, exist_ok=True)
+        parallel = self.supports_parallel_extract and workers != 1
+
+        total = 0
+        entries = None
+        if progress is not None or parallel:
+            wanted = set(members) if members is not None else None
+            entries = [e for e in self.list_entries() if wanted is None or e.name in wanted]
+            total = sum(e.size for e in entries)
+        tracker = _Progress(total, progress)
+
+        if not parallel:
+            return self.reader.extract(dest, members,
+                                       on_entry=lambda e: tracker.entry(e.name),
+                                       on_chunk=tracker.chunk)
+
+        extractor = ParallelExtractor(self._member_opener(), workers=workers,
+                                      memory_budget=memory_budget)
+        return extractor.extract(entries, dest,
+                                 on_entry=lambda e: tracker.entry(e.name),
+                                 on_chunk=tracker.chunk)
+
+    def _select_members(self, names: Iterable[str]) -> List[str]:
+        """Элементы по именам: папка (с '/' на конце или без) - вместе с содержимым"""
+        entries = self.list_entries()
+        known = {e.name for e in entries}
+        wanted = set()
+        prefixes = []
+        missing = []
+        for name in names:
+            if name in known and not name.endswith('/'):
+                wanted.add(name)
+                continue
+            prefix = name.rstrip('/') + '/'
+            if prefix in known or any(other.startswith(prefix) for other in known):
+                prefixes.append(prefix)
+            else:
+                missing.append(name)
+        if missing:
+            raise ArchiveError(f"Нет в архиве: {', '.join(missing)}")
+        prefixes = tuple(prefixes)
+        return [e.name for e in entries
+                if e.name in wanted or (prefixes and e.name.startswith(prefixes))]
+
+    @trace.traced_operation('test')
+    def verify(self, progress: Optional[ProgressCallback] = None,
+               workers: Optional[int] = None, manifest: Optional[str] = None,
+               resume: bool = True) -> VerifyResult:
+        """Проверяет целостность элементов, ничего не записывая на диск.
+
+        Каждый файл читается до конца и сверяется по размеру и CRC; ZIP,
+        .nv v2 и несжатый TAR проверяются в workers потоков. manifest -
+        алгоритм хэша (например 'sha256'): хэши сверяются с манифестом
+        архива, а если его нет - после успешной проверки манифест
+        записывается (см. verify). resume=True продолжает прерванную проверку.
+        """
+        algorithm = check_algorithm(manifest) if manifest else None
+        files = [e for e in self.list_entries() if not e.is_dir]
+        expected = None
+        if algorithm is not None:
+            expected = self._read_manifest(algorithm)
+            files = [e for e in files if e.name != manifest_name(algorithm)]
+
+        checkpoint = VerifyCheckpoint(self.location, algorithm, self._fingerprint())
+        done = checkpoint.load() if resume else {}
+        todo = [e for e in files if e.name not in done]
+        tracker = _Progress(sum(e.size for e in todo), progress)
+        problems: List[MemberProblem] = []
+
+        def on_result(entry: ArchiveEntry, digest: Optional[str], problem: Optional[str]):
+            tracker.entry(entry.name)
+            if problem is None and expected is not None and expected.get(entry.name,
+                                                                          digest) != digest:
+                problem = "Хэш не совпадает с манифестом"
+            if problem is not None:
+                problems.append(MemberProblem(entry.name, problem))
+            else:
+                checkpoint.mark(entry.name, digest)
+
+        try:
+            if self.supports_parallel_extract and workers != 1:
+                ArchiveVerifier(self._member_opener(), workers, algorithm).verify(
+                    todo, on_result, tracker.chunk)
+            else:
+                verify_sequential(self.reader.iter_members([e.name for e in todo]),
+                                  on_result, tracker.chunk, algorithm)
+        except BaseException:
+            checkpoint.save()
+            raise
+        checkpoint.remove()
+
+        unlisted = 0
+        written = False
+        if expected is not None:
+            names = {e.name for e in files}
+            problems.extend(MemberProblem(name, "Нет в архиве")
+                            for name in sorted(expected) if name not in names)
+            unlisted = len(names.difference(expected))
+        elif algorithm is not None and not problems and self.url is None:
+            self._write_manifest(algorithm, checkpoint.done)
+            written = True
+        return VerifyResult(len(todo), len(files) - len(todo), problems,
+                            algorithm, written, unlisted)
+
+    @trace.traced_operation('search')
+    def search(self, pattern: str, regex: bool = False, ignore_case: bool = False,
+               names_only: bool = False, progress: Optional[ProgressCallback] = None,
+               workers: Optional[int] = None, use_index: bool = False,
+               max_hits: int = DEFAULT_MAX_HITS) -> SearchResult:
+        """Ищет текст в элементах архива, ничего не записывая на диск.
+
+        pattern - подстрока или (regex=True) регулярное выражение; поиск
+        построчный. names_only - достаточно знать, в каких элементах есть
+        совпадение. use_index - триграммный индекс в каталоге кэша: первый
+        поиск его строит, следующие читают только подходящие элементы.
+        """
+        matcher = Matcher(pattern, regex, ignore_case)
+        files = [e for e in self.list_entries() if not e.is_dir]
+        order = {e.name: i for i, e in enumerate(files)}
+        # Содержимое зашифрованных архивов в кэш не попадает
+        if any(e.encrypted for e in files):
+            use_index = False
+
+        index = builder = None
+        todo = files
+        if use_index:
+            print_ = self._fingerprint()
+            index = TrigramIndex(self.location)
+            found = index.open(print_)
+            trace.count(trace.cache_counter('search_index', found))
+            if found:
+                candidates = index.candidates(matcher.trigrams())
+                index.close()
+                todo = [e for e in files if e.name in candidates]
+            else:
+                index = None
+                try:
+                    builder = TrigramIndexBuilder(TrigramIndex(self.location))
+                except (OSError, sqlite3.Error):
+                    builder = None
+
+        tracker = _Progress(sum(e.size for e in todo), progress)
+        hits = []
+        matched = []
+        problems: List[MemberProblem] = []
+        skipped = 0
+
+        def on_result(entry: ArchiveEntry, scan: Optional[MemberScan], problem: Optional[str]):
+            nonlocal skipped
+            tracker.entry(entry.name)
+            if builder is not None:
+                builder.add(entry.name, scan)
+            if problem is not None:
+                problems.append(MemberProblem(entry.name, problem))
+            elif scan.hits is None:
+                skipped += 1
+            elif scan.hits:
+                matched.append(entry.name)
+                hits.extend(scan.hits)
+
+        searcher = ArchiveSearcher(self._member_opener(), matcher, workers, names_only,
+                                   max_hits, collect_trigrams=builder is not None)
+        try:
+            if self.supports_parallel_extract and workers != 1:
+                searcher.search(todo, on_result, tracker.chunk)
+            else:
+                searcher.search_sequential(
+                    self.reader.iter_members([e.name for e in todo]), on_result, tracker.chunk)
+        except BaseException:
+            if builder is not None:
+                builder.abort()
+            raise
+        if builder is not None:
+            try:
+                builder.finish(print_)
+            except (OSError, sqlite3.Error):
+                builder.abort()
+
+        matched.sort(key=order.get)
+        hits.sort(key=lambda hit: (order[hit.name], hit.line))
+        return SearchResult(matched, hits, len(todo) - skipped - len(problems), skipped,
+                            problems, index is not None)
+
+    def _manifest_sidecar(self, algorithm: str) -> Path:
+        """Манифест рядом с архивом для форматов, которые не меняются на месте"""
+        return self.path.with_name(f"{self.path.name}.manifest.{algorithm}")
+
+    def _read_manifest(self, algorithm: str) -> Optional[Dict[str, str]]:
+        name = manifest_name(algorithm)
+        if any(e.name == name for e in self.list_entries()):
+            with self.open_member(name) as f:
+                return parse_manifest(f.read())
+        sidecar = self._manifest_sidecar(algorithm)
+        if self.url is None and sidecar.exists():
+            return parse_manifest(sidecar.read_bytes())
+        return None
+
+    def _write_manifest(self, algorithm: str, digests: Dict[str, str]):
+        """Записывает манифест в архив (ZIP и .nv v2) или рядом с ним"""
+        data = format_manifest(digests)
+        if not self.supports_update:
+            self._manifest_sidecar(algorithm).write_bytes(data)
+            return
+        entry = ArchiveEntry(manifest_name(algorithm), size=len(data), mtime=time.time())
+        self.close()
+        try:
+            with open_updater(self.path, self.format, workers=1) as writer:
+                writer.add_stream(entry, io.BytesIO(data))
+        finally:
+            self._forget_listing()
+
+    def _member_opener(self):
+        """Потокобезопасное открытие элементов для параллельного извлечения"""
+        if self.format == FORMAT_TAR:
+            offsets = self.reader.data_offsets()
+            return lambda entry: FileSlice(self.path, *offsets[entry.name])
+        # zipfile читает общий файл под блокировкой, распаковка идет параллельно
+        return lambda entry: self.reader.open(entry.name)
+
+    @classmethod
+    @trace.traced_operation('create')
+    def create(cls, path, sources: Iterable, fmt: Optional[str] = None,
+               level: Optional[int] = None, password: Optional[str] = None,
+               progress: Optional[ProgressCallback] = None,
+               workers: Optional[int] = None, codec: Optional[str] = None,
+               long_distance: bool = False, volume_size: Optional[int] = None,
+               solid_size: Optional[int] = None) -> 'ArchiveHandler':
+        """Создает архив из файлов и папок, возвращает обработчик нового архива.
+
+        workers - число потоков сжатия для ZIP (по умолчанию все ядра).
+        codec - метод сжатия (deflate, zstd, lz4, store; см. codecs),
+        long_distance - дальние совпадения zstd. volume_size - размер тома
+        в байтах: архив пишется томами path.z01, ..., path (ZIP и .nv v2).
+        solid_size - размер сплошного блока в байтах (.nv v2 и 7z): файл
+        извлекается распаковкой только своего блока.
+        """
+        fmt = target_format(path, fmt)
+        if solid_size and fmt == FORMAT_7Z:
+            check_7z_solid_support()
+        # stat каждого файла берется из обхода папок, мелкие файлы читаются
+        # заранее пачками (см. smallfiles)
+        items = list(scan_sources(sources))
+        total = sum(item.stat.st_size for item in items if not item.is_dir)
+        tracker = _Progress(total, progress)
+
+        try:
+            with open_writer(path, fmt, level, password, workers, codec,
+                             long_distance=long_distance, volume_size=volume_size,
+                             solid_size=solid_size) as writer, \
+                    closing(prefetch_small_files(items)) as files:
+                for item, data in files:
+                    tracker.entry(item.arcname)
+                    if item.is_dir:
+                        writer.add_dir(item.arcname, item.stat.st_mtime)
+                    elif data is not None:
+                        writer.add_data(item.arcname, data, item.stat, on_chunk=tracker.chunk)
+                    else:
+                        writer.add_file(item.path, item.arcname, on_chunk=tracker.chunk)
+        except BaseException:
+            # Недописанный архив (ошибка или отмена) не оставляем
+            if volume_size:
+                remove_volumes(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            raise
+        return cls(path, password=password, fmt=fmt)
+
+    def _rewrite(self, skip: Iterable[str] = (), password: Optional[str] = None,
+                 progress: Optional[ProgressCallback] = None):
+        """Перезаписывает архив во временный файл и подменяет им исходный"""
+        self._check_single()
+        if not self.is_writable:
+            raise ArchiveError(f"Формат {self.format} доступен только для чтения")
+        skip = set(skip)
+        entries = [e for e in self.list_entries() if e.name not in skip]
+        tracker = _Progress(sum(e.size for e in entries), progress)
+
+        def build(tmp_name: str):
+            with open_writer(tmp_name, self.format, password=password) as writer:
+                for entry in entries:
+                    tracker.entry(entry.name)
+                    if entry.is_dir:
+                        writer.add_dir(entry.name, entry.mtime)
+                        continue
+                    with self.open_member(entry.name) as stream:
+                        writer.add_stream(entry, stream, on_chunk=tracker.chunk)
+
+        self._replace(build)
+
+    def _replace(self, build):
+        """Строит новый архив build(tmp_name) во временном файле и подменяет им исходный"""
+        fd, tmp_name = tempfile.mkstemp(prefix='.nova_', suffix=self.path.suffix,
+                                        dir=str(self.path.parent))
+        os.close(fd)
+        try:
+            build(tmp_name)
+            self.close()
+            shutil.move(tmp_name, str(self.path))
+            self._forget_listing()
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+    @trace.traced_operation('convert')
+    def convert(self, dest, fmt: Optional[str] = None, level: Optional[int] = None,
+                password: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+                workers: Optional[int] = None, codec: Optional[str] = None,
+                long_distance: bool = False, volume_size: Optional[int] = None,
+                solid_size: Optional[int] = None) -> 'ArchiveHandler':
+        """Перепаковывает архив в другой файл (и формат) без распаковки на диск.
+
+        Элементы читаются потоками по порядку архива и сразу пишутся в новый
+        архив. ZIP в ZIP (.zip, .sntr, .nv) без нового уровня, кодека и
+        пароля копируется как есть, без распаковки и пересжатия; так же
+        многотомный архив собирается в один файл или режется на тома
+        (volume_size). solid_size - как у create. Возвращает обработчик
+        нового архива.
+        """
+        dest = Path(dest)
+        fmt = target_format(dest, fmt)
+        if solid_size and fmt == FORMAT_7Z:
+            check_7z_solid_support()
+        if self.url is None and dest.exists() and dest.resolve() == self.path.resolve():
+            raise ArchiveError("Архив нельзя преобразовать сам в себя")
+        entries = self.list_entries()
+        raw_copy = (self.format == FORMAT_ZIP and fmt == FORMAT_ZIP and self.url is None and
+                    level is None and codec is None and not password and not solid_size and
+                    not any(e.encrypted for e in entries))
+
+        try:
+            if raw_copy:
+                tracker = _Progress(sum(p.stat().st_size for p in self.volumes), progress)
+                copy_zip_members(self.path, dest, tracker.chunk, tracker.entry, volume_size)
+            else:
+                tracker = _Progress(sum(e.size for e in entries if not e.is_dir), progress)
+                with open_writer(dest, fmt, level, password, workers, codec,
+                                 long_distance=long_distance, volume_size=volume_size,
+                                 solid_size=solid_size) as writer:
+                    for entry in entries:
+                        if entry.is_dir:
+                            writer.add_dir(entry.name, entry.mtime)
+                    for entry, stream in self.reader.iter_members():
+                        tracker.entry(entry.name)
+                        writer.add_stream(entry, stream, on_chunk=tracker.chunk)
+        except BaseException:
+            if volume_size:
+                remove_volumes(dest)
+            elif dest.exists():
+                dest.unlink()
+            raise
+        return ArchiveHandler(dest, password=password, fmt=fmt)
+
+    @property
+    def supports_update(self) -> bool:
+        """Можно ли менять архив на месте, без перезаписи (ZIP и .nv v2)"""
+        return self.format in UPDATABLE_FORMATS and self.url is None and not self.is_split
+
+    @trace.traced_operation('update')
+    def update(self, sources: Iterable, progress: Optional[ProgressCallback] = None,
+               workers: Optional[int] = None, level: Optional[int] = None,
+               codec: Optional[str] = None) -> UpdateResult:
+        """Добавляет файлы и папки в архив на месте.
+
+        Новые и измененные (по размеру, времени изменения и CRC) файлы
+        дописываются в конец, остальные элементы не трогаются. Старые версии
+        замененных файлов остаются мертвым пространством до compact().
+        """
+        self._check_single()
+        if not self.supports_update:
+            raise ArchiveError(f"Обновление на месте не поддерживается для формата {self.format}")
+        entries = self.list_entries()
+        if any(e.encrypted for e in entries):
+            raise ArchiveError("Зашифрованный архив нельзя обновить на месте")
+        tolerance = ZIP_MTIME_TOLERANCE if self.format == FORMAT_ZIP else NV2_MTIME_TOLERANCE
+        plan = plan_update(entries, iter_source_files(sources), tolerance)
+        replaced = set(plan.replaced)
+        total = sum(os.path.getsize(p) for p, name in plan.add if not name.endswith('/'))
+        tracker = _Progress(total, progress)
+
+        self.close()
+        try:
+            with open_updater(self.path, self.format, level, workers,
+                              keep=lambda name: name not in replaced, codec=codec) as writer:
+                for src_path, arcname in plan.add:
+                    tracker.entry(arcname)
+                    if arcname.endswith('/'):
+                        writer.add_dir(arcname, os.path.getmtime(src_path))
+                    else:
+                        writer.add_file(src_path, arcname, on_chunk=tracker.chunk)
+        finally:
+            self._forget_listing()
+        return UpdateResult(len(plan.add) - len(replaced), len(replaced), len(plan.unchanged))
+
+    def remove_members(self, names: Iterable[str],
+                       progress: Optional[ProgressCallback] = None):
+        """Удаляет элементы из архива (с папками - вместе с содержимым).
+
+        ZIP и .nv v2 меняются на месте: переписывается только каталог, а
+        данные удаленных элементов освобождает compact().
+        """
+        names = list(names)
+        prefixes = tuple(n for n in names if n.endswith('/'))
+        skip = {e.name for e in self.list_entries()
+                if e.name in names or (prefixes and e.name.startswith(prefixes))}
+        if not self.supports_update:
+            self._rewrite(skip=skip, password=self.password, progress=progress)
+            return
+        self.close()
+        try:
+            with open_updater(self.path, self.format, keep=lambda name: name not in skip):
+                pass
+        finally:
+            self._forget_listing()
+
+    def dead_bytes(self) -> int:
+        """Байты, занятые удаленными и замененными элементами"""
+        if not self.supports_update:
+            return 0
+        return dead_bytes(self.path, self.format)
+
+    @trace.traced_operation('compact')
+    def compact(self, progress: Optional[ProgressCallback] = None) -> int:
+        """Переписывает архив без мертвого пространства, возвращает освобожденные байты"""
+        self._check_single()
+        if not self.supports_update:
+            raise ArchiveError(f"Оптимизация не поддерживается для формата {self.format}")
+        tracker = _Progress(self.path.stat().st_size, progress)
+        tracker.entry(self.path.name)
+        self.close()
+        try:
+            return compact(self.path, self.format, tracker.chunk)
+        finally:
+            self._forget_listing()
+
+    @trace.traced_operation('set_password')
+    def set_password(self, new_password: Optional[str],
+                     progress: Optional[ProgressCallback] = None,
+                     workers: Optional[int] = None):
+        """Устанавливает (или снимает, если None) пароль на ZIP архив.
+
+        Пароль AES меняется без распаковки: сжатые данные элементов
+        перешифровываются параллельно. Архивы со старым шифрованием
+        ZipCrypto перезаписываются целиком.
+        """
+        if self.format != FORMAT_ZIP:
+            raise ArchiveError("Шифрование поддерживается только для ZIP архивов")
+        self._check_single()
+        if not rewrap_supported(self.path, new_password):
+            self._rewrite(password=new_password, progress=progress)
+        else:
+            tracker = _Progress(self.path.stat().st_size, progress)
+            self._replace(lambda tmp_name: rewrap_zip(
+                self.path, tmp_name, self.password, new_password,
+                tracker.chunk, tracker.entry, workers))
+        self.password = new_password
+
+    def _forget_listing(self):
+        """Сбрасывает список элементов после изменения архива"""
+        self._entries = None
+        self._store = self._store_source = None
+        self._cached_print = None
+        if self._cache is not None:
+            self._cache.invalidate(self.path)
+
+    def close(self):
+        """Закрывает архив"""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._remote is not None:
+            self._remote.close()
+            self._remote = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __repr__(self):
+        return f"ArchiveHandler({str(self.location)!r}, format={self.format!r})"
+
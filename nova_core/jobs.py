@@ -0,0 +1,234 @@
+# [file name]: nova_core/jobs.py
+"""
+Общий планировщик фоновых операций с архивами
+
+Операции (открытие, извлечение, создание, проверка, смена пароля)
+ставятся в очередь с приоритетом и выполняются в пуле потоков, так что
+одна долгая операция не блокирует остальные. Планировщик не зависит от Qt
+и используется и окном, и командной строкой.
+
+Функция задачи вызывается как func(*args, progress=..., **kwargs).
+Колбэк progress(done, total, name) прореживается до ~30 вызовов в секунду
+и служит точкой отмены: после Job.cancel() очередной вызов progress
+бросает OperationCancelled.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .errors import OperationCancelled
+from .streams import ProgressCallback
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+# Минимальный интервал между событиями прогресса (~30 Гц)
+PROGRESS_INTERVAL = 1 / 30
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_log = logging.getLogger(__name__)
+
+
+class ThrottledProgress:
+    """Прореживает события прогресса и проверяет отмену.
+
+    Последнее состояние всегда доставляется через flush(), поэтому
+    итоговые 100% не теряются.
+    """
+
+    def __init__(self, callback: Optional[ProgressCallback], cancelled: threading.Event,
+                 interval: float = PROGRESS_INTERVAL):
+        self._callback = callback
+        self._cancelled = cancelled
+        self._interval = interval
+        self._last = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def __call__(self, done, total, name: str = ''):
+        if self._cancelled.is_set():
+            raise OperationCancelled("Операция отменена")
+        if self._callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last < self._interval:
+                self._pending = (done, total, name)
+                return
+            self._last = now
+            self._pending = None
+        self._callback(done, total, name)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None and self._callback is not None:
+            self._callback(*pending)
+
+
+class Job:
+    """Задача планировщика: состояние, результат и отмена"""
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, title: str = '',
+                 priority: int = PRIORITY_NORMAL,
+                 on_progress: Optional[ProgressCallback] = None,
+                 on_done: Optional[Callable[['Job'], None]] = None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.title = title or getattr(func, '__name__', 'job')
+        self.priority = priority
+        self.on_done = on_done
+        self.state = PENDING
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self.progress = ThrottledProgress(on_progress, self._cancel)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Запрашивает отмену; задача в очереди не будет запущена"""
+        self._cancel.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Ждет завершения, не пробрасывая ошибку задачи"""
+        return self._done.wait(timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Ждет завершения и возвращает результат (или бросает ошибку задачи).
+
+        Ctrl+C во время ожидания отменяет задачу.
+        """
+        try:
+            if not self._done.wait(timeout):
+                raise TimeoutError(f"Задача не завершилась: {self.title}")
+        except KeyboardInterrupt:
+            self.cancel()
+            self._done.wait()
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _run(self):
+        if self._cancel.is_set():
+            self.state = CANCELLED
+            self.error = OperationCancelled("Операция отменена")
+        else:
+            self.state = RUNNING
+            self.started = time.monotonic()
+            try:
+                self.result = self.func(*self.args, progress=self.progress, **self.kwargs)
+                self.state = DONE
+            except OperationCancelled as e:
+                self.state, self.error = CANCELLED, e
+            except BaseException as e:
+                self.state, self.error = FAILED, e
+            self.finished = time.monotonic()
+            self.progress.flush()
+        self._done.set()
+        if self.on_done is not None:
+            try:
+                self.on_done(self)
+            except Exception:
+                # Ошибка колбэка (например, окно уже закрыто) не должна убивать поток пула
+                _log.exception("Ошибка в обработчике завершения задачи %r", self.title)
+
+    def __repr__(self):
+        return f"Job({self.title!r}, state={self.state})"
+
+
+class JobScheduler:
+    """Пул потоков с очередью задач по приоритету (меньше - раньше)"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or min(4, max(2, os.cpu_count() or 1)))
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, func: Callable, *args, title: str = '', priority: int = PRIORITY_NORMAL,
+               on_progress: Optional[ProgressCallback] = None,
+               on_done: Optional[Callable[[Job], None]] = None, **kwargs) -> Job:
+        """Ставит задачу в очередь"""
+        job = Job(func, args, kwargs, title, priority, on_progress, on_done)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Планировщик остановлен")
+            self._queue.put((priority, next(self._order), job))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f'nova-job-{len(self._threads)}')
+                self._threads.append(thread)
+                thread.start()
+        return job
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет задачу через очередь и ждет результат"""
+        return self.submit(func, *args, **kwargs).wait()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item[2] is None:
+                return
+            try:
+                item[2]._run()
+            except Exception:
+                _log.exception("Ошибка в потоке планировщика")
+
+    def shutdown(self, cancel: bool = False):
+        """Останавливает потоки; cancel=True отменяет задачи в очереди"""
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        if cancel:
+            pending = []
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for _, _, job in pending:
+                if job is not None:
+                    job.cancel()
+                    job._run()
+        for _ in threads:
+            self._queue.put((PRIORITY_LOW + 1, next(self._order), None))
+        for thread in threads:
+            thread.join()
+
+
+_default_scheduler: Optional[JobScheduler] = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> JobScheduler:
+    """Общий планировщик процесса"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = JobScheduler()
+        return _default_scheduler
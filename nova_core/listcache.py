@@ -0,0 +1,183 @@
+# [file name]: nova_core/listcache.py
+"""
+Постоянный кэш списков элементов архивов
+
+Список элементов хранится в SQLite в каталоге кэша Nova и привязан к
+отпечатку архива (путь, размер, mtime и частичный хэш). При повторном
+открытии таблица заполняется из кэша сразу после проверки размера и mtime,
+а частичный хэш сверяется позже, в фоне (см. ArchiveHandler.revalidate).
+Общий размер кэша ограничен, давно не открывавшиеся архивы вытесняются.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from .entries import ArchiveEntry
+from .fingerprint import Fingerprint, cache_dir, path_key
+
+# Предел суммарного размера сохраненных списков (сжатых)
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial_hash TEXT NOT NULL,
+    entries BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def _pack_entries(entries: Iterable[ArchiveEntry]) -> bytes:
+    rows = [[e.name, e.size, e.compressed_size, e.mtime, e.crc, int(e.is_dir),
+             int(e.encrypted), e.method, e.mode] for e in entries]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack_entries(blob: bytes) -> List[ArchiveEntry]:
+    # Записи прежних версий - без прав (*mode пуст)
+    return [ArchiveEntry(name, size, compressed_size, mtime, crc, bool(is_dir),
+                         bool(encrypted), method, *mode)
+            for name, size, compressed_size, mtime, crc, is_dir, encrypted, method, *mode
+            in json.loads(zlib.decompress(blob))]
+
+
+class ListingCache:
+    """Кэш списков элементов с вытеснением давно не использованных (LRU).
+
+    Ошибки SQLite и файловой системы не пробрасываются: кэш недоступен -
+    архив читается как обычно. Если базу не удалось открыть, кэш отключается
+    до конца сеанса.
+    """
+
+    def __init__(self, path=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disabled = False
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._path = cache_dir() / 'listings.sqlite'
+        return self._path
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self._disabled:
+                raise sqlite3.OperationalError("кэш списков отключен")
+            try:
+                db = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+                try:
+                    db.execute('PRAGMA journal_mode=WAL')
+                    db.execute(_SCHEMA)
+                    db.commit()
+                except sqlite3.Error:
+                    db.close()
+                    raise
+            except (OSError, sqlite3.Error):
+                self._disabled = True
+                raise
+            self._db = db
+        return self._db
+
+    def lookup(self, archive_path) -> Optional[Tuple[str, Fingerprint, List[ArchiveEntry]]]:
+        """Формат, сохраненный отпечаток и элементы, если размер и mtime не изменились"""
+        try:
+            st = os.stat(archive_path)
+            with self._lock:
+                db = self._connect()
+                row = db.execute(
+                    'SELECT format, size, mtime_ns, partial_hash, entries FROM listings '
+                    'WHERE key = ?', (path_key(archive_path),)).fetchone()
+                if row is None:
+                    return None
+                fmt, size, mtime_ns, partial, blob = row
+                if size != st.st_size or mtime_ns != st.st_mtime_ns:
+                    return None
+                db.execute('UPDATE listings SET last_used = ? WHERE key = ?',
+                           (time.time(), path_key(archive_path)))
+                db.commit()
+            return fmt, Fingerprint(size, mtime_ns, partial), _unpack_entries(blob)
+        except (OSError, sqlite3.Error, ValueError, zlib.error):
+            return None
+
+    def store(self, archive_path, fmt: str, print_: Fingerprint, entries: Iterable[ArchiveEntry]):
+        """Сохраняет список элементов и вытесняет старые записи сверх предела"""
+        blob = _pack_entries(entries)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute(
+                    'INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (path_key(archive_path), os.path.abspath(os.fspath(archive_path)), fmt,
+                     print_.size, print_.mtime_ns, print_.partial_hash, blob, len(blob),
+                     time.time()))
+                self._evict(db)
+                db.commit()
+        except (OSError, sqlite3.Error):
+            pass
+
+    def _evict(self, db: sqlite3.Connection):
+        total = db.execute('SELECT COALESCE(SUM(bytes), 0) FROM listings').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute(
+                'SELECT key, bytes FROM listings ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute('DELETE FROM listings WHERE key = ?', (key,))
+            total -= size
+
+    def invalidate(self, archive_path):
+        """Удаляет запись об архиве (после его изменения)"""
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute('DELETE FROM listings WHERE key = ?', (path_key(archive_path),))
+                db.commit()
+        except (OSError, sqlite3.Error):
+            pass
+
+    def clear(self):
+        """Очищает кэш"""
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute('DELETE FROM listings')
+                db.commit()
+        except (OSError, sqlite3.Error):
+            pass
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_default_cache: Optional[ListingCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ListingCache:
+    """Общий кэш списков процесса"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ListingCache()
+        return _default_cache
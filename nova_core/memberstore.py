@@ -0,0 +1,209 @@
+# [file name]: nova_core/memberstore.py
+"""
+Компактное поколоночное хранилище элементов архива
+
+Для архивов с миллионами элементов список объектов ArchiveEntry слишком
+тяжел. MemberStore хранит размеры, даты и CRC в массивах array, а имена -
+в одном общем буфере UTF-8 со смещениями. ArchiveEntry создается только
+по запросу для конкретной строки. Сортировка и фильтрация работают с
+массивами индексов и не меняют само хранилище, поэтому их можно выполнять
+в фоновом потоке.
+"""
+
+import math
+from array import array
+from itertools import compress
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .entries import ArchiveEntry
+
+COLUMN_NAME = 0
+COLUMN_SIZE = 1
+COLUMN_COMPRESSED = 2
+COLUMN_RATIO = 3
+COLUMN_MTIME = 4
+COLUMN_CRC = 5
+COLUMN_METHOD = 6
+
+FLAG_DIR = 1
+FLAG_ENCRYPTED = 2
+NO_CRC = -1
+
+# Таблицы bytes.translate для подсчета итогов по колонке флагов
+_FILE_TABLE = bytes(0 if flag & FLAG_DIR else 1 for flag in range(256))
+_ENCRYPTED_TABLE = bytes(1 if flag & FLAG_ENCRYPTED else 0 for flag in range(256))
+
+
+class MemberStore:
+    """Элементы архива в виде колонок"""
+
+    def __init__(self):
+        self._names = bytearray()
+        self._offsets = array('Q', [0])
+        self.sizes = array('q')
+        self.compressed_sizes = array('q')
+        self.mtimes = array('d')
+        self.crcs = array('q')
+        self.flags = array('B')
+        # Права Unix, 0 - неизвестны
+        self.modes = array('I')
+        self._method_ids = array('B')
+        self._methods: List[str] = []
+        self._method_index: Dict[str, int] = {}
+
+        self.total_size = 0
+        self.packed_size = 0
+        self.file_count = 0
+        self.encrypted = False
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[ArchiveEntry]) -> 'MemberStore':
+        store = cls()
+        for entry in entries:
+            store.append(entry)
+        return store
+
+    @classmethod
+    def from_columns(cls, names: bytearray, offsets: array, sizes: array,
+                     compressed_sizes: array, mtimes: array, crcs: array, flags: array,
+                     method_ids: array, methods: List[str],
+                     modes: Optional[array] = None) -> 'MemberStore':
+        """Хранилище из готовых колонок (offsets начинается с 0, mtime None - NaN,
+        CRC None - NO_CRC, права неизвестны - 0); так читатели быстрых каталогов
+        обходятся без append"""
+        store = cls()
+        store._names = names
+        store._offsets = offsets
+        store.sizes = sizes
+        store.compressed_sizes = compressed_sizes
+        store.mtimes = mtimes
+        store.crcs = crcs
+        store.flags = flags
+        store.modes = modes if modes is not None else array('I', bytes(4 * len(sizes)))
+        store._method_ids = method_ids
+        store._methods = list(methods)
+        store._method_index = {method: i for i, method in enumerate(store._methods)}
+        files = flags.tobytes().translate(_FILE_TABLE)
+        store.file_count = files.count(1)
+        store.total_size = sum(compress(sizes, files))
+        store.packed_size = sum(compress(compressed_sizes, files))
+        store.encrypted = any(flags.tobytes().translate(_ENCRYPTED_TABLE))
+        return store
+
+    def append(self, entry: ArchiveEntry):
+        """Добавляет элемент"""
+        self.append_fields(entry.name.encode('utf-8', 'surrogateescape'), entry.size,
+                           entry.compressed_size, entry.mtime, entry.crc, entry.is_dir,
+                           entry.encrypted, entry.method, entry.mode)
+
+    def append_fields(self, name: bytes, size: int, compressed_size: int,
+                      mtime: Optional[float], crc: Optional[int], is_dir: bool,
+                      encrypted: bool, method: str, mode: Optional[int] = None):
+        """Добавляет элемент по полям (имя - UTF-8), без создания ArchiveEntry"""
+        self._names += name
+        self._offsets.append(len(self._names))
+        self.sizes.append(size)
+        self.compressed_sizes.append(compressed_size)
+        self.mtimes.append(math.nan if mtime is None else mtime)
+        self.crcs.append(NO_CRC if crc is None else crc)
+        self.flags.append((FLAG_DIR if is_dir else 0) | (FLAG_ENCRYPTED if encrypted else 0))
+        self.modes.append(mode or 0)
+        method_id = self._method_index.get(method)
+        if method_id is None:
+            # Методов сжатия в архиве единицы, храним номер строки
+            method_id = self._method_index[method] = len(self._methods)
+            self._methods.append(method)
+        self._method_ids.append(method_id)
+
+        if not is_dir:
+            self.file_count += 1
+            self.total_size += size
+            self.packed_size += compressed_size
+        self.encrypted = self.encrypted or encrypted
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    # ----- доступ к строкам -----
+
+    def name(self, i: int) -> str:
+        return self._names[self._offsets[i]:self._offsets[i + 1]].decode('utf-8', 'surrogateescape')
+
+    def is_dir(self, i: int) -> bool:
+        return bool(self.flags[i] & FLAG_DIR)
+
+    def mtime(self, i: int) -> Optional[float]:
+        value = self.mtimes[i]
+        return None if math.isnan(value) else value
+
+    def crc(self, i: int) -> Optional[int]:
+        value = self.crcs[i]
+        return None if value == NO_CRC else value
+
+    def mode(self, i: int) -> Optional[int]:
+        return self.modes[i] or None
+
+    def method(self, i: int) -> str:
+        return self._methods[self._method_ids[i]]
+
+    def ratio(self, i: int) -> float:
+        size = self.sizes[i]
+        if not size:
+            return 0.0
+        return max(0.0, 100.0 * (1 - self.compressed_sizes[i] / size))
+
+    def entry(self, i: int) -> ArchiveEntry:
+        """Элемент в виде ArchiveEntry"""
+        flags = self.flags[i]
+        return ArchiveEntry(self.name(i), self.sizes[i], self.compressed_sizes[i],
+                            self.mtime(i), self.crc(i), bool(flags & FLAG_DIR),
+                            bool(flags & FLAG_ENCRYPTED), self.method(i), self.mode(i))
+
+    def entries(self, rows: Optional[Iterable[int]] = None) -> List[ArchiveEntry]:
+        rows = range(len(self)) if rows is None else rows
+        return [self.entry(i) for i in rows]
+
+    def iter_entries(self) -> Iterator[ArchiveEntry]:
+        """Элементы по одному, без списка в памяти"""
+        return (self.entry(i) for i in range(len(self)))
+
+    # ----- сортировка и фильтрация -----
+
+    def _sort_key(self, column: int) -> Callable[[int], object]:
+        if column == COLUMN_NAME:
+            return lambda i: self.name(i).lower()
+        if column == COLUMN_SIZE:
+            return self.sizes.__getitem__
+        if column == COLUMN_COMPRESSED:
+            return self.compressed_sizes.__getitem__
+        if column == COLUMN_RATIO:
+            return self.ratio
+        if column == COLUMN_MTIME:
+            # Неизвестная дата (NaN) сортируется первой
+            return lambda i: -math.inf if math.isnan(self.mtimes[i]) else self.mtimes[i]
+        if column == COLUMN_CRC:
+            return self.crcs.__getitem__
+        if column == COLUMN_METHOD:
+            return self.method
+        raise ValueError(f"Неизвестная колонка: {column}")
+
+    def sorted_rows(self, column: int, descending: bool = False,
+                    rows: Optional[Iterable[int]] = None) -> array:
+        """Номера строк в порядке сортировки по колонке"""
+        rows = range(len(self)) if rows is None else rows
+        return array('l', sorted(rows, key=self._sort_key(column), reverse=descending))
+
+    def filter_rows(self, text: str, rows: Optional[Iterable[int]] = None) -> array:
+        """Номера строк, в имени которых есть text (без учета регистра)"""
+        rows = range(len(self)) if rows is None else rows
+        text = text.lower()
+        if not text:
+            return array('l', rows)
+        names = self._names
+        offsets = self._offsets
+        if text.isascii():
+            # Для ASCII ищем прямо в байтах, не декодируя каждое имя
+            needle = text.encode('ascii')
+            return array('l', (i for i in rows
+                               if needle in names[offsets[i]:offsets[i + 1]].lower()))
+        return array('l', (i for i in rows if text in self.name(i).lower()))
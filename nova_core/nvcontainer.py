@@ -0,0 +1,799 @@
+# [file name]: nova_core/nvcontainer.py
+"""
+Контейнер .nv версии 2 (3) с дедупликацией
+
+Входные файлы режутся на фрагменты по содержимому (content-defined
+chunking): граница ставится там, где скользящее окно байтов удовлетворяет
+условию, поэтому вставка в начало файла сдвигает лишь соседние границы.
+Фрагменты адресуются SHA-256 и хранятся один раз, сжимаются в пуле
+потоков, а манифест в конце файла связывает файлы со списками фрагментов.
+
+Структура файла:
+    заголовок (MAGIC, версия, флаги)
+    сжатые фрагменты подряд
+    манифест (zlib + JSON): таблица фрагментов, их хэши и список файлов
+    трейлер: смещение и длина манифеста, CRC32, TRAILER_MAGIC
+
+Читатель дает произвольный доступ к любому файлу и к любому месту в нем:
+читаются и распаковываются только нужные фрагменты.
+
+Версия 3: файлы меньше PACK_FILE_SIZE не режутся на свои фрагменты, а
+складываются подряд в общие фрагменты-пачки до PACK_SIZE. Ссылка такого
+файла - [номер фрагмента, смещение, длина] вместо номера фрагмента.
+Тысячи крошечных файлов сжимаются вместе, а читатель держит несколько
+последних распакованных пачек в кэше. Архивы версии 2 читаются как прежде.
+
+Сплошной режим (solid_size) - те же пачки, но размером до solid_size, по
+группам расширений (см. solid), и в них идут все файлы меньше MAX_CHUNK.
+Пачка - независимый блок: файл читается распаковкой одного блока, а при
+последовательном чтении следующие блоки распаковываются заранее в
+отдельных потоках.
+
+Архив можно писать томами (archive.n01, ..., archive.nv): фрагмент не
+разрезается границей тома, поэтому файл, чьи фрагменты лежат в одном
+томе, читается без остальных.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import stat
+import struct
+import tempfile
+import time
+import threading
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from . import trace
+from .codecs import CODEC_DEFLATE as CODEC_NAME_DEFLATE
+from .codecs import CODEC_STORE as CODEC_NAME_STORE
+from .codecs import CODECS, SAMPLE_SIZE, Codec, codec_for_nv_id, get_codec, should_store
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .solid import MAX_OPEN_GROUPS, check_solid_size, solid_group
+from .streams import normalize_member_name, read_full
+from .volumes import VolumeSet, VolumeWriter, find_volumes
+
+MAGIC = b'NOVA\x02\r\n\x1a'
+TRAILER_MAGIC = b'NV2INDEX'
+VERSION = 3
+READ_VERSIONS = (2, 3)
+
+_HEADER = struct.Struct('<8sHHI')
+_TRAILER = struct.Struct('<QQI8s')
+
+# Номера кодеков фрагментов (см. Codec.nv_id)
+CODEC_STORE = 0
+CODEC_DEFLATE = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+CODEC_NAMES = {CODEC_STORE: 'Stored', CODEC_DEFLATE: 'Deflate', CODEC_ZSTD: 'Zstd',
+               CODEC_LZ4: 'LZ4'}
+
+# Границы фрагментов: минимум, ожидаемый средний размер ~64 КБ, максимум
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+# Граница - серия из ANCHOR_RUN байтов, отмеченных в _ANCHOR_TABLE (p = 1/2);
+# серия из 15 встречается в среднем раз в 64 КБ случайных данных
+ANCHOR_RUN = 15
+_ANCHOR = b'\x01' * ANCHOR_RUN
+
+DIGEST_SIZE = 32
+_READ_SIZE = 4 * 1024 * 1024
+
+# Файлы меньше PACK_FILE_SIZE складываются во фрагменты-пачки до PACK_SIZE
+PACK_FILE_SIZE = MIN_CHUNK
+PACK_SIZE = MAX_CHUNK
+# Сколько распакованных пачек держит читатель: не больше PACK_CACHE_SIZE
+# штук и PACK_CACHE_BYTES байт (последняя прочитанная остается всегда)
+PACK_CACHE_SIZE = 64
+PACK_CACHE_BYTES = 64 * 1024 * 1024
+# При последовательном чтении пачек столько следующих распаковывается заранее
+PACK_READAHEAD = 2
+
+# Ссылка файла на данные: номер фрагмента или [номер пачки, смещение, длина]
+ChunkRef = Union[int, List[int]]
+
+
+def ref_chunk(ref: ChunkRef) -> int:
+    """Номер фрагмента, на который указывает ссылка"""
+    return ref if isinstance(ref, int) else ref[0]
+
+
+def _anchor_table() -> bytes:
+    """Фиксированная псевдослучайная таблица байт -> 0/1 (часть формата)"""
+    seed = hashlib.sha256(b'nova-archiver cdc v2').digest()
+    bits = [(seed[i // 8] >> (i % 8)) & 1 for i in range(256)]
+    # Заполнители (нули и 0xFF) не должны давать границу на каждом шаге
+    bits[0x00] = bits[0xFF] = 0
+    return bytes(bits)
+
+
+_ANCHOR_TABLE = _anchor_table()
+
+
+def split_chunks(data: bytes, final: bool) -> Tuple[List[int], int]:
+    """Находит границы фрагментов в data.
+
+    Возвращает концы найденных фрагментов и позицию начала остатка, который
+    нужно склеить со следующей порцией данных (при final остатка нет).
+    Окно каждой границы зависит только от байтов текущего фрагмента, поэтому
+    результат не зависит от того, какими порциями читается файл.
+
+    Скользящее окно проверяется через bytes.translate и bytes.find, то есть
+    на скорости C, а не побайтовым циклом Python.
+    """
+    marks = data.translate(_ANCHOR_TABLE)
+    cuts = []
+    pos = 0
+    size = len(data)
+    while pos < size:
+        if size - pos <= MIN_CHUNK:
+            if final:
+                cuts.append(size)
+                pos = size
+            break
+        if not final and size - pos < MAX_CHUNK:
+            break
+        found = marks.find(_ANCHOR, pos + MIN_CHUNK - ANCHOR_RUN, pos + MAX_CHUNK)
+        cut = found + ANCHOR_RUN if found != -1 else min(size, pos + MAX_CHUNK)
+        cuts.append(cut)
+        pos = cut
+    return cuts, pos
+
+
+def compress_chunk(data: bytes, level: int, codec: Optional[Codec] = None) -> Tuple[int, bytes]:
+    """Сжимает фрагмент (по умолчанию raw deflate); несжимаемые данные хранятся как есть"""
+    codec = codec or CODECS[CODEC_NAME_DEFLATE]
+    if codec.nv_id != CODEC_STORE and (level > 0 or codec.name != CODEC_NAME_DEFLATE):
+        with trace.span(trace.PHASE_COMPRESS):
+            out = codec.compress(data, level)
+        if len(out) < len(data):
+            return codec.nv_id, out
+    return CODEC_STORE, bytes(data)
+
+
+def decompress_chunk(codec: int, payload: bytes, size: int) -> bytes:
+    if codec == CODEC_STORE:
+        return payload
+    return codec_for_nv_id(codec).decompress(payload, size)
+
+
+class NvWriter:
+    """Запись .nv с дедупликацией и параллельным сжатием фрагментов.
+
+    Одинаковые фрагменты (в одном файле, в разных файлах) сохраняются
+    один раз, мелкие файлы складываются в пачки. Объем несжатых данных в
+    очереди сжатия ограничен max_pending_bytes. Фрагменты сжимаются кодеком
+    codec (deflate, zstd, lz4); при auto_store уже сжатые файлы хранятся как
+    есть. solid_size включает сплошной режим: пачки до solid_size байт по
+    группам расширений.
+    """
+
+    format = 'nv2'
+
+    def __init__(self, path, level: Optional[int] = None, workers: Optional[int] = None,
+                 max_pending_bytes: Optional[int] = None, codec: str = CODEC_NAME_DEFLATE,
+                 auto_store: bool = True, volume_size: Optional[int] = None,
+                 solid_size: Optional[int] = None):
+        self.path = Path(path)
+        self.volume_size = volume_size
+        self.codec = get_codec(codec)
+        self.level = self.codec.clamp(level)
+        self.auto_store = auto_store
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.solid_size = check_solid_size(solid_size) if solid_size else None
+        self._pack_size = self.solid_size or PACK_SIZE
+        self._pack_file_size = MAX_CHUNK if self.solid_size else PACK_FILE_SIZE
+        # Очередь сжатия вмещает по блоку на поток, иначе блоки сжимаются по одному
+        self.max_pending_bytes = max_pending_bytes or max(self.workers * MAX_CHUNK * 16,
+                                                          (self.workers + 1) * self._pack_size)
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='nova-nv')
+        self._chunks: List[Optional[list]] = []
+        self._digests: List[bytes] = []
+        self._by_digest: Dict[bytes, int] = {}
+        self._pending: Deque[Tuple[int, int, Future]] = deque()
+        self._pending_bytes = 0
+        self._files: List[list] = []
+        # Открытые пачки по (кодеку, группе): [данные, ссылки файлов в пачке]
+        self._packs: 'OrderedDict[Tuple[str, str], Tuple[bytearray, List[list]]]' = OrderedDict()
+        # SHA-256 мелкого файла -> его ссылка (одинаковые файлы пишутся один раз)
+        self._packed: Dict[bytes, ChunkRef] = {}
+        self._closed = False
+
+        self.input_bytes = 0
+        self.unique_bytes = 0
+        self._file = self._open()
+
+    def _open(self) -> IO[bytes]:
+        """Открывает файл; фрагменты пишутся с текущей позиции"""
+        f = VolumeWriter(self.path, self.volume_size) if self.volume_size else open(self.path, 'wb')
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        return f
+
+    def _check_open(self):
+        if self._closed:
+            raise ArchiveError("Архив уже закрыт")
+
+    @staticmethod
+    def _name(arcname: str) -> str:
+        return normalize_member_name(arcname)
+
+    def add_dir(self, arcname: str, mtime: Optional[float] = None):
+        """Добавляет запись папки"""
+        self._check_open()
+        mtime = time.time() if mtime is None else mtime
+        self._files.append([self._name(arcname) + '/', 0, mtime, 0o40755, []])
+
+    def add_file(self, src_path, arcname: str,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл с диска"""
+        st = os.stat(src_path)
+        entry = ArchiveEntry(name=arcname, size=st.st_size, mtime=st.st_mtime)
+        with open(src_path, 'rb') as src:
+            self.add_stream(entry, src, on_chunk, mode=st.st_mode)
+
+    def add_data(self, arcname: str, data: bytes, st: Optional[os.stat_result] = None,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл, уже прочитанный в память; st - его stat с диска"""
+        mtime = st.st_mtime if st is not None else None
+        mode = st.st_mode if st is not None else 0o100644
+        if len(data) >= self._pack_file_size:
+            entry = ArchiveEntry(name=arcname, size=len(data), mtime=mtime)
+            self.add_stream(entry, io.BytesIO(data), on_chunk, mode=mode)
+            return
+        self._check_open()
+        self._add_small(arcname, data, mtime, mode)
+        if on_chunk is not None and data:
+            on_chunk(len(data))
+
+    def add_stream(self, entry: ArchiveEntry, stream: IO[bytes],
+                   on_chunk: Optional[Callable[[int], None]] = None, mode: Optional[int] = None):
+        """Добавляет элемент из потока, режет его на фрагменты"""
+        self._check_open()
+        if mode is None:
+            # Конвертация: права из исходного архива
+            mode = stat.S_IFREG | stat.S_IMODE(entry.mode) if entry.mode else 0o100644
+        head = read_full(stream, self._pack_file_size)
+        if len(head) < self._pack_file_size:
+            self._add_small(entry.name, head, entry.mtime, mode)
+            if on_chunk is not None and head:
+                on_chunk(len(head))
+            return
+        ids: List[ChunkRef] = []
+        size = 0
+        rest = b''
+        codec = None
+        while True:
+            data = stream.read(_READ_SIZE)
+            if head:
+                data, head = head + data, b''
+            if codec is None:
+                codec = self.codec
+                if self.auto_store and should_store(data[:SAMPLE_SIZE], entry.name):
+                    codec = CODECS[CODEC_NAME_STORE]
+            buffer = rest + data if rest else data
+            cuts, end = split_chunks(buffer, final=not data)
+            view = memoryview(buffer)
+            start = 0
+            for cut in cuts:
+                ids.append(self._add_chunk(view[start:cut], codec))
+                start = cut
+            rest = bytes(view[end:])
+            view.release()
+            if not data:
+                break
+            size += len(data)
+            if on_chunk is not None:
+                on_chunk(len(data))
+        mtime = time.time() if entry.mtime is None else entry.mtime
+        self._files.append([self._name(entry.name), size, mtime, mode & 0xFFFF, ids])
+        self.input_bytes += size
+
+    def _add_small(self, arcname: str, data: bytes, mtime: Optional[float], mode: int):
+        """Мелкий файл: ссылка на кусок пачки (пустой файл - без ссылок)"""
+        ids: List[ChunkRef] = []
+        if data:
+            digest = hashlib.sha256(data).digest()
+            ref = self._packed.get(digest)
+            if ref is None:
+                # Такой же файл целым фрагментом (старый архив при обновлении)
+                ref = self._by_digest.get(digest)
+            if ref is None:
+                ref = self._packed[digest] = self._pack(arcname, data)
+            ids.append(ref)
+        mtime = time.time() if mtime is None else mtime
+        self._files.append([self._name(arcname), len(data), mtime, mode & 0xFFFF, ids])
+        self.input_bytes += len(data)
+
+    def _pack(self, arcname: str, data: bytes) -> list:
+        """Дописывает данные в открытую пачку; номер фрагмента ссылки
+        проставляется, когда пачка уходит на сжатие"""
+        codec = self.codec
+        # Пробное сжатие на каждый крошечный файл дороже, чем оно экономит:
+        # решают только расширение и сигнатура
+        if self.auto_store and should_store(data[:SAMPLE_SIZE], arcname, probe=False):
+            codec = CODECS[CODEC_NAME_STORE]
+        key = (codec.name, solid_group(arcname) if self.solid_size else '')
+        pack = self._packs.get(key)
+        if pack is not None and len(pack[0]) + len(data) > self._pack_size:
+            self._flush_pack(key)
+            pack = None
+        if pack is None:
+            if len(self._packs) >= MAX_OPEN_GROUPS:
+                self._flush_pack(next(iter(self._packs)))
+            pack = self._packs[key] = (bytearray(), [])
+        else:
+            self._packs.move_to_end(key)
+        ref = [-1, len(pack[0]), len(data)]
+        pack[0].extend(data)
+        pack[1].append(ref)
+        return ref
+
+    def _flush_pack(self, key: Tuple[str, str]):
+        data, refs = self._packs.pop(key)
+        chunk_id = self._add_chunk(data, CODECS[key[0]])
+        for ref in refs:
+            ref[0] = chunk_id
+
+    def _add_chunk(self, data, codec: Codec) -> int:
+        digest = hashlib.sha256(data).digest()
+        chunk_id = self._by_digest.get(digest)
+        if chunk_id is not None:
+            return chunk_id
+        chunk_id = len(self._chunks)
+        self._by_digest[digest] = chunk_id
+        self._digests.append(digest)
+        self._chunks.append(None)
+        size = len(data)
+        self.unique_bytes += size
+        self._pending.append((chunk_id, size,
+                              self._executor.submit(compress_chunk, bytes(data), self.level, codec)))
+        self._pending_bytes += size
+        self._drain(self.max_pending_bytes)
+        return chunk_id
+
+    def _drain(self, limit: int):
+        """Пишет готовые фрагменты; ждет, пока очередь не станет меньше limit"""
+        while self._pending and (self._pending_bytes > limit or self._pending[0][2].done()):
+            chunk_id, size, job = self._pending.popleft()
+            codec, payload = job.result()
+            self._reserve(len(payload))
+            self._chunks[chunk_id] = [self._file.tell(), len(payload), size, codec]
+            with trace.span(trace.PHASE_WRITE):
+                self._file.write(payload)
+            trace.count(trace.BYTES_OUT, len(payload))
+            self._pending_bytes -= size
+
+    def close(self):
+        """Дописывает фрагменты, манифест и трейлер"""
+        if self._closed:
+            return
+        try:
+            for key in list(self._packs):
+                self._flush_pack(key)
+            self._drain(0)
+            manifest = zlib.compress(json.dumps({
+                'version': VERSION,
+                'digest': 'sha256',
+                'chunks': self._chunks,
+                'digests': base64.b64encode(b''.join(self._digests)).decode('ascii'),
+                'files': self._files,
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+            self._reserve(len(manifest) + _TRAILER.size)
+            offset = self._file.tell()
+            self._file.write(manifest)
+            self._file.write(_TRAILER.pack(offset, len(manifest), zlib.crc32(manifest),
+                                           TRAILER_MAGIC))
+            # При обновлении на месте новый архив может быть короче старого
+            self._file.truncate()
+        except BaseException:
+            self.abort()
+            raise
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._file.close()
+
+    def _reserve(self, size: int):
+        """Запись size байт не должна пересекать границу тома"""
+        if self.volume_size:
+            self._file.reserve(size)
+
+    def abort(self):
+        """Прерывает запись без манифеста"""
+        self._closed = True
+        for _, _, job in self._pending:
+            job.cancel()
+        self._executor.shutdown(wait=True)
+        if self.volume_size:
+            self._file.abort()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class NvMemberStream(io.RawIOBase):
+    """Поток чтения файла из .nv с произвольным доступом (seek)"""
+
+    def __init__(self, archive: 'NvArchive', chunk_ids: List[ChunkRef], size: int):
+        super().__init__()
+        self._archive = archive
+        self._refs = chunk_ids
+        self._size = size
+        self._starts = []
+        position = 0
+        for ref in chunk_ids:
+            self._starts.append(position)
+            position += archive.chunks[ref][2] if isinstance(ref, int) else ref[2]
+        # Дескриптор открывается при первом чтении: мелкий файл из пачки в
+        # кэше читается без открытия архива
+        self._file: Optional[IO[bytes]] = None
+        self._pos = 0
+        self._current = -1
+        self._data = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._size:
+            return 0
+        index = bisect_right(self._starts, self._pos) - 1
+        if index != self._current:
+            self._data = self._load(self._refs[index])
+            self._current = index
+        start = self._pos - self._starts[index]
+        count = min(len(buffer), len(self._data) - start)
+        buffer[:count] = self._data[start:start + count]
+        self._pos += count
+        return count
+
+    def _load(self, ref: ChunkRef):
+        if isinstance(ref, int):
+            return self._archive.read_chunk(ref, self._handle())
+        chunk_id, offset, length = ref
+        data = self._archive.read_pack(chunk_id, self._handle)
+        return memoryview(data)[offset:offset + length]
+
+    def _handle(self) -> IO[bytes]:
+        if self._file is None:
+            self._file = self._archive.open_file()
+        return self._file
+
+    def close(self):
+        if not self.closed and self._file is not None:
+            self._file.close()
+        super().close()
+
+
+def _volume_set(path: Path) -> Optional[VolumeSet]:
+    """Тома архива; последний том с заголовком MAGIC - это обычный архив"""
+    paths = find_volumes(path)
+    if paths is None:
+        return None
+    if path == paths[-1]:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) == MAGIC:
+                return None
+    return VolumeSet(paths)
+
+
+class NvArchive:
+    """Открытый для чтения .nv: манифест и чтение фрагментов"""
+
+    def __init__(self, path, source=None):
+        self.path = Path(path)
+        # RangeReader архива на сервере (см. remote)
+        self.source = source
+        self.volumes = _volume_set(self.path) if source is None else None
+        with self.open_file() as f:
+            magic, version, _, _ = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ArchiveError("Файл не является архивом .nv v2")
+            if version not in READ_VERSIONS:
+                raise ArchiveError(f"Неподдерживаемая версия .nv: {version}")
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            offset, length, crc, trailer = _TRAILER.unpack(f.read(_TRAILER.size))
+            if trailer != TRAILER_MAGIC:
+                raise ArchiveError("Архив .nv поврежден или не дописан")
+            f.seek(offset)
+            manifest = f.read(length)
+        self.manifest_offset = offset
+        if zlib.crc32(manifest) != crc:
+            raise ArchiveError("Контрольная сумма манифеста .nv не совпадает")
+        try:
+            data = json.loads(zlib.decompress(manifest))
+        except (ValueError, zlib.error) as e:
+            raise ArchiveError(f"Поврежденный манифест .nv: {e}") from e
+        self.chunks: List[list] = data['chunks']
+        digests = base64.b64decode(data['digests'])
+        self.digests = [digests[i:i + DIGEST_SIZE] for i in range(0, len(digests), DIGEST_SIZE)]
+        self.files: List[list] = data['files']
+        self._by_name = {f[0]: f for f in self.files}
+        self.version = version
+        # Кэш распакованных пачек: номер -> Future (пачку, которую уже
+        # распаковывает другой поток, ждем, а не распаковываем второй раз)
+        self._packs: 'OrderedDict[int, Future]' = OrderedDict()
+        self._pack_bytes = 0
+        self._packs_lock = threading.Lock()
+        self._pack_order: Optional[List[int]] = None
+        self._last_pack = -1
+        self._readahead: Optional[ThreadPoolExecutor] = None
+
+    def open_file(self) -> IO[bytes]:
+        """Новый дескриптор архива (у многотомного - поток по всем томам)"""
+        if self.source is not None:
+            return self.source.open()
+        if self.volumes is not None:
+            return self.volumes.open()
+        return open(self.path, 'rb')
+
+    def close(self):
+        if self._readahead is not None:
+            self._readahead.shutdown(wait=True)
+            self._readahead = None
+        if self.volumes is not None:
+            self.volumes.close()
+
+    def entries(self) -> List[ArchiveEntry]:
+        result = []
+        for name, size, mtime, mode, ids in self.files:
+            result.append(ArchiveEntry(
+                name=name,
+                size=size,
+                compressed_size=sum(self._stored_size(ref) for ref in ids),
+                mtime=mtime,
+                is_dir=name.endswith('/'),
+                method='NV2',
+                mode=mode or None,
+            ))
+        return result
+
+    def _stored_size(self, ref: ChunkRef) -> int:
+        """Сжатый размер данных ссылки; у куска пачки - его доля пачки"""
+        if isinstance(ref, int):
+            return self.chunks[ref][1]
+        chunk_id, _, length = ref
+        _, csize, size, _ = self.chunks[chunk_id]
+        return round(csize * length / size) if size else 0
+
+    @property
+    def stored_bytes(self) -> int:
+        """Сумма сжатых размеров уникальных фрагментов"""
+        return sum(chunk[1] for chunk in self.chunks)
+
+    def live_chunks(self) -> List[int]:
+        """Фрагменты, на которые ссылается хотя бы один файл, по порядку"""
+        return sorted({ref_chunk(ref) for record in self.files for ref in record[4]})
+
+    @property
+    def dead_bytes(self) -> int:
+        """Байты фрагментов, на которые больше не ссылается ни один файл"""
+        live = sum(self.chunks[i][1] for i in self.live_chunks())
+        return max(0, self.manifest_offset - _HEADER.size - live)
+
+    def read_chunk(self, chunk_id: int, f: IO[bytes]) -> bytes:
+        """Читает, распаковывает и проверяет фрагмент по SHA-256"""
+        offset, csize, size, codec = self.chunks[chunk_id]
+        with trace.span(trace.PHASE_READ):
+            f.seek(offset)
+            payload = f.read(csize)
+        trace.count(trace.BYTES_IN, len(payload))
+        # Проверка SHA-256 считается частью распаковки
+        with trace.span(trace.PHASE_DECOMPRESS):
+            data = decompress_chunk(codec, payload, size)
+            valid = len(data) == size and hashlib.sha256(data).digest() == self.digests[chunk_id]
+        if not valid:
+            raise ArchiveError(f"Фрагмент {chunk_id} поврежден")
+        return data
+
+    def read_pack(self, chunk_id: int, handle: Callable[[], IO[bytes]]) -> bytes:
+        """Распакованная пачка (блок) мелких файлов из кэша или с диска.
+
+        handle() дает дескриптор архива; он нужен только при промахе кэша.
+        Если пачки читаются по порядку, следующие распаковываются заранее.
+        """
+        future, load = self._pack_slot(chunk_id)
+        trace.count(trace.cache_counter('nv_packs', not load))
+        if load:
+            self._load_pack(chunk_id, future, handle)
+        self._read_ahead(chunk_id)
+        return future.result()
+
+    def _pack_slot(self, chunk_id: int) -> Tuple[Future, bool]:
+        """Место пачки в кэше и нужно ли ее загрузить вызывающему"""
+        with self._packs_lock:
+            future = self._packs.get(chunk_id)
+            if future is not None:
+                self._packs.move_to_end(chunk_id)
+                return future, False
+            future = self._packs[chunk_id] = Future()
+            return future, True
+
+    def _load_pack(self, chunk_id: int, future: Future, handle: Callable[[], IO[bytes]]):
+        try:
+            data = self.read_chunk(chunk_id, handle())
+        except BaseException as e:
+            # Ошибку получат все ждущие, а следующее чтение попробует снова
+            with self._packs_lock:
+                if self._packs.get(chunk_id) is future:
+                    del self._packs[chunk_id]
+            future.set_exception(e)
+            return
+        with self._packs_lock:
+            if self._packs.get(chunk_id) is future:
+                self._pack_bytes += len(data)
+                self._evict_packs()
+        future.set_result(data)
+
+    def _evict_packs(self):
+        while len(self._packs) > 1 and (len(self._packs) > PACK_CACHE_SIZE or
+                                        self._pack_bytes > PACK_CACHE_BYTES):
+            _, future = self._packs.popitem(last=False)
+            if future.done() and future.exception() is None:
+                self._pack_bytes -= len(future.result())
+
+    def _read_ahead(self, chunk_id: int):
+        """Переход к следующей по порядку пачке - распаковать заранее еще несколько"""
+        with self._packs_lock:
+            if chunk_id == self._last_pack:
+                return
+            previous, self._last_pack = self._last_pack, chunk_id
+            if self._pack_order is None:
+                self._pack_order = sorted({ref[0] for record in self.files for ref in record[4]
+                                           if not isinstance(ref, int)})
+            order = self._pack_order
+            index = bisect_right(order, chunk_id) - 1
+            if index < 1 or order[index - 1] != previous:
+                return
+            if self._readahead is None:
+                self._readahead = ThreadPoolExecutor(PACK_READAHEAD,
+                                                     thread_name_prefix='nova-nv-pack')
+            pool = self._readahead
+        for next_id in order[index + 1:index + 1 + PACK_READAHEAD]:
+            future, load = self._pack_slot(next_id)
+            if load:
+                pool.submit(self._prefetch_pack, next_id, future)
+
+    def _prefetch_pack(self, chunk_id: int, future: Future):
+        handles: List[IO[bytes]] = []
+
+        def handle() -> IO[bytes]:
+            handles.append(self.open_file())
+            return handles[0]
+
+        try:
+            self._load_pack(chunk_id, future, handle)
+        finally:
+            for f in handles:
+                f.close()
+
+    def open(self, name: str) -> IO[bytes]:
+        """Открывает файл как буферизованный поток с поддержкой seek"""
+        record = self._by_name.get(name)
+        if record is None or name.endswith('/'):
+            raise ArchiveError(f"Элемент не найден в архиве: {name}")
+        return io.BufferedReader(NvMemberStream(self, record[4], record[1]), MAX_CHUNK)
+
+    def read_range(self, name: str, offset: int, size: int) -> bytes:
+        """Читает size байт файла, начиная с offset"""
+        with self.open(name) as stream:
+            stream.seek(offset)
+            return stream.read(size)
+
+
+class NvUpdater(NvWriter):
+    """NvWriter, дописывающий файлы в существующий .nv v2.
+
+    Таблица фрагментов архива переиспользуется для дедупликации, так что
+    неизмененное содержимое не пишется повторно. keep(name) решает, остается
+    ли существующий файл. Новые фрагменты пишутся на место старого
+    манифеста; abort возвращает архив в прежнее состояние.
+    """
+
+    def __init__(self, path, level: Optional[int] = None, workers: Optional[int] = None,
+                 keep: Optional[Callable[[str], bool]] = None, codec: str = CODEC_NAME_DEFLATE):
+        self._keep = keep
+        super().__init__(path, level, workers, codec=codec)
+
+    def _open(self) -> IO[bytes]:
+        archive = NvArchive(self.path)
+        if archive.volumes is not None:
+            archive.close()
+            raise ArchiveError("Многотомный архив .nv нельзя изменить на месте")
+        self._chunks = archive.chunks
+        self._digests = archive.digests
+        self._by_digest = {digest: i for i, digest in enumerate(archive.digests)}
+        self._files = [f for f in archive.files if self._keep is None or self._keep(f[0])]
+        f = open(self.path, 'r+b')
+        self._head = f.read(_HEADER.size)
+        f.seek(archive.manifest_offset)
+        self._tail_offset = archive.manifest_offset
+        self._tail = f.read()
+        # Архив версии 2 после дописывания может содержать пачки
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        f.seek(archive.manifest_offset)
+        return f
+
+    def _restore(self):
+        with open(self.path, 'r+b') as f:
+            f.write(self._head)
+            f.seek(self._tail_offset)
+            f.write(self._tail)
+            f.truncate()
+
+    def abort(self):
+        """Отменяет изменения: возвращает старый манифест"""
+        super().abort()
+        self._restore()
+
+
+def compact_nv(path, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Переписывает .nv без фрагментов, на которые никто не ссылается.
+
+    Фрагменты копируются без распаковки. Возвращает число освобожденных байт.
+    """
+    path = Path(path)
+    before = path.stat().st_size
+    archive = NvArchive(path)
+    remap: Dict[int, int] = {}
+    fd, tmp_name = tempfile.mkstemp(prefix='.nova_', suffix=path.suffix, dir=str(path.parent))
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    writer = NvWriter(tmp_path, workers=1)
+    try:
+        with open(path, 'rb') as src:
+            for chunk_id in archive.live_chunks():
+                offset, csize, size, codec = archive.chunks[chunk_id]
+                src.seek(offset)
+                payload = src.read(csize)
+                remap[chunk_id] = len(writer._chunks)
+                writer._chunks.append([writer._file.tell(), csize, size, codec])
+                writer._digests.append(archive.digests[chunk_id])
+                writer._file.write(payload)
+                if progress is not None:
+                    progress(csize)
+        writer._files = [[name, size, mtime, mode,
+                          [remap[ref] if isinstance(ref, int) else [remap[ref[0]], ref[1], ref[2]]
+                           for ref in ids]]
+                         for name, size, mtime, mode, ids in archive.files]
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.abort()
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    return before - path.stat().st_size
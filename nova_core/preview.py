@@ -0,0 +1,251 @@
+# [file name]: nova_core/preview.py
+"""
+Постоянный кэш извлеченных элементов для просмотра
+
+Элемент, открытый из таблицы, извлекается один раз в папку
+<temp>/nova_archiver/preview/<ключ>/<имя файла> и при следующих открытиях
+берется оттуда. Ключ строится из пути архива, имени элемента, размера и
+CRC (псевдоним) и отпечатка архива: после изменения архива неизмененный
+элемент не распаковывается заново, а связывается жесткой ссылкой с прежней
+копией. Общий размер кэша ограничен, давно не открывавшиеся элементы
+вытесняются; кэш переживает перезапуск и чистится при следующем запуске.
+Элементы зашифрованных архивов хранятся только до конца сеанса.
+"""
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import IO, Callable, List, Optional, Tuple
+
+from . import trace
+from .entries import ArchiveEntry
+from .fingerprint import Fingerprint, archive_id, fingerprint
+from .streams import copy_stream
+
+# Предел суммарного размера извлеченных элементов
+DEFAULT_PREVIEW_LIMIT = 4 * 1024 * 1024 * 1024
+# Элементы, которые не открывали дольше, удаляются при очистке
+PREVIEW_MAX_AGE = 14 * 24 * 3600
+# Брошенные недописанные копии и копии прошлых сеансов удаляются через сутки
+STALE_AGE = 24 * 3600
+
+_PART_PREFIX = '.part-'
+_SESSION_PREFIX = 'session-'
+
+
+def preview_dir() -> Path:
+    """Папка кэша просмотра во временной папке Nova"""
+    path = Path(tempfile.gettempdir()) / 'nova_archiver' / 'preview'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _hash(*parts) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+def _remove_readonly(func, path, exc_info):
+    # Копии доступны только для чтения, на Windows их нужно разблокировать
+    try:
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+    except OSError:
+        pass
+
+
+def _remove_tree(path: Path):
+    shutil.rmtree(path, onerror=_remove_readonly)
+
+
+class PreviewCache:
+    """Кэш извлеченных элементов с вытеснением давно не открывавшихся (LRU).
+
+    Время последнего открытия - mtime папки элемента, поэтому порядок
+    вытеснения сохраняется между сеансами и общий для всех окон.
+    """
+
+    def __init__(self, root=None, limit: int = DEFAULT_PREVIEW_LIMIT,
+                 max_age: float = PREVIEW_MAX_AGE):
+        self.root = Path(root) if root else preview_dir()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.limit = limit
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._session: List[Path] = []
+
+    @staticmethod
+    def keys(archive, print_: Fingerprint, entry: ArchiveEntry) -> Tuple[str, str]:
+        """Псевдоним элемента (без отпечатка архива) и полный ключ"""
+        # У элементов TAR нет CRC, их содержимое определяет время изменения
+        check = entry.crc if entry.crc is not None else entry.mtime
+        alias = _hash(archive_id(archive), entry.name, entry.size, check)
+        return alias, f"{alias}-{_hash(*print_.to_list())}"
+
+    def _target(self, folder: Path, entry: ArchiveEntry) -> Path:
+        name = entry.name.rstrip('/').rsplit('/', 1)[-1] or 'file'
+        return folder / name
+
+    def lookup(self, archive, entry: ArchiveEntry,
+               print_: Optional[Fingerprint] = None) -> Optional[Path]:
+        """Путь к готовой копии элемента или None"""
+        print_ = print_ or fingerprint(archive)
+        alias, key = self.keys(archive, print_, entry)
+        for prefix in ('', _SESSION_PREFIX):
+            target = self._target(self.root / (prefix + key), entry)
+            if self._valid(target, entry):
+                self._touch(target.parent)
+                return target
+        return None
+
+    def fetch(self, archive, entry: ArchiveEntry, open_member: Callable[[], IO[bytes]],
+              on_chunk: Optional[Callable[[int], None]] = None,
+              print_: Optional[Fingerprint] = None) -> Path:
+        """Возвращает копию элемента, извлекая ее только при промахе кэша.
+
+        open_member() открывает поток элемента; on_chunk получает размер
+        каждого записанного блока. print_ - готовый отпечаток архива
+        (у архива на сервере его дает RangeReader).
+        """
+        print_ = print_ or fingerprint(archive)
+        found = self.lookup(archive, entry, print_)
+        trace.count(trace.cache_counter('preview', found is not None))
+        if found is not None:
+            return found
+        alias, key = self.keys(archive, print_, entry)
+        persistent = not entry.encrypted
+        folder = self.root / (key if persistent else _SESSION_PREFIX + key)
+        part = Path(tempfile.mkdtemp(prefix=_PART_PREFIX, dir=self.root))
+        try:
+            target = self._target(part, entry)
+            previous = self._find_alias(alias, entry) if persistent else None
+            if previous is None or not self._link(previous, target):
+                with open_member() as src, open(target, 'wb') as dst:
+                    copy_stream(src, dst, on_chunk=on_chunk)
+            if entry.mtime is not None:
+                os.utime(target, (entry.mtime, entry.mtime))
+            # Просмотрщик не должен менять копию (и связанные с ней жесткие ссылки)
+            os.chmod(target, stat.S_IREAD)
+            if folder.exists() and not self._valid(self._target(folder, entry), entry):
+                _remove_tree(folder)
+            try:
+                os.rename(part, folder)
+            except OSError:
+                # Другое окно успело извлечь тот же элемент
+                if not self._valid(self._target(folder, entry), entry):
+                    raise
+        finally:
+            if part.exists():
+                _remove_tree(part)
+        target = self._target(folder, entry)
+        self._touch(folder)
+        if not persistent:
+            self._session.append(folder)
+        self.cleanup(keep=folder)
+        return target
+
+    @staticmethod
+    def _valid(target: Path, entry: ArchiveEntry) -> bool:
+        try:
+            return target.stat().st_size == entry.size
+        except OSError:
+            return False
+
+    @staticmethod
+    def _touch(folder: Path):
+        try:
+            os.utime(folder)
+        except OSError:
+            pass
+
+    def _find_alias(self, alias: str, entry: ArchiveEntry) -> Optional[Path]:
+        """Копия того же элемента из прежней версии архива"""
+        for folder in self.root.glob(f"{alias}-*"):
+            target = self._target(folder, entry)
+            if self._valid(target, entry):
+                return target
+        return None
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> bool:
+        try:
+            os.link(source, target)
+            return True
+        except OSError:
+            # Файловая система без жестких ссылок - копия все равно быстрее распаковки
+            try:
+                shutil.copyfile(source, target)
+                return True
+            except OSError:
+                return False
+
+    def _folders(self) -> List[Tuple[float, int, Path, bool]]:
+        """(время открытия, размер, папка, служебная) для всех папок кэша"""
+        folders = []
+        for folder in self.root.iterdir():
+            try:
+                info = folder.stat()
+                size = 0
+                for item in folder.iterdir():
+                    st = item.stat()
+                    # Файл с жесткими ссылками делит свой размер между папками
+                    size += st.st_size // max(1, st.st_nlink)
+            except OSError:
+                continue
+            special = folder.name.startswith((_PART_PREFIX, _SESSION_PREFIX))
+            folders.append((info.st_mtime, size, folder, special))
+        return folders
+
+    def size(self) -> int:
+        """Суммарный размер кэша в байтах"""
+        return sum(size for _, size, _, _ in self._folders())
+
+    def cleanup(self, keep: Optional[Path] = None) -> int:
+        """Удаляет старые копии и вытесняет лишнее сверх предела.
+
+        Возвращает число освобожденных байт. Копии, открытые сейчас
+        просмотрщиком (на Windows их нельзя удалить), пропускаются.
+        """
+        with self._lock:
+            now = time.time()
+            folders = sorted(self._folders(), key=lambda item: item[0])
+            total = sum(size for _, size, _, _ in folders)
+            freed = 0
+            for used, size, folder, special in folders:
+                if folder == keep:
+                    continue
+                stale = now - used > (STALE_AGE if special else self.max_age)
+                if not stale and (special or total <= self.limit):
+                    continue
+                _remove_tree(folder)
+                if not folder.exists():
+                    total -= size
+                    freed += size
+            return freed
+
+    def clear_session(self):
+        """Удаляет копии элементов зашифрованных архивов этого сеанса"""
+        for folder in self._session:
+            _remove_tree(folder)
+        self._session.clear()
+
+
+_default_cache: Optional[PreviewCache] = None
+_default_lock = threading.Lock()
+
+
+def default_preview_cache() -> PreviewCache:
+    """Общий кэш просмотра процесса"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PreviewCache()
+        return _default_cache
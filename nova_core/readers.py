@@ -0,0 +1,859 @@
+# [file name]: nova_core/readers.py
+"""
+Чтение архивов разных форматов через единый интерфейс
+"""
+
+import io
+import os
+import queue
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import backends, seekindex, trace
+from .codecs import CODEC_ZSTD, get_codec
+from .entries import ArchiveEntry
+from .errors import ArchiveError, OperationCancelled, PasswordRequiredError
+from .extract import entry_mode, finish_dirs
+from .formats import (FORMAT_7Z, FORMAT_NV2, FORMAT_RAR, FORMAT_TAR, FORMAT_TAR_ZST, FORMAT_ZIP,
+                      TAR_FORMATS)
+from .memberstore import MemberStore
+from .nvcontainer import NvArchive
+from .streams import CHUNK_SIZE, copy_stream, safe_join
+from .volumes import VolumeSet, find_volumes
+from .zipmap import MappedZip, RangeZip, SplitZip, open_zipfile, zip_volumes
+
+# Форматы с произвольным доступом, которые читаются по сети
+REMOTE_FORMATS = (FORMAT_ZIP, FORMAT_NV2)
+
+ZIP_METHODS = {
+    zipfile.ZIP_STORED: 'Stored',
+    zipfile.ZIP_DEFLATED: 'Deflate',
+    zipfile.ZIP_BZIP2: 'BZip2',
+    zipfile.ZIP_LZMA: 'LZMA',
+    93: 'Zstd',
+    99: 'AES',
+}
+
+
+def _date_time_to_timestamp(date_time) -> Optional[float]:
+    """Переводит кортеж даты ZIP/RAR в timestamp"""
+    try:
+        return time.mktime(tuple(date_time[:6]) + (0, 0, -1))
+    except (OverflowError, ValueError, TypeError):
+        return None
+
+
+def _set_file_metadata(target: Path, entry: ArchiveEntry):
+    """Время изменения и права извлеченного файла (ошибка не прерывает извлечение)"""
+    mode = entry_mode(entry)
+    try:
+        with trace.span(trace.PHASE_METADATA):
+            if entry.mtime is not None:
+                os.utime(target, (entry.mtime, entry.mtime))
+            if mode is not None:
+                os.chmod(target, mode)
+    except OSError:
+        pass
+
+
+class ArchiveReader:
+    """Базовый класс чтения архива"""
+
+    format = None
+
+    def __init__(self, path, password: Optional[str] = None):
+        self.path = Path(path)
+        self.password = password
+        self._entries = None
+
+    def entries(self) -> List[ArchiveEntry]:
+        """Возвращает список элементов архива"""
+        if self._entries is None:
+            self._entries = self._read_entries()
+        return self._entries
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        raise NotImplementedError
+
+    def member_store(self) -> MemberStore:
+        """Элементы в поколоночном виде; форматы с быстрым каталогом строят его напрямую"""
+        return MemberStore.from_entries(self.entries())
+
+    def needs_password(self) -> bool:
+        """Проверяет, зашифрован ли хотя бы один элемент"""
+        return any(entry.encrypted for entry in self.entries())
+
+    def open(self, name: str) -> IO[bytes]:
+        """Открывает элемент архива как поток для чтения"""
+        raise NotImplementedError
+
+    def extract(self, dest, names: Optional[Iterable[str]] = None,
+                on_entry: Optional[Callable[[ArchiveEntry], None]] = None,
+                on_chunk: Optional[Callable[[int], None]] = None) -> int:
+        """Потоково извлекает элементы в папку, возвращает их количество"""
+        wanted = set(names) if names is not None else None
+        count = 0
+        dirs = []
+        for entry in self.entries():
+            if wanted is not None and entry.name not in wanted:
+                continue
+            if on_entry is not None:
+                on_entry(entry)
+            target = self._extract_entry(entry, dest, on_chunk)
+            if entry.is_dir:
+                dirs.append((entry, target))
+            count += 1
+        finish_dirs(dirs)
+        return count
+
+    def iter_members(self, names: Optional[Iterable[str]] = None
+                     ) -> Iterator[Tuple[ArchiveEntry, IO[bytes]]]:
+        """Файлы архива по порядку вместе с открытыми потоками чтения.
+
+        Поток действителен до перехода к следующему элементу.
+        """
+        wanted = set(names) if names is not None else None
+        for entry in self.entries():
+            if entry.is_dir or (wanted is not None and entry.name not in wanted):
+                continue
+            with self.open(entry.name) as stream:
+                yield entry, stream
+
+    def _extract_entry(self, entry: ArchiveEntry, dest, on_chunk=None):
+        """Извлекает один элемент блоками фиксированного размера"""
+        target = safe_join(dest, entry.name)
+        if entry.is_dir:
+            with trace.span(trace.PHASE_METADATA):
+                target.mkdir(parents=True, exist_ok=True)
+            trace.count(trace.DIRS)
+            return target
+        with trace.span(trace.PHASE_METADATA):
+            target.parent.mkdir(parents=True, exist_ok=True)
+        with self.open(entry.name) as src:
+            with trace.span(trace.PHASE_METADATA):
+                dst = open(target, 'wb')
+            trace.count(trace.OPEN_CALLS)
+            with trace.traced_writer(dst) as dst:
+                copy_stream(trace.traced_reader(src), dst, on_chunk=on_chunk)
+        _set_file_metadata(target, entry)
+        trace.count(trace.FILES)
+        return target
+
+    def close(self):
+        """Закрывает архив"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ZipReader(ArchiveReader):
+    """Чтение ZIP, .sntr и .nv.
+
+    Каталог читается из отображения файла в память (MappedZip); элементы
+    Stored, Deflate и Zstd (открытые и под WinZip AES) читаются оттуда же,
+    остальные - через zipfile (pyzipper для AES без отображения), который
+    открывается только при необходимости. Многотомный
+    архив (.z01, ..., .zip) читается SplitZip: тома открываются по мере
+    обращения к лежащим в них элементам. source - RangeReader архива на
+    сервере (см. remote): тогда каталог и элементы читает RangeZip.
+    """
+
+    format = FORMAT_ZIP
+
+    def __init__(self, path, password: Optional[str] = None, use_mmap: bool = True,
+                 source=None):
+        super().__init__(path, password)
+        self._map: Optional[MappedZip] = None
+        self._zip_file = None
+        self._zip_lock = threading.Lock()
+        self._source = source
+        volumes = zip_volumes(self.path) if source is None else None
+        if source is not None:
+            try:
+                self._map = RangeZip(source)
+            except ArchiveError:
+                self._map = None
+        elif volumes is not None:
+            # zipfile не читает тома сам, поэтому SplitZip нужен всегда
+            self._map = SplitZip(VolumeSet(volumes))
+        elif use_mmap:
+            try:
+                self._map = MappedZip(self.path)
+            except (ArchiveError, OSError):
+                # Необычные архивы (и файловые системы без mmap) читает zipfile
+                self._map = None
+        if self._map is None:
+            self._open_zip()
+
+    def _open_zip(self):
+        """zipfile (или pyzipper для AES) открывается при первой необходимости"""
+        with self._zip_lock:
+            if self._zip_file is not None:
+                return self._zip_file
+            try:
+                archive = self._zipfile(zipfile.ZipFile)
+                # Стандартный zipfile не умеет AES, для таких архивов нужен pyzipper
+                if any(info.compress_type == 99 for info in archive.infolist()):
+                    archive.close()
+                    archive = self._zipfile(backends.load('pyzipper').AESZipFile)
+            except zipfile.BadZipFile as e:
+                raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+            if self.password:
+                archive.setpassword(self.password.encode('utf-8'))
+            self._zip_file = archive
+            return archive
+
+    def _zipfile(self, factory: Callable):
+        if self._source is not None:
+            return factory(self._source.open())
+        return open_zipfile(self.path, factory)
+
+    def member_store(self) -> MemberStore:
+        if self._map is not None:
+            return self._map.member_store(ZIP_METHODS)
+        return super().member_store()
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        if self._map is not None:
+            return self._map.member_store(ZIP_METHODS).entries()
+        entries = []
+        for info in self._open_zip().infolist():
+            entries.append(ArchiveEntry(
+                name=info.filename,
+                size=info.file_size,
+                compressed_size=info.compress_size,
+                mtime=_date_time_to_timestamp(info.date_time),
+                crc=info.CRC,
+                is_dir=info.is_dir(),
+                encrypted=bool(info.flag_bits & 0x1),
+                method=ZIP_METHODS.get(info.compress_type, str(info.compress_type)),
+                mode=info.external_attr >> 16 or None,
+            ))
+        return entries
+
+    def open(self, name: str) -> IO[bytes]:
+        if self._map is not None and self._map.can_open(name):
+            return self._map.open(name, self.password)
+        try:
+            archive = self._open_zip()
+            info = archive.getinfo(name)
+            # pyzipper расшифровывает и распаковывает в одном вызове read
+            phase = trace.PHASE_DECRYPT if info.flag_bits & 0x1 else trace.PHASE_DECOMPRESS
+            # Для AES при открытии из пароля выводится ключ (PBKDF2)
+            with trace.span(phase):
+                stream = archive.open(info)
+            return trace.traced_reader(stream, phase)
+        except RuntimeError as e:
+            # zipfile сообщает об отсутствующем или неверном пароле через RuntimeError
+            raise PasswordRequiredError(str(e)) from e
+        except KeyError:
+            raise ArchiveError(f"Элемент не найден в архиве: {name}") from None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
+
+
+class TarReader(ArchiveReader):
+    """Чтение TAR и сжатых TAR (gz, bz2, xz, zst)
+
+    Для сжатых TAR строится индекс произвольного доступа (см. seekindex),
+    поэтому отдельный файл распаковывается от ближайшей контрольной точки,
+    а не с начала архива. .tar.zst читается только последовательно: каждый
+    проход открывает поток распаковки заново.
+    """
+
+    def __init__(self, path, password: Optional[str] = None, fmt: str = 'tar',
+                 use_index: bool = True):
+        super().__init__(path, password)
+        self.format = fmt
+        self._streamed = fmt == FORMAT_TAR_ZST
+        self.use_index = use_index and fmt != FORMAT_TAR and not self._streamed
+        self._index: Optional[seekindex.SeekIndex] = None
+        try:
+            if self._streamed:
+                self._tar = self._open_stream()
+            else:
+                self._tar = tarfile.open(self.path, 'r:*')
+        except tarfile.TarError as e:
+            raise ArchiveError(f"Поврежденный TAR архив: {e}") from e
+
+    def _open_stream(self) -> tarfile.TarFile:
+        """Новый последовательный проход по .tar.zst"""
+        raw = open(self.path, 'rb')
+        try:
+            source = get_codec(CODEC_ZSTD).reader(raw)
+            tar = _StreamTarFile.open(fileobj=source, mode='r|')
+        except BaseException:
+            raw.close()
+            raise
+        tar.streams = (source, raw)
+        return tar
+
+    def _members(self) -> Iterator[Tuple[tarfile.TarFile, tarfile.TarInfo]]:
+        """Файлы и папки архива по порядку вместе с открытым TarFile"""
+        if not self._streamed:
+            for member in self._tar:
+                if member.isfile() or member.isdir():
+                    yield self._tar, member
+            return
+        if self._tar is None:
+            self._tar = self._open_stream()
+        tar, self._tar = self._tar, None
+        try:
+            for member in tar:
+                if member.isfile() or member.isdir():
+                    yield tar, member
+        except tarfile.TarError as e:
+            raise ArchiveError(f"Поврежденный TAR архив: {e}") from e
+        finally:
+            tar.close()
+
+    @staticmethod
+    def _to_entry(member: tarfile.TarInfo) -> ArchiveEntry:
+        return ArchiveEntry(
+            name=member.name + ('/' if member.isdir() else ''),
+            size=member.size,
+            compressed_size=member.size,
+            mtime=float(member.mtime),
+            is_dir=member.isdir(),
+            method='TAR',
+            mode=member.mode,
+        )
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        if self._streamed:
+            return [self._to_entry(m) for tar, m in self._members()]
+        if self.use_index:
+            try:
+                self._index = seekindex.load_or_build(self.path, self.format)
+                return self._index.entries()
+            except ArchiveError:
+                # Нет libz, поврежденный поток и т.п. - читаем как обычно
+                self._index = None
+        # Ссылки и устройства не извлекаются, поэтому и в списке не нужны
+        return [self._to_entry(m) for m in self._tar.getmembers()
+                if m.isfile() or m.isdir()]
+
+    def data_offsets(self) -> Dict[str, Tuple[int, int]]:
+        """Смещения и размеры данных обычных файлов (имеет смысл для несжатого TAR)"""
+        return {self._to_entry(m).name: (m.offset_data, m.size)
+                for m in self._tar.getmembers() if m.isreg() and not m.issparse()}
+
+    def open(self, name: str) -> IO[bytes]:
+        if self._streamed:
+            return self._open_streamed(name)
+        if self._index is None and self.use_index:
+            self.entries()
+        if self._index is not None:
+            return self._index.open_member(name)
+        try:
+            member = self._tar.getmember(name.rstrip('/'))
+        except KeyError:
+            raise ArchiveError(f"Элемент не найден в архиве: {name}") from None
+        stream = self._tar.extractfile(member)
+        if stream is None:
+            raise ArchiveError(f"Элемент не является файлом: {name}")
+        return stream
+
+    def _open_streamed(self, name: str) -> IO[bytes]:
+        """Элемент .tar.zst; поиск идет проходом с начала архива"""
+        return io.BufferedReader(_StreamedMember(lambda: self._find_streamed(name)))
+
+    def _find_streamed(self, name: str):
+        target = name.rstrip('/')
+        members = self._members()
+        for tar, member in members:
+            if member.name == target:
+                stream = tar.extractfile(member)
+                if stream is None:
+                    break
+                return stream, member.size, members
+        members.close()
+        raise ArchiveError(f"Элемент не найден в архиве: {name}")
+
+    def iter_members(self, names=None):
+        entries = self.entries()
+        wanted = set(names) if names is not None else None
+        # Индекс выгоден, только пока переходы к точкам (до DEFAULT_SPAN распаковки
+        # на элемент) обходятся дешевле одного прохода по всему архиву
+        if self._index is not None and wanted is not None and (
+                len(wanted) * seekindex.DEFAULT_SPAN < sum(e.size for e in entries)):
+            yield from super().iter_members(names)
+            return
+        # Иначе - один проход по архиву вместо поиска каждого элемента с начала
+        for tar, member in self._members():
+            if not member.isfile():
+                continue
+            entry = self._to_entry(member)
+            if wanted is None or entry.name in wanted:
+                yield entry, tar.extractfile(member)
+
+    def extract(self, dest, names=None, on_entry=None, on_chunk=None) -> int:
+        # Идем по архиву последовательно, без предварительного полного сканирования;
+        # при полном извлечении это быстрее, чем переходы по точкам индекса.
+        # .tar.zst всегда читается одним проходом с фильтром по именам
+        wanted = set(names) if names is not None else None
+        if not self._streamed and (names is not None or
+                                   (self._entries is not None and self._index is None)):
+            return super().extract(dest, names, on_entry, on_chunk)
+        count = 0
+        # Уже созданные папки: mkdir для каждого файла стоил бы двух вызовов
+        made = set()
+        dirs = []
+        for tar, member in self._members():
+            entry = self._to_entry(member)
+            if wanted is not None and entry.name not in wanted:
+                continue
+            if on_entry is not None:
+                on_entry(entry)
+            target = safe_join(dest, entry.name)
+            if entry.is_dir:
+                with trace.span(trace.PHASE_METADATA):
+                    target.mkdir(parents=True, exist_ok=True)
+                made.add(target)
+                dirs.append((entry, target))
+                trace.count(trace.DIRS)
+            else:
+                if target.parent not in made:
+                    with trace.span(trace.PHASE_METADATA):
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                    made.add(target.parent)
+                with tar.extractfile(member) as src:
+                    with trace.span(trace.PHASE_METADATA):
+                        dst = open(target, 'wb')
+                    trace.count(trace.OPEN_CALLS)
+                    # Для сжатого TAR чтение включает распаковку (tarfile не разделяет их)
+                    with trace.traced_writer(dst) as dst:
+                        copy_stream(trace.traced_reader(src), dst, on_chunk=on_chunk)
+                _set_file_metadata(target, entry)
+                trace.count(trace.FILES)
+            count += 1
+        finish_dirs(dirs)
+        return count
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+
+class _StreamTarFile(tarfile.TarFile):
+    """TarFile поверх потока распаковки; закрывает и поток, и файл"""
+
+    streams = ()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for stream in self.streams:
+                stream.close()
+
+
+class _StreamedMember(io.RawIOBase):
+    """Элемент .tar.zst: чтение по порядку, переход назад - новый проход"""
+
+    def __init__(self, find: Callable):
+        super().__init__()
+        self._find = find
+        self._members = None
+        self._rewind()
+
+    def _rewind(self):
+        if self._members is not None:
+            self._members.close()
+        self._stream, self._size, self._members = self._find()
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        if offset < self._pos:
+            self._rewind()
+        while self._pos < offset:
+            skipped = len(self._stream.read(min(offset - self._pos, CHUNK_SIZE)))
+            if not skipped:
+                break
+            self._pos += skipped
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        count = len(data)
+        buffer[:count] = data
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._members.close()
+        super().close()
+
+
+class _ExtractedMember(io.BufferedReader):
+    """Файл, извлеченный во временную папку; папка удаляется при закрытии"""
+
+    def __init__(self, path, tmpdir: tempfile.TemporaryDirectory):
+        super().__init__(io.FileIO(path, 'rb'))
+        self._tmpdir = tmpdir
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._tmpdir.cleanup()
+
+
+# Сколько блоков распакованных данных 7z ждут читателя (ограничивает память)
+_PIPE_DEPTH = 4
+
+
+class _PipeStream(io.RawIOBase):
+    """Поток элемента 7z, который py7zr распаковывает в другом потоке.
+
+    Распаковка кладет блоки в короткую очередь и ждет, пока их заберут, так
+    что в памяти не больше _PIPE_DEPTH блоков. После закрытия читателем
+    остаток элемента отбрасывается.
+    """
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self._chunks: queue.Queue = queue.Queue(_PIPE_DEPTH)
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._dropped = threading.Event()
+
+    # Сторона распаковки
+
+    def put(self, item):
+        """Передает блок (или конец потока None, или исключение) читателю"""
+        while not self._dropped.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # Сторона читателя
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            if self._eof:
+                return 0
+            item = self._chunks.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._buffer = memoryview(item)
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+    def close(self):
+        self._dropped.set()
+        super().close()
+
+
+class _PipeWriter:
+    """Приемник py7zr (интерфейс py7zr.io.Py7zIO), пишущий в _PipeStream"""
+
+    def __init__(self, pipe: _PipeStream):
+        self._pipe = pipe
+        self._size = 0
+
+    def write(self, data) -> int:
+        view = memoryview(data)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self._pipe.put(bytes(view[start:start + CHUNK_SIZE]))
+        self._size += len(view)
+        return len(view)
+
+    def read(self, size=None) -> bytes:
+        return b''
+
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._size
+
+    def flush(self):
+        pass
+
+    def size(self) -> int:
+        return self._size
+
+    def close(self):
+        self._pipe.put(None)
+
+
+class _PipeFactory:
+    """Фабрика приемников py7zr: каждый новый элемент становится _PipeStream
+    в очереди читателя в том порядке, в каком py7zr начинает его писать
+    """
+
+    _DONE = object()
+
+    def __init__(self):
+        self._pipes: queue.Queue = queue.Queue()
+        self._open: List[_PipeStream] = []
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def create(self, filename: str) -> _PipeWriter:
+        pipe = _PipeStream(filename)
+        with self._lock:
+            if self._cancelled:
+                raise OperationCancelled("Чтение архива прервано")
+            self._open.append(pipe)
+        self._pipes.put(pipe)
+        return _PipeWriter(pipe)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Распаковка закончилась; ошибку получит читатель"""
+        if error is not None:
+            with self._lock:
+                for pipe in self._open:
+                    pipe.put(error)
+        self._pipes.put(error if error is not None else self._DONE)
+
+    def cancel(self):
+        """Читатель ушел: остальные элементы не нужны"""
+        with self._lock:
+            self._cancelled = True
+            for pipe in self._open:
+                pipe.close()
+
+    def __iter__(self) -> Iterator[_PipeStream]:
+        while True:
+            item = self._pipes.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class SevenZipReader(ArchiveReader):
+    """Чтение .7z через py7zr"""
+
+    format = FORMAT_7Z
+
+    def __init__(self, path, password: Optional[str] = None):
+        super().__init__(path, password)
+        py7zr = backends.load('py7zr')
+        self._py7zr = py7zr
+        # Тома 7-Zip (.7z.001, .7z.002, ...) - разрезанный файл, py7zr читает их как один
+        paths = find_volumes(self.path)
+        self._volumes = VolumeSet(paths) if paths is not None else None
+        source = self._volumes.open() if self._volumes is not None else self.path
+        self._archive = py7zr.SevenZipFile(source, 'r', password=password)
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        entries = []
+        for info in self._archive.list():
+            mtime = info.creationtime.timestamp() if info.creationtime else None
+            entries.append(ArchiveEntry(
+                name=info.filename + ('/' if info.is_directory else ''),
+                size=info.uncompressed or 0,
+                compressed_size=info.compressed or 0,
+                mtime=mtime,
+                crc=info.crc32,
+                is_dir=info.is_directory,
+                encrypted=self._archive.needs_password(),
+                method='7z',
+            ))
+        return entries
+
+    def needs_password(self) -> bool:
+        return self._archive.needs_password()
+
+    def _run_extract(self, path, targets=None):
+        try:
+            # py7zr читает, распаковывает и пишет файлы сам, фазы не разделить
+            with trace.span(trace.PHASE_DECOMPRESS):
+                self._archive.extract(path=path, targets=targets)
+        except self._py7zr.exceptions.PasswordRequired as e:
+            raise PasswordRequiredError(str(e)) from e
+        finally:
+            # py7zr после извлечения требует сброса позиции
+            self._archive.reset()
+
+    def iter_members(self, names=None):
+        # Элементы распаковываются в фоновом потоке прямо в читателя, без
+        # временной папки и без повторной распаковки солид-блоков с начала
+        entries = {e.name: e for e in self.entries() if not e.is_dir}
+        targets = None
+        if names is not None:
+            targets = [name.rstrip('/') for name in names if name in entries]
+        factory = _PipeFactory()
+
+        def run():
+            try:
+                self._archive.extract(targets=targets, factory=factory)
+            except self._py7zr.exceptions.PasswordRequired as e:
+                factory.finish(PasswordRequiredError(str(e)))
+            except ArchiveError as e:
+                factory.finish(e)
+            except Exception as e:
+                factory.finish(ArchiveError(f"Ошибка распаковки 7z: {e}"))
+            else:
+                factory.finish()
+
+        thread = threading.Thread(target=run, name='nova-7z-stream', daemon=True)
+        thread.start()
+        try:
+            for pipe in factory:
+                with pipe:
+                    entry = entries.get(pipe.name)
+                    if entry is not None:
+                        yield entry, pipe
+        finally:
+            factory.cancel()
+            thread.join()
+            self._archive.reset()
+
+    def open(self, name: str) -> IO[bytes]:
+        # py7zr извлекает элементы только на диск, поэтому идем через временную папку
+        name = name.rstrip('/')
+        tmpdir = tempfile.TemporaryDirectory(prefix='nova_7z_')
+        self._run_extract(tmpdir.name, [name])
+        path = Path(tmpdir.name, *name.split('/'))
+        if not path.is_file():
+            tmpdir.cleanup()
+            raise ArchiveError(f"Элемент не найден в архиве: {name}")
+        return _ExtractedMember(path, tmpdir)
+
+    def extract(self, dest, names=None, on_entry=None, on_chunk=None) -> int:
+        entries = self.entries()
+        if names is not None:
+            wanted = set(names)
+            entries = [e for e in entries if e.name in wanted]
+        for entry in entries:
+            safe_join(dest, entry.name)
+        targets = [e.name.rstrip('/') for e in entries] if names is not None else None
+        self._run_extract(str(dest), targets)
+        for entry in entries:
+            if on_entry is not None:
+                on_entry(entry)
+            if on_chunk is not None and entry.size:
+                on_chunk(entry.size)
+        return len(entries)
+
+    def close(self):
+        self._archive.close()
+        if self._volumes is not None:
+            self._volumes.close()
+
+
+class NvReader(ArchiveReader):
+    """Чтение контейнера .nv v2 (произвольный доступ к файлам)"""
+
+    format = FORMAT_NV2
+
+    def __init__(self, path, password: Optional[str] = None, source=None):
+        super().__init__(path, password)
+        self.archive = NvArchive(self.path, source)
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        return self.archive.entries()
+
+    def open(self, name: str) -> IO[bytes]:
+        # Каждый поток открывает свой дескриптор, поэтому open потокобезопасен
+        return self.archive.open(name)
+
+    def close(self):
+        self.archive.close()
+
+
+class RarReader(ArchiveReader):
+    """Чтение .rar через rarfile (только чтение)"""
+
+    format = FORMAT_RAR
+
+    def __init__(self, path, password: Optional[str] = None):
+        super().__init__(path, password)
+        self._rarfile = backends.load('rarfile')
+        self._rar = self._rarfile.RarFile(str(self.path))
+        if password:
+            self._rar.setpassword(password)
+
+    def _read_entries(self) -> List[ArchiveEntry]:
+        entries = []
+        for info in self._rar.infolist():
+            entries.append(ArchiveEntry(
+                name=info.filename + ('/' if info.is_dir() and not info.filename.endswith('/') else ''),
+                size=info.file_size,
+                compressed_size=info.compress_size,
+                mtime=_date_time_to_timestamp(info.date_time),
+                crc=info.CRC,
+                is_dir=info.is_dir(),
+                encrypted=info.needs_password(),
+                method='RAR',
+            ))
+        return entries
+
+    def open(self, name: str) -> IO[bytes]:
+        try:
+            return self._rar.open(name.rstrip('/'))
+        except self._rarfile.PasswordRequired as e:
+            raise PasswordRequiredError(str(e)) from e
+        except self._rarfile.Error as e:
+            raise ArchiveError(str(e)) from e
+
+    def close(self):
+        self._rar.close()
+
+
+def open_reader(path, fmt: str, password: Optional[str] = None,
+                source=None) -> ArchiveReader:
+    """Создает читателя для указанного формата (source - RangeReader архива на сервере)"""
+    if source is not None and fmt not in REMOTE_FORMATS:
+        raise ArchiveError("По адресу открываются только ZIP (.zip, .sntr, .nv) и .nv v2")
+    if fmt == FORMAT_ZIP:
+        return ZipReader(path, password, source=source)
+    if fmt in TAR_FORMATS:
+        if find_volumes(path) is not None:
+            raise ArchiveError("Многотомные TAR не поддерживаются")
+        return TarReader(path, password, fmt)
+    if fmt == FORMAT_7Z:
+        return SevenZipReader(path, password)
+    if fmt == FORMAT_RAR:
+        return RarReader(path, password)
+    if fmt == FORMAT_NV2:
+        return NvReader(path, password, source)
+    raise ArchiveError(f"Чтение формата {fmt} не поддерживается")
@@ -0,0 +1,421 @@
+# [file name]: nova_core/search.py
+"""
+Поиск текста внутри архива без извлечения на диск
+
+Элементы читаются потоками (ZIP, .nv v2 и несжатый TAR - в нескольких
+потоках) и проверяются построчно подстрокой или регулярным выражением.
+Двоичные и уже сжатые элементы пропускаются по первым байтам. В режиме
+"только имена" чтение элемента прекращается на первом совпадении.
+
+Необязательный триграммный индекс (SQLite в каталоге кэша) хранит для
+каждой триграммы слов список текстовых элементов; повторный поиск
+подстроки читает только элементы, содержащие все ее триграммы.
+"""
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from . import trace
+from .codecs import SAMPLE_SIZE, should_store
+from .entries import ArchiveEntry
+from .errors import ArchiveError, BackendMissingError, OperationCancelled, PasswordRequiredError
+from .fingerprint import Fingerprint, cache_dir, path_key
+from .streams import CHUNK_SIZE
+from .verify import MemberProblem
+
+# Сколько совпадений сохранять на элемент
+DEFAULT_MAX_HITS = 1000
+# Сколько символов строки с совпадением показывать
+MAX_LINE_LENGTH = 300
+# Строка без перевода строки длиннее этого проверяется по частям
+MAX_CARRY = 16 * 1024 * 1024
+# Сколько пар (триграмма, элемент) копится в памяти до записи в индекс
+INDEX_FLUSH_ENTRIES = 4_000_000
+
+_FATAL_ERRORS = (PasswordRequiredError, BackendMissingError)
+# Индекс строится по словам из латиницы, цифр и _ (регистр не учитывается)
+_WORD = re.compile(rb'\w{3,}')
+
+_CHUNK = 0
+_DONE = 1
+
+
+class SearchHit(NamedTuple):
+    """Строка элемента с совпадением"""
+
+    name: str
+    line: int
+    text: str
+
+
+class SearchResult(NamedTuple):
+    """Итог поиска по архиву"""
+
+    matched: List[str]
+    hits: List[SearchHit]
+    searched: int
+    skipped: int
+    problems: List[MemberProblem]
+    indexed: bool = False
+
+
+class MemberScan(NamedTuple):
+    """Результат просмотра одного элемента.
+
+    hits is None - элемент двоичный и пропущен; trigrams - триграммы слов
+    для индекса (None, если их не собирали или набор неполон).
+    """
+
+    hits: Optional[List[SearchHit]]
+    trigrams: Optional[Set[bytes]] = None
+
+
+def word_trigrams(data: bytes) -> Set[bytes]:
+    """Триграммы слов текста в нижнем регистре"""
+    trigrams = set()
+    for word in set(_WORD.findall(data.lower())):
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+def looks_binary(sample: bytes, name: str = '') -> bool:
+    """Двоичные данные или уже сжатый файл - искать в них текст бессмысленно"""
+    return b'\0' in sample[:SAMPLE_SIZE] or should_store(sample[:SAMPLE_SIZE], name)
+
+
+class Matcher:
+    """Поиск подстроки (bytes.find) или регулярного выражения в байтах"""
+
+    def __init__(self, pattern: str, regex: bool = False, ignore_case: bool = False):
+        if not pattern:
+            raise ArchiveError("Пустой образец поиска")
+        raw = pattern.encode('utf-8')
+        self.literal = None if regex else raw
+        self._regex = None
+        if regex or ignore_case:
+            try:
+                self._regex = re.compile(raw if regex else re.escape(raw),
+                                         re.IGNORECASE if ignore_case else 0)
+            except re.error as e:
+                raise ArchiveError(f"Неверное регулярное выражение: {e}") from e
+
+    def find(self, block: bytes, start: int = 0) -> int:
+        """Позиция первого совпадения не раньше start или -1"""
+        if self._regex is None:
+            return block.find(self.literal, start)
+        match = self._regex.search(block, start)
+        return match.start() if match else -1
+
+    def trigrams(self) -> Optional[Set[bytes]]:
+        """Триграммы, которые обязательно есть в совпадающем элементе (только подстрока)"""
+        return word_trigrams(self.literal) if self.literal is not None else None
+
+
+def _line_text(block: bytes, start: int, end: int) -> str:
+    line = block[start:min(end, start + MAX_LINE_LENGTH * 4)]
+    return line.decode('utf-8', 'replace')[:MAX_LINE_LENGTH].rstrip('\r')
+
+
+def search_member(entry: ArchiveEntry, stream: IO[bytes], matcher: Matcher,
+                  names_only: bool = False, max_hits: int = DEFAULT_MAX_HITS,
+                  on_chunk: Optional[Callable[[int], None]] = None,
+                  collect_trigrams: bool = False) -> MemberScan:
+    """Ищет совпадения в потоке элемента построчно.
+
+    names_only - остановиться на первом совпадении (если не собираются
+    триграммы для индекса).
+    """
+    stream = trace.traced_reader(stream)
+    data = stream.read(CHUNK_SIZE)
+    if data and looks_binary(data, entry.name):
+        if on_chunk is not None:
+            on_chunk(entry.size)
+        return MemberScan(None)
+    hits: List[SearchHit] = []
+    trigrams: Optional[Set[bytes]] = set() if collect_trigrams else None
+    carry = b''
+    line_no = 1
+
+    def scan(block: bytes):
+        nonlocal line_no
+        if trigrams is not None:
+            trigrams.update(word_trigrams(block))
+        counted = 0
+        pos = matcher.find(block) if len(hits) < max_hits else -1
+        while pos != -1:
+            start = block.rfind(b'\n', 0, pos) + 1
+            end = block.find(b'\n', pos)
+            end = len(block) if end == -1 else end
+            line_no += block.count(b'\n', counted, start)
+            counted = start
+            hits.append(SearchHit(entry.name, line_no, _line_text(block, start, end)))
+            if len(hits) >= max_hits or (names_only and trigrams is None):
+                break
+            pos = matcher.find(block, end + 1) if end < len(block) else -1
+        line_no += block.count(b'\n', counted)
+
+    while data:
+        if on_chunk is not None:
+            on_chunk(len(data))
+        buffer = carry + data if carry else data
+        cut = buffer.rfind(b'\n') + 1
+        if cut == 0 and len(buffer) < MAX_CARRY:
+            carry = buffer
+        else:
+            if cut == 0:
+                # Огромная строка: слова на границе частей в индекс не попадут
+                cut = len(buffer)
+                if trigrams is not None:
+                    trigrams = None
+                    collect_trigrams = False
+            carry = buffer[cut:]
+            scan(buffer[:cut])
+            if hits and names_only and not collect_trigrams:
+                return MemberScan(hits)
+        data = stream.read(CHUNK_SIZE)
+    if carry:
+        scan(carry)
+    return MemberScan(hits, trigrams)
+
+
+ResultCallback = Callable[[ArchiveEntry, Optional[MemberScan], Optional[str]], None]
+
+
+class ArchiveSearcher:
+    """Параллельный поиск по элементам.
+
+    open_member(entry) должен быть потокобезопасным. Колбэки вызываются в
+    вызывающем потоке, поэтому исключение из них (отмена) останавливает поиск.
+    """
+
+    def __init__(self, open_member: Callable[[ArchiveEntry], IO[bytes]], matcher: Matcher,
+                 workers: Optional[int] = None, names_only: bool = False,
+                 max_hits: int = DEFAULT_MAX_HITS, collect_trigrams: bool = False):
+        self.open_member = open_member
+        self.matcher = matcher
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.names_only = names_only
+        self.max_hits = max_hits
+        self.collect_trigrams = collect_trigrams
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _scan(self, entry: ArchiveEntry, stream: IO[bytes], report) -> MemberScan:
+        return search_member(entry, stream, self.matcher, self.names_only, self.max_hits,
+                             report, self.collect_trigrams)
+
+    def search(self, entries: List[ArchiveEntry], on_result: ResultCallback,
+               on_chunk: Optional[Callable[[int], None]] = None):
+        self._stop.clear()
+        self._error = None
+        events: queue.Queue = queue.Queue()
+        next_index = iter(range(len(entries)))
+        index_lock = threading.Lock()
+
+        def report(size: int):
+            if self._stop.is_set():
+                raise OperationCancelled("Поиск остановлен")
+            events.put((_CHUNK, size, None, None))
+
+        def work():
+            while not self._stop.is_set():
+                with index_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                entry = entries[index]
+                try:
+                    with self.open_member(entry) as stream:
+                        result, problem = self._scan(entry, stream, report), None
+                except OperationCancelled:
+                    return
+                except _FATAL_ERRORS as e:
+                    self._error = e
+                    self._stop.set()
+                    return
+                except Exception as e:
+                    result, problem = None, str(e) or type(e).__name__
+                events.put((_DONE, index, result, problem))
+
+        threads = [threading.Thread(target=work, name=f'nova-search-{i}', daemon=True)
+                   for i in range(min(self.workers, len(entries)))]
+        for thread in threads:
+            thread.start()
+        try:
+            left = len(entries)
+            while left:
+                try:
+                    kind, value, result, problem = events.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if kind == _CHUNK:
+                    if on_chunk is not None:
+                        on_chunk(value)
+                else:
+                    left -= 1
+                    on_result(entries[value], result, problem)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def search_sequential(self, members: Iterable[Tuple[ArchiveEntry, IO[bytes]]],
+                          on_result: ResultCallback,
+                          on_chunk: Optional[Callable[[int], None]] = None):
+        """Поиск одним проходом (сжатые TAR, 7z, RAR)"""
+        for entry, stream in members:
+            try:
+                with stream:
+                    result, problem = self._scan(entry, stream, on_chunk), None
+            except (OperationCancelled,) + _FATAL_ERRORS:
+                raise
+            except Exception as e:
+                result, problem = None, str(e) or type(e).__name__
+            on_result(entry, result, problem)
+
+
+_INDEX_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE members (id INTEGER PRIMARY KEY, name TEXT NOT NULL, text INTEGER NOT NULL,
+                      exact INTEGER NOT NULL);
+CREATE TABLE postings (trigram BLOB NOT NULL, ids BLOB NOT NULL);
+"""
+
+
+def _pack_ids(ids: array) -> bytes:
+    ids = array('I', sorted(ids))
+    return zlib.compress(ids.tobytes(), 1)
+
+
+def _unpack_ids(blob: bytes) -> array:
+    ids = array('I')
+    ids.frombytes(zlib.decompress(blob))
+    return ids
+
+
+class TrigramIndex:
+    """Триграммный индекс архива в каталоге кэша, привязанный к отпечатку.
+
+    Ошибки SQLite и недоступный каталог кэша не пробрасываются: без индекса
+    поиск читает все элементы.
+    """
+
+    def __init__(self, archive, path=None):
+        try:
+            self.path: Optional[Path] = (Path(path) if path else
+                                         cache_dir('search') / f"{path_key(archive)}.sqlite")
+        except OSError:
+            self.path = None
+        self._db: Optional[sqlite3.Connection] = None
+
+    def open(self, print_: Fingerprint) -> bool:
+        """Открывает индекс, если он построен для этой версии архива"""
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            db = sqlite3.connect(str(self.path), check_same_thread=False)
+            row = db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != ':'.join(map(str, print_.to_list())):
+                db.close()
+                return False
+            self._db = db
+            return True
+        except sqlite3.Error:
+            return False
+
+    def text_members(self) -> Set[str]:
+        """Имена текстовых элементов (двоичные в индекс не входят)"""
+        return {name for name, in self._db.execute('SELECT name FROM members WHERE text = 1')}
+
+    def candidates(self, trigrams: Optional[Set[bytes]]) -> Set[str]:
+        """Текстовые элементы, в которых есть все триграммы образца"""
+        if not trigrams:
+            return self.text_members()
+        found: Optional[Set[int]] = None
+        for trigram in trigrams:
+            ids = set()
+            for blob, in self._db.execute('SELECT ids FROM postings WHERE trigram = ?',
+                                          (trigram,)):
+                ids.update(_unpack_ids(blob))
+            found = ids if found is None else found & ids
+            if not found:
+                break
+        inexact = {row[0] for row in self._db.execute(
+            'SELECT id FROM members WHERE text = 1 AND exact = 0')}
+        wanted = (found or set()) | inexact
+        return {name for member_id, name in self._db.execute('SELECT id, name FROM members')
+                if member_id in wanted}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class TrigramIndexBuilder:
+    """Строит индекс во временном файле и атомарно заменяет прежний"""
+
+    def __init__(self, index: TrigramIndex):
+        if index.path is None:
+            raise OSError("Каталог кэша недоступен")
+        self.index = index
+        self._tmp = index.path.with_name(index.path.name + f'.{os.getpid()}.tmp')
+        if self._tmp.exists():
+            self._tmp.unlink()
+        self._db = sqlite3.connect(str(self._tmp), check_same_thread=False)
+        self._db.executescript(_INDEX_SCHEMA)
+        self._pending: Dict[bytes, array] = {}
+        self._pending_count = 0
+        self._next_id = 0
+
+    def add(self, name: str, scan: Optional[MemberScan]):
+        """Добавляет элемент; scan is None или без триграмм - элемент читается всегда"""
+        member_id = self._next_id
+        self._next_id += 1
+        text = scan is not None and scan.hits is not None
+        exact = text and scan.trigrams is not None
+        self._db.execute('INSERT INTO members VALUES (?, ?, ?, ?)',
+                         (member_id, name, int(text or scan is None), int(exact)))
+        if not exact:
+            return
+        for trigram in scan.trigrams:
+            ids = self._pending.get(trigram)
+            if ids is None:
+                ids = self._pending[trigram] = array('I')
+            ids.append(member_id)
+        self._pending_count += len(scan.trigrams)
+        if self._pending_count >= INDEX_FLUSH_ENTRIES:
+            self._flush()
+
+    def _flush(self):
+        self._db.executemany('INSERT INTO postings VALUES (?, ?)',
+                             ((trigram, _pack_ids(ids)) for trigram, ids in self._pending.items()))
+        self._pending.clear()
+        self._pending_count = 0
+
+    def finish(self, print_: Fingerprint):
+        self._flush()
+        self._db.execute('CREATE INDEX postings_trigram ON postings (trigram)')
+        self._db.execute("INSERT INTO meta VALUES ('fingerprint', ?)",
+                         (':'.join(map(str, print_.to_list())),))
+        self._db.commit()
+        self._db.close()
+        os.replace(self._tmp, self.index.path)
+
+    def abort(self):
+        self._db.close()
+        try:
+            self._tmp.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,741 @@
+# [file name]: nova_core/seekindex.py
+"""
+Индекс произвольного доступа для .tar.gz, .tar.bz2 и .tar.xz
+
+Чтобы достать один файл из сжатого TAR, обычно приходится распаковать
+все, что лежит перед ним. Индекс хранит точки, с которых распаковку можно
+начать с середины потока, и таблицу элементов TAR со смещениями:
+
+- gzip: контрольные точки каждые span байт (как zran из zlib): смещение
+  во входном потоке с точностью до бита и последние 32 КБ вывода;
+- xz: границы блоков из индекса в конце файла (каждый блок независим);
+- bz2: смещения блоков, найденные по 48-битной сигнатуре блока.
+
+Индекс сохраняется рядом с архивом (.nvidx) или в каталоге кэша и
+проверяется по размеру, mtime и частичному хэшу архива.
+"""
+
+import bisect
+import bz2
+import ctypes
+import ctypes.util
+import json
+import lzma
+import os
+import struct
+import tarfile
+import tempfile
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .fingerprint import Fingerprint, cache_dir, fingerprint, path_key
+from .formats import FORMAT_TAR_BZ2, FORMAT_TAR_GZ, FORMAT_TAR_XZ
+
+# Расстояние между контрольными точками gzip (в распакованных байтах)
+DEFAULT_SPAN = 8 * 1024 * 1024
+
+INDEX_MAGIC = b'NVSIDX1\x00'
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.nvidx'
+
+WINDOW_SIZE = 32 * 1024
+_IN_CHUNK = 256 * 1024
+_OUT_CHUNK = 256 * 1024
+
+
+class SeekIndexUnavailable(ArchiveError):
+    """Индекс для этого архива построить нельзя"""
+
+
+# ----- gzip: zran через системную libz -----
+
+_Z_OK = 0
+_Z_STREAM_END = 1
+_Z_NEED_DICT = 2
+_Z_BUF_ERROR = -5
+_Z_NO_FLUSH = 0
+_Z_BLOCK = 5
+
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [
+        ('next_in', ctypes.c_void_p), ('avail_in', ctypes.c_uint), ('total_in', ctypes.c_ulong),
+        ('next_out', ctypes.c_void_p), ('avail_out', ctypes.c_uint), ('total_out', ctypes.c_ulong),
+        ('msg', ctypes.c_char_p), ('state', ctypes.c_void_p),
+        ('zalloc', ctypes.c_void_p), ('zfree', ctypes.c_void_p), ('opaque', ctypes.c_void_p),
+        ('data_type', ctypes.c_int), ('adler', ctypes.c_ulong), ('reserved', ctypes.c_ulong),
+    ]
+
+
+_libz = None
+_libz_checked = False
+
+
+def _load_libz():
+    """Загружает системную libz: модуль zlib не дает доступа к Z_BLOCK и inflatePrime"""
+    global _libz, _libz_checked
+    if _libz_checked:
+        return _libz
+    _libz_checked = True
+    names = [ctypes.util.find_library('z'), ctypes.util.find_library('zlib1'),
+             ctypes.util.find_library('zlib'), 'libz.so.1', 'libz.dylib', 'zlib1.dll']
+    for name in names:
+        if not name:
+            continue
+        try:
+            lib = ctypes.CDLL(name)
+            lib.inflatePrime
+        except (OSError, AttributeError):
+            continue
+        stream_p = ctypes.POINTER(_ZStream)
+        lib.zlibVersion.restype = ctypes.c_char_p
+        lib.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.inflate.argtypes = [stream_p, ctypes.c_int]
+        lib.inflateEnd.argtypes = [stream_p]
+        lib.inflatePrime.argtypes = [stream_p, ctypes.c_int, ctypes.c_int]
+        lib.inflateSetDictionary.argtypes = [stream_p, ctypes.c_char_p, ctypes.c_uint]
+        lib.inflateReset2.argtypes = [stream_p, ctypes.c_int]
+        _libz = lib
+        break
+    return _libz
+
+
+class _Inflater:
+    """Тонкая обертка над z_stream"""
+
+    def __init__(self, lib, window_bits: int):
+        self._lib = lib
+        self._strm = _ZStream()
+        self._out = ctypes.create_string_buffer(_OUT_CHUNK)
+        self._input = b''
+        ret = lib.inflateInit2_(ctypes.byref(self._strm), window_bits, lib.zlibVersion(),
+                                ctypes.sizeof(_ZStream))
+        if ret != _Z_OK:
+            raise ArchiveError(f"inflateInit2 вернул {ret}")
+
+    @property
+    def avail_in(self) -> int:
+        return self._strm.avail_in
+
+    @property
+    def data_type(self) -> int:
+        return self._strm.data_type
+
+    def set_input(self, data: bytes):
+        self._input = data
+        self._strm.next_in = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+        self._strm.avail_in = len(data)
+
+    def remaining_input(self) -> bytes:
+        return self._input[len(self._input) - self._strm.avail_in:]
+
+    def inflate(self, flush: int) -> Tuple[int, bytes]:
+        self._strm.next_out = ctypes.addressof(self._out)
+        self._strm.avail_out = _OUT_CHUNK
+        ret = self._lib.inflate(ctypes.byref(self._strm), flush)
+        produced = _OUT_CHUNK - self._strm.avail_out
+        if ret not in (_Z_OK, _Z_STREAM_END, _Z_BUF_ERROR):
+            message = self._strm.msg.decode('ascii', 'replace') if self._strm.msg else ret
+            raise ArchiveError(f"Ошибка распаковки gzip: {message}")
+        return ret, ctypes.string_at(self._out, produced) if produced else b''
+
+    def prime(self, bits: int, value: int):
+        self._lib.inflatePrime(ctypes.byref(self._strm), bits, value)
+
+    def set_dictionary(self, window: bytes):
+        if window:
+            self._lib.inflateSetDictionary(ctypes.byref(self._strm), window, len(window))
+
+    def reset(self, window_bits: int):
+        self._lib.inflateReset2(ctypes.byref(self._strm), window_bits)
+
+    def close(self):
+        if self._strm is not None:
+            self._lib.inflateEnd(ctypes.byref(self._strm))
+            self._strm = None
+
+    def __del__(self):
+        self.close()
+
+
+class _Tail:
+    """Последние WINDOW_SIZE байт распакованного потока"""
+
+    def __init__(self):
+        self._chunks = deque()
+        self._size = 0
+
+    def add(self, data: bytes):
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._chunks and self._size - len(self._chunks[0]) >= WINDOW_SIZE:
+            self._size -= len(self._chunks.popleft())
+
+    def window(self) -> bytes:
+        return b''.join(self._chunks)[-WINDOW_SIZE:]
+
+
+class _GzipCodec:
+    """Контрольные точки gzip: [out, in, bits, смещение окна, длина окна]"""
+
+    kind = 'gzip'
+
+    def __init__(self):
+        self.lib = _load_libz()
+        if self.lib is None:
+            raise SeekIndexUnavailable("Системная библиотека zlib недоступна")
+
+    def scan(self, f: IO[bytes], span: int, points: list, blobs: IO[bytes]) -> Iterator[bytes]:
+        inflater = _Inflater(self.lib, 47)
+        tail = _Tail()
+        total_in = total_out = 0
+        last = 0
+        try:
+            data = f.read(_IN_CHUNK)
+            inflater.set_input(data)
+            while True:
+                before = inflater.avail_in
+                ret, out = inflater.inflate(_Z_BLOCK)
+                total_in += before - inflater.avail_in
+                if out:
+                    total_out += len(out)
+                    tail.add(out)
+                    yield out
+
+                if ret == _Z_STREAM_END:
+                    # Следующий член многочленного gzip, если он есть
+                    rest = inflater.remaining_input() or f.read(_IN_CHUNK)
+                    if not rest.strip(b'\x00'):
+                        return
+                    inflater.reset(47)
+                    inflater.set_input(rest)
+                    continue
+
+                data_type = inflater.data_type
+                if (data_type & 128) and not (data_type & 64) and \
+                        (total_out == 0 or total_out - last > span):
+                    window = zlib.compress(tail.window(), 1)
+                    points.append([total_out, total_in, data_type & 7, blobs.tell(), len(window)])
+                    blobs.write(window)
+                    last = total_out
+
+                if inflater.avail_in == 0 and len(out) < _OUT_CHUNK:
+                    data = f.read(_IN_CHUNK)
+                    if not data:
+                        return
+                    inflater.set_input(data)
+        finally:
+            inflater.close()
+
+    def iter_from(self, f: IO[bytes], point: list, window: bytes) -> Iterator[bytes]:
+        _, offset, bits = point[0], point[1], point[2]
+        inflater = _Inflater(self.lib, -15)
+        try:
+            f.seek(offset - (1 if bits else 0))
+            if bits:
+                inflater.prime(bits, f.read(1)[0] >> (8 - bits))
+            inflater.set_dictionary(window)
+            inflater.set_input(f.read(_IN_CHUNK))
+            while True:
+                ret, out = inflater.inflate(_Z_NO_FLUSH)
+                if out:
+                    yield out
+                if ret == _Z_STREAM_END:
+                    # Пропускаем трейлер (CRC32 + ISIZE) и переходим к следующему члену
+                    rest = inflater.remaining_input()
+                    while len(rest) < 8:
+                        more = f.read(_IN_CHUNK)
+                        if not more:
+                            return
+                        rest += more
+                    rest = rest[8:] or f.read(_IN_CHUNK)
+                    if not rest.strip(b'\x00'):
+                        return
+                    inflater.reset(47)
+                    inflater.set_input(rest)
+                    continue
+                if inflater.avail_in == 0 and len(out) < _OUT_CHUNK:
+                    data = f.read(_IN_CHUNK)
+                    if not data:
+                        return
+                    inflater.set_input(data)
+        finally:
+            inflater.close()
+
+
+# ----- xz: независимые блоки -----
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class _XzCodec:
+    """Блоки xz: [out, in, несжатый размер, размер без выравнивания, смещение заголовка потока]"""
+
+    kind = 'xz'
+
+    @staticmethod
+    def blocks(f: IO[bytes]) -> List[list]:
+        """Читает индексы всех потоков xz с конца файла"""
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        streams = []
+        while end > 0:
+            # Пропускаем выравнивание между потоками
+            while end >= 4:
+                f.seek(end - 4)
+                if f.read(4) != b'\x00\x00\x00\x00':
+                    break
+                end -= 4
+            if end < 24:
+                break
+            f.seek(end - 12)
+            footer = f.read(12)
+            if footer[10:12] != b'YZ':
+                raise SeekIndexUnavailable("Не найден заголовок конца потока xz")
+            backward_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+            index_start = end - 12 - backward_size
+            f.seek(index_start)
+            index = f.read(backward_size)
+            if index[0] != 0:
+                raise SeekIndexUnavailable("Поврежден индекс xz")
+            count, pos = _read_varint(index, 1)
+            records = []
+            for _ in range(count):
+                unpadded, pos = _read_varint(index, pos)
+                uncompressed, pos = _read_varint(index, pos)
+                records.append((unpadded, uncompressed))
+            blocks_size = sum((u + 3) & ~3 for u, _ in records)
+            stream_start = index_start - blocks_size - 12
+            streams.append((stream_start, records))
+            end = stream_start
+
+        result = []
+        out = 0
+        for stream_start, records in reversed(streams):
+            offset = stream_start + 12
+            for unpadded, uncompressed in records:
+                result.append([out, offset, uncompressed, unpadded, stream_start])
+                offset += (unpadded + 3) & ~3
+                out += uncompressed
+        return result
+
+    @staticmethod
+    def decode_block(f: IO[bytes], block: list) -> Iterator[bytes]:
+        """Распаковывает один блок: заголовок его потока + сам блок"""
+        _, offset, _, unpadded, stream_start = block
+        f.seek(stream_start)
+        header = f.read(12)
+        f.seek(offset)
+        data = header + f.read((unpadded + 3) & ~3)
+        decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        out = decompressor.decompress(data, _OUT_CHUNK)
+        while out:
+            yield out
+            out = decompressor.decompress(b'', _OUT_CHUNK)
+
+    def scan(self, f, span, points, blobs) -> Iterator[bytes]:
+        points.extend(self.blocks(f))
+        for block in list(points):
+            yield from self.decode_block(f, block)
+
+    def iter_from(self, f, point, window, points) -> Iterator[bytes]:
+        start = points.index(point)
+        for block in points[start:]:
+            yield from self.decode_block(f, block)
+
+
+# ----- bz2: блоки по битовой сигнатуре -----
+
+_BZ2_BLOCK_MAGIC = 0x314159265359
+_BZ2_EOS_MAGIC = 0x177245385090
+
+
+def _bit_patterns(magic: int):
+    """Варианты 48-битной сигнатуры для каждого сдвига внутри байта"""
+    patterns = []
+    for shift in range(8):
+        if shift == 0:
+            patterns.append((0, magic.to_bytes(6, 'big'), None, None))
+            continue
+        value = (magic << (8 - shift)).to_bytes(7, 'big')
+        head_mask = (1 << (8 - shift)) - 1
+        tail_mask = (0xFF << (8 - shift)) & 0xFF
+        patterns.append((shift, value[1:6], (value[0] & head_mask, head_mask),
+                         (value[6] & tail_mask, tail_mask)))
+    return patterns
+
+
+_BLOCK_PATTERNS = _bit_patterns(_BZ2_BLOCK_MAGIC)
+_EOS_PATTERNS = _bit_patterns(_BZ2_EOS_MAGIC)
+
+
+def _find_bit_magic(data: bytes, patterns, base: int, limit: int) -> List[int]:
+    """Битовые позиции сигнатуры в data (только начинающиеся раньше limit)"""
+    found = []
+    for shift, body, head, tail in patterns:
+        pos = data.find(body, 1 if head else 0)
+        while pos != -1:
+            start = pos - 1 if head else pos
+            if start < limit:
+                ok = True
+                if head and (data[start] & head[1]) != head[0]:
+                    ok = False
+                if ok and tail:
+                    end = pos + 5
+                    ok = end < len(data) and (data[end] & tail[1]) == tail[0]
+                if ok:
+                    found.append((base + start) * 8 + shift)
+            pos = data.find(body, pos + 1)
+    return found
+
+
+class _Bz2Codec:
+    """Блоки bz2: [out, начальный бит, конечный бит, несжатый размер]"""
+
+    kind = 'bz2'
+
+    @staticmethod
+    def boundaries(f: IO[bytes]) -> Tuple[List[int], List[int]]:
+        """Находит битовые позиции начала блоков и концов потоков"""
+        blocks, ends = [], []
+        f.seek(0)
+        base = 0
+        previous = b''
+        while True:
+            data = f.read(4 * 1024 * 1024)
+            if not data and not previous:
+                break
+            window = previous + data
+            window_base = base - len(previous)
+            limit = len(window) if not data else len(window) - 7
+            blocks.extend(_find_bit_magic(window, _BLOCK_PATTERNS, window_base, limit))
+            ends.extend(_find_bit_magic(window, _EOS_PATTERNS, window_base, limit))
+            if not data:
+                break
+            previous = window[limit:]
+            base += len(data)
+        return sorted(set(blocks)), sorted(set(ends))
+
+    @staticmethod
+    def block_stream(f: IO[bytes], start_bit: int, end_bit: int) -> bytes:
+        """Собирает из одного блока полноценный поток bz2"""
+        first = start_bit // 8
+        last = (end_bit + 7) // 8
+        f.seek(first)
+        chunk = f.read(last - first)
+        nbits = end_bit - start_bit
+        value = int.from_bytes(chunk, 'big')
+        value >>= len(chunk) * 8 - (start_bit - first * 8) - nbits
+        value &= (1 << nbits) - 1
+        block_crc = (value >> (nbits - 80)) & 0xFFFFFFFF
+        # Блок + сигнатура конца потока + CRC потока (для одного блока равен CRC блока)
+        stream = (((value << 48) | _BZ2_EOS_MAGIC) << 32) | block_crc
+        total_bits = nbits + 80
+        padding = (-total_bits) % 8
+        stream <<= padding
+        return b'BZh9' + stream.to_bytes((total_bits + padding) // 8, 'big')
+
+    def decode_block(self, f, point) -> bytes:
+        return bz2.decompress(self.block_stream(f, point[1], point[2]))
+
+    def scan(self, f, span, points, blobs) -> Iterator[bytes]:
+        starts, ends = self.boundaries(f)
+        marks = sorted(set(starts) | set(ends))
+        ends = set(ends)
+        out = 0
+        i = 0
+        while i < len(starts):
+            start = starts[i]
+            # Конец блока - следующая сигнатура; ложные срабатывания пропускаем
+            j = bisect.bisect_right(marks, start)
+            data = None
+            while j < len(marks):
+                try:
+                    data = bz2.decompress(self.block_stream(f, start, marks[j]))
+                    break
+                except (OSError, ValueError, EOFError):
+                    if marks[j] in ends:
+                        raise ArchiveError("Поврежден блок bz2") from None
+                    j += 1
+            if data is None:
+                raise ArchiveError("Не найден конец блока bz2")
+            points.append([out, start, marks[j], len(data)])
+            out += len(data)
+            yield data
+            i = bisect.bisect_left(starts, marks[j])
+
+    def iter_from(self, f, point, window, points) -> Iterator[bytes]:
+        start = points.index(point)
+        for block in points[start:]:
+            yield self.decode_block(f, block)
+
+
+_CODECS = {
+    FORMAT_TAR_GZ: _GzipCodec,
+    FORMAT_TAR_XZ: _XzCodec,
+    FORMAT_TAR_BZ2: _Bz2Codec,
+}
+
+
+class _ChunkReader:
+    """Файлоподобный объект поверх итератора блоков (для tarfile в режиме r|)"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class RangeStream:
+    """Поток чтения участка распакованных данных, начиная с ближайшей точки"""
+
+    def __init__(self, chunks: Iterator[bytes], skip: int, size: int, file: IO[bytes]):
+        self._chunks = chunks
+        self._skip = skip
+        self._left = size
+        self._buffer = b''
+        self._file = file
+
+    def read(self, size: int = -1) -> bytes:
+        while self._skip:
+            chunk = next(self._chunks, b'')
+            if not chunk:
+                raise ArchiveError("Архив короче, чем указано в индексе")
+            if len(chunk) <= self._skip:
+                self._skip -= len(chunk)
+            else:
+                self._buffer = chunk[self._skip:]
+                self._skip = 0
+        if size < 0 or size > self._left:
+            size = self._left
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, b'')
+            if not chunk:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self._left -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SeekIndex:
+    """Индекс произвольного доступа к сжатому TAR"""
+
+    def __init__(self, archive_path, fmt: str, print_: Fingerprint, span: int,
+                 points: List[list], members: List[list], index_path=None, blobs_offset: int = 0):
+        self.archive_path = Path(archive_path)
+        self.format = fmt
+        self.fingerprint = print_
+        self.span = span
+        self.points = points
+        self.members = members
+        self.index_path = Path(index_path) if index_path else None
+        self._blobs_offset = blobs_offset
+        self._blobs: Optional[IO[bytes]] = None
+        self._codec = _CODECS[fmt]()
+        self._by_name: Dict[str, list] = {m[0]: m for m in members}
+        self._starts = [p[0] for p in points]
+
+    # ----- построение -----
+
+    @classmethod
+    def build(cls, archive_path, fmt: str, span: int = DEFAULT_SPAN) -> 'SeekIndex':
+        """Строит индекс за один проход распаковки архива"""
+        if fmt not in _CODECS:
+            raise SeekIndexUnavailable(f"Индекс не нужен для формата {fmt}")
+        codec = _CODECS[fmt]()
+        print_ = fingerprint(archive_path)
+        points: List[list] = []
+        members: List[list] = []
+        blobs = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        with open(archive_path, 'rb') as f:
+            reader = _ChunkReader(codec.scan(f, span, points, blobs))
+            try:
+                with tarfile.open(fileobj=reader, mode='r|') as tar:
+                    for member in tar:
+                        if member.isdir():
+                            members.append([member.name + '/', 0, 0, member.mtime, 1,
+                                            member.mode])
+                        elif member.isreg() and not member.issparse():
+                            members.append([member.name, member.offset_data, member.size,
+                                            member.mtime, 0, member.mode])
+            except tarfile.TarError as e:
+                raise ArchiveError(f"Поврежденный TAR архив: {e}") from e
+            # Дочитываем поток, чтобы получить точки до конца архива
+            while reader.read(_OUT_CHUNK):
+                pass
+
+        index = cls(archive_path, fmt, print_, span, points, members)
+        blobs.seek(0)
+        index._blobs = blobs
+        return index
+
+    # ----- сохранение и загрузка -----
+
+    def save(self, path):
+        """Записывает индекс в файл (атомарно)"""
+        path = Path(path)
+        header = zlib.compress(json.dumps({
+            'version': INDEX_VERSION,
+            'format': self.format,
+            'fingerprint': self.fingerprint.to_list(),
+            'span': self.span,
+            'points': self.points,
+            'members': self.members,
+        }, separators=(',', ':')).encode('utf-8'))
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as out:
+            out.write(INDEX_MAGIC)
+            out.write(struct.pack('<Q', len(header)))
+            out.write(header)
+            if self._blobs is not None:
+                self._blobs.seek(0)
+                while True:
+                    data = self._blobs.read(1024 * 1024)
+                    if not data:
+                        break
+                    out.write(data)
+        os.replace(tmp, path)
+        if self._blobs is not None:
+            self._blobs.close()
+        self._blobs = None
+        self.index_path = path
+        self._blobs_offset = len(INDEX_MAGIC) + 8 + len(header)
+
+    @classmethod
+    def load(cls, path, archive_path) -> Optional['SeekIndex']:
+        """Загружает индекс; None, если он отсутствует или устарел"""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                    return None
+                (length,) = struct.unpack('<Q', f.read(8))
+                header = json.loads(zlib.decompress(f.read(length)))
+        except (OSError, ValueError, struct.error, zlib.error):
+            return None
+        if header.get('version') != INDEX_VERSION:
+            return None
+        stored = Fingerprint.from_list(header['fingerprint'])
+        try:
+            st = os.stat(archive_path)
+        except OSError:
+            return None
+        # Сначала дешевая проверка размера и mtime, затем частичный хэш
+        if stored.size != st.st_size or stored.mtime_ns != st.st_mtime_ns:
+            return None
+        if fingerprint(archive_path) != stored:
+            return None
+        return cls(archive_path, header['format'], stored, header['span'], header['points'],
+                   header['members'], index_path=path,
+                   blobs_offset=len(INDEX_MAGIC) + 8 + length)
+
+    # ----- чтение -----
+
+    def entries(self) -> List[ArchiveEntry]:
+        """Элементы архива из индекса, без распаковки"""
+        return [ArchiveEntry(name=name, size=size, compressed_size=size, mtime=float(mtime),
+                             is_dir=bool(is_dir), method='TAR', mode=mode)
+                for name, _, size, mtime, is_dir, mode in self.members]
+
+    def _window(self, point: list) -> bytes:
+        if self._codec.kind != 'gzip':
+            return b''
+        offset, length = point[3], point[4]
+        if self._blobs is not None:
+            self._blobs.seek(offset)
+            data = self._blobs.read(length)
+        else:
+            with open(self.index_path, 'rb') as f:
+                f.seek(self._blobs_offset + offset)
+                data = f.read(length)
+        return zlib.decompress(data)
+
+    def open_range(self, offset: int, size: int) -> RangeStream:
+        """Открывает участок распакованного потока [offset, offset + size)"""
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i < 0:
+            raise ArchiveError("Смещение вне индекса")
+        point = self.points[i]
+        f = open(self.archive_path, 'rb')
+        try:
+            if self._codec.kind == 'gzip':
+                chunks = self._codec.iter_from(f, point, self._window(point))
+            else:
+                chunks = self._codec.iter_from(f, point, b'', self.points)
+        except BaseException:
+            f.close()
+            raise
+        return RangeStream(chunks, offset - point[0], size, f)
+
+    def open_member(self, name: str) -> RangeStream:
+        """Открывает файл из архива, распаковывая только от ближайшей точки"""
+        member = self._by_name.get(name)
+        if member is None or member[4]:
+            raise ArchiveError(f"Элемент не найден в архиве: {name}")
+        return self.open_range(member[1], member[2])
+
+
+def index_location(archive_path, sidecar: bool = False) -> Path:
+    """Путь файла индекса: рядом с архивом или в каталоге кэша"""
+    if sidecar:
+        return Path(os.fspath(archive_path) + INDEX_SUFFIX)
+    return cache_dir('seekindex') / (path_key(archive_path) + INDEX_SUFFIX)
+
+
+def load_or_build(archive_path, fmt: str, span: int = DEFAULT_SPAN,
+                  sidecar: bool = False) -> SeekIndex:
+    """Возвращает актуальный индекс, при необходимости строит и сохраняет его"""
+    if fmt not in _CODECS:
+        raise SeekIndexUnavailable(f"Индекс не нужен для формата {fmt}")
+    for beside in (True, False):
+        try:
+            path = index_location(archive_path, beside)
+            if not path.exists():
+                continue
+        except OSError:
+            # Каталог кэша недоступен - индекс строится заново и живет в памяти
+            continue
+        index = SeekIndex.load(path, archive_path)
+        if index is not None:
+            return index
+
+    index = SeekIndex.build(archive_path, fmt, span)
+    try:
+        index.save(index_location(archive_path, sidecar))
+    except OSError:
+        # Нет прав на запись рядом с архивом или в кэш - индекс остается в памяти
+        pass
+    return index
@@ -0,0 +1,54 @@
+# [file name]: nova_core/solid.py
+"""
+Сплошные (solid) блоки для .nv и .7z
+
+Мелкие файлы сжимаются не по одному, а общими блоками до solid_size байт,
+что дает степень сжатия сплошного архива. Файлы раскладываются по блокам по
+семейству расширений (исходники C, веб, тексты...), чтобы похожие данные
+сжимались вместе. Блоки независимы: извлечение одного файла распаковывает
+только его блок, а разные блоки сжимаются и распаковываются параллельно.
+"""
+
+from typing import Dict
+
+from .errors import ArchiveError
+
+MIN_SOLID_SIZE = 64 * 1024
+MAX_SOLID_SIZE = 1024 * 1024 * 1024
+# Сколько групп одновременно копит писатель; при переполнении сбрасывается
+# группа, дольше всех не получавшая файлов
+MAX_OPEN_GROUPS = 16
+
+# Родственные расширения попадают в одну группу
+_FAMILIES = {
+    'c': ('.c', '.h', '.cc', '.cpp', '.cxx', '.hh', '.hpp', '.hxx', '.inl', '.m', '.mm'),
+    'js': ('.js', '.mjs', '.cjs', '.jsx', '.ts', '.tsx', '.mts', '.cts', '.map'),
+    'web': ('.html', '.htm', '.xhtml', '.css', '.scss', '.sass', '.less', '.vue', '.svelte',
+            '.svg'),
+    'jvm': ('.java', '.kt', '.kts', '.scala', '.groovy', '.gradle'),
+    'py': ('.py', '.pyi', '.pyx', '.pxd'),
+    'shell': ('.sh', '.bash', '.zsh', '.fish', '.ps1', '.bat', '.cmd'),
+    'data': ('.json', '.jsonl', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.conf', '.xml',
+             '.lock'),
+    'text': ('.txt', '.md', '.rst', '.adoc', '.tex', '.log', '.csv', '.tsv'),
+}
+_FAMILY_OF: Dict[str, str] = {ext: family for family, exts in _FAMILIES.items()
+                              for ext in exts}
+
+
+def solid_group(name: str) -> str:
+    """Группа файла для сплошных блоков: семейство расширения или само расширение"""
+    base = name.rstrip('/').rsplit('/', 1)[-1]
+    dot = base.rfind('.')
+    if dot <= 0:
+        # Файлы без расширения (Makefile, LICENSE, .gitignore) - обычно текст
+        return 'text'
+    ext = base[dot:].lower()
+    return _FAMILY_OF.get(ext, ext)
+
+
+def check_solid_size(size: int) -> int:
+    if not MIN_SOLID_SIZE <= size <= MAX_SOLID_SIZE:
+        raise ArchiveError(f"Размер сплошного блока должен быть от "
+                           f"{MIN_SOLID_SIZE // 1024} КБ до {MAX_SOLID_SIZE >> 30} ГБ")
+    return size
@@ -0,0 +1,133 @@
+# [file name]: nova_core/streams.py
+"""
+Потоковое копирование данных и работа с путями
+"""
+
+import os
+import stat
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .errors import ArchiveError
+
+# Размер блока при потоковом чтении/записи: память не зависит от размера архива
+CHUNK_SIZE = 1024 * 1024
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def copy_stream(src, dst, chunk_size: int = CHUNK_SIZE,
+                on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Копирует поток блоками фиксированного размера, возвращает число байт"""
+    total = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    readinto = getattr(src, 'readinto', None)
+    while True:
+        if readinto is not None:
+            n = readinto(buffer)
+            if not n:
+                break
+            dst.write(view[:n])
+        else:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            n = len(chunk)
+            dst.write(chunk)
+        total += n
+        if on_chunk is not None:
+            on_chunk(n)
+    return total
+
+
+def read_full(stream, size: int) -> bytes:
+    """Первые size байт потока (read может вернуть меньше запрошенного); меньше - только в конце"""
+    data = stream.read(size)
+    while data and len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+def normalize_member_name(name: str) -> str:
+    """Приводит имя элемента архива к виду a/b/c без ведущих слэшей"""
+    # Разбор строкой, без pathlib: функция вызывается на каждый элемент
+    return '/'.join(p for p in name.replace('\\', '/').split('/') if p not in ('', '.'))
+
+
+def safe_join(dest, name: str) -> Path:
+    """Возвращает путь извлечения, не выходящий за пределы папки назначения"""
+    relative = normalize_member_name(name)
+    if not relative or '..' in relative.split('/'):
+        raise ArchiveError(f"Недопустимое имя элемента в архиве: {name}")
+    return Path(dest).joinpath(*relative.split('/'))
+
+
+def is_url(path) -> bool:
+    """Путь - адрес архива на сервере (http:// или https://), а не файл"""
+    return isinstance(path, str) and path.lower().startswith(('http://', 'https://'))
+
+
+class SourceFile(NamedTuple):
+    """Исходный файл или папка: путь на диске, имя в архиве и stat из обхода"""
+
+    path: str
+    arcname: str
+    stat: os.stat_result
+
+    @property
+    def is_dir(self) -> bool:
+        return self.arcname.endswith('/')
+
+
+def scan_sources(sources: Iterable) -> Iterator[SourceFile]:
+    """Обходит исходные пути через os.scandir.
+
+    stat каждого элемента запрашивается один раз за обход (в Windows он
+    приходит вместе со списком папки) и дальше не повторяется. Порядок -
+    как у os.walk: подпапки и файлы папки по именам, затем содержимое
+    подпапок; ссылки на папки не раскрываются.
+    """
+    for source in sources:
+        source = Path(source)
+        try:
+            st = source.stat()
+        except FileNotFoundError:
+            raise ArchiveError(f"Файл не найден: {source}") from None
+        if stat.S_ISDIR(st.st_mode):
+            yield SourceFile(str(source), source.name + '/', st)
+            yield from _scan_dir(str(source), source.name + '/')
+        else:
+            yield SourceFile(str(source), source.name, st)
+
+
+def _scan_dir(path: str, prefix: str) -> Iterator[SourceFile]:
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as items:
+            for item in items:
+                try:
+                    (dirs if item.is_dir() else files).append(item)
+                except OSError:
+                    files.append(item)
+    except OSError:
+        # Как os.walk: недоступная папка пропускается
+        return
+    dirs.sort(key=lambda item: item.name)
+    files.sort(key=lambda item: item.name)
+    for item in dirs:
+        yield SourceFile(item.path, prefix + item.name + '/', item.stat())
+    for item in files:
+        yield SourceFile(item.path, prefix + item.name, item.stat())
+    for item in dirs:
+        if not item.is_symlink():
+            yield from _scan_dir(item.path, prefix + item.name + '/')
+
+
+def iter_source_files(sources: Iterable) -> Iterator[Tuple[str, str]]:
+    """Обходит исходные пути, возвращая пары (путь на диске, имя в архиве)"""
+    for item in scan_sources(sources):
+        yield item.path, item.arcname
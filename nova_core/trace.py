@@ -0,0 +1,366 @@
+# [file name]: nova_core/trace.py
+"""
+Трассировка операций: время по фазам и счетчики событий
+
+Движок отмечает участки работы фазами (чтение архива, распаковка,
+расшифровка, запись, метаданные файловой системы, ожидание диска,
+прогресс и интерфейс) и считает события: байты, файлы, вызовы чтения и
+записи, попадания в кэши. Пока трассировка не включена (start_trace),
+отметка стоит одной проверки.
+
+Для фазы копится собственное время (без вложенных фаз) и процессорное
+время потока: если время заметно больше процессорного, поток ждал диск,
+а не работал. Итог - сводка JSON или файл событий Chrome
+(chrome://tracing, ui.perfetto.dev).
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Фазы
+PHASE_LIST = 'list'              # разбор каталога архива
+PHASE_READ = 'read'              # чтение данных архива (без вложенной распаковки)
+PHASE_DECOMPRESS = 'decompress'
+PHASE_DECRYPT = 'decrypt'        # расшифровка ZIP (pyzipper: AES и распаковка вместе)
+PHASE_ENCRYPT = 'encrypt'
+PHASE_KEYS = 'keys'              # вывод ключей из пароля (PBKDF2)
+PHASE_COMPRESS = 'compress'
+PHASE_WRITE = 'write'            # запись извлекаемых файлов и архивов
+PHASE_METADATA = 'metadata'      # создание и закрытие файлов, папки, время изменения
+PHASE_WRITE_QUEUE = 'write_queue'  # распаковка ждет места в очереди записи на диск
+PHASE_PROGRESS = 'progress'      # обработчики прогресса движка
+PHASE_UI = 'ui'                  # обновление окна
+
+# Счетчики
+BYTES_IN = 'bytes_in'            # прочитано из архива (сжатые данные)
+BYTES_OUT = 'bytes_out'          # записано на диск
+FILES = 'files'
+DIRS = 'dirs'
+READ_CALLS = 'read_calls'
+WRITE_CALLS = 'write_calls'
+OPEN_CALLS = 'open_calls'
+METADATA_CALLS = 'metadata_calls'
+FSYNC_CALLS = 'fsync_calls'
+
+TRACE_JSON = 'json'
+TRACE_CHROME = 'chrome'
+TRACE_FORMATS = (TRACE_JSON, TRACE_CHROME)
+
+# Сверх этого числа отдельные события не хранятся, итоги по фазам копятся дальше
+DEFAULT_MAX_EVENTS = 200000
+
+
+def cache_counter(cache: str, hit: bool) -> str:
+    """Имя счетчика попаданий или промахов кэша"""
+    return f"cache_{cache}_{'hits' if hit else 'misses'}"
+
+
+class _NullSpan:
+    """Отметка при выключенной трассировке"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('_tracer', '_phase', '_args', '_start', '_cpu', '_operation')
+
+    def __init__(self, tracer: 'Tracer', phase: str, args: Optional[Dict[str, Any]],
+                 operation: bool = False):
+        self._tracer = tracer
+        self._phase = phase
+        self._args = args
+        self._operation = operation
+
+    def __enter__(self):
+        if not self._operation:
+            self._tracer._stack().append([0.0, 0.0])
+        self._cpu = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        cpu = time.thread_time() - self._cpu
+        self._tracer._finish(self._phase, self._start, end - self._start, cpu, self._args,
+                             self._operation)
+        return False
+
+
+class Tracer:
+    """Накопитель фаз, операций, счетчиков и событий трассы (потокобезопасный)"""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS):
+        self.epoch = time.time()
+        self.max_events = max_events
+        self.dropped = 0
+        self._origin = time.perf_counter()
+        self._stopped: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # фаза -> [собственное время, процессорное время, вызовы]
+        self._phases: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0, 0])
+        # операция -> [время, вызовы]
+        self._operations: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._events: List[tuple] = []
+        self._threads: Dict[int, str] = {}
+
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, phase: str, start: float, seconds: float, cpu: float,
+                args: Optional[Dict[str, Any]], operation: bool):
+        thread = threading.current_thread()
+        if operation:
+            own, own_cpu = seconds, cpu
+        else:
+            stack = self._stack()
+            child, child_cpu = stack.pop()
+            own, own_cpu = seconds - child, cpu - child_cpu
+            if stack:
+                stack[-1][0] += seconds
+                stack[-1][1] += cpu
+        with self._lock:
+            if operation:
+                totals = self._operations[phase]
+                totals[0] += seconds
+                totals[1] += 1
+            else:
+                totals = self._phases[phase]
+                totals[0] += own
+                totals[1] += max(0.0, own_cpu)
+                totals[2] += 1
+            if len(self._events) < self.max_events:
+                self._threads.setdefault(thread.ident, thread.name)
+                self._events.append((phase, operation, thread.ident, start - self._origin,
+                                     seconds, cpu, args))
+            else:
+                self.dropped += 1
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stop(self):
+        if self._stopped is None:
+            self._stopped = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self._stopped or time.perf_counter()) - self._origin
+
+    def summary(self) -> Dict[str, Any]:
+        """Итоги: время и процессорное время фаз, время операций, счетчики.
+
+        wait_seconds фазы - время без работы процессора (ожидание диска,
+        блокировок или очередей). Фазы разных потоков складываются, поэтому
+        их сумма может быть больше elapsed.
+        """
+        with self._lock:
+            phases = {name: {'seconds': round(own, 6), 'cpu_seconds': round(cpu, 6),
+                             'wait_seconds': round(max(0.0, own - cpu), 6), 'calls': calls}
+                      for name, (own, cpu, calls) in sorted(self._phases.items())}
+            operations = {name: {'seconds': round(seconds, 6), 'calls': calls}
+                          for name, (seconds, calls) in sorted(self._operations.items())}
+            counters = dict(sorted(self._counters.items()))
+            events = len(self._events)
+        return {'started': self.epoch, 'elapsed': round(self.elapsed, 6),
+                'operations': operations, 'phases': phases, 'counters': counters,
+                'events': events, 'dropped_events': self.dropped}
+
+    def to_json(self) -> Dict[str, Any]:
+        """Сводка и список событий"""
+        data = self.summary()
+        with self._lock:
+            threads = dict(self._threads)
+            data['trace'] = [
+                {'phase': phase, 'operation': operation, 'thread': threads.get(ident, ident),
+                 'start': round(start, 6), 'seconds': round(seconds, 6),
+                 'cpu_seconds': round(cpu, 6), **({'args': args} if args else {})}
+                for phase, operation, ident, start, seconds, cpu, args in self._events]
+        return data
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """События в формате Chrome Trace Event (полные события 'X')"""
+        pid = os.getpid()
+        with self._lock:
+            events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident,
+                       'args': {'name': thread}} for ident, thread in self._threads.items()]
+            for phase, operation, ident, start, seconds, cpu, args in self._events:
+                event_args = dict(args or {})
+                event_args['cpu_ms'] = round(cpu * 1000, 3)
+                events.append({'name': phase, 'cat': 'operation' if operation else 'phase',
+                               'ph': 'X', 'pid': pid, 'tid': ident,
+                               'ts': round(start * 1e6, 1), 'dur': round(seconds * 1e6, 1),
+                               'args': event_args})
+            end = round(self.elapsed * 1e6, 1)
+            counters = dict(self._counters)
+        if counters:
+            events.append({'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': end,
+                           'args': counters})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}
+
+    def write(self, path, fmt: str = TRACE_CHROME):
+        """Записывает трассу в файл атомарно (через временный файл)"""
+        data = self.to_chrome() if fmt == TRACE_CHROME else self.to_json()
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+_active: Optional[Tracer] = None
+
+
+def start_trace(max_events: int = DEFAULT_MAX_EVENTS) -> Tracer:
+    """Включает трассировку всего процесса и возвращает новый накопитель"""
+    global _active
+    _active = Tracer(max_events)
+    return _active
+
+
+def stop_trace() -> Optional[Tracer]:
+    """Выключает трассировку и возвращает накопитель"""
+    global _active
+    tracer, _active = _active, None
+    if tracer is not None:
+        tracer.stop()
+    return tracer
+
+
+def current() -> Optional[Tracer]:
+    """Текущий накопитель или None, если трассировка выключена"""
+    return _active
+
+
+def span(phase: str, **args):
+    """Отметка участка фазы: with span(PHASE_WRITE): ..."""
+    tracer = _active
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, phase, args or None)
+
+
+def operation(name: str, **args):
+    """Отметка операции целиком (извлечение, создание, проверка)"""
+    tracer = _active
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, args or None, operation=True)
+
+
+def traced_operation(name: str):
+    """Декоратор: вызов функции отмечается как операция name"""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with operation(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, amount: int = 1):
+    """Увеличивает счетчик, если трассировка включена"""
+    tracer = _active
+    if tracer is not None:
+        tracer.count(name, amount)
+
+
+class TracedReader:
+    """Поток чтения, отмечающий каждое чтение фазой phase"""
+
+    def __init__(self, stream, phase: str, counter: Optional[str]):
+        self._stream = stream
+        self._phase = phase
+        self._counter = counter
+
+    def read(self, size: int = -1) -> bytes:
+        with span(self._phase):
+            data = self._stream.read(size)
+        self._count(len(data))
+        return data
+
+    def readinto(self, buffer) -> int:
+        readinto = getattr(self._stream, 'readinto', None)
+        with span(self._phase):
+            if readinto is not None:
+                n = readinto(buffer)
+            else:
+                data = self._stream.read(len(buffer))
+                n = len(data)
+                buffer[:n] = data
+        self._count(n or 0)
+        return n
+
+    def _count(self, size: int):
+        count(READ_CALLS)
+        if self._counter is not None and size:
+            count(self._counter, size)
+
+    def close(self):
+        self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TracedWriter:
+    """Файл для записи, отмечающий запись фазой write и считающий байты"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, data) -> int:
+        with span(PHASE_WRITE):
+            written = self._stream.write(data)
+        count(WRITE_CALLS)
+        count(BYTES_OUT, len(data))
+        return written
+
+    def close(self):
+        with span(PHASE_METADATA):
+            self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def traced_reader(stream, phase: str = PHASE_READ, counter: Optional[str] = None):
+    """Оборачивает поток чтения, только если трассировка включена"""
+    return stream if _active is None else TracedReader(stream, phase, counter)
+
+
+def traced_writer(stream):
+    """Оборачивает файл для записи, только если трассировка включена"""
+    return stream if _active is None else TracedWriter(stream)
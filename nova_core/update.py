@@ -0,0 +1,600 @@
+# [file name]: nova_core/update.py
+"""
+Обновление ZIP (.zip, .sntr, .nv) и .nv v2 на месте
+
+Вместо перезаписи всего архива во временный файл новые и измененные
+элементы дописываются в конец файла ZIP, после старого центрального
+каталога (для .nv v2 - на место манифеста), данные неизмененных элементов
+остаются на месте без пересжатия, а в конце пишется новый каталог. Старый
+каталог ZIP не трогается, пока новый не записан на диск, а журнал рядом с
+архивом хранит прежний размер файла: после сбоя посреди обновления
+recover_zip_update обрезает недописанный хвост, и архив снова прежний.
+Данные замененных и удаленных элементов и старые каталоги становятся
+"мертвым" пространством, которое освобождает compact: живые элементы
+копируются как есть (без распаковки) в новый файл.
+Так же, без распаковки, меняется пароль AES: rewrap_zip перешифровывает
+сжатые данные элементов новым ключом.
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import trace, zipaes
+from .codecs import CODEC_DEFLATE
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .formats import FORMAT_NV2, FORMAT_ZIP
+from .nvcontainer import NvArchive, NvUpdater, compact_nv
+from .streams import CHUNK_SIZE, copy_stream
+from .volumes import VolumeSet
+from .zipmap import open_zipfile, zip_volumes
+from .zipwriter import (BLOCK_SIZE, FLAG_ENCRYPTED, ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED,
+                        ParallelZipWriter, _Member)
+
+UPDATABLE_FORMATS = (FORMAT_ZIP, FORMAT_NV2)
+
+# В ZIP время хранится с точностью до 2 секунд, в .nv v2 - без округления
+ZIP_MTIME_TOLERANCE = 2.0
+NV2_MTIME_TOLERANCE = 0.001
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+_FLAG_DESCRIPTOR = 0x08
+_EXTRA_ZIP64 = 1
+# Методы, для которых CRC элемента AE-2 можно посчитать при снятии пароля
+_CRC_METHODS = (ZIP_STORED, ZIP_DEFLATED)
+# Журнал незавершенного обновления ZIP: прежний размер архива
+JOURNAL_SUFFIX = '.nova-journal'
+
+
+class UpdatePlan(NamedTuple):
+    """Что нужно сделать, чтобы архив соответствовал исходным файлам"""
+
+    add: List[Tuple[str, str]]
+    replaced: List[str]
+    unchanged: List[str]
+
+
+class UpdateResult(NamedTuple):
+    """Итог обновления архива"""
+
+    added: int
+    replaced: int
+    unchanged: int
+
+
+def file_crc32(path) -> int:
+    """CRC32 файла, читаемого блоками"""
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                return crc
+            crc = zlib.crc32(data, crc)
+
+
+def is_unchanged(entry: ArchiveEntry, path, st: os.stat_result,
+                 mtime_tolerance: float = ZIP_MTIME_TOLERANCE) -> bool:
+    """Совпадает ли элемент архива с файлом: размер, затем mtime, затем CRC"""
+    if entry.size != st.st_size:
+        return False
+    if entry.mtime is not None and abs(entry.mtime - st.st_mtime) < mtime_tolerance:
+        return True
+    return entry.crc is not None and file_crc32(path) == entry.crc
+
+
+def plan_update(entries: Iterable[ArchiveEntry], items: Iterable[Tuple[str, str]],
+                mtime_tolerance: float = ZIP_MTIME_TOLERANCE) -> UpdatePlan:
+    """Сравнивает элементы архива с файлами (path, arcname)"""
+    existing: Dict[str, ArchiveEntry] = {e.name: e for e in entries}
+    add, replaced, unchanged = [], [], []
+    for path, arcname in items:
+        entry = existing.get(arcname)
+        if entry is None:
+            add.append((path, arcname))
+        elif arcname.endswith('/') or is_unchanged(entry, path, os.stat(path), mtime_tolerance):
+            unchanged.append(arcname)
+        else:
+            replaced.append(arcname)
+            add.append((path, arcname))
+    return UpdatePlan(add, replaced, unchanged)
+
+
+def _strip_extra(extra: bytes, kinds: Tuple[int, ...] = (_EXTRA_ZIP64,)) -> bytes:
+    """Убирает поля kinds из extra (ZIP64: при записи каталога оно строится заново)"""
+    result = b''
+    pos = 0
+    while pos + 4 <= len(extra):
+        kind, size = struct.unpack_from('<HH', extra, pos)
+        if kind not in kinds:
+            result += extra[pos:pos + 4 + size]
+        pos += 4 + size
+    return result
+
+
+def _record_from_info(info: zipfile.ZipInfo) -> _Member:
+    """Запись центрального каталога существующего элемента"""
+    name = info.orig_filename.encode('utf-8' if info.flag_bits & 0x800 else 'cp437')
+    member = _Member(name, info.flag_bits, None, info.external_attr, info.is_dir())
+    year, month, day, hour, minute, second = info.date_time
+    member.dos_time = (hour << 11) | (minute << 5) | (second // 2)
+    member.dos_date = ((year - 1980) << 9) | (month << 5) | day
+    member.offset = info.header_offset
+    member.method = info.compress_type
+    member.crc = info.CRC
+    member.file_size = info.file_size
+    member.compress_size = info.compress_size
+    member.extra = _strip_extra(info.extra)
+    member.version = info.extract_version
+    member.create_system = info.create_system
+    return member
+
+
+def _fsync_path(path, flags: int = os.O_RDWR):
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    trace.count(trace.FSYNC_CALLS)
+
+
+def _fsync_dir(path):
+    # Папку в Windows открыть для fsync нельзя, там создание файла и так на диске
+    if os.name != 'nt':
+        _fsync_path(path, os.O_RDONLY)
+
+
+def _journal_path(path) -> str:
+    return os.fspath(path) + JOURNAL_SUFFIX
+
+
+def recover_zip_update(path) -> bool:
+    """Откатывает обновление ZIP, прерванное сбоем: обрезает архив до размера
+    из журнала, так что в конце снова старый каталог. True, если был откат"""
+    journal = _journal_path(path)
+    if not os.path.exists(journal):
+        return False
+    try:
+        with open(journal, encoding='utf-8') as f:
+            size = int(json.load(f)['size'])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ArchiveError(f"Поврежден журнал обновления {journal}: {e}") from e
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+        os.fsync(f.fileno())
+    trace.count(trace.FSYNC_CALLS)
+    os.remove(journal)
+    return True
+
+
+class ZipUpdater(ParallelZipWriter):
+    """ParallelZipWriter, дописывающий элементы в существующий архив.
+
+    keep(name) решает, остается ли существующий элемент; новые элементы и
+    новый каталог пишутся в конец файла, после старого каталога. Журнал
+    удаляется только после того, как новый каталог сброшен на диск; при
+    ошибке (abort) или после сбоя (recover_zip_update) файл обрезается до
+    прежнего размера, и архив остается прежним.
+    """
+
+    def __init__(self, path, level: Optional[int] = None, workers: Optional[int] = None,
+                 keep: Optional[Callable[[str], bool]] = None, codec: str = CODEC_DEFLATE):
+        self._keep = keep
+        super().__init__(path, level, workers, codec=codec)
+
+    def _open(self) -> IO[bytes]:
+        recover_zip_update(self.path)
+        try:
+            with zipfile.ZipFile(self.path) as archive:
+                infos = archive.infolist()
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+        f = open(self.path, 'r+b')
+        try:
+            self._old_size = f.seek(0, os.SEEK_END)
+            # Журнал - на диске раньше первого дописанного байта
+            journal = _journal_path(self.path)
+            with open(journal, 'w', encoding='utf-8') as j:
+                json.dump({'size': self._old_size}, j)
+                j.flush()
+                os.fsync(j.fileno())
+            trace.count(trace.FSYNC_CALLS)
+            _fsync_dir(os.path.dirname(os.path.abspath(journal)))
+        except BaseException:
+            f.close()
+            raise
+        for info in infos:
+            if self._keep is None or self._keep(info.filename):
+                self._records.append(_record_from_info(info))
+        return f
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            super().close()
+            # Только когда новый каталог на диске, старый больше не нужен
+            _fsync_path(self.path)
+        except BaseException:
+            recover_zip_update(self.path)
+            raise
+        os.remove(_journal_path(self.path))
+
+    def abort(self):
+        """Отменяет изменения: обрезает дописанное, в конце снова старый каталог"""
+        super().abort()
+        recover_zip_update(self.path)
+
+
+def _member_span(f: IO[bytes], info: zipfile.ZipInfo) -> int:
+    """Длина элемента в файле: локальный заголовок, данные и дескриптор"""
+    f.seek(info.header_offset)
+    header = f.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+        raise ArchiveError(f"Поврежден локальный заголовок: {info.filename}")
+    fields = _LOCAL_HEADER.unpack(header)
+    name_len, extra_len = fields[9], fields[10]
+    span = _LOCAL_HEADER.size + name_len + extra_len + info.compress_size
+    if info.flag_bits & 0x08:
+        f.seek(info.header_offset + _LOCAL_HEADER.size + name_len)
+        local_extra = f.read(extra_len)
+        zip64 = (info.file_size >= 0xFFFFFFFF or info.compress_size >= 0xFFFFFFFF or
+                 any(kind == 1 for kind in _extra_kinds(local_extra)))
+        f.seek(info.header_offset + span)
+        signature = f.read(4) == _DATA_DESCRIPTOR_SIGNATURE
+        span += (20 if zip64 else 12) + (4 if signature else 0)
+    return span
+
+
+def _extra_kinds(extra: bytes):
+    pos = 0
+    while pos + 4 <= len(extra):
+        kind, size = struct.unpack_from('<HH', extra, pos)
+        yield kind
+        pos += 4 + size
+
+
+def zip_dead_bytes(path) -> int:
+    """Сколько байт архива занято данными удаленных и замененных элементов"""
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+        start = archive.start_dir
+        concat = min((info.header_offset for info in infos), default=start)
+        with open(path, 'rb') as f:
+            live = sum(_member_span(f, info) for info in infos)
+    return max(0, start - concat - live)
+
+
+def _local_header_size(f: IO[bytes], info: zipfile.ZipInfo) -> int:
+    f.seek(info.header_offset)
+    fields = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+    return _LOCAL_HEADER.size + fields[9] + fields[10]
+
+
+def copy_zip_members(src_path, dest_path, progress: Optional[Callable[[int], None]] = None,
+                     on_entry: Optional[Callable[[str], None]] = None,
+                     volume_size: Optional[int] = None) -> int:
+    """Копирует все элементы ZIP в новый файл как есть, без распаковки и пересжатия.
+
+    Сжатые данные, CRC и атрибуты не меняются; пишется новый центральный
+    каталог. Исходный архив может быть многотомным, а новый пишется томами
+    по volume_size. Возвращает число скопированных элементов.
+    """
+    with open_zipfile(src_path) as archive:
+        infos = archive.infolist()
+    volumes = zip_volumes(src_path)
+    writer = ParallelZipWriter(dest_path, workers=1, volume_size=volume_size)
+    try:
+        with VolumeSet(volumes).open() if volumes else open(src_path, 'rb') as src:
+            for info in infos:
+                if on_entry is not None:
+                    on_entry(info.filename)
+                span = _member_span(src, info)
+                record = _record_from_info(info)
+                writer._reserve(_local_header_size(src, info))
+                record.offset = writer._file.tell()
+                src.seek(info.header_offset)
+                copy_stream(_Limited(src, span), writer._file, on_chunk=progress)
+                writer._records.append(record)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return len(infos)
+
+
+def compact_zip(path, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Убирает мертвое пространство: живые элементы копируются без пересжатия.
+
+    Возвращает число освобожденных байт. Нужен свободный объем только под
+    живые данные; исходный файл заменяется атомарно.
+    """
+    path = os.fspath(path)
+    before = os.path.getsize(path)
+    fd, tmp_name = tempfile.mkstemp(prefix='.nova_', suffix='.zip',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        copy_zip_members(path, tmp_name, progress)
+        shutil.move(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    return before - os.path.getsize(path)
+
+
+class _Limited:
+    """Чтение не более size байт из потока"""
+
+    def __init__(self, stream: IO[bytes], size: int):
+        self._stream = stream
+        self._left = size
+
+    def readinto(self, buffer) -> int:
+        if self._left <= 0:
+            return 0
+        view = memoryview(buffer)[:self._left]
+        count = self._stream.readinto(view)
+        self._left -= count
+        return count
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._stream.read(size)
+        self._left -= len(data)
+        return data
+
+
+def rewrap_supported(path, new_password: Optional[str]) -> bool:
+    """Может ли rewrap_zip сменить пароль архива.
+
+    Элементы ZipCrypto так не перешифровать, а при снятии пароля с
+    элементов AE-2 (без CRC) CRC считается распаковкой - только для
+    Stored и Deflate.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+    for info in infos:
+        if not info.flag_bits & FLAG_ENCRYPTED:
+            continue
+        field = zipaes.parse_extra(info.extra) if info.compress_type == zipaes.METHOD_AES else None
+        if field is None:
+            return False
+        if not new_password and field.version == zipaes.AE_2 and field.method not in _CRC_METHODS:
+            return False
+    return True
+
+
+class _CrcCounter:
+    """CRC распакованных данных по кускам сжатых (Stored или Deflate)"""
+
+    def __init__(self, method: int):
+        self._inflater = zlib.decompressobj(-15) if method == ZIP_DEFLATED else None
+        self.crc = 0
+
+    def update(self, data):
+        if self._inflater is None:
+            self.crc = zlib.crc32(data, self.crc)
+            return
+        while True:
+            out = self._inflater.decompress(data, CHUNK_SIZE)
+            self.crc = zlib.crc32(out, self.crc)
+            data = self._inflater.unconsumed_tail
+            if not data and len(out) < CHUNK_SIZE:
+                return
+
+
+class _RewrapMember:
+    """Элемент при смене пароля: новая запись каталога и ключи"""
+
+    def __init__(self, info: zipfile.ZipInfo, new_password: Optional[str]):
+        # Папки, как и при создании архива, не шифруются
+        if info.is_dir():
+            new_password = None
+        self.new_password = new_password
+        self.name = info.filename
+        self.old = (zipaes.parse_extra(info.extra) if info.flag_bits & FLAG_ENCRYPTED
+                    else None)
+        self.head = (zipaes.SALT_SIZES[self.old.strength] + zipaes.VERIFIER_SIZE
+                     if self.old else 0)
+        self.body_size = info.compress_size - (self.head + zipaes.MAC_SIZE if self.old else 0)
+        method = self.old.method if self.old else info.compress_type
+        crc_known = self.old is None or self.old.version == zipaes.AE_1
+        # CRC нужна, если пароль снимается с элемента AE-2
+        self.crc = None if crc_known or new_password else _CrcCounter(method)
+
+        record = _record_from_info(info)
+        record.flags &= ~(FLAG_ENCRYPTED | _FLAG_DESCRIPTOR)
+        record.extra = _strip_extra(info.extra, (_EXTRA_ZIP64, zipaes.EXTRA_AES))
+        record.crc = info.CRC if crc_known else 0
+        record.compress_size = self.body_size
+        self.method = method
+        if new_password:
+            field = zipaes.AesField(zipaes.aes_version(info.file_size, crc_known),
+                                    zipaes.STRENGTH_256, method)
+            record.flags |= FLAG_ENCRYPTED
+            record.extra += zipaes.build_extra(field)
+            record.compress_size += zipaes.overhead(field.strength)
+            if field.version == zipaes.AE_2:
+                record.crc = 0
+            self.method = zipaes.METHOD_AES
+        record.zip64 = record.file_size >= ZIP64_LIMIT or record.compress_size >= ZIP64_LIMIT
+        self.record = record
+        self.old_keys = self.new_keys = None
+        self.old_mac = self.new_mac = None
+
+
+def _rewrap_whole(data: bytes, member: _RewrapMember, old_password):
+    """Перешифровывает данные небольшого элемента целиком (в потоке пула)"""
+    if member.old:
+        data = zipaes.decrypt_member(old_password, data, member.old.strength, member.name)
+    if member.crc is not None:
+        member.crc.update(data)
+    if member.new_password:
+        data = zipaes.encrypt_member(member.new_password, data)
+    return data
+
+
+def _rewrap_chunk(data: bytes, position: int, member: _RewrapMember) -> bytes:
+    """Перешифровывает кусок большого элемента с позиции position (в потоке пула)"""
+    if member.old_keys is not None:
+        with trace.span(trace.PHASE_DECRYPT):
+            data = zipaes.transform(member.old_keys.encryption, position, data)
+    if member.new_keys is not None:
+        with trace.span(trace.PHASE_ENCRYPT):
+            data = zipaes.transform(member.new_keys.encryption, position, data)
+    return data
+
+
+def rewrap_zip(src_path, dest_path, old_password: Optional[str], new_password: Optional[str],
+               progress: Optional[Callable[[int], None]] = None,
+               on_entry: Optional[Callable[[str], None]] = None,
+               workers: Optional[int] = None) -> int:
+    """Ставит, меняет или снимает пароль AES без распаковки и пересжатия.
+
+    Сжатые данные элемента расшифровываются старым ключом и шифруются
+    новым (AES-256, своя соль у каждого элемента). Элементы до BLOCK_SIZE
+    перешифровываются целиком в потоках пула, большие - кусками, тоже
+    параллельно: CTR шифрует с любого места, а HMAC считается по порядку
+    при записи. Проверить rewrap_supported нужно заранее. Возвращает число
+    элементов.
+    """
+    try:
+        with zipfile.ZipFile(src_path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+    workers = max(1, workers or os.cpu_count() or 1)
+    # Сколько кусков перешифровывается впереди записи
+    window = workers * 2
+    writer = ParallelZipWriter(dest_path, workers=1)
+    executor = ThreadPoolExecutor(workers, thread_name_prefix='nova-rewrap')
+    pending = deque()
+
+    def write_next():
+        kind, member, job, size = pending.popleft()
+        record = member.record
+        if kind == 'whole':
+            data = job.result()
+            if member.crc is not None:
+                record.crc = member.crc.crc
+            writer._write_local_header(record, member.method)
+            writer._file.write(data)
+        elif kind == 'begin':
+            writer._write_local_header(record, member.method)
+            if member.new_keys is not None:
+                writer._file.write(job)
+        elif kind == 'chunk':
+            raw, data = job[0], job[1].result()
+            if member.old_mac is not None:
+                member.old_mac.update(raw)
+            if member.new_mac is not None:
+                member.new_mac.update(data)
+            if member.crc is not None:
+                member.crc.update(data)
+            writer._file.write(data)
+        else:
+            if member.old_mac is not None:
+                zipaes.check_mac(member.old_mac, job, member.name)
+            if member.new_mac is not None:
+                writer._file.write(member.new_mac.digest()[:zipaes.MAC_SIZE])
+            if member.crc is not None:
+                record.crc = member.crc.crc
+                end = writer._file.tell()
+                writer._file.seek(record.offset + 14)
+                writer._file.write(struct.pack('<I', record.crc))
+                writer._file.seek(end)
+        if progress is not None and size:
+            progress(size)
+
+    def push(item):
+        while len(pending) >= window:
+            write_next()
+        pending.append(item)
+
+    try:
+        with open(src_path, 'rb') as src:
+            for info in infos:
+                if on_entry is not None:
+                    on_entry(info.filename)
+                member = _RewrapMember(info, new_password)
+                start = info.header_offset + _local_header_size(src, info)
+                src.seek(start)
+                if info.compress_size <= BLOCK_SIZE:
+                    data = src.read(info.compress_size)
+                    push(('whole', member, executor.submit(
+                        _rewrap_whole, data, member, old_password),
+                        info.compress_size))
+                    continue
+                header = b''
+                if member.old:
+                    member.old_keys = zipaes.unlock(old_password, src.read(member.head),
+                                                    member.old.strength, member.name)
+                    member.old_mac = zipaes.new_mac(member.old_keys)
+                if member.new_password:
+                    header, member.new_keys = zipaes.fresh_keys(member.new_password)
+                    member.new_mac = zipaes.new_mac(member.new_keys)
+                push(('begin', member, header, member.head))
+                for position in range(0, member.body_size, BLOCK_SIZE):
+                    raw = src.read(min(BLOCK_SIZE, member.body_size - position))
+                    push(('chunk', member, (raw, executor.submit(
+                        _rewrap_chunk, raw, position, member)), len(raw)))
+                tail = src.read(zipaes.MAC_SIZE) if member.old else b''
+                push(('end', member, tail, len(tail)))
+        while pending:
+            write_next()
+        writer.close()
+    except BaseException:
+        for kind, _, job, _ in pending:
+            if kind == 'whole':
+                job.cancel()
+            elif kind == 'chunk':
+                job[1].cancel()
+        executor.shutdown()
+        writer.abort()
+        raise
+    executor.shutdown()
+    return len(infos)
+
+
+def open_updater(path, fmt: str, level: Optional[int] = None, workers: Optional[int] = None,
+                 keep: Optional[Callable[[str], bool]] = None, codec: Optional[str] = None):
+    """Писатель, дописывающий элементы в существующий архив"""
+    if fmt == FORMAT_ZIP:
+        return ZipUpdater(path, level, workers, keep, codec or CODEC_DEFLATE)
+    if fmt == FORMAT_NV2:
+        return NvUpdater(path, level, workers, keep, codec or CODEC_DEFLATE)
+    raise ArchiveError(f"Обновление на месте не поддерживается для формата {fmt}")
+
+
+def dead_bytes(path, fmt: str) -> int:
+    """Объем мертвого пространства, которое освободит compact"""
+    if fmt == FORMAT_ZIP:
+        return zip_dead_bytes(path)
+    if fmt == FORMAT_NV2:
+        return NvArchive(path).dead_bytes
+    return 0
+
+
+def compact(path, fmt: str, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Освобождает мертвое пространство, возвращает число освобожденных байт"""
+    if fmt == FORMAT_ZIP:
+        return compact_zip(path, progress)
+    if fmt == FORMAT_NV2:
+        return compact_nv(path, progress)
+    raise ArchiveError(f"Оптимизация не поддерживается для формата {fmt}")
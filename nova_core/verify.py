@@ -0,0 +1,289 @@
+# [file name]: nova_core/verify.py
+"""
+Проверка целостности архива без извлечения на диск
+
+Элементы читаются потоками в нескольких потоках и сверяются по размеру и
+CRC, а при проверке с манифестом - еще и по хэшу. Манифест - элемент
+.nova-manifest.<алгоритм> в формате sha256sum - хранится в самом архиве
+(ZIP-семейство и .nv v2) или рядом с ним. Ход проверки сохраняется в
+каталоге кэша, поэтому прерванная проверка большого архива продолжается
+с места остановки.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import trace
+from .entries import ArchiveEntry
+from .errors import ArchiveError, BackendMissingError, OperationCancelled, PasswordRequiredError
+from .fingerprint import Fingerprint, cache_dir, fingerprint, path_key
+from .streams import CHUNK_SIZE
+
+MANIFEST_PREFIX = '.nova-manifest.'
+DEFAULT_MANIFEST_ALGORITHM = 'sha256'
+
+# Как часто сохраняется ход проверки (секунды)
+CHECKPOINT_INTERVAL = 2.0
+
+# Ошибки, при которых продолжать проверку бессмысленно
+_FATAL_ERRORS = (PasswordRequiredError, BackendMissingError)
+
+_CHUNK = 0
+_DONE = 1
+
+
+class MemberProblem(NamedTuple):
+    """Элемент, не прошедший проверку"""
+
+    name: str
+    message: str
+
+
+class VerifyResult(NamedTuple):
+    """Итог проверки архива"""
+
+    checked: int
+    resumed: int
+    problems: List[MemberProblem]
+    manifest: Optional[str] = None
+    manifest_written: bool = False
+    unlisted: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def check_algorithm(algorithm: str) -> str:
+    """Проверяет имя алгоритма хэша для манифеста"""
+    name = algorithm.lower().replace('-', '')
+    if name not in hashlib.algorithms_guaranteed or name.startswith('shake'):
+        raise ArchiveError(f"Алгоритм хэша не поддерживается: {algorithm}")
+    return name
+
+
+def manifest_name(algorithm: str) -> str:
+    """Имя элемента манифеста в архиве"""
+    return MANIFEST_PREFIX + algorithm
+
+
+def find_manifest(names: Iterable[str]) -> Optional[str]:
+    """Алгоритм манифеста, который уже лежит в архиве"""
+    for name in names:
+        if name.startswith(MANIFEST_PREFIX):
+            algorithm = name[len(MANIFEST_PREFIX):]
+            if algorithm in hashlib.algorithms_guaranteed:
+                return algorithm
+    return None
+
+
+def parse_manifest(data: bytes) -> Dict[str, str]:
+    """Разбирает манифест в формате sha256sum: "<хэш>  <имя>" в строке"""
+    digests = {}
+    for line in data.decode('utf-8').splitlines():
+        digest, sep, name = line.partition(' ')
+        if not sep or not name:
+            continue
+        if name[0] in ' *':
+            name = name[1:]
+        digests[name] = digest.lower()
+    return digests
+
+
+def format_manifest(digests: Dict[str, str]) -> bytes:
+    return ''.join(f"{digests[name]}  {name}\n" for name in sorted(digests)).encode('utf-8')
+
+
+def check_member(entry: ArchiveEntry, stream: IO[bytes], algorithm: Optional[str] = None,
+                 on_chunk: Optional[Callable[[int], None]] = None
+                 ) -> Tuple[Optional[str], Optional[str]]:
+    """Читает элемент до конца и сверяет размер и CRC.
+
+    Возвращает (хэш или None, описание ошибки или None).
+    """
+    digest = hashlib.new(algorithm) if algorithm else None
+    stream = trace.traced_reader(stream)
+    crc = 0
+    size = 0
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    readinto = getattr(stream, 'readinto', None)
+    while True:
+        if readinto is not None:
+            count = readinto(buffer)
+            chunk = view[:count]
+        else:
+            chunk = stream.read(CHUNK_SIZE)
+            count = len(chunk)
+        if not count:
+            break
+        crc = zlib.crc32(chunk, crc)
+        if digest is not None:
+            digest.update(chunk)
+        size += count
+        if on_chunk is not None:
+            on_chunk(count)
+    hexdigest = digest.hexdigest() if digest is not None else None
+    if size != entry.size:
+        return hexdigest, f"Размер {size} вместо {entry.size}"
+    # Зашифрованные AES элементы (AE-2) хранят CRC 0: их целостность проверяет HMAC читателя
+    if entry.crc is not None and crc != entry.crc and not (entry.encrypted and not entry.crc):
+        return hexdigest, f"Неверная CRC: {crc:08x} вместо {entry.crc:08x}"
+    return hexdigest, None
+
+
+class VerifyCheckpoint:
+    """Ход проверки: проверенные элементы и их хэши.
+
+    Привязан к отпечатку архива и алгоритму: если архив изменился, проверка
+    начинается заново. Если каталог кэша недоступен, ход проверки не сохраняется.
+    """
+
+    def __init__(self, archive, algorithm: Optional[str] = None,
+                 print_: Optional[Fingerprint] = None):
+        try:
+            self.path: Optional[Path] = cache_dir('verify') / f"{path_key(archive)}.json"
+        except OSError:
+            self.path = None
+        self.algorithm = algorithm
+        self.done: Dict[str, str] = {}
+        self._print = (print_ or fingerprint(archive)).to_list()
+        self._saved = time.monotonic()
+
+    def load(self) -> Dict[str, str]:
+        """Элементы, проверенные прерванным запуском"""
+        if self.path is None:
+            return self.done
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data['fingerprint'] == self._print and data['algorithm'] == self.algorithm:
+                self.done = dict(data['done'])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.done = {}
+        return self.done
+
+    def mark(self, name: str, digest: Optional[str]):
+        self.done[name] = digest or ''
+        if time.monotonic() - self._saved >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def save(self):
+        self._saved = time.monotonic()
+        if not self.done or self.path is None:
+            return
+        tmp = self.path.with_suffix('.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self._print, 'algorithm': self.algorithm,
+                           'done': self.done}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def remove(self):
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+ResultCallback = Callable[[ArchiveEntry, Optional[str], Optional[str]], None]
+
+
+class ArchiveVerifier:
+    """Параллельная проверка элементов.
+
+    open_member(entry) должен быть потокобезопасным. Колбэки вызываются в
+    вызывающем потоке, поэтому исключение из них (отмена) останавливает
+    проверку.
+    """
+
+    def __init__(self, open_member: Callable[[ArchiveEntry], IO[bytes]],
+                 workers: Optional[int] = None, algorithm: Optional[str] = None):
+        self.open_member = open_member
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.algorithm = algorithm
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def verify(self, entries: List[ArchiveEntry], on_result: ResultCallback,
+               on_chunk: Optional[Callable[[int], None]] = None):
+        self._stop.clear()
+        self._error = None
+        events: queue.Queue = queue.Queue()
+        next_index = iter(range(len(entries)))
+        index_lock = threading.Lock()
+
+        def report(size: int):
+            if self._stop.is_set():
+                raise OperationCancelled("Проверка остановлена")
+            events.put((_CHUNK, size, None, None))
+
+        def work():
+            while not self._stop.is_set():
+                with index_lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                entry = entries[index]
+                try:
+                    with self.open_member(entry) as stream:
+                        digest, problem = check_member(entry, stream, self.algorithm, report)
+                except _FATAL_ERRORS as e:
+                    self._error = e
+                    self._stop.set()
+                    return
+                except Exception as e:
+                    digest, problem = None, str(e) or type(e).__name__
+                events.put((_DONE, index, digest, problem))
+
+        threads = [threading.Thread(target=work, name=f'nova-verify-{i}', daemon=True)
+                   for i in range(min(self.workers, len(entries)))]
+        for thread in threads:
+            thread.start()
+        try:
+            left = len(entries)
+            while left:
+                try:
+                    kind, value, digest, problem = events.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if kind == _CHUNK:
+                    if on_chunk is not None:
+                        on_chunk(value)
+                else:
+                    left -= 1
+                    on_result(entries[value], digest, problem)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def verify_sequential(members: Iterable[Tuple[ArchiveEntry, IO[bytes]]], on_result: ResultCallback,
+                      on_chunk: Optional[Callable[[int], None]] = None,
+                      algorithm: Optional[str] = None):
+    """Проверка элементов одним проходом (сжатые TAR, 7z, RAR)"""
+    for entry, stream in members:
+        try:
+            with stream:
+                digest, problem = check_member(entry, stream, algorithm, on_chunk)
+        except (OperationCancelled,) + _FATAL_ERRORS:
+            raise
+        except Exception as e:
+            digest, problem = None, str(e) or type(e).__name__
+        on_result(entry, digest, problem)
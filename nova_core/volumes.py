@@ -0,0 +1,434 @@
+# [file name]: nova_core/volumes.py
+"""
+Многотомные архивы: запись томами заданного размера и чтение набора томов
+
+Тома ZIP и .nv называются как у WinZip: archive.z01, archive.z02, ...,
+а последний том (с центральным каталогом или манифестом) носит имя
+самого архива - archive.zip. Читаются также наборы томов 7-Zip
+(archive.7z.001, archive.7z.002, ...), которые представляют собой просто
+разрезанный на части файл.
+
+Набор томов читается как один файл со сквозными смещениями. Тома
+открываются (отображаются в память) только при первом обращении, поэтому
+элемент, лежащий в одном томе, читается без остальных; несколько потоков
+читают разные тома одновременно. Если данные продолжаются в томе на
+другом диске, ОС заранее получает просьбу прочитать его часть.
+"""
+
+import glob
+import io
+import mmap
+import os
+import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from .errors import ArchiveError
+from .streams import CHUNK_SIZE
+
+# Том меньше этого размера не имеет смысла: в него не поместятся заголовки
+MIN_VOLUME_SIZE = 64 * 1024
+
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+_SIZE_RE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*', re.IGNORECASE)
+# archive.z01 (номер тома после первой буквы расширения) и archive.7z.001
+_SPLIT_RE = re.compile(r'(?P<stem>.+)\.(?P<letter>[^\W\d_])(?P<number>\d{2,})')
+_NUMBERED_RE = re.compile(r'(?P<base>.+)\.(?P<number>\d{3})')
+
+
+def parse_size(text) -> int:
+    """Размер тома из строки вида '650M', '4.7G', '100 KB' или числа байт"""
+    if isinstance(text, int):
+        return text
+    match = _SIZE_RE.fullmatch(str(text))
+    if match is None:
+        raise ArchiveError(f"Неверный размер тома: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def volume_path(path, number: int) -> Path:
+    """Имя тома с номером number (с 1): archive.zip -> archive.z01"""
+    path = Path(path)
+    letter = path.suffix[1:2] or 'z'
+    return path.with_name(f"{path.stem}.{letter}{number:02d}")
+
+
+def _numbered(name) -> List[Path]:
+    """Файлы name(1), name(2), ... подряд, пока следующий существует"""
+    paths = []
+    number = 1
+    while True:
+        path = name(number)
+        if not path.is_file():
+            return paths
+        paths.append(path)
+        number += 1
+
+
+def find_volumes(path) -> Optional[List[Path]]:
+    """Тома набора, к которому относится path, по порядку; None - это не набор томов.
+
+    path может быть любым томом набора или последним томом (самим архивом).
+    Набор определяется только по именам; содержимое проверяет читатель.
+    """
+    path = Path(path)
+    match = _NUMBERED_RE.fullmatch(path.name)
+    if match is not None:
+        base = path.with_name(match.group('base'))
+        paths = _numbered(lambda n: base.with_name(f"{base.name}.{n:03d}"))
+        return paths if len(paths) > 1 else None
+
+    match = _SPLIT_RE.fullmatch(path.name)
+    if match is not None and match.group('number') != '00':
+        # Последний том - файл с тем же именем и расширением на ту же букву
+        letter = match.group('letter')
+        finals = [p for p in path.parent.glob(f"{glob.escape(match.group('stem'))}.{letter}*")
+                  if p.is_file() and _SPLIT_RE.fullmatch(p.name) is None]
+        if len(finals) != 1:
+            return None
+        path = finals[0]
+
+    paths = _numbered(lambda n: volume_path(path, n))
+    if not paths or not path.is_file():
+        return None
+    return paths + [path]
+
+
+def remove_volumes(path):
+    """Удаляет архив и все его тома (недописанный многотомный архив)"""
+    path = Path(path)
+    for candidate in [path] + _numbered(lambda n: volume_path(path, n)):
+        try:
+            candidate.unlink()
+        except OSError:
+            pass
+
+
+class VolumeWriter:
+    """Файл для записи, разрезаемый на тома не больше volume_size байт.
+
+    Смещения (tell, seek) сквозные, как у одного файла. Запись можно
+    вернуть назад и исправить (заголовки потоковых элементов): исправление
+    попадает в тот том, где лежат эти байты. reserve() не дает разрезать
+    запись, которая должна лежать в одном томе. При close() последний том
+    получает имя самого архива.
+    """
+
+    def __init__(self, path, volume_size: int):
+        if volume_size < MIN_VOLUME_SIZE:
+            raise ArchiveError(f"Размер тома меньше {MIN_VOLUME_SIZE // 1024} КБ")
+        self.path = Path(path)
+        self.volume_size = volume_size
+        self.paths: List[Path] = []
+        self._sizes: List[int] = []
+        self._starts: List[int] = []
+        self._file = None
+        self._pos = 0
+        self._closed = False
+        self._next_volume()
+
+    def _next_volume(self):
+        if self._file is not None:
+            self._file.close()
+        self._starts.append(sum(self._sizes))
+        path = volume_path(self.path, len(self.paths) + 1)
+        self._file = open(path, 'w+b')
+        self.paths.append(path)
+        self._sizes.append(0)
+
+    @property
+    def disk(self) -> int:
+        """Номер текущего (последнего) тома, с нуля"""
+        return len(self.paths) - 1
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """Сквозное смещение -> (номер тома, смещение внутри тома)"""
+        index = bisect_right(self._starts, offset) - 1
+        return index, offset - self._starts[index]
+
+    def reserve(self, size: int):
+        """Начинает новый том, если size байт не помещаются в остаток текущего"""
+        index, local = self.locate(self._pos)
+        if (index == self.disk and local == self._sizes[index] and local and
+                local + size > self.volume_size and size <= self.volume_size):
+            self._next_volume()
+            self._pos = self._starts[-1]
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast('B')
+        total = len(view)
+        while view:
+            index, local = self.locate(self._pos)
+            if index < self.disk:
+                # Исправление уже закрытого тома
+                count = min(len(view), self._sizes[index] - local)
+                with open(self.paths[index], 'r+b') as f:
+                    f.seek(local)
+                    f.write(view[:count])
+            else:
+                count = min(len(view), self.volume_size - local)
+                if count <= 0:
+                    self._next_volume()
+                    continue
+                self._file.seek(local)
+                self._file.write(view[:count])
+                self._sizes[index] = max(self._sizes[index], local + count)
+            view = view[count:]
+            self._pos += count
+        return total
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._starts[-1] + self._sizes[-1]
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        self._pos = offset
+        return offset
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        size = self._pos if size is None else size
+        index, local = self.locate(size)
+        if index == self.disk:
+            self._file.truncate(local)
+            self._sizes[index] = local
+        return size
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """Закрывает последний том и дает ему имя архива"""
+        if self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        os.replace(self.paths[-1], self.path)
+        self.paths[-1] = self.path
+        # Лишние тома прежнего архива с тем же именем сбили бы чтение набора
+        for stale in _numbered(lambda n: volume_path(self.path, n + self.disk)):
+            stale.unlink()
+
+    def abort(self):
+        """Закрывает и удаляет все записанные тома"""
+        if self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        for path in self.paths:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+class SpannedView:
+    """Данные, продолжающиеся в нескольких томах: срезы как у memoryview.
+
+    Срез внутри одного тома - memoryview без копирования, срез через
+    границу томов склеивается в bytes.
+    """
+
+    def __init__(self, views: List[memoryview]):
+        self._views = views
+        self._starts = list(accumulate((len(v) for v in views), initial=0))
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("Поддерживаются только срезы")
+        if key.start is None and key.stop is None:
+            # Копия набора: ее release() не затрагивает исходные срезы
+            return SpannedView([view[:] for view in self._views])
+        start, stop, _ = key.indices(len(self))
+        pieces = []
+        index = max(0, bisect_right(self._starts, start) - 1)
+        while start < stop and index < len(self._views):
+            base = self._starts[index]
+            end = min(stop, self._starts[index + 1])
+            if end > start:
+                pieces.append(self._views[index][start - base:end - base])
+                start = end
+            index += 1
+        if len(pieces) == 1:
+            return pieces[0]
+        return b''.join(pieces)
+
+    def release(self):
+        for view in self._views:
+            view.release()
+
+
+class VolumeSet:
+    """Набор томов, читаемый как один файл со сквозными смещениями.
+
+    Размеры томов узнаются из каталога файловой системы; сами тома
+    отображаются в память при первом чтении из них.
+    """
+
+    def __init__(self, paths):
+        self.paths = [Path(p) for p in paths]
+        try:
+            stats = [os.stat(p) for p in self.paths]
+        except OSError as e:
+            raise ArchiveError(f"Не найден том архива: {e}") from e
+        self.sizes = [st.st_size for st in stats]
+        self.devices = [st.st_dev for st in stats]
+        self.starts = list(accumulate(self.sizes, initial=0))
+        self.size = self.starts[-1]
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._lock = threading.Lock()
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def opened(self) -> List[int]:
+        """Номера томов, которые уже пришлось открыть"""
+        return sorted(self._maps)
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """Сквозное смещение -> (номер тома, смещение внутри тома)"""
+        index = min(bisect_right(self.starts, offset) - 1, len(self.paths) - 1)
+        return index, offset - self.starts[index]
+
+    def _parts(self, offset: int, size: int) -> List[Tuple[int, int, int]]:
+        """Куски диапазона по томам: (том, смещение в томе, длина)"""
+        parts = []
+        end = min(offset + size, self.size)
+        while offset < end:
+            index, local = self.locate(offset)
+            length = min(end - offset, self.sizes[index] - local)
+            parts.append((index, local, length))
+            offset += length
+        return parts
+
+    def mapping(self, index: int) -> mmap.mmap:
+        """Отображение тома в память (открывается при первом обращении)"""
+        with self._lock:
+            mapped = self._maps.get(index)
+            if mapped is None:
+                if not self.sizes[index]:
+                    # Пустой файл нельзя отобразить
+                    return b''
+                with open(self.paths[index], 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[index] = mapped
+            return mapped
+
+    def view(self, offset: int, size: int):
+        """Диапазон без копирования: memoryview или SpannedView через границы томов"""
+        parts = self._parts(offset, size)
+        if len(parts) == 1:
+            index, local, length = parts[0]
+            return memoryview(self.mapping(index))[local:local + length]
+        if len(parts) > 1:
+            self.prefetch(parts)
+        return SpannedView([memoryview(self.mapping(index))[local:local + length]
+                            for index, local, length in parts])
+
+    def read(self, offset: int, size: int) -> bytes:
+        """Читает до size байт со сквозного смещения"""
+        return b''.join(self.mapping(index)[local:local + length]
+                        for index, local, length in self._parts(offset, size))
+
+    def prefetch(self, parts: List[Tuple[int, int, int]]):
+        """Заранее подкачивает куски, лежащие на других дисках, чем первый.
+
+        Диски работают одновременно: ОС читает следующие тома, пока
+        разбирается текущий. На одном диске хватает обычного упреждающего
+        чтения ОС, лишние запросы только гоняли бы головки.
+        """
+        first = self.devices[parts[0][0]]
+        for index, local, length in parts[1:]:
+            if self.devices[index] == first:
+                continue
+            mapped = self.mapping(index)
+            advice = getattr(mmap, 'MADV_WILLNEED', None)
+            if advice is not None:
+                start = local - local % mmap.PAGESIZE
+                mapped.madvise(advice, start, length + local - start)
+                continue
+            with self._lock:
+                if self._prefetcher is None:
+                    self._prefetcher = ThreadPoolExecutor(
+                        len(set(self.devices)), thread_name_prefix='nova-volume')
+            self._prefetcher.submit(_read_ahead, self.paths[index], local, length)
+
+    def open(self) -> IO[bytes]:
+        """Поток чтения всего набора (seek по сквозным смещениям)"""
+        return io.BufferedReader(VolumeStream(self), CHUNK_SIZE)
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for mapped in self._maps.values():
+                try:
+                    mapped.close()
+                except BufferError:
+                    # Открытые потоки еще держат срезы; отображение освободит сборщик мусора
+                    pass
+            self._maps.clear()
+
+
+def _read_ahead(path: Path, offset: int, size: int):
+    """Читает кусок тома в кэш ОС (там, где нет madvise)"""
+    buffer = bytearray(CHUNK_SIZE)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            f.seek(offset)
+            while size > 0:
+                count = f.readinto(memoryview(buffer)[:min(size, CHUNK_SIZE)])
+                if not count:
+                    return
+                size -= count
+    except OSError:
+        pass
+
+
+class VolumeStream(io.RawIOBase):
+    """Набор томов как один файл только для чтения"""
+
+    def __init__(self, volumes: VolumeSet):
+        super().__init__()
+        self._volumes = volumes
+        self._pos = 0
+        self.name = os.fspath(volumes.paths[-1])
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._volumes.size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        self._pos = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        data = self._volumes.read(self._pos, len(buffer))
+        count = len(data)
+        buffer[:count] = data
+        self._pos += count
+        return count
@@ -0,0 +1,571 @@
+# [file name]: nova_core/watch.py
+"""
+Наблюдение за папками: поступающие файлы непрерывно упаковываются (nova watch)
+
+Готовые файлы (закрытые после записи или переименованные в папку) копятся
+в пакет, который сворачивается в новый архив (.nv, .tar.zst или .zip), когда
+набирается roll_size байт или проходит roll_time секунд с первого файла
+пакета. Пока один пакет сжимается (потоками писателя), следующий уже
+собирается; одновременно сворачивается не больше pipeline пакетов.
+
+На Linux папки наблюдаются через inotify (ctypes, без зависимостей):
+каталог заново не обходится. На других системах и с poll=True папки
+обходятся раз в poll_interval секунд. Файлы, найденные обходом (при
+запуске, в новой подпапке, после переполнения очереди inotify), считаются
+готовыми, когда не менялись settle секунд.
+
+После каждого архива в индекс output/nova-watch.jsonl дописывается строка:
+имя архива и его файлы (путь на диске, имя в архиве, размер, время
+изменения). По индексу после перезапуска не упаковываются повторно уже
+упакованные файлы. С fsync архив, папка и индекс сбрасываются на диск до
+того, как архив считается записанным (и до удаления исходных с remove).
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import trace
+from .errors import ArchiveError
+from .formats import FORMAT_NV2, FORMAT_TAR_ZST, FORMAT_ZIP
+from .writers import open_writer
+
+# Формат -> расширение архивов
+WATCH_FORMATS = {FORMAT_NV2: '.nv', FORMAT_TAR_ZST: '.tar.zst', FORMAT_ZIP: '.zip'}
+DEFAULT_FORMAT = FORMAT_NV2
+DEFAULT_ROLL_SIZE = 256 * 1024 * 1024
+DEFAULT_ROLL_TIME = 300.0
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_PIPELINE = 2
+DEFAULT_PREFIX = 'nova'
+# Недописанные и служебные файлы не упаковываются
+DEFAULT_EXCLUDE = ('.*', '*.tmp', '*.part', '*~')
+INDEX_NAME = 'nova-watch.jsonl'
+
+# inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_ONLYDIR
+_EVENT = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+FileState = Tuple[int, int]          # (размер, время изменения в нс)
+
+
+def _state(st: os.stat_result) -> FileState:
+    return st.st_size, st.st_mtime_ns
+
+
+class _Watcher:
+    """Общее для наблюдателей: корни, исключенные папки и дозревание файлов"""
+
+    def __init__(self, roots: Iterable, settle: float = DEFAULT_SETTLE,
+                 skip_dirs: Iterable = ()):
+        self.roots = [Path(root).resolve() for root in roots]
+        for root in self.roots:
+            if not root.is_dir():
+                raise ArchiveError(f"Папка не найдена: {root}")
+        self.settle = settle
+        self._skip = {Path(path).resolve() for path in skip_dirs}
+        # Найденные обходом файлы ждут, пока перестанут меняться
+        self._candidates: Dict[str, FileState] = {}
+
+    def _skipped(self, directory: Path) -> bool:
+        return directory in self._skip
+
+    def _walk(self, top: Path) -> Iterable[Tuple[str, os.stat_result]]:
+        """Обычные файлы под top, кроме исключенных папок"""
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as items:
+                    for item in items:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                path = Path(item.path)
+                                if not self._skipped(path):
+                                    self._on_dir(path)
+                                    pending.append(path)
+                            elif item.is_file(follow_symlinks=False):
+                                yield item.path, item.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _on_dir(self, path: Path):
+        """Обход нашел папку (inotify ставит на нее наблюдение)"""
+
+    def _scan(self, top: Path):
+        for path, st in self._walk(top):
+            self._candidates.setdefault(path, _state(st))
+
+    def _settled(self) -> List[str]:
+        """Кандидаты, не менявшиеся с прошлой проверки и дольше settle секунд"""
+        ready = []
+        now = time.time_ns()
+        for path, state in list(self._candidates.items()):
+            try:
+                current = _state(os.stat(path))
+            except OSError:
+                del self._candidates[path]
+                continue
+            if current == state and now - current[1] >= self.settle * 1e9:
+                del self._candidates[path]
+                ready.append(path)
+            else:
+                self._candidates[path] = current
+        return ready
+
+    def root_of(self, path: str) -> Optional[Path]:
+        """Наблюдаемая папка, в которой лежит path"""
+        for root in self.roots:
+            try:
+                if os.path.commonpath([str(root), path]) == str(root):
+                    return root
+            except ValueError:
+                # Разные диски в Windows
+                continue
+        return None
+
+    def scan_all(self) -> List[str]:
+        """Все файлы папок сразу, без дозревания (однократная упаковка)"""
+        return [path for root in self.roots for path, _ in self._walk(root)]
+
+    def poll(self, timeout: float) -> List[str]:
+        """Ждет не дольше timeout секунд и возвращает готовые файлы"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PollingWatcher(_Watcher):
+    """Наблюдение обходом папок раз в interval секунд (любая система)"""
+
+    def __init__(self, roots, settle=DEFAULT_SETTLE, skip_dirs=(),
+                 interval: float = DEFAULT_POLL_INTERVAL):
+        super().__init__(roots, settle, skip_dirs)
+        self.interval = interval
+        self._next = 0.0
+        # Уже отданные файлы: повторно отдаются, только если изменились
+        self._reported: Dict[str, FileState] = {}
+
+    def poll(self, timeout):
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return []
+        time.sleep(max(0.0, wait))
+        self._next = time.monotonic() + self.interval
+        seen = set()
+        for root in self.roots:
+            for path, st in self._walk(root):
+                seen.add(path)
+                if self._reported.get(path) != _state(st):
+                    self._candidates.setdefault(path, _state(st))
+        for path in set(self._reported) - seen:
+            del self._reported[path]
+        ready = self._settled()
+        for path in ready:
+            try:
+                self._reported[path] = _state(os.stat(path))
+            except OSError:
+                pass
+        return ready
+
+
+class InotifyWatcher(_Watcher):
+    """Наблюдение через inotify: готовы файлы, закрытые после записи или перемещенные"""
+
+    def __init__(self, roots, settle=DEFAULT_SETTLE, skip_dirs=()):
+        super().__init__(roots, settle, skip_dirs)
+        self._libc = _inotify_libc()
+        if self._libc is None:
+            raise ArchiveError("inotify недоступен в этой системе")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise ArchiveError(f"Не удалось включить inotify: {os.strerror(ctypes.get_errno())}")
+        self._dirs: Dict[int, Path] = {}
+        self._rescan = True
+
+    def _on_dir(self, path: Path):
+        self._add_watch(path)
+
+    def _add_watch(self, path: Path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == 28:          # ENOSPC: исчерпан fs.inotify.max_user_watches
+                raise ArchiveError("Исчерпан лимит наблюдений inotify "
+                                   "(fs.inotify.max_user_watches); используйте --poll")
+            return
+        self._dirs[wd] = path
+
+    def _start(self):
+        # Сначала наблюдение, потом обход: файл, закрытый между ними, не теряется
+        self._rescan = False
+        for root in self.roots:
+            self._add_watch(root)
+            self._scan(root)
+
+    def poll(self, timeout):
+        if self._rescan:
+            self._start()
+        if self._candidates:
+            timeout = min(timeout, max(self.settle, 0.05))
+        ready = []
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if readable:
+            ready += self._read_events()
+        if self._candidates:
+            ready += self._settled()
+        return ready
+
+    def _read_events(self) -> List[str]:
+        ready = []
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b'\0')
+                pos += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    # События потеряны: папки обходятся заново
+                    self._rescan = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & _IN_ISDIR:
+                    if not self._skipped(path):
+                        # Файлы могли появиться в папке до наблюдения за ней
+                        self._add_watch(path)
+                        self._scan(path)
+                elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    self._candidates.pop(str(path), None)
+                    ready.append(str(path))
+        return ready
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _inotify_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def open_watcher(roots, settle: float = DEFAULT_SETTLE, skip_dirs=(), poll: bool = False,
+                 interval: float = DEFAULT_POLL_INTERVAL) -> _Watcher:
+    """inotify, если он есть и poll не задан, иначе обход папок"""
+    if not poll and _inotify_libc() is not None:
+        return InotifyWatcher(roots, settle, skip_dirs)
+    return PollingWatcher(roots, settle, skip_dirs, interval)
+
+
+class RollResult(NamedTuple):
+    """Итог свертки одного пакета"""
+
+    archive: Path
+    files: int
+    bytes: int
+    archive_bytes: int
+    seconds: float
+    vanished: int                 # файлы, удаленные до упаковки
+
+
+def load_index(path) -> Dict[str, FileState]:
+    """Упакованные файлы по индексу: путь -> (размер, время изменения в нс)"""
+    archived: Dict[str, FileState] = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Строка, оборванная при сбое, пропускается
+                    continue
+                for member in record.get('members', ()):
+                    archived[member['path']] = (member['size'], member['mtime_ns'])
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        raise ArchiveError(f"Не удалось прочитать индекс {path}: {e}") from e
+    return archived
+
+
+def _fsync(fd: int):
+    os.fsync(fd)
+    trace.count(trace.FSYNC_CALLS)
+
+
+def _fsync_file(path):
+    with open(path, 'rb+') as f:
+        _fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    # Папку в Windows открыть для fsync нельзя, там переименование и так на диске
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        _fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Batch:
+    def __init__(self):
+        self.files: Dict[str, Tuple[str, FileState]] = {}   # путь -> (имя в архиве, состояние)
+        self.bytes = 0
+        self.started = 0.0
+
+    def add(self, path: str, arcname: str, state: FileState):
+        if not self.files:
+            self.started = time.monotonic()
+        old = self.files.get(path)
+        if old is not None:
+            self.bytes -= old[1][0]
+        self.files[path] = (arcname, state)
+        self.bytes += state[0]
+
+
+class FolderArchiver:
+    """Сворачивает поступающие в папки файлы в архивы папки output.
+
+    fmt - nv2 (.nv), tar.zst или zip; level, codec и workers - как у
+    nova create (workers - потоки сжатия одного архива). Пакет
+    сворачивается по roll_size байт или через roll_time секунд после
+    первого файла. pipeline - сколько архивов пишется одновременно, пока
+    собирается следующий пакет. fsync - сбрасывать архив, папку и индекс
+    на диск; remove - удалять исходные файлы после записи архива в индекс.
+    on_roll(RollResult) и on_error(сообщение) вызываются из потоков свертки.
+    """
+
+    def __init__(self, roots: Sequence, output, fmt: str = DEFAULT_FORMAT,
+                 roll_size: int = DEFAULT_ROLL_SIZE, roll_time: float = DEFAULT_ROLL_TIME,
+                 level: Optional[int] = None, codec: Optional[str] = None,
+                 workers: Optional[int] = None, password: Optional[str] = None,
+                 pipeline: int = DEFAULT_PIPELINE, fsync: bool = False, remove: bool = False,
+                 prefix: str = DEFAULT_PREFIX, exclude: Sequence[str] = DEFAULT_EXCLUDE,
+                 settle: float = DEFAULT_SETTLE, poll: bool = False,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 on_roll: Optional[Callable[[RollResult], None]] = None,
+                 on_error: Optional[Callable[[str], None]] = None):
+        if fmt not in WATCH_FORMATS:
+            raise ArchiveError(f"Наблюдение пишет только форматы: {', '.join(WATCH_FORMATS)}")
+        if roll_size <= 0 or roll_time <= 0:
+            raise ArchiveError("Размер и время свертки должны быть больше нуля")
+        self.output = Path(output).resolve()
+        self.index_path = self.output / INDEX_NAME
+        self.format = fmt
+        self.roll_size = roll_size
+        self.roll_time = roll_time
+        self.level = level
+        self.codec = codec
+        self.workers = workers
+        self.password = password
+        self.fsync = fsync
+        self.remove = remove
+        self.prefix = prefix
+        self.exclude = tuple(exclude)
+        self.on_roll = on_roll
+        self.on_error = on_error
+        self._watcher = open_watcher(roots, settle, [self.output], poll, poll_interval)
+        self.output.mkdir(parents=True, exist_ok=True)
+        self._archived = load_index(self.index_path)
+        # Файлы в собираемом пакете и в архивах, которые еще пишутся
+        self._claimed: Dict[str, FileState] = {}
+        self._batch = _Batch()
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, pipeline))
+        self._pool = ThreadPoolExecutor(max(1, pipeline), thread_name_prefix='nova-watch')
+        self._sequence = 0
+        self.rolls = 0
+
+    def _wanted(self, path: str) -> bool:
+        return not any(fnmatch.fnmatch(os.path.basename(path), pattern)
+                       for pattern in self.exclude)
+
+    def add(self, path: str) -> bool:
+        """Добавляет готовый файл в пакет; False - файл не нужен или уже упакован"""
+        root = self._watcher.root_of(path)
+        if root is None or not self._wanted(path):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        state = _state(st)
+        with self._lock:
+            if self._archived.get(path) == state or self._claimed.get(path) == state:
+                return False
+            self._claimed[path] = state
+        arcname = Path(path).relative_to(root.parent).as_posix()
+        self._batch.add(path, arcname, state)
+        if self._batch.bytes >= self.roll_size:
+            self.roll()
+        return True
+
+    def due_in(self) -> float:
+        """Через сколько секунд пакет пора свернуть по времени"""
+        if not self._batch.files:
+            return self.roll_time
+        return self._batch.started + self.roll_time - time.monotonic()
+
+    def roll(self):
+        """Отдает текущий пакет на запись; ждет, если заняты все места конвейера"""
+        batch, self._batch = self._batch, _Batch()
+        if not batch.files:
+            return
+        self._slots.acquire()
+        self._pool.submit(self._write, batch, self._next_name())
+
+    def _next_name(self) -> Path:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        while True:
+            self._sequence += 1
+            path = self.output / f"{self.prefix}-{stamp}-{self._sequence:04d}" \
+                                 f"{WATCH_FORMATS[self.format]}"
+            if not path.exists():
+                return path
+
+    def _write(self, batch: _Batch, path: Path):
+        started = time.perf_counter()
+        tmp = path.with_name(f".{path.name}.part")
+        members = []
+        vanished = 0
+        try:
+            with trace.operation('watch_roll'):
+                with open_writer(tmp, self.format, self.level, self.password, self.workers,
+                                 self.codec) as writer:
+                    for src, (arcname, _) in sorted(batch.files.items(),
+                                                    key=lambda item: item[1][0]):
+                        try:
+                            state = _state(os.stat(src))
+                            writer.add_file(src, arcname)
+                        except FileNotFoundError:
+                            vanished += 1
+                            continue
+                        members.append({'name': arcname, 'path': src, 'size': state[0],
+                                        'mtime_ns': state[1]})
+                if self.fsync:
+                    _fsync_file(tmp)
+                os.replace(tmp, path)
+                if self.fsync:
+                    _fsync_dir(self.output)
+                archive_bytes = path.stat().st_size
+                self._append_index(path, members, archive_bytes)
+        except BaseException as e:
+            if tmp.exists():
+                tmp.unlink()
+            with self._lock:
+                for src in batch.files:
+                    self._claimed.pop(src, None)
+            if self.on_error is not None:
+                self.on_error(f"Не удалось записать {path.name}: {e}")
+            return None
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            for member in members:
+                self._archived[member['path']] = (member['size'], member['mtime_ns'])
+            for src in batch.files:
+                self._claimed.pop(src, None)
+            self.rolls += 1
+        if self.remove:
+            self._remove_sources(members)
+        result = RollResult(path, len(members), sum(m['size'] for m in members),
+                            archive_bytes, time.perf_counter() - started, vanished)
+        if self.on_roll is not None:
+            self.on_roll(result)
+        return result
+
+    def _append_index(self, path: Path, members: List[dict], archive_bytes: int):
+        record = {'archive': path.name, 'created': round(time.time(), 3),
+                  'format': self.format, 'files': len(members),
+                  'bytes': sum(m['size'] for m in members), 'archive_bytes': archive_bytes,
+                  'members': members}
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                if self.fsync:
+                    f.flush()
+                    _fsync(f.fileno())
+
+    def _remove_sources(self, members: List[dict]):
+        for member in members:
+            try:
+                # Файл, измененный после упаковки, остается до следующей свертки
+                if _state(os.stat(member['path'])) == (member['size'], member['mtime_ns']):
+                    os.remove(member['path'])
+            except OSError:
+                continue
+
+    def run(self, stop: Optional[threading.Event] = None, once: bool = False) -> int:
+        """Наблюдает, пока не выставлен stop; с once упаковывает то, что есть, и
+        возвращается. Возвращает число записанных архивов."""
+        stop = stop or threading.Event()
+        try:
+            if once:
+                for path in self._watcher.scan_all():
+                    self.add(path)
+            else:
+                while not stop.is_set():
+                    timeout = min(1.0, max(0.0, self.due_in()))
+                    for path in self._watcher.poll(timeout):
+                        self.add(path)
+                    if self._batch.files and self.due_in() <= 0:
+                        self.roll()
+            self.roll()
+        finally:
+            self.close()
+        return self.rolls
+
+    def close(self):
+        """Дожидается записи начатых архивов и прекращает наблюдение"""
+        self._pool.shutdown(wait=True)
+        self._watcher.close()
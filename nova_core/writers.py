@@ -0,0 +1,492 @@
+# [file name]: nova_core/writers.py
+"""
+Создание архивов разных форматов через единый интерфейс
+"""
+
+import io
+import lzma
+import os
+import tarfile
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+from . import backends
+from .codecs import CODEC_DEFLATE, CODEC_ZSTD, get_codec
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .formats import (FORMAT_7Z, FORMAT_NV2, FORMAT_TAR_XZ, FORMAT_TAR_ZST, FORMAT_ZIP,
+                      TAR_FORMATS, TAR_WRITE_MODES)
+from .nvcontainer import NvWriter
+from .seekindex import DEFAULT_SPAN
+from .solid import MAX_OPEN_GROUPS, check_solid_size, solid_group
+from .streams import read_full
+from .zipwriter import ParallelZipWriter
+
+DEFAULT_LEVEL = 6
+
+
+def _user_name(uid: int) -> str:
+    try:
+        import pwd
+        return pwd.getpwuid(uid).pw_name
+    except (ImportError, KeyError):
+        return ''
+
+
+def _group_name(gid: int) -> str:
+    try:
+        import grp
+        return grp.getgrgid(gid).gr_name
+    except (ImportError, KeyError):
+        return ''
+
+
+class _ProgressReader:
+    """Обертка над потоком, сообщающая о каждом прочитанном блоке"""
+
+    def __init__(self, stream, on_chunk: Optional[Callable[[int], None]]):
+        self._stream = stream
+        self._on_chunk = on_chunk
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if data and self._on_chunk is not None:
+            self._on_chunk(len(data))
+        return data
+
+
+class _XzStreamsWriter:
+    """Сжатие xz отдельными потоками по block_size несжатых байт.
+
+    lzma пишет весь вывод одним блоком, и индекс произвольного доступа
+    (seekindex) не может начать распаковку с середины. Склеенные потоки -
+    обычный файл .xz для любого распаковщика, а каждый поток - точка индекса.
+    """
+
+    def __init__(self, raw: IO[bytes], preset: int, block_size: int = DEFAULT_SPAN):
+        self._raw = raw
+        self._preset = preset
+        self._block_size = block_size
+        self._compressor: Optional[lzma.LZMACompressor] = None
+        self._left = 0
+
+    def write(self, data) -> int:
+        view = memoryview(data)
+        while view:
+            if self._compressor is None:
+                self._compressor = lzma.LZMACompressor(lzma.FORMAT_XZ, preset=self._preset)
+                self._left = self._block_size
+            part = view[:self._left]
+            self._raw.write(self._compressor.compress(part))
+            self._left -= len(part)
+            view = view[len(part):]
+            if not self._left:
+                self._end_stream()
+        return len(data)
+
+    def _end_stream(self):
+        self._raw.write(self._compressor.flush())
+        self._compressor = None
+
+    def close(self):
+        if self._compressor is not None:
+            self._end_stream()
+
+
+class _SizedReader(io.BufferedIOBase):
+    """Последовательный поток известного размера для py7zr.
+
+    py7zr принимает только файловые объекты и узнает размер через
+    seek(0, SEEK_END)/tell(), после чего возвращается назад; сами данные
+    читаются строго по порядку.
+    """
+
+    def __init__(self, stream, size: int, on_chunk: Optional[Callable[[int], None]]):
+        super().__init__()
+        self._reader = _ProgressReader(stream, on_chunk)
+        self._size = size
+        self._pos = 0
+        self._cursor = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._cursor
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._cursor, os.SEEK_END: self._size}[whence]
+        self._cursor = base + offset
+        return self._cursor
+
+    def read(self, size=-1):
+        if self._cursor != self._pos:
+            raise io.UnsupportedOperation("Поток читается только последовательно")
+        data = self._reader.read(size if size is not None else -1)
+        self._pos += len(data)
+        self._cursor = self._pos
+        return data
+
+    read1 = read
+
+
+class ArchiveWriter:
+    """Базовый класс записи архива"""
+
+    format = None
+
+    def __init__(self, path, level: Optional[int] = None, password: Optional[str] = None):
+        self.path = Path(path)
+        self.level = DEFAULT_LEVEL if level is None else level
+        self.password = password
+
+    def add_file(self, src_path, arcname: str,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл с диска"""
+        st = os.stat(src_path)
+        entry = ArchiveEntry(name=arcname, size=st.st_size, mtime=st.st_mtime)
+        with open(src_path, 'rb') as src:
+            self.add_stream(entry, src, on_chunk)
+
+    def add_data(self, arcname: str, data: bytes, st: Optional[os.stat_result] = None,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл, уже прочитанный в память (мелкие файлы, см. smallfiles);
+        st - его stat с диска"""
+        entry = ArchiveEntry(name=arcname, size=len(data),
+                             mtime=st.st_mtime if st is not None else None)
+        self.add_stream(entry, io.BytesIO(data), on_chunk)
+
+    def add_dir(self, arcname: str, mtime: Optional[float] = None):
+        """Добавляет запись папки"""
+        raise NotImplementedError
+
+    def add_stream(self, entry: ArchiveEntry, stream: IO[bytes],
+                   on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет элемент из потока, размер берется из entry.size"""
+        raise NotImplementedError
+
+    def close(self):
+        """Завершает запись архива"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TarWriter(ArchiveWriter):
+    """Запись TAR и сжатых TAR (gz, bz2, xz, zst)"""
+
+    def __init__(self, path, level=None, password=None, fmt: str = 'tar',
+                 long_distance: bool = False, workers: Optional[int] = None):
+        super().__init__(path, level, password)
+        if password:
+            raise ArchiveError("TAR архивы не поддерживают пароль")
+        self.format = fmt
+        mode = TAR_WRITE_MODES[fmt]
+        self._raw = self._stream = None
+        self._owners: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        if fmt == FORMAT_TAR_ZST:
+            codec = get_codec(CODEC_ZSTD)
+            self.level = codec.clamp(level)
+            self._raw = open(self.path, 'wb')
+            # Многопоточное сжатие zstd; дальние совпадения находят повторы между файлами
+            self._stream = codec.writer(self._raw, self.level, long_distance,
+                                        workers if workers is not None else os.cpu_count() or 1)
+            self._tar = tarfile.open(fileobj=self._stream, mode=mode)
+            return
+        if fmt == FORMAT_TAR_XZ:
+            # Потоками по шагу индекса, чтобы seekindex мог читать архив с середины
+            self._raw = open(self.path, 'wb')
+            self._stream = _XzStreamsWriter(self._raw, max(0, min(9, self.level)))
+            self._tar = tarfile.open(fileobj=self._stream, mode='w|')
+            return
+        kwargs = {}
+        if fmt in ('tar.gz', 'tar.bz2'):
+            kwargs['compresslevel'] = max(1, min(9, self.level))
+        self._tar = tarfile.open(self.path, mode, **kwargs)
+
+    def add_file(self, src_path, arcname, on_chunk=None):
+        info = self._tar.gettarinfo(src_path, arcname)
+        with open(src_path, 'rb') as src:
+            self._tar.addfile(info, _ProgressReader(src, on_chunk))
+
+    def add_data(self, arcname, data, st=None, on_chunk=None):
+        if st is None:
+            return super().add_data(arcname, data, st, on_chunk)
+        # Те же поля, что заполняет gettarinfo, но без повторного stat
+        info = tarfile.TarInfo(arcname)
+        info.size = len(data)
+        info.mode = st.st_mode & 0o7777
+        info.mtime = int(st.st_mtime)
+        info.uid, info.gid = st.st_uid, st.st_gid
+        info.uname, info.gname = self._owner(st.st_uid, st.st_gid)
+        self._tar.addfile(info, io.BytesIO(data))
+        if on_chunk is not None and data:
+            on_chunk(len(data))
+
+    def _owner(self, uid: int, gid: int) -> Tuple[str, str]:
+        """Имена владельца и группы (как в gettarinfo), с кэшем на архив"""
+        key = (uid, gid)
+        names = self._owners.get(key)
+        if names is None:
+            names = self._owners[key] = (_user_name(uid), _group_name(gid))
+        return names
+
+    def add_dir(self, arcname, mtime=None):
+        info = tarfile.TarInfo(arcname.rstrip('/'))
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        info.mtime = int(mtime if mtime is not None else time.time())
+        self._tar.addfile(info)
+
+    def add_stream(self, entry, stream, on_chunk=None):
+        info = tarfile.TarInfo(entry.name)
+        info.size = entry.size
+        info.mode = entry.mode & 0o7777 if entry.mode else 0o644
+        info.mtime = int(entry.mtime if entry.mtime is not None else time.time())
+        self._tar.addfile(info, _ProgressReader(stream, on_chunk))
+
+    def close(self):
+        try:
+            self._tar.close()
+            if self._stream is not None:
+                self._stream.close()
+        finally:
+            if self._raw is not None:
+                self._raw.close()
+
+
+# Блоки 7z закрываются через внутренности py7zr (см. SevenZipWriter._next_folder):
+# публичный API пишет все в один блок. Сплошной режим разрешен только на
+# проверенных версиях [от, до) и при наличии нужных атрибутов
+SOLID_PY7ZR_VERSIONS = ((0, 22), (2, 0))
+_solid_7z_error: Optional[str] = None
+_solid_7z_checked = False
+
+
+def check_7z_solid_support():
+    """Проверяет, что установленный py7zr умеет сплошные блоки Nova.
+
+    Вызывается до создания архива (handler.create, convert, SevenZipWriter);
+    при несовместимой версии - ArchiveError с понятной причиной. Результат
+    проверки запоминается.
+    """
+    global _solid_7z_error, _solid_7z_checked
+    if not _solid_7z_checked:
+        _solid_7z_error = _detect_7z_solid_support(backends.load('py7zr'))
+        _solid_7z_checked = True
+    if _solid_7z_error:
+        raise ArchiveError(_solid_7z_error)
+
+
+def _detect_7z_solid_support(py7zr) -> Optional[str]:
+    """Причина, по которой сплошные блоки недоступны, или None"""
+    version = getattr(py7zr, '__version__', '')
+    try:
+        current = tuple(int(part) for part in version.split('.')[:2])
+    except ValueError:
+        current = ()
+    low, high = SOLID_PY7ZR_VERSIONS
+    if not low <= current < high:
+        return (f"Сплошные блоки 7z не поддерживаются py7zr {version or 'этой версии'}: "
+                f"нужна версия от {'.'.join(map(str, low))} до {'.'.join(map(str, high))}")
+    try:
+        from py7zr.archiveinfo import Header
+        from py7zr.py7zr import Worker
+        usable = callable(getattr(Worker, 'flush_archive', None)) and \
+            hasattr(Header(), '_initialized')
+    except Exception:
+        usable = False
+    if not usable:
+        return (f"Сплошные блоки 7z не поддерживаются py7zr {version}: "
+                f"нет Worker.flush_archive или Header._initialized")
+    return None
+
+
+class SevenZipWriter(ArchiveWriter):
+    """Запись .7z через py7zr.
+
+    Без solid_size py7zr пишет все файлы в один сплошной блок (folder), и
+    извлечение любого файла распаковывает архив с начала. С solid_size
+    блоки закрываются по достижении solid_size байт, а файлы до solid_size
+    копятся по группам расширений (см. solid) и пишутся группами; py7zr
+    при извлечении пропускает блоки без нужных файлов.
+    """
+
+    format = FORMAT_7Z
+
+    def __init__(self, path, level=None, password=None, solid_size: Optional[int] = None):
+        super().__init__(path, level, password)
+        self.solid_size = check_solid_size(solid_size) if solid_size else None
+        if self.solid_size:
+            check_7z_solid_support()
+        py7zr = backends.load('py7zr')
+        self._archive = py7zr.SevenZipFile(self.path, 'w', password=password,
+                                           filters=self._filters(py7zr))
+        # Группа -> файлы (имя, данные, mtime), ждущие записи; по порядку использования
+        self._groups: 'OrderedDict[str, List[Tuple[str, bytes, Optional[float]]]]' = OrderedDict()
+        self._group_bytes: Dict[str, int] = {}
+        self._buffered = 0
+        self._folder_bytes = 0
+        self._folder_done = False
+
+    def _filters(self, py7zr) -> List[dict]:
+        """Цепочка фильтров py7zr по умолчанию, но с уровнем LZMA2 из level"""
+        lzma2 = {'id': py7zr.FILTER_LZMA2, 'preset': max(0, min(9, self.level))}
+        if self.password:
+            return [lzma2, {'id': py7zr.FILTER_CRYPTO_AES256_SHA256}]
+        return [{'id': py7zr.FILTER_X86}, lzma2]
+
+    def add_file(self, src_path, arcname, on_chunk=None):
+        if self.solid_size:
+            return super().add_file(src_path, arcname, on_chunk)
+        self._archive.write(src_path, arcname)
+        if on_chunk is not None:
+            on_chunk(os.path.getsize(src_path))
+
+    def add_dir(self, arcname, mtime=None):
+        # py7zr берет атрибуты папки с диска, поэтому пишем пустую временную папку
+        with tempfile.TemporaryDirectory(prefix='nova_7z_') as tmp:
+            self._archive.write(tmp, arcname.rstrip('/'))
+
+    def add_data(self, arcname, data, st=None, on_chunk=None):
+        mtime = st.st_mtime if st is not None else None
+        if self.solid_size and data:
+            self._buffer(arcname, data, mtime)
+        else:
+            # Без solid_size все файлы и так в одном сплошном блоке
+            self._write_data(arcname, data, mtime)
+        if on_chunk is not None and data:
+            on_chunk(len(data))
+
+    def add_stream(self, entry, stream, on_chunk=None):
+        if self.solid_size and 0 < entry.size <= self.solid_size:
+            data = read_full(stream, entry.size)
+            self._buffer(entry.name, data, entry.mtime)
+            if on_chunk is not None:
+                on_chunk(len(data))
+            return
+        if entry.size:
+            self._next_folder()
+        self._archive.writef(_SizedReader(stream, entry.size, on_chunk), entry.name)
+        self._stamp(entry.mtime)
+        self._folder_bytes += entry.size
+
+    def _write_data(self, arcname: str, data: bytes, mtime: Optional[float]):
+        if data:
+            self._next_folder()
+        self._archive.writef(io.BytesIO(data), arcname)
+        self._stamp(mtime)
+        self._folder_bytes += len(data)
+
+    def _buffer(self, arcname: str, data: bytes, mtime: Optional[float]):
+        """Откладывает файл в его группу; полная группа пишется своим блоком"""
+        group = solid_group(arcname)
+        items = self._groups.get(group)
+        if items is None:
+            if len(self._groups) >= MAX_OPEN_GROUPS:
+                self._flush_group(next(iter(self._groups)))
+            items = self._groups[group] = []
+            self._group_bytes[group] = 0
+        else:
+            self._groups.move_to_end(group)
+        items.append((arcname, data, mtime))
+        self._group_bytes[group] += len(data)
+        self._buffered += len(data)
+        if self._group_bytes[group] >= self.solid_size:
+            self._flush_group(group)
+
+    def _flush_group(self, group: str):
+        items = self._groups.pop(group)
+        self._buffered -= self._group_bytes.pop(group)
+        # Группа начинает свой блок, чтобы не делить его с другими расширениями
+        self._end_folder()
+        for arcname, data, mtime in items:
+            self._write_data(arcname, data, mtime)
+
+    def _end_folder(self):
+        """Следующие данные начнут новый блок"""
+        if self._folder_bytes:
+            self._folder_done = True
+
+    def _next_folder(self):
+        """Перед новыми данными закрывает заполненный блок.
+
+        Блок закрывается только здесь: пустой файл или папка после
+        закрытия открыли бы в py7zr новый блок без данных.
+        """
+        if self.solid_size and self._folder_bytes >= self.solid_size:
+            self._folder_done = True
+        if not self._folder_done:
+            return
+        # То же, что делает py7zr при дописывании в архив: сброс сжатого
+        # потока блока, новый блок - при следующей записи
+        header = self._archive.header
+        self._archive.worker.flush_archive(self._archive.fp,
+                                           header.main_streams.unpackinfo.folders[-1])
+        header._initialized = False
+        self._folder_bytes = 0
+        self._folder_done = False
+
+    def _stamp(self, mtime: Optional[float]):
+        """writef ставит время изменения "сейчас"; ставим время файла"""
+        if mtime is None:
+            return
+        info = self._archive.header.files_info.files[-1]
+        stamp = info.get('lastwritetime')
+        if stamp is not None:
+            info['lastwritetime'] = type(stamp).from_datetime(mtime)
+
+    def close(self):
+        # Остатки групп - подряд, по группам: блоки делятся только по размеру
+        self._end_folder()
+        for group in sorted(self._groups):
+            for arcname, data, mtime in self._groups[group]:
+                self._write_data(arcname, data, mtime)
+        self._groups.clear()
+        self._archive.close()
+
+
+def open_writer(path, fmt: str, level: Optional[int] = None,
+                password: Optional[str] = None, workers: Optional[int] = None,
+                codec: Optional[str] = None, auto_store: bool = True,
+                long_distance: bool = False, volume_size: Optional[int] = None,
+                solid_size: Optional[int] = None):
+    """Создает писателя для указанного формата.
+
+    ZIP пишется ParallelZipWriter (workers потоков сжатия, по умолчанию -
+    все ядра; с паролем элементы шифруются AES-256 в тех же потоках).
+    .nv v2 пишется NvWriter с дедупликацией фрагментов. codec выбирает метод сжатия для
+    ZIP (deflate, zstd, store) и .nv v2 (еще lz4); уровень по умолчанию
+    свой у каждого кодека. auto_store сохраняет уже сжатые файлы как есть.
+    volume_size - размер тома многотомного архива (ZIP и .nv v2).
+    solid_size - размер сплошного блока (.nv v2 и 7z, см. solid).
+    """
+    if codec is not None and fmt not in (FORMAT_ZIP, FORMAT_NV2):
+        raise ArchiveError(f"Выбор метода сжатия не поддерживается для формата {fmt}")
+    if volume_size and fmt not in (FORMAT_ZIP, FORMAT_NV2):
+        raise ArchiveError("Тома поддерживаются только для ZIP и .nv v2")
+    if solid_size and fmt not in (FORMAT_NV2, FORMAT_7Z):
+        raise ArchiveError("Сплошные блоки поддерживаются только для .nv v2 и 7z")
+    if fmt == FORMAT_ZIP:
+        return ParallelZipWriter(path, level, workers, codec=codec or CODEC_DEFLATE,
+                                 auto_store=auto_store, long_distance=long_distance,
+                                 volume_size=volume_size, password=password)
+    if fmt in TAR_FORMATS:
+        return TarWriter(path, level, password, fmt, long_distance, workers)
+    if fmt == FORMAT_7Z:
+        return SevenZipWriter(path, level, password, solid_size=solid_size)
+    if fmt == FORMAT_NV2:
+        if password:
+            raise ArchiveError("Пароль для .nv v2 не поддерживается")
+        return NvWriter(path, level, workers, codec=codec or CODEC_DEFLATE,
+                        auto_store=auto_store, volume_size=volume_size, solid_size=solid_size)
+    raise ArchiveError(f"Запись в формат {fmt} не поддерживается")
@@ -0,0 +1,280 @@
+# [file name]: nova_core/zipaes.py
+"""
+Шифрование WinZip AES для ZIP (метод 99) без pyzipper
+
+Данные зашифрованного элемента: соль, 2 байта проверки пароля, сжатые
+данные, зашифрованные AES-CTR (счетчик little-endian с 1), и 10 байт
+HMAC-SHA1 от зашифрованных данных. Настоящий метод сжатия лежит в поле
+extra 0x9901. Ключи выводятся PBKDF2-HMAC-SHA1 (1000 итераций) из пароля и
+соли элемента.
+
+Шифрование - потоковое поверх уже сжатых данных, поэтому элементы
+шифруются в тех же потоках, что и сжимаются, а смена пароля
+перешифровывает сжатые данные без распаковки. CTR допускает произвольный
+доступ: расшифровка начинается с любого блока AES. Выведенные ключи
+кэшируются на сеанс по паролю и соли, так что проверка, просмотр и
+извлечение одного архива считают PBKDF2 по разу на элемент.
+"""
+
+import hashlib
+import hmac
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from . import backends, trace
+from .errors import ArchiveError, PasswordRequiredError
+
+METHOD_AES = 99
+EXTRA_AES = 0x9901
+VENDOR_ID = b'AE'
+AE_1 = 1                       # CRC хранится
+AE_2 = 2                       # CRC равна 0, целостность - только HMAC
+STRENGTH_256 = 3
+SALT_SIZES = {1: 8, 2: 12, 3: 16}
+KEY_SIZES = {1: 16, 2: 24, 3: 32}
+VERIFIER_SIZE = 2
+MAC_SIZE = 10
+PBKDF2_ITERATIONS = 1000
+# Версия ZIP, нужная для чтения AES
+VERSION_AES = 51
+# Файлы меньше пишутся AE-2: CRC короткого файла выдает его содержимое
+MIN_CRC_SIZE = 20
+# Сколько выведенных ключей хранит кэш сеанса
+KEY_CACHE_SIZE = 65536
+
+_BLOCK = 16
+_EXTRA = struct.Struct('<HHH2sBH')
+
+
+class AesField(NamedTuple):
+    """Поле extra 0x9901: версия AE, стойкость ключа и настоящий метод сжатия"""
+
+    version: int
+    strength: int
+    method: int
+
+
+class AesKeys(NamedTuple):
+    encryption: bytes
+    mac: bytes
+    verifier: bytes
+
+
+def parse_extra(extra) -> Optional[AesField]:
+    """Поле AES из extra элемента или None"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        kind, size = struct.unpack_from('<HH', extra, pos)
+        if kind == EXTRA_AES and size >= 7:
+            version, vendor, strength, method = struct.unpack_from('<H2sBH', extra, pos + 4)
+            if vendor != VENDOR_ID or strength not in KEY_SIZES:
+                raise ArchiveError("Неизвестный вариант шифрования AES")
+            return AesField(version, strength, method)
+        pos += 4 + size
+    return None
+
+
+def build_extra(field: AesField) -> bytes:
+    """Поле extra 0x9901"""
+    return _EXTRA.pack(EXTRA_AES, 7, field.version, VENDOR_ID, field.strength, field.method)
+
+
+def overhead(strength: int = STRENGTH_256) -> int:
+    """Сколько байт добавляет шифрование к сжатым данным"""
+    return SALT_SIZES[strength] + VERIFIER_SIZE + MAC_SIZE
+
+
+def aes_version(file_size: int, crc_known: bool = True) -> int:
+    return AE_1 if crc_known and file_size >= MIN_CRC_SIZE else AE_2
+
+
+_key_cache: 'OrderedDict[Tuple[bytes, bytes, int], AesKeys]' = OrderedDict()
+_key_lock = threading.Lock()
+
+
+def _password_bytes(password) -> bytes:
+    return password.encode('utf-8') if isinstance(password, str) else bytes(password)
+
+
+def derive_keys(password, salt: bytes, strength: int = STRENGTH_256,
+                cache: bool = True) -> AesKeys:
+    """Ключи шифрования и HMAC и проверочное значение (PBKDF2, с кэшем сеанса)"""
+    password = _password_bytes(password)
+    key = (password, bytes(salt), strength)
+    if cache:
+        with _key_lock:
+            keys = _key_cache.get(key)
+            if keys is not None:
+                _key_cache.move_to_end(key)
+        trace.count(trace.cache_counter('aes_keys', keys is not None))
+        if keys is not None:
+            return keys
+    size = KEY_SIZES[strength]
+    with trace.span(trace.PHASE_KEYS):
+        material = hashlib.pbkdf2_hmac('sha1', password, key[1], PBKDF2_ITERATIONS,
+                                       2 * size + VERIFIER_SIZE)
+    keys = AesKeys(material[:size], material[size:2 * size], material[2 * size:])
+    if cache:
+        with _key_lock:
+            _key_cache[key] = keys
+            if len(_key_cache) > KEY_CACHE_SIZE:
+                _key_cache.popitem(last=False)
+    return keys
+
+
+def clear_key_cache():
+    """Забывает выведенные ключи (например, при закрытии сеанса)"""
+    with _key_lock:
+        _key_cache.clear()
+
+
+def unlock(password, header: bytes, strength: int, name: str = '') -> AesKeys:
+    """Ключи элемента по паролю и заголовку (соль + проверочные байты)"""
+    if not password:
+        raise PasswordRequiredError(f"Требуется пароль для {name}" if name else
+                                    "Требуется пароль")
+    salt_size = SALT_SIZES[strength]
+    keys = derive_keys(password, header[:salt_size], strength)
+    if keys.verifier != bytes(header[salt_size:salt_size + VERIFIER_SIZE]):
+        raise PasswordRequiredError(f"Неверный пароль для {name}" if name else "Неверный пароль")
+    return keys
+
+
+def cipher(key: bytes, position: int = 0):
+    """AES-CTR WinZip, начиная с байта position данных (кратного 16)"""
+    aes = backends.load('pycryptodomex')
+    counter = {'counter_len': _BLOCK, 'prefix': b'', 'suffix': b'',
+               'initial_value': position // _BLOCK + 1, 'little_endian': True}
+    return aes.new(key, aes.MODE_CTR, counter=counter)
+
+
+def transform(key: bytes, position: int, data) -> bytes:
+    """Шифрует или расшифровывает (в CTR это одно и то же) кусок с позиции position"""
+    skip = position % _BLOCK
+    ctr = cipher(key, position - skip)
+    if skip:
+        ctr.encrypt(bytes(skip))
+    return ctr.encrypt(data)
+
+
+def fresh_keys(password, strength: int = STRENGTH_256) -> Tuple[bytes, AesKeys]:
+    """Ключи нового элемента со свежей солью и его заголовок (соль + проверочные байты)"""
+    salt = os.urandom(SALT_SIZES[strength])
+    # Соль новая всегда, поэтому в кэш такие ключи не кладутся
+    keys = derive_keys(password, salt, strength, cache=False)
+    return salt + keys.verifier, keys
+
+
+class AesEncryptor:
+    """Потоковое шифрование одного элемента со свежей солью"""
+
+    def __init__(self, password, strength: int = STRENGTH_256):
+        self.strength = strength
+        self._header, keys = fresh_keys(password, strength)
+        self._cipher = cipher(keys.encryption)
+        self._mac = new_mac(keys)
+
+    def header(self) -> bytes:
+        """Соль и проверочные байты - начало данных элемента"""
+        return self._header
+
+    def encrypt(self, data) -> bytes:
+        with trace.span(trace.PHASE_ENCRYPT):
+            out = self._cipher.encrypt(data)
+            self._mac.update(out)
+        return out
+
+    def finish(self) -> bytes:
+        """Код HMAC - конец данных элемента"""
+        return self._mac.digest()[:MAC_SIZE]
+
+
+def encrypt_member(password, data, strength: int = STRENGTH_256) -> bytes:
+    """Зашифрованные данные элемента целиком: заголовок, шифротекст и HMAC"""
+    encryptor = AesEncryptor(password, strength)
+    body = encryptor.encrypt(data)
+    return encryptor.header() + body + encryptor.finish()
+
+
+def new_mac(keys: AesKeys):
+    """HMAC-SHA1 данных элемента"""
+    return hmac.new(keys.mac, digestmod='sha1')
+
+
+def check_mac(mac, expected, name: str = ''):
+    """Сверяет HMAC элемента с 10 байтами из архива"""
+    if not hmac.compare_digest(mac.digest()[:MAC_SIZE], bytes(expected)):
+        raise ArchiveError(f"Неверный код проверки HMAC элемента: {name}")
+
+
+def decrypt_member(password, data, strength: int, name: str = '') -> bytes:
+    """Расшифровывает данные элемента целиком (обратное encrypt_member) и проверяет HMAC"""
+    head = SALT_SIZES[strength] + VERIFIER_SIZE
+    if len(data) < head + MAC_SIZE:
+        raise ArchiveError(f"Данные элемента обрезаны: {name}")
+    keys = unlock(password, data[:head], strength, name)
+    with memoryview(data)[head:len(data) - MAC_SIZE] as body, trace.span(trace.PHASE_DECRYPT):
+        mac = new_mac(keys)
+        mac.update(body)
+        check_mac(mac, data[len(data) - MAC_SIZE:], name)
+        return cipher(keys.encryption).decrypt(body)
+
+
+class DecryptedView:
+    """Расшифровка данных элемента по срезам, как memoryview.
+
+    Срез [a:b] расшифровывается с нужного блока AES, поэтому распаковка
+    может перематывать поток. HMAC проверяется, когда данные прочитаны
+    подряд до конца. Полный срез [:] - новое представление тех же данных.
+    data - memoryview или SpannedView (элемент многотомного архива).
+    """
+
+    def __init__(self, data, keys: AesKeys, strength: int, name: str):
+        self._start = SALT_SIZES[strength] + VERIFIER_SIZE
+        self._size = len(data) - self._start - MAC_SIZE
+        if self._size < 0:
+            raise ArchiveError(f"Данные элемента обрезаны: {name}")
+        self._data = data
+        self._keys = keys
+        self._strength = strength
+        self._name = name
+        self._mac = new_mac(keys)
+        self._checked = 0
+        # Последовательное чтение продолжает тот же шифр без пересоздания
+        self._cipher = None
+        self._next = -1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("Поддерживаются только срезы")
+        if key.start is None and key.stop is None:
+            return DecryptedView(self._data[:], self._keys, self._strength, self._name)
+        start, stop, _ = key.indices(self._size)
+        stop = max(start, stop)
+        chunk = self._data[self._start + start:self._start + stop]
+        with trace.span(trace.PHASE_DECRYPT):
+            if start == self._checked and stop > start:
+                self._mac.update(chunk)
+                self._checked = stop
+                if stop == self._size:
+                    end = self._start + self._size
+                    check_mac(self._mac, self._data[end:end + MAC_SIZE], self._name)
+            if start != self._next:
+                skip = start % _BLOCK
+                self._cipher = cipher(self._keys.encryption, start - skip)
+                if skip:
+                    self._cipher.encrypt(bytes(skip))
+            out = self._cipher.encrypt(chunk)
+            self._next = stop
+        if isinstance(chunk, memoryview):
+            chunk.release()
+        return out
+
+    def release(self):
+        self._data.release()
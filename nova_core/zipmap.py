@@ -0,0 +1,780 @@
+# [file name]: nova_core/zipmap.py
+"""
+Чтение ZIP через отображение файла в память (mmap)
+
+Центральный каталог разбирается прямо из memoryview отображения, без
+объектов ZipInfo: в памяти остается только массив смещений записей
+каталога, а список элементов сразу складывается в MemberStore. Несжатые
+элементы читаются срезами отображения без промежуточных копий, сжатые
+deflate распаковываются прямо из отображенного буфера.
+
+Поддерживаются методы Stored, Deflate и Zstd (93), в том числе под
+шифрованием WinZip AES (расшифровка по срезам, см. zipaes); остальные
+элементы читатель открывает через zipfile. Те же элементы читаются и по
+сети: RangeZip вместо отображения берет диапазоны у RangeReader (см. remote).
+"""
+
+import io
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from array import array
+from itertools import accumulate
+from operator import add
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional
+
+from . import trace, zipaes
+from .codecs import CODEC_ZSTD, Codec, get_codec
+from .errors import ArchiveError, PasswordRequiredError
+from .memberstore import FLAG_DIR, FLAG_ENCRYPTED, MemberStore
+from .streams import CHUNK_SIZE
+from .volumes import VolumeSet, find_volumes
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+METHOD_ZSTD = 93
+MAPPED_METHODS = (METHOD_STORED, METHOD_DEFLATED, METHOD_ZSTD)
+
+_END = struct.Struct('<4s4H2LH')
+_END_SIGNATURE = b'PK\x05\x06'
+_END64_LOCATOR = struct.Struct('<4sLQL')
+_END64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+_END64 = struct.Struct('<4sQ2H2L4Q')
+_END64_SIGNATURE = b'PK\x06\x06'
+_CENTRAL = struct.Struct('<4s4B4HL2L5H2L')
+_CENTRAL_SIGNATURE = b'PK\x01\x02'
+# Длины имени, extra и комментария внутри записи каталога
+_LENGTHS = struct.Struct('<3H')
+_LENGTHS_OFFSET = 28
+_LOCAL = struct.Struct('<4s2B4HL2L2H')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+_MAX_COMMENT = 0xFFFF
+_MARKER32 = 0xFFFFFFFF
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_UTF8 = 0x800
+
+# Таблицы bytes.translate: байт флагов -> FLAG_ENCRYPTED, последний байт имени -> FLAG_DIR
+_ENCRYPTED_TABLE = bytes(FLAG_ENCRYPTED if b & _FLAG_ENCRYPTED else 0 for b in range(256))
+_DIR_TABLE = bytes(FLAG_DIR if b == 0x2F else 0 for b in range(256))
+
+
+def _dos_timestamp(date: int, time_: int) -> float:
+    """Дата DOS в timestamp; неверная дата - NaN, как пустая дата в MemberStore"""
+    try:
+        return time.mktime(((date >> 9) + 1980, (date >> 5) & 0xF, date & 0x1F,
+                            time_ >> 11, (time_ >> 5) & 0x3F, (time_ & 0x1F) * 2, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return math.nan
+
+
+def _zip64_fields(extra, file_size: int, compress_size: int, offset: int):
+    """Подставляет 64-битные значения из поля ZIP64 (0x0001)"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        kind, size = struct.unpack_from('<HH', extra, pos)
+        if kind == 1:
+            values = iter(struct.unpack_from(f'<{size // 8}Q', extra, pos + 4))
+            try:
+                if file_size == _MARKER32:
+                    file_size = next(values)
+                if compress_size == _MARKER32:
+                    compress_size = next(values)
+                if offset == _MARKER32:
+                    offset = next(values)
+            except StopIteration:
+                raise ArchiveError("Поврежденное поле ZIP64") from None
+            break
+        pos += 4 + size
+    return file_size, compress_size, offset
+
+
+def _column(headers: bytes, offset: int, width: int) -> array:
+    """Поле шириной 2 или 4 байта из всех заголовков: срезы с шагом, без цикла Python"""
+    count = len(headers) // _CENTRAL.size
+    data = bytearray(width * count)
+    for i in range(width):
+        data[i::width] = headers[offset + i::_CENTRAL.size]
+    column = array('H' if width == 2 else 'I', data)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _find_end(mm):
+    """Позиция и поля записи конца каталога в хвосте буфера"""
+    size = len(mm)
+    pos = mm.rfind(_END_SIGNATURE, max(0, size - _END.size - _MAX_COMMENT))
+    while pos != -1:
+        if pos + _END.size <= size:
+            fields = _END.unpack_from(mm, pos)
+            if pos + _END.size + fields[7] <= size:
+                return pos, fields
+        pos = mm.rfind(_END_SIGNATURE, max(0, size - _END.size - _MAX_COMMENT), pos)
+    raise ArchiveError("не найден конец центрального каталога")
+
+
+def _read_end(path):
+    """Поля записи конца каталога по хвосту файла (без отображения)"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - _END.size - _MAX_COMMENT))
+        return _find_end(f.read())[1]
+
+
+def zip_volumes(path) -> Optional[List[Path]]:
+    """Тома многотомного ZIP, к которому относится path, или None.
+
+    Соседние файлы .z01, ... считаются томами, только если каталог в
+    последнем томе действительно ссылается на несколько томов.
+    """
+    volumes = find_volumes(path)
+    if volumes is None:
+        return None
+    try:
+        disk = _read_end(volumes[-1])[1]
+    except (ArchiveError, OSError):
+        return None
+    return volumes if disk else None
+
+
+def open_zipfile(path, factory: Callable = zipfile.ZipFile):
+    """zipfile.ZipFile (или AESZipFile) для обычного и многотомного ZIP.
+
+    zipfile не знает о томах: набор читается как один файл, а смещения
+    элементов из пары (том, смещение в томе) пересчитываются в сквозные.
+    """
+    paths = zip_volumes(path)
+    if paths is None:
+        return factory(path)
+    volumes = VolumeSet(paths)
+    archive = factory(volumes.open())
+    # zipfile отсчитал смещения от начала тома с центральным каталогом
+    concat = volumes.starts[_read_end(paths[-1])[2]]
+    for info in archive.infolist():
+        if info.volume >= len(volumes):
+            raise ArchiveError(f"Элемент {info.filename} ссылается на отсутствующий том")
+        info.header_offset += volumes.starts[info.volume] - concat
+    return archive
+
+
+class MappedZip:
+    """ZIP архив, отображенный в память"""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArchiveError("Пустой файл не является ZIP архивом") from None
+        self._view = memoryview(self._mmap)
+        try:
+            self._parse_end()
+            self._scan_directory()
+        except (ArchiveError, struct.error) as e:
+            self.close()
+            raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+        self._names: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _parse_end(self):
+        mm = self._mmap
+        pos, fields = _find_end(mm)
+        cd_size, cd_offset = fields[5], fields[6]
+        directory_end = pos
+        locator = pos - _END64_LOCATOR.size
+        if locator >= 0 and mm[locator:locator + 4] == _END64_LOCATOR_SIGNATURE:
+            record = locator - _END64.size
+            if record < 0 or mm[record:record + 4] != _END64_SIGNATURE:
+                raise ArchiveError("не найдена запись ZIP64")
+            fields = _END64.unpack_from(mm, record)
+            cd_size, cd_offset = fields[8], fields[9]
+            directory_end = record
+        # Данные перед архивом (самораспаковывающиеся архивы) сдвигают все смещения
+        self.concat = directory_end - cd_size - cd_offset
+        if self.concat < 0:
+            raise ArchiveError("неверное смещение центрального каталога")
+        self._start = cd_offset + self.concat
+        self._end = self._start + cd_size
+
+    def _scan_directory(self):
+        """Запоминает только позиции записей каталога"""
+        mm = self._mmap
+        lengths = _LENGTHS.unpack_from
+        records = array('Q')
+        append = records.append
+        pos = self._start
+        end = self._end
+        while pos < end:
+            append(pos)
+            name_len, extra_len, comment_len = lengths(mm, pos + _LENGTHS_OFFSET)
+            pos += _CENTRAL.size + name_len + extra_len + comment_len
+        if pos != end:
+            raise ArchiveError("размер центрального каталога не совпадает с записями")
+        self._records = records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _record(self, index: int):
+        """Поля записи каталога: (флаги, метод, CRC, сжатый и полный размер, смещение)"""
+        pos = self._records[index]
+        fields = _CENTRAL.unpack_from(self._mmap, pos)
+        flags, method, crc = fields[5], fields[6], fields[9]
+        compress_size, file_size = fields[10], fields[11]
+        name_end = pos + _CENTRAL.size + fields[12]
+        offset = fields[18]
+        if _MARKER32 in (compress_size, file_size, offset):
+            extra = self._view[name_end:name_end + fields[13]]
+            file_size, compress_size, offset = _zip64_fields(extra, file_size, compress_size, offset)
+        return flags, method, crc, compress_size, file_size, self._member_offset(fields[15], offset)
+
+    def _member_offset(self, disk: int, offset: int) -> int:
+        """Смещение локального заголовка в файле (disk - номер тома)"""
+        return offset + self.concat
+
+    def _aes_field(self, index: int) -> Optional[zipaes.AesField]:
+        """Поле AES (0x9901) из extra записи каталога"""
+        pos = self._records[index]
+        fields = _CENTRAL.unpack_from(self._mmap, pos)
+        start = pos + _CENTRAL.size + fields[12]
+        return zipaes.parse_extra(self._mmap[start:start + fields[13]])
+
+    def _local_header(self, offset: int):
+        return _LOCAL.unpack_from(self._mmap, offset)
+
+    def _data(self, start: int, size: int):
+        """Сжатые данные элемента как срез отображения"""
+        if start + size > len(self._mmap):
+            return None
+        return self._view[start:start + size]
+
+    @staticmethod
+    def _decode(name: bytes, flags: int) -> str:
+        if flags & _FLAG_UTF8:
+            return name.decode('utf-8', 'surrogateescape')
+        return name.decode('cp437')
+
+    def name_index(self) -> Dict[str, int]:
+        """Словарь имя -> номер записи (строится при первом обращении)"""
+        with self._lock:
+            if self._names is None:
+                names = {}
+                for i in range(len(self._records)):
+                    pos = self._records[i]
+                    fields = _CENTRAL.unpack_from(self._mmap, pos)
+                    raw = self._mmap[pos + _CENTRAL.size:pos + _CENTRAL.size + fields[12]]
+                    # Как и в zipfile, при повторах имени побеждает последняя запись
+                    names[self._decode(raw, fields[5])] = i
+                self._names = names
+            return self._names
+
+    def methods(self):
+        """Множество методов сжатия и признак шифрования в архиве"""
+        methods = set()
+        encrypted = False
+        for pos in self._records:
+            fields = _CENTRAL.unpack_from(self._mmap, pos)
+            methods.add(fields[6])
+            encrypted = encrypted or bool(fields[5] & _FLAG_ENCRYPTED)
+        return methods, encrypted
+
+    def _headers(self) -> bytes:
+        """Заголовки всех записей каталога подряд (без имен и extra)"""
+        size = _CENTRAL.size
+        records = self._records
+        headers = b''.join(map(self._mmap.__getitem__,
+                               map(slice, records, map(size.__add__, records))))
+        count = len(records)
+        for i, byte in enumerate(_CENTRAL_SIGNATURE):
+            if headers[i::size] != bytes((byte,)) * count:
+                raise ArchiveError("неверная подпись записи каталога")
+        return headers
+
+    def member_store(self, method_names: Dict[int, str]) -> MemberStore:
+        """Список элементов сразу в поколоночном виде, без ZipInfo и ArchiveEntry.
+
+        Числовые поля всех записей вынимаются срезами с шагом по склеенным
+        заголовкам, то есть на скорости C; цикл Python нужен только для имен.
+        """
+        mm = self._mmap
+        records = self._records
+        headers = self._headers()
+        flags = _column(headers, 8, 2)
+        # Бит шифрования - младший бит флагов
+        encrypted = headers[8::_CENTRAL.size].translate(_ENCRYPTED_TABLE)
+        method_codes = _column(headers, 10, 2)
+        # Время и дата DOS рядом: ключ date << 16 | time
+        stamps_keys = _column(headers, 12, 4)
+        crcs = array('q', _column(headers, 16, 4))
+        compressed_sizes = array('q', _column(headers, 20, 4))
+        sizes = array('q', _column(headers, 24, 4))
+        name_lens = _column(headers, _LENGTHS_OFFSET, 2)
+        # Права Unix - старшие два байта внешних атрибутов
+        modes = array('I', _column(headers, 40, 2))
+        del headers
+
+        if _MARKER32 in sizes or _MARKER32 in compressed_sizes:
+            for i in range(len(records)):
+                if sizes[i] == _MARKER32 or compressed_sizes[i] == _MARKER32:
+                    _, _, _, compressed_sizes[i], sizes[i], _ = self._record(i)
+
+        # Срезы имен: map по C-функциям вместо цикла Python
+        starts = array('Q', map(_CENTRAL.size.__add__, records))
+        names = list(map(mm.__getitem__, map(slice, starts, map(add, starts, name_lens))))
+        del starts
+        joined = b''.join(names)
+        if not joined.isascii():
+            names = [name if flag & _FLAG_UTF8 or name.isascii()
+                     else name.decode('cp437').encode('utf-8')
+                     for flag, name in zip(flags, names)]
+            joined = b''.join(names)
+        offsets = array('Q', accumulate(map(len, names), initial=0))
+        del names
+        # Папка - имя на '/': последние байты имен выбираются без цикла Python
+        if 0 in name_lens:
+            dirs = bytes(FLAG_DIR if end > begin and joined[end - 1] == 0x2F else 0
+                         for begin, end in zip(offsets, offsets[1:]))
+        else:
+            dirs = bytes(map(joined.__getitem__, map((-1).__add__, offsets[1:])))
+            dirs = dirs.translate(_DIR_TABLE)
+        flag_column = array('B', (int.from_bytes(dirs, 'little') |
+                                  int.from_bytes(encrypted, 'little')
+                                  ).to_bytes(len(records), 'little'))
+        names = bytearray(joined)
+        del joined
+
+        # Одинаковые даты в архиве встречаются часто, mktime вызывается по разу
+        stamps = {key: _dos_timestamp(key >> 16, key & 0xFFFF) for key in set(stamps_keys)}
+        mtimes = array('d', map(stamps.__getitem__, stamps_keys))
+        codes = sorted(set(method_codes))
+        code_ids = {code: i for i, code in enumerate(codes)}
+        method_ids = array('B', map(code_ids.__getitem__, method_codes))
+        methods = [method_names.get(code) or str(code) for code in codes]
+        return MemberStore.from_columns(names, offsets, sizes, compressed_sizes, mtimes, crcs,
+                                        flag_column, method_ids, methods, modes)
+
+    def _locate(self, name: str):
+        index = self._index(name)
+        flags, method, crc, compress_size, file_size, offset = self._record(index)
+        local = self._local_header(offset)
+        if local[0] != _LOCAL_SIGNATURE:
+            raise ArchiveError(f"Поврежден локальный заголовок: {name}")
+        start = offset + _LOCAL.size + local[10] + local[11]
+        data = self._data(start, compress_size)
+        if data is None:
+            raise ArchiveError(f"Данные элемента обрезаны: {name}")
+        return flags, method, crc, file_size, data
+
+    def _index(self, name: str) -> int:
+        index = self.name_index().get(name)
+        if index is None:
+            raise ArchiveError(f"Элемент не найден в архиве: {name}")
+        return index
+
+    def can_open(self, name: str) -> bool:
+        """Читается ли элемент из отображения: Stored/Deflate/Zstd, открытый или под AES"""
+        index = self.name_index().get(name)
+        if index is None:
+            return False
+        flags, method = self._record(index)[:2]
+        if not flags & _FLAG_ENCRYPTED:
+            return method in MAPPED_METHODS
+        if method != zipaes.METHOD_AES:
+            return False
+        try:
+            field = self._aes_field(index)
+        except ArchiveError:
+            return False
+        return field is not None and field.method in MAPPED_METHODS
+
+    def view(self, name: str) -> memoryview:
+        """Данные несжатого элемента как срез отображения, без копирования"""
+        flags, method, _, _, data = self._locate(name)
+        if method != METHOD_STORED or flags & _FLAG_ENCRYPTED:
+            data.release()
+            raise ArchiveError(f"Элемент сжат или зашифрован: {name}")
+        return data
+
+    def open(self, name: str, password: Optional[str] = None) -> IO[bytes]:
+        """Открывает элемент как буферизованный поток (AES - с паролем password)"""
+        flags, method, crc, file_size, data = self._locate(name)
+        if flags & _FLAG_ENCRYPTED and method == zipaes.METHOD_AES:
+            try:
+                field = self._aes_field(self._index(name))
+                if field is None:
+                    raise ArchiveError(f"Нет поля AES у зашифрованного элемента: {name}")
+                header = bytes(data[:zipaes.SALT_SIZES[field.strength] + zipaes.VERIFIER_SIZE])
+                keys = zipaes.unlock(password, header, field.strength, name)
+                data = zipaes.DecryptedView(data, keys, field.strength, name)
+            except BaseException:
+                data.release()
+                raise
+            method = field.method
+            # AE-2 не хранит CRC, целостность проверяет HMAC
+            if field.version == zipaes.AE_2:
+                crc = None
+        elif flags & _FLAG_ENCRYPTED:
+            data.release()
+            raise PasswordRequiredError(f"Шифрование ZipCrypto не читается из отображения: {name}")
+        if method not in MAPPED_METHODS:
+            data.release()
+            raise ArchiveError(f"Метод сжатия {method} не читается из отображения: {name}")
+        if method == METHOD_STORED:
+            raw = _StoredStream(data, crc, name)
+        elif method == METHOD_DEFLATED:
+            raw = _InflateStream(data, file_size, crc, name)
+        else:
+            raw = _CodecStream(get_codec(CODEC_ZSTD), data, file_size, crc, name)
+        return io.BufferedReader(raw, CHUNK_SIZE)
+
+    def close(self):
+        self._names = None
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Открытые потоки еще держат срезы; отображение освободит сборщик мусора
+            pass
+
+
+
+class SplitZip(MappedZip):
+    """Многотомный ZIP (.z01, .z02, ..., .zip) поверх набора томов.
+
+    Центральный каталог читается из последних томов, смещения элементов в
+    нем отсчитываются от начала их тома. Данные элемента - срез
+    отображения его тома (SpannedView, если элемент продолжается в
+    следующих), поэтому остальные тома не открываются.
+    """
+
+    def __init__(self, volumes: VolumeSet):
+        self.path = os.fspath(volumes.paths[-1])
+        self.volumes = volumes
+        try:
+            self._parse_end()
+            self._scan_directory()
+        except (ArchiveError, struct.error) as e:
+            volumes.close()
+            raise ArchiveError(f"Поврежденный многотомный ZIP: {e}") from e
+        self._names: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _parse_end(self):
+        volumes = self.volumes
+        last = len(volumes) - 1
+        mm = volumes.mapping(last)
+        pos, fields = _find_end(mm)
+        disk, cd_disk, cd_size, cd_offset = fields[1], fields[2], fields[5], fields[6]
+        locator = pos - _END64_LOCATOR.size
+        if locator >= 0 and mm[locator:locator + 4] == _END64_LOCATOR_SIGNATURE:
+            _, record_disk, record_offset, _ = _END64_LOCATOR.unpack_from(mm, locator)
+            if record_disk > last:
+                raise ArchiveError("не найдена запись ZIP64")
+            record = volumes.read(volumes.starts[record_disk] + record_offset, _END64.size)
+            if record[:4] != _END64_SIGNATURE or len(record) != _END64.size:
+                raise ArchiveError("не найдена запись ZIP64")
+            fields = _END64.unpack(record)
+            disk, cd_disk, cd_size, cd_offset = fields[4], fields[5], fields[8], fields[9]
+        if disk != last:
+            raise ArchiveError(f"найдено томов: {last + 1}, а в архиве их {disk + 1}")
+        if cd_disk > last:
+            raise ArchiveError("неверный том центрального каталога")
+        # Каталог невелик по сравнению с данными и может лежать в двух томах
+        directory = volumes.read(volumes.starts[cd_disk] + cd_offset, cd_size)
+        if len(directory) != cd_size:
+            raise ArchiveError("центральный каталог обрезан")
+        self._mmap = directory
+        self._view = memoryview(directory)
+        self.concat = 0
+        self._start, self._end = 0, cd_size
+
+    def _member_offset(self, disk: int, offset: int) -> int:
+        if disk >= len(self.volumes):
+            raise ArchiveError(f"Элемент ссылается на отсутствующий том {disk + 1}")
+        return self.volumes.starts[disk] + offset
+
+    def _local_header(self, offset: int):
+        header = self.volumes.read(offset, _LOCAL.size)
+        if len(header) != _LOCAL.size:
+            raise ArchiveError("Локальный заголовок за концом архива")
+        return _LOCAL.unpack(header)
+
+    def _data(self, start: int, size: int):
+        if start + size > self.volumes.size:
+            return None
+        return self.volumes.view(start, size)
+
+    def close(self):
+        self._names = None
+        self._view.release()
+        self.volumes.close()
+
+
+class RangeZip(MappedZip):
+    """ZIP, читаемый по диапазонам (RangeReader: архив на сервере).
+
+    Хвост с записью конца каталога и сам каталог читаются в память, а
+    данные элемента - RangeView, который запрашивает блоки по мере
+    распаковки. Остальной архив не читается.
+    """
+
+    def __init__(self, source):
+        self.path = source.name
+        self.source = source
+        try:
+            self._parse_end()
+            self._scan_directory()
+        except (ArchiveError, struct.error) as e:
+            raise ArchiveError(f"Поврежденный ZIP архив: {e}") from e
+        self._names: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _parse_end(self):
+        source = self.source
+        tail_start = max(0, source.size - _END.size - _MAX_COMMENT)
+        tail = source.read(tail_start, source.size - tail_start)
+        pos, fields = _find_end(tail)
+        cd_size, cd_offset = fields[5], fields[6]
+        directory_end = tail_start + pos
+        locator = pos - _END64_LOCATOR.size
+        if locator >= 0 and tail[locator:locator + 4] == _END64_LOCATOR_SIGNATURE:
+            record_offset = directory_end - _END64_LOCATOR.size - _END64.size
+            record = source.read(max(0, record_offset), _END64.size)
+            if record_offset < 0 or record[:4] != _END64_SIGNATURE:
+                raise ArchiveError("не найдена запись ZIP64")
+            fields = _END64.unpack(record)
+            cd_size, cd_offset = fields[8], fields[9]
+            directory_end = record_offset
+        self.concat = directory_end - cd_size - cd_offset
+        if self.concat < 0:
+            raise ArchiveError("неверное смещение центрального каталога")
+        directory = source.read(cd_offset + self.concat, cd_size)
+        if len(directory) != cd_size:
+            raise ArchiveError("центральный каталог обрезан")
+        self._mmap = directory
+        self._view = memoryview(directory)
+        self._start, self._end = 0, cd_size
+
+    def _local_header(self, offset: int):
+        header = self.source.read(offset, _LOCAL.size)
+        if len(header) != _LOCAL.size:
+            raise ArchiveError("Локальный заголовок за концом архива")
+        return _LOCAL.unpack(header)
+
+    def _data(self, start: int, size: int):
+        if start + size > self.source.size:
+            return None
+        return self.source.view(start, size)
+
+    def close(self):
+        # Источник принадлежит тому, кто его открыл
+        self._names = None
+        self._view.release()
+
+
+class _StoredStream(io.RawIOBase):
+    """Несжатый элемент: чтение прямо из среза отображения"""
+
+    def __init__(self, data: memoryview, crc: Optional[int], name: str):
+        super().__init__()
+        self._data = data
+        self._crc = crc
+        self._name = name
+        self._pos = 0
+        # CRC проверяется при последовательном чтении до конца
+        self._checked = 0
+        self._running = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._data)
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        self._pos = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        chunk = self._data[self._pos:self._pos + len(buffer)]
+        count = len(chunk)
+        buffer[:count] = chunk
+        trace.count(trace.BYTES_IN, count)
+        if self._crc is not None and self._pos == self._checked and count:
+            self._running = zlib.crc32(chunk, self._running)
+            self._checked += count
+            if self._checked == len(self._data) and self._running != self._crc:
+                raise ArchiveError(f"Неверная CRC элемента: {self._name}")
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._data.release()
+        super().close()
+
+
+class _InflateStream(io.RawIOBase):
+    """Элемент deflate: распаковка прямо из отображенного буфера"""
+
+    def __init__(self, data: memoryview, size: int, crc: Optional[int], name: str):
+        super().__init__()
+        self._data = data
+        self._size = size
+        self._crc = crc
+        self._name = name
+        self._rewind()
+
+    def _rewind(self):
+        self._inflater = zlib.decompressobj(-15)
+        self._in_pos = 0
+        self._tail = b''
+        self._pos = 0
+        self._running = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        # Назад - распаковка с начала, вперед - пропуск данных
+        if offset < self._pos:
+            self._rewind()
+        skip = bytearray(CHUNK_SIZE)
+        while self._pos < offset:
+            if not self.readinto(memoryview(skip)[:offset - self._pos]):
+                break
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        want = len(buffer)
+        while want and self._pos < self._size:
+            source = self._tail
+            if not source:
+                if self._in_pos >= len(self._data):
+                    raise ArchiveError(f"Данные элемента обрезаны: {self._name}")
+                source = self._data[self._in_pos:self._in_pos + CHUNK_SIZE]
+                self._in_pos += len(source)
+                trace.count(trace.BYTES_IN, len(source))
+            # Страницы отображения подгружаются с диска прямо во время распаковки
+            with trace.span(trace.PHASE_DECOMPRESS):
+                out = self._inflater.decompress(source, want)
+            self._tail = self._inflater.unconsumed_tail
+            if out:
+                count = len(out)
+                buffer[:count] = out
+                self._running = zlib.crc32(out, self._running)
+                self._pos += count
+                if (self._pos >= self._size and self._crc is not None and
+                        self._running != self._crc):
+                    raise ArchiveError(f"Неверная CRC элемента: {self._name}")
+                return count
+            if self._inflater.eof:
+                break
+        if self._pos < self._size and want:
+            raise ArchiveError(f"Данные элемента обрезаны: {self._name}")
+        return 0
+
+    def close(self):
+        if not self.closed:
+            self._data.release()
+        super().close()
+
+
+class _CodecStream(io.RawIOBase):
+    """Элемент, сжатый внешним кодеком (zstd): распаковка из отображенного буфера"""
+
+    def __init__(self, codec: Codec, data: memoryview, size: int, crc: Optional[int],
+                 name: str):
+        super().__init__()
+        self._codec = codec
+        self._data = data
+        self._size = size
+        self._crc = crc
+        self._name = name
+        self._reader = None
+        self._rewind()
+
+    def _rewind(self):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = self._codec.reader(_StoredStream(self._data[:], None, self._name))
+        self._pos = 0
+        self._running = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция")
+        if offset < self._pos:
+            self._rewind()
+        skip = bytearray(CHUNK_SIZE)
+        while self._pos < offset:
+            if not self.readinto(memoryview(skip)[:offset - self._pos]):
+                break
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if not len(buffer) or self._pos >= self._size:
+            return 0
+        try:
+            with trace.span(trace.PHASE_DECOMPRESS):
+                count = self._reader.readinto(buffer)
+        except ArchiveError:
+            raise
+        except Exception as e:
+            raise ArchiveError(f"Поврежденные данные элемента {self._name}: {e}") from e
+        if not count:
+            raise ArchiveError(f"Данные элемента обрезаны: {self._name}")
+        self._running = zlib.crc32(memoryview(buffer)[:count], self._running)
+        self._pos += count
+        if self._pos >= self._size and self._crc is not None and self._running != self._crc:
+            raise ArchiveError(f"Неверная CRC элемента: {self._name}")
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._reader.close()
+            self._data.release()
+        super().close()
@@ -0,0 +1,614 @@
+# [file name]: nova_core/zipwriter.py
+"""
+Запись ZIP (.zip, .sntr, .nv) с параллельным сжатием на всех ядрах
+
+Элементы сжимаются в пуле потоков (zlib отпускает GIL), а затем в исходном
+порядке сшиваются в один корректный ZIP: локальные заголовки с точными
+размерами и CRC, ZIP64 при необходимости и центральный каталог.
+Большие файлы режутся на блоки, которые сжимаются независимо (как в pigz):
+блоки заканчиваются Z_SYNC_FLUSH, а последние 32 КБ предыдущего блока
+используются как словарь, поэтому результат - обычный deflate-поток.
+
+Метод сжатия выбирается кодеком (deflate или zstd - ZIP метод 93, блоки
+zstd - отдельные кадры подряд). Уже сжатые файлы (auto_store) сохраняются
+без сжатия по пробе первого блока.
+
+С паролем элементы шифруются WinZip AES-256 (см. zipaes): маленькие
+элементы - в тех же потоках пула сразу после сжатия, большие - блоками по
+мере записи (HMAC элемента считается последовательно).
+
+С volume_size архив пишется томами (.z01, .z02, ..., .zip): смещения в
+каталоге отсчитываются от начала тома, заголовки и записи каталога не
+разрезаются границей тома, а данные элемента могут продолжаться в
+следующем.
+"""
+
+import io
+import os
+import stat
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Callable, Deque, List, Optional, Tuple
+
+from . import backends, trace, zipaes
+from .codecs import (CODEC_DEFLATE, CODECS, SAMPLE_SIZE, Codec, codec_for_zip_method,
+                     get_codec, should_store)
+from .entries import ArchiveEntry
+from .errors import ArchiveError
+from .streams import normalize_member_name
+from .volumes import VolumeWriter
+
+# Размер блока параллельного сжатия; файлы не больше блока сжимаются целиком
+BLOCK_SIZE = 4 * 1024 * 1024
+# Размер словаря deflate, переносимого между блоками
+DICT_SIZE = 32 * 1024
+# Мелкие файлы из памяти (add_data) сжимаются пачками: одна задача пула
+# на SMALL_BATCH_FILES файлов или SMALL_BATCH_BYTES байт
+SMALL_BATCH_FILES = 64
+SMALL_BATCH_BYTES = 1024 * 1024
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Пороги перехода на ZIP64 и значения-маркеры "смотри ZIP64 extra"
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+_MARKER32 = 0xFFFFFFFF
+_MARKER16 = 0xFFFF
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+# Старший байт "version made by": 3 - Unix (атрибуты в external_attr)
+CREATE_SYSTEM = 3
+
+FLAG_ENCRYPTED = 0x01
+FLAG_UTF8 = 0x800
+
+# Первые байты первого тома и метка архива, уместившегося в один том
+SPLIT_SIGNATURE = b'PK\x07\x08'
+SINGLE_VOLUME_SIGNATURE = b'PK00'
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_END_RECORD64 = struct.Struct('<IQHHIIQQQQ')
+_END_LOCATOR64 = struct.Struct('<IIQI')
+
+
+def _gf2_times(matrix: List[int], vector: int) -> int:
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+
+def _gf2_square(matrix: List[int]) -> List[int]:
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    """CRC32 склейки двух блоков по их CRC (перенос crc32_combine из zlib)"""
+    if len2 <= 0:
+        return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
+
+
+def dos_date_time(mtime: Optional[float]):
+    """Дата и время в формате MS-DOS (не раньше 1980 года)"""
+    t = time.localtime(mtime if mtime is not None else time.time())
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def compress_block(data, level: int, final: bool, zdict: Optional[bytes] = None,
+                   codec: Optional[Codec] = None, long_distance: bool = False):
+    """Сжимает блок (по умолчанию raw deflate), возвращает (сжатые данные, crc32, длина)"""
+    codec = codec or CODECS[CODEC_DEFLATE]
+    with trace.span(trace.PHASE_COMPRESS):
+        out = codec.compress_block(data, level, final, zdict, long_distance)
+        crc = zlib.crc32(data)
+    return out, crc, len(data)
+
+
+def _version_needed(method: int, zip64: bool) -> int:
+    version = VERSION_ZIP64 if zip64 else VERSION_DEFAULT
+    if method == zipaes.METHOD_AES:
+        return max(version, zipaes.VERSION_AES)
+    codec = codec_for_zip_method(method)
+    return max(version, codec.zip_version if codec is not None else VERSION_DEFAULT)
+
+
+class _Member:
+    """Элемент, ожидающий записи.
+
+    Маленький элемент - одна задача сжатия, пишется целиком. Потоковый
+    элемент - очередь блоков: заголовок пишется заранее, блоки - по мере
+    готовности, а CRC и размеры дописываются в заголовок в конце.
+    """
+
+    __slots__ = ('name', 'flags', 'dos_time', 'dos_date', 'external_attr', 'is_dir',
+                 'job', 'blocks', 'sealed', 'zip64', 'offset', 'method', 'crc',
+                 'file_size', 'compress_size', 'on_chunk', 'extra', 'version', 'create_system',
+                 'encryptor')
+
+    def __init__(self, name: bytes, flags: int, mtime: Optional[float],
+                 external_attr: int, is_dir: bool = False):
+        self.name = name
+        self.flags = flags
+        self.dos_time, self.dos_date = dos_date_time(mtime)
+        self.external_attr = external_attr
+        self.is_dir = is_dir
+        self.job: Optional[Future] = None
+        self.blocks: Optional[Deque[Future]] = None
+        self.sealed = False
+        self.zip64 = False
+        self.offset = None
+        self.method = ZIP_DEFLATED
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self.on_chunk: Optional[Callable[[int], None]] = None
+        # Поля центрального каталога, сохраняемые у элементов существующего архива
+        self.extra = b''
+        self.version = VERSION_DEFAULT
+        self.create_system = CREATE_SYSTEM
+        # Шифрование потокового элемента (с паролем)
+        self.encryptor: Optional[zipaes.AesEncryptor] = None
+
+
+class _BatchJob:
+    """Результат одного элемента из общей задачи пула (пачка мелких файлов)"""
+
+    __slots__ = ('_future', '_index')
+
+    def __init__(self, future: Future, index: int):
+        self._future = future
+        self._index = index
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self):
+        return self._future.result()[self._index]
+
+    def cancel(self) -> bool:
+        return self._future.cancel()
+
+
+class ParallelZipWriter:
+    """Запись ZIP архива с параллельным сжатием элементов.
+
+    Элементы можно добавлять сразу: сжатие идет в фоне, запись на диск -
+    в порядке добавления. Объем несжатых данных в работе ограничен
+    max_pending_bytes, поэтому память не зависит от размера архива.
+    password включает шифрование AES-256 всех файлов (папки не шифруются).
+    """
+
+    def __init__(self, path, level: Optional[int] = None, workers: Optional[int] = None,
+                 max_pending_bytes: Optional[int] = None, block_size: int = BLOCK_SIZE,
+                 codec: str = CODEC_DEFLATE, auto_store: bool = True,
+                 long_distance: bool = False, volume_size: Optional[int] = None,
+                 password: Optional[str] = None):
+        if password:
+            # Без библиотеки AES архив не начинаем, а не падаем на первом файле
+            backends.load('pycryptodomex')
+        self.password = password or None
+        self.path = Path(path)
+        self.codec = get_codec(codec)
+        if self.codec.zip_method is None:
+            raise ArchiveError(f"Метод сжатия {codec} не поддерживается в ZIP")
+        self.level = self.codec.clamp(level)
+        self.auto_store = auto_store
+        self.long_distance = long_distance
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.block_size = block_size
+        self.volume_size = volume_size
+        self.max_pending_bytes = max_pending_bytes or self.workers * block_size * 4
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='nova-zip')
+        self._queue: Deque[_Member] = deque()
+        self._pending_bytes = 0
+        # Мелкие элементы, еще не отданные пулу: (элемент, данные, имя)
+        self._batch: List[Tuple[_Member, bytes, str]] = []
+        self._batch_bytes = 0
+        self._records: List[_Member] = []
+        self._closed = False
+        self._file = self._open()
+
+    def _open(self) -> IO[bytes]:
+        """Открывает файл архива; элементы пишутся с текущей позиции"""
+        if self.volume_size:
+            volumes = VolumeWriter(self.path, self.volume_size)
+            volumes.write(SPLIT_SIGNATURE)
+            return volumes
+        return open(self.path, 'wb')
+
+    def _reserve(self, size: int):
+        """Запись size байт не должна пересекать границу тома"""
+        if self.volume_size:
+            self._file.reserve(size)
+
+    def _locate(self, offset: int):
+        """Сквозное смещение -> (номер тома, смещение в томе)"""
+        if self.volume_size:
+            return self._file.locate(offset)
+        return 0, offset
+
+    # ----- добавление элементов -----
+
+    @staticmethod
+    def _encode_name(name: str):
+        name = normalize_member_name(name) + ('/' if name.endswith(('/', '\\')) else '')
+        try:
+            return name.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return name.encode('utf-8'), FLAG_UTF8
+
+    def _check_open(self):
+        if self._closed:
+            raise ArchiveError("Архив уже закрыт")
+
+    def add_dir(self, arcname: str, mtime: Optional[float] = None):
+        """Добавляет запись папки"""
+        self._check_open()
+        name, flags = self._encode_name(arcname.rstrip('/') + '/')
+        self._queue.append(_Member(name, flags, mtime, (0o40755 << 16) | 0x10, is_dir=True))
+        self._drain(self.max_pending_bytes)
+
+    def add_file(self, src_path, arcname: str,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл с диска; маленькие файлы читаются прямо в потоках пула"""
+        self._check_open()
+        st = os.stat(src_path)
+        if st.st_size > self.block_size:
+            entry = ArchiveEntry(name=arcname, size=st.st_size, mtime=st.st_mtime)
+            with open(src_path, 'rb') as src:
+                self.add_stream(entry, src, on_chunk, mode=st.st_mode)
+            return
+
+        name, flags = self._encode_name(arcname)
+        member = _Member(name, flags, st.st_mtime, ((st.st_mode & 0xFFFF) or 0o100644) << 16)
+        member.on_chunk = on_chunk
+        member.file_size = st.st_size
+        member.job = self._executor.submit(self._compress_file, src_path, arcname)
+        self._pending_bytes += st.st_size
+        self._queue.append(member)
+        self._drain(self.max_pending_bytes)
+
+    def add_data(self, arcname: str, data: bytes, st: Optional[os.stat_result] = None,
+                 on_chunk: Optional[Callable[[int], None]] = None):
+        """Добавляет файл, уже прочитанный в память; st - его stat с диска"""
+        self._check_open()
+        if len(data) > self.block_size:
+            entry = ArchiveEntry(name=arcname, size=len(data),
+                                 mtime=st.st_mtime if st is not None else None)
+            self.add_stream(entry, io.BytesIO(data), on_chunk,
+                            mode=st.st_mode if st is not None else 0o100644)
+            return
+
+        name, flags = self._encode_name(arcname)
+        mode = st.st_mode if st is not None else 0o100644
+        member = _Member(name, flags, st.st_mtime if st is not None else None,
+                         ((mode & 0xFFFF) or 0o100644) << 16)
+        member.on_chunk = on_chunk
+        member.file_size = len(data)
+        self._pending_bytes += len(data)
+        self._queue.append(member)
+        # Задача пула на каждый крошечный файл стоит дороже его сжатия
+        self._batch.append((member, data, arcname))
+        self._batch_bytes += len(data)
+        if len(self._batch) >= SMALL_BATCH_FILES or self._batch_bytes >= SMALL_BATCH_BYTES:
+            self._submit_batch()
+        self._drain(self.max_pending_bytes)
+
+    def _submit_batch(self):
+        if not self._batch:
+            return
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        future = self._executor.submit(self._compress_batch,
+                                       [(data, arcname) for _, data, arcname in batch])
+        for index, (member, _, _) in enumerate(batch):
+            member.job = _BatchJob(future, index)
+
+    def _compress_batch(self, items: List[Tuple[bytes, str]]):
+        return [self._compress_data(data, arcname) for data, arcname in items]
+
+    def add_stream(self, entry: ArchiveEntry, stream: IO[bytes],
+                   on_chunk: Optional[Callable[[int], None]] = None, mode: Optional[int] = None):
+        """Добавляет элемент из потока, разбивая его на блоки для параллельного сжатия.
+
+        entry.size - ожидаемый размер: по нему заранее решается, нужен ли ZIP64.
+        mode - st_mode файла; без него берутся права из entry (конвертация).
+        """
+        self._check_open()
+        if mode is None:
+            mode = stat.S_IFREG | stat.S_IMODE(entry.mode) if entry.mode else 0o100644
+        name, flags = self._encode_name(entry.name)
+        member = _Member(name, flags, entry.mtime, ((mode & 0xFFFF) or 0o100644) << 16)
+        member.on_chunk = on_chunk
+        member.blocks = deque()
+        # Сжатые данные могут оказаться чуть больше исходных, берем запас
+        member.zip64 = entry.size + entry.size // 100 + 1024 >= ZIP64_LIMIT
+        self._queue.append(member)
+
+        previous = b''
+        block = stream.read(self.block_size)
+        codec = self.codec
+        if self.auto_store and should_store(block[:SAMPLE_SIZE], entry.name):
+            codec = CODECS['store']
+        member.method = codec.zip_method
+        if self.password:
+            member.method = self._encrypted(member, member.method, entry.size)
+            member.encryptor = zipaes.AesEncryptor(self.password)
+        while True:
+            following = stream.read(self.block_size) if block else b''
+            final = not following
+            zdict = previous[-DICT_SIZE:] if previous else None
+            member.blocks.append(self._executor.submit(compress_block, block, self.level, final,
+                                                       zdict, codec, self.long_distance))
+            self._pending_bytes += len(block)
+            self._drain(self.max_pending_bytes)
+            if final:
+                break
+            previous, block = block, following
+        member.sealed = True
+        self._drain(self.max_pending_bytes)
+
+    def _compress_file(self, src_path, arcname: str = ''):
+        with trace.span(trace.PHASE_READ):
+            with open(src_path, 'rb') as f:
+                data = f.read()
+        return self._compress_data(data, arcname)
+
+    def _compress_data(self, data: bytes, arcname: str = ''):
+        if self.auto_store and should_store(data[:SAMPLE_SIZE], arcname):
+            return self._seal(data, zlib.crc32(data), len(data), ZIP_STORED)
+        with trace.span(trace.PHASE_COMPRESS):
+            compressed = self.codec.compress(data, self.level, self.long_distance)
+        # Несжимаемые данные выгоднее сохранить как есть
+        if len(compressed) >= len(data):
+            return self._seal(data, zlib.crc32(data), len(data), ZIP_STORED)
+        return self._seal(compressed, zlib.crc32(data), len(data), self.codec.zip_method)
+
+    def _seal(self, data, crc: int, size: int, method: int):
+        """Шифрует сжатые данные элемента (с паролем) в том же потоке пула"""
+        if self.password:
+            data = zipaes.encrypt_member(self.password, data)
+        return data, crc, size, method
+
+    @staticmethod
+    def _encrypted(member: _Member, method: int, size: int) -> int:
+        """Помечает элемент как зашифрованный AES, возвращает метод 99"""
+        field = zipaes.AesField(zipaes.aes_version(size), zipaes.STRENGTH_256, method)
+        member.flags |= FLAG_ENCRYPTED
+        member.extra = zipaes.build_extra(field)
+        return zipaes.METHOD_AES
+
+    # ----- запись -----
+
+    def _drain(self, limit: int):
+        """Пишет готовые элементы по порядку; пока объем в работе выше limit - ждет их"""
+        while self._queue:
+            head = self._queue[0]
+            if head.blocks is None:
+                if head.job is None and not head.is_dir:
+                    # Элемент ждет в неотправленной пачке мелких файлов
+                    self._submit_batch()
+                if head.job is not None and not head.job.done() and self._pending_bytes <= limit:
+                    return
+                self._write_whole(head)
+                self._queue.popleft()
+                continue
+
+            if head.offset is None:
+                self._write_local_header(head, head.method)
+                if head.encryptor is not None:
+                    header = head.encryptor.header()
+                    self._file.write(header)
+                    head.compress_size += len(header)
+            while head.blocks and (head.blocks[0].done() or self._pending_bytes > limit):
+                data, block_crc, block_len = head.blocks.popleft().result()
+                if head.encryptor is not None:
+                    data = head.encryptor.encrypt(data)
+                with trace.span(trace.PHASE_WRITE):
+                    self._file.write(data)
+                trace.count(trace.BYTES_OUT, len(data))
+                head.crc = crc32_combine(head.crc, block_crc, block_len)
+                head.file_size += block_len
+                head.compress_size += len(data)
+                self._pending_bytes -= block_len
+                if head.on_chunk is not None and block_len:
+                    head.on_chunk(block_len)
+            if not (head.sealed and not head.blocks):
+                return
+            self._finish_stream(head)
+            self._queue.popleft()
+
+    def _write_local_header(self, member: _Member, method: int):
+        extra = b''
+        if member.zip64:
+            extra = struct.pack('<HHQQ', 1, 16, member.file_size, member.compress_size)
+        # Новые элементы несут в extra только поле AES, оно нужно и в локальном заголовке
+        extra += member.extra
+        self._reserve(_LOCAL_HEADER.size + len(member.name) + len(extra))
+        member.offset = self._file.tell()
+        size_field = _MARKER32 if member.zip64 else member.file_size
+        compress_field = _MARKER32 if member.zip64 else member.compress_size
+        member.version = _version_needed(method, member.zip64)
+        self._file.write(_LOCAL_HEADER.pack(
+            0x04034B50, member.version, member.flags,
+            method, member.dos_time, member.dos_date, member.crc,
+            compress_field, size_field, len(member.name), len(extra)))
+        self._file.write(member.name)
+        self._file.write(extra)
+        member.method = method
+        self._records.append(member)
+
+    def _write_whole(self, member: _Member):
+        expected = member.file_size
+        if member.is_dir:
+            data, method = b'', ZIP_STORED
+        else:
+            data, member.crc, member.file_size, method = member.job.result()
+            member.job = None
+            if self.password:
+                method = self._encrypted(member, method, member.file_size)
+                if zipaes.parse_extra(member.extra).version == zipaes.AE_2:
+                    member.crc = 0
+        member.compress_size = len(data)
+        member.zip64 = member.file_size >= ZIP64_LIMIT or member.compress_size >= ZIP64_LIMIT
+        self._write_local_header(member, method)
+        with trace.span(trace.PHASE_WRITE):
+            self._file.write(data)
+        trace.count(trace.BYTES_OUT, len(data))
+        self._pending_bytes -= expected
+        if member.on_chunk is not None and member.file_size:
+            member.on_chunk(member.file_size)
+
+    def _finish_stream(self, member: _Member):
+        """Дописывает CRC и размеры в локальный заголовок потокового элемента"""
+        if member.encryptor is not None:
+            mac = member.encryptor.finish()
+            self._file.write(mac)
+            member.compress_size += len(mac)
+            member.encryptor = None
+            if zipaes.parse_extra(member.extra).version == zipaes.AE_2:
+                member.crc = 0
+        if not member.zip64 and (member.file_size >= ZIP64_LIMIT or
+                                 member.compress_size >= ZIP64_LIMIT):
+            raise ArchiveError(f"Элемент больше заявленного размера, нужен ZIP64: "
+                               f"{member.name.decode('utf-8', 'replace')}")
+        end = self._file.tell()
+        self._file.seek(member.offset + 14)
+        if member.zip64:
+            self._file.write(struct.pack('<I', member.crc))
+            self._file.seek(member.offset + _LOCAL_HEADER.size + len(member.name) + 4)
+            self._file.write(struct.pack('<QQ', member.file_size, member.compress_size))
+        else:
+            self._file.write(struct.pack('<III', member.crc, member.compress_size, member.file_size))
+        self._file.seek(end)
+
+    def _write_central_directory(self):
+        start = None
+        disks = []
+        for record in self._records:
+            fields = []
+            disk, offset = self._locate(record.offset)
+            file_size, compress_size = record.file_size, record.compress_size
+            if file_size >= ZIP64_LIMIT:
+                fields.append(file_size)
+                file_size = _MARKER32
+            if compress_size >= ZIP64_LIMIT:
+                fields.append(compress_size)
+                compress_size = _MARKER32
+            if offset >= ZIP64_LIMIT:
+                fields.append(offset)
+                offset = _MARKER32
+            extra = b''
+            if fields:
+                extra = struct.pack('<HH', 1, 8 * len(fields)) + struct.pack(f'<{len(fields)}Q', *fields)
+            extra += record.extra
+            version = max(record.version, VERSION_ZIP64 if fields else VERSION_DEFAULT)
+            self._reserve(_CENTRAL_HEADER.size + len(record.name) + len(extra))
+            if start is None:
+                start = self._file.tell()
+            disks.append(self._locate(self._file.tell())[0])
+            self._file.write(_CENTRAL_HEADER.pack(
+                0x02014B50, (record.create_system << 8) | version, version, record.flags,
+                record.method, record.dos_time, record.dos_date, record.crc,
+                compress_size, file_size, len(record.name), len(extra), 0, disk, 0,
+                record.external_attr, offset))
+            self._file.write(record.name)
+            self._file.write(extra)
+        end = self._file.tell()
+        start = end if start is None else start
+
+        count = len(self._records)
+        size = end - start
+        cd_disk, cd_offset = self._locate(start)
+        zip64 = count >= ZIP_MAX_ENTRIES or size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT
+        # Записи конца каталога лежат в последнем томе целиком
+        self._reserve(_END_RECORD.size + (_END_RECORD64.size + _END_LOCATOR64.size
+                                          if zip64 else 0))
+        end = self._file.tell()
+        disk, end_offset = self._locate(end)
+        here = sum(1 for item in disks if item == disk)
+        if zip64:
+            self._file.write(_END_RECORD64.pack(
+                0x06064B50, _END_RECORD64.size - 12, (CREATE_SYSTEM << 8) | VERSION_ZIP64,
+                VERSION_ZIP64, disk, cd_disk, here, count, size, cd_offset))
+            self._file.write(_END_LOCATOR64.pack(0x07064B50, disk, end_offset, disk + 1))
+            self._file.write(_END_RECORD.pack(
+                0x06054B50, _MARKER16, _MARKER16, _MARKER16, _MARKER16, _MARKER32, _MARKER32, 0))
+        else:
+            self._file.write(_END_RECORD.pack(0x06054B50, disk, cd_disk, here, count, size,
+                                              cd_offset, 0))
+        if self.volume_size and not disk:
+            # Все уместилось в один том: это обычный ZIP с меткой вместо подписи томов
+            self._file.seek(0)
+            self._file.write(SINGLE_VOLUME_SIGNATURE)
+            self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        """Дописывает оставшиеся элементы и центральный каталог"""
+        if self._closed:
+            return
+        try:
+            self._drain(-1)
+            self._write_central_directory()
+        except BaseException:
+            if self.volume_size:
+                self._file.abort()
+            raise
+        finally:
+            self._closed = True
+            self._executor.shutdown(wait=True)
+            self._file.close()
+
+    def abort(self):
+        """Прерывает запись без центрального каталога"""
+        self._closed = True
+        for member in self._queue:
+            for job in ([member.job] if member.job else []) + list(member.blocks or ()):
+                job.cancel()
+        self._executor.shutdown(wait=True)
+        if self.volume_size:
+            # Недописанные тома без каталога бесполезны
+            self._file.abort()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,29 @@
+# [file name]: nova_gui/__init__.py
+"""
+Графический интерфейс Nova Archiver на PyQt6
+"""
+
+import sys
+from pathlib import Path
+from typing import Optional
+
+from PyQt6.QtGui import QIcon
+from PyQt6.QtWidgets import QApplication
+
+from .dialogs import PasswordDialog, SetPasswordDialog
+from .window import NovaArchiver
+
+__all__ = ['NovaArchiver', 'PasswordDialog', 'SetPasswordDialog', 'run_gui']
+
+
+def run_gui(archive_path: Optional[str] = None) -> int:
+    """Запускает главное окно и цикл обработки событий"""
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setApplicationName("Nova Archiver")
+    icon_path = Path(__file__).resolve().parent.parent / "nova.ico"
+    if icon_path.exists():
+        app.setWindowIcon(QIcon(str(icon_path)))
+
+    window = NovaArchiver(archive_path)
+    window.show()
+    return app.exec()
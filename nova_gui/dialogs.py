@@ -0,0 +1,95 @@
+# [file name]: nova_gui/dialogs.py
+"""
+Диалоги ввода и установки пароля
+"""
+
+from PyQt6.QtWidgets import (QCheckBox, QComboBox, QDialog, QDialogButtonBox,
+                             QFormLayout, QLabel, QLineEdit, QMessageBox,
+                             QVBoxLayout)
+
+
+class PasswordDialog(QDialog):
+    """Диалоговое окно ввода пароля при открытии защищенного архива"""
+
+    def __init__(self, archive_name: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Введите пароль")
+        self.setMinimumWidth(360)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Архив <b>{archive_name}</b> защищен паролем"))
+
+        self.password_edit = QLineEdit()
+        self.password_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        self.password_edit.setPlaceholderText("Пароль")
+        layout.addWidget(self.password_edit)
+
+        self.remember_check = QCheckBox("Запомнить пароль на время сеанса")
+        layout.addWidget(self.remember_check)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok |
+                                   QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def password(self) -> str:
+        """Введенный пароль"""
+        return self.password_edit.text()
+
+    def remember(self) -> bool:
+        """Нужно ли запомнить пароль"""
+        return self.remember_check.isChecked()
+
+
+class SetPasswordDialog(QDialog):
+    """Диалоговое окно установки пароля на архив"""
+
+    ENCRYPTION_AES = 'aes'
+    ENCRYPTION_ZIP = 'zipcrypto'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Установить пароль")
+        self.setMinimumWidth(380)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        self.password_edit = QLineEdit()
+        self.password_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        form.addRow("Пароль:", self.password_edit)
+
+        self.confirm_edit = QLineEdit()
+        self.confirm_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        form.addRow("Подтверждение:", self.confirm_edit)
+
+        self.method_combo = QComboBox()
+        self.method_combo.addItem("AES-256 (рекомендуется)", self.ENCRYPTION_AES)
+        self.method_combo.addItem("ZIP шифрование (совместимость)", self.ENCRYPTION_ZIP)
+        form.addRow("Шифрование:", self.method_combo)
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok |
+                                   QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self._validate)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _validate(self):
+        """Проверяет совпадение пароля и подтверждения"""
+        if not self.password_edit.text():
+            QMessageBox.warning(self, "Пароль", "Пароль не может быть пустым")
+            return
+        if self.password_edit.text() != self.confirm_edit.text():
+            QMessageBox.warning(self, "Пароль", "Пароли не совпадают")
+            return
+        self.accept()
+
+    def password(self) -> str:
+        """Новый пароль"""
+        return self.password_edit.text()
+
+    def encryption(self) -> str:
+        """Выбранный метод шифрования"""
+        return self.method_combo.currentData()
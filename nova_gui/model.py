@@ -0,0 +1,205 @@
+# [file name]: nova_gui/model.py
+"""
+Виртуальная модель таблицы файлов поверх MemberStore
+
+Модель не создает объектов на строку: данные берутся из колонок
+хранилища только для видимых строк, строки подгружаются порциями
+(canFetchMore/fetchMore), а сортировка и фильтрация считаются в фоновом
+потоке над массивами индексов.
+"""
+
+from array import array
+from datetime import datetime
+from typing import List, Optional, Set
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from nova_core import ArchiveEntry
+from nova_core.jobs import PRIORITY_HIGH
+from nova_core.memberstore import (COLUMN_COMPRESSED, COLUMN_CRC, COLUMN_METHOD,
+                                   COLUMN_MTIME, COLUMN_NAME, COLUMN_RATIO, COLUMN_SIZE,
+                                   MemberStore)
+
+from .workers import ArchiveWorker
+
+COLUMNS = ["Имя", "Размер", "Сжатый", "Сжатие", "Изменен", "CRC32", "Метод"]
+
+# Сколько строк добавляется в представление за один fetchMore
+FETCH_BATCH = 5000
+
+
+def format_size(size: int) -> str:
+    """Человекочитаемый размер"""
+    value = float(size)
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if value < 1024 or unit == "ГБ":
+            return f"{value:.0f} {unit}" if unit == "Б" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} ТБ"
+
+
+def _compute_rows(store: MemberStore, text: str, column: Optional[int], descending: bool,
+                  matches: Optional[Set[str]] = None, progress=None) -> array:
+    rows = store.filter_rows(text) if text else None
+    if matches is not None:
+        rows = array('l', (i for i in (rows if rows is not None else range(len(store)))
+                           if store.name(i) in matches))
+    if column is None:
+        return rows if rows is not None else array('l', range(len(store)))
+    return store.sorted_rows(column, descending, rows)
+
+
+class MemberTableModel(QAbstractTableModel):
+    """Модель таблицы элементов архива"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = MemberStore()
+        self._rows = array('l')
+        self._loaded = 0
+        self._filter = ''
+        self._matches: Optional[Set[str]] = None
+        self._sort_column: Optional[int] = None
+        self._descending = False
+        self._generation = 0
+        self._workers = []
+
+    # ----- данные -----
+
+    def set_store(self, store: MemberStore):
+        """Показывает новое хранилище (порядок архива, без фильтра)"""
+        self._generation += 1
+        self.beginResetModel()
+        self.store = store
+        self._rows = array('l', range(len(store)))
+        self._loaded = min(FETCH_BATCH, len(self._rows))
+        self.endResetModel()
+        if self._filter or self._matches is not None or self._sort_column is not None:
+            self._recompute()
+
+    def store_row(self, row: int) -> int:
+        """Номер элемента в хранилище для строки представления"""
+        return self._rows[row]
+
+    def entry(self, row: int) -> ArchiveEntry:
+        return self.store.entry(self._rows[row])
+
+    def entries(self, rows: List[int]) -> List[ArchiveEntry]:
+        return [self.entry(row) for row in rows]
+
+    @property
+    def visible_count(self) -> int:
+        """Число строк после фильтрации (включая еще не подгруженные)"""
+        return len(self._rows)
+
+    # ----- QAbstractTableModel -----
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self._rows[index.row()]
+        column = index.column()
+        store = self.store
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == COLUMN_NAME:
+                return store.name(i)
+            if column == COLUMN_METHOD:
+                return store.method(i)
+            if column == COLUMN_CRC:
+                crc = store.crc(i)
+                return f"{crc:08X}" if crc is not None else ""
+            if column == COLUMN_MTIME:
+                mtime = store.mtime(i)
+                if mtime is None:
+                    return ""
+                return datetime.fromtimestamp(mtime).strftime("%d.%m.%Y %H:%M")
+            if store.is_dir(i):
+                return ""
+            if column == COLUMN_SIZE:
+                return format_size(store.sizes[i])
+            if column == COLUMN_COMPRESSED:
+                return format_size(store.compressed_sizes[i])
+            if column == COLUMN_RATIO:
+                return f"{store.ratio(i):.0f}%"
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            if column in (COLUMN_SIZE, COLUMN_COMPRESSED, COLUMN_RATIO):
+                return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        elif role == Qt.ItemDataRole.UserRole:
+            return i
+        return None
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        # -1 (индикатор сортировки снят) - порядок архива
+        self._sort_column = column if column >= 0 else None
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self._recompute()
+
+    # ----- фильтр и фоновый пересчет -----
+
+    def set_filter(self, text: str):
+        """Оставляет строки, имя которых содержит text"""
+        if text == self._filter:
+            return
+        self._filter = text
+        self._recompute()
+
+    def set_matches(self, names: Optional[Set[str]]):
+        """Оставляет только элементы из names (результат поиска); None - все"""
+        if names is None and self._matches is None:
+            return
+        self._matches = names
+        self._recompute()
+
+    @property
+    def matches(self) -> Optional[Set[str]]:
+        return self._matches
+
+    def _recompute(self):
+        self._generation += 1
+        generation = self._generation
+        # Сортировка не должна ждать в очереди за долгим извлечением
+        worker = ArchiveWorker(_compute_rows, self.store, self._filter, self._sort_column,
+                               self._descending, self._matches, parent=self,
+                               title="Сортировка", priority=PRIORITY_HIGH)
+        worker.succeeded.connect(lambda rows: self._apply_rows(generation, rows))
+        worker.finished.connect(lambda: self._workers.remove(worker))
+        self._workers.append(worker)
+        worker.start()
+
+    def _apply_rows(self, generation: int, rows: array):
+        # Результат устаревшего пересчета (фильтр уже сменился) отбрасываем
+        if generation != self._generation:
+            return
+        self.beginResetModel()
+        self._rows = rows
+        self._loaded = min(FETCH_BATCH, len(rows))
+        self.endResetModel()
+
+    def wait(self):
+        """Дожидается фоновых пересчетов (перед закрытием окна)"""
+        for worker in list(self._workers):
+            worker.wait()
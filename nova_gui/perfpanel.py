@@ -0,0 +1,158 @@
+# [file name]: nova_gui/perfpanel.py
+"""
+Панель производительности: фазы и счетчики трассировки движка вживую
+
+Пока панель открыта, трассировка nova_core включена; таблица фаз
+обновляется по таймеру. Время фазы без работы процессора (ожидание)
+показывает, что операция упирается в диск, а не в код.
+"""
+
+from typing import Optional
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (QDockWidget, QFileDialog, QHBoxLayout, QHeaderView, QLabel,
+                             QMessageBox, QPushButton, QTableWidget, QTableWidgetItem,
+                             QVBoxLayout, QWidget)
+
+from nova_core import trace
+
+from .model import format_size
+
+# Период обновления таблицы, мс
+REFRESH_INTERVAL = 500
+
+PHASE_COLUMNS = ["Фаза", "Время, с", "Процессор, с", "Ожидание, с", "Вызовов"]
+
+PHASE_TITLES = {
+    trace.PHASE_LIST: "Чтение каталога",
+    trace.PHASE_READ: "Чтение архива",
+    trace.PHASE_DECOMPRESS: "Распаковка",
+    trace.PHASE_DECRYPT: "Расшифровка",
+    trace.PHASE_ENCRYPT: "Шифрование",
+    trace.PHASE_KEYS: "Ключи из пароля",
+    trace.PHASE_COMPRESS: "Сжатие",
+    trace.PHASE_WRITE: "Запись на диск",
+    trace.PHASE_METADATA: "Метаданные ФС",
+    trace.PHASE_WRITE_QUEUE: "Очередь записи",
+    trace.PHASE_PROGRESS: "Прогресс",
+    trace.PHASE_UI: "Интерфейс",
+}
+
+TRACE_FILTER = "Chrome Trace (*.json);;Сводка JSON (*.json)"
+
+
+class PerformancePanel(QDockWidget):
+    """Плавающая панель с итогами трассировки текущего сеанса"""
+
+    def __init__(self, parent=None):
+        super().__init__("Производительность", parent)
+        self.setObjectName("performancePanel")
+        self._tracer: Optional[trace.Tracer] = None
+        self._owns_tracer = False
+
+        body = QWidget()
+        layout = QVBoxLayout(body)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.phase_table = QTableWidget(0, len(PHASE_COLUMNS))
+        self.phase_table.setHorizontalHeaderLabels(PHASE_COLUMNS)
+        self.phase_table.verticalHeader().setVisible(False)
+        self.phase_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.phase_table.horizontalHeader().setSectionResizeMode(
+            0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.phase_table)
+
+        self.counters_label = QLabel()
+        self.counters_label.setWordWrap(True)
+        self.counters_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(self.counters_label)
+
+        buttons = QHBoxLayout()
+        reset_button = QPushButton("Сбросить")
+        reset_button.clicked.connect(self.reset)
+        save_button = QPushButton("Сохранить трассу...")
+        save_button.clicked.connect(self.save_trace)
+        buttons.addWidget(reset_button)
+        buttons.addWidget(save_button)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        self.setWidget(body)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL)
+        self._timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def _on_visibility_changed(self, visible: bool):
+        if visible:
+            self._start()
+        else:
+            self._stop()
+
+    def _start(self):
+        if self._tracer is None:
+            # Трассировку, включенную до панели (nova --trace), панель не выключает
+            self._tracer = trace.current()
+            self._owns_tracer = self._tracer is None
+            if self._owns_tracer:
+                self._tracer = trace.start_trace()
+        self._timer.start()
+        self.refresh()
+
+    def _stop(self):
+        self._timer.stop()
+        if self._owns_tracer and trace.current() is self._tracer:
+            trace.stop_trace()
+        self._tracer = None
+        self._owns_tracer = False
+
+    def reset(self):
+        """Начинает новую трассу с нуля"""
+        if self._owns_tracer and trace.current() is self._tracer:
+            self._tracer = trace.start_trace()
+            self.refresh()
+
+    def refresh(self):
+        """Перерисовывает таблицу фаз и счетчики"""
+        if self._tracer is None:
+            return
+        summary = self._tracer.summary()
+        phases = sorted(summary['phases'].items(), key=lambda item: -item[1]['seconds'])
+        self.phase_table.setRowCount(len(phases))
+        for row, (name, phase) in enumerate(phases):
+            values = [PHASE_TITLES.get(name, name), f"{phase['seconds']:.3f}",
+                      f"{phase['cpu_seconds']:.3f}", f"{phase['wait_seconds']:.3f}",
+                      str(phase['calls'])]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight |
+                                          Qt.AlignmentFlag.AlignVCenter)
+                self.phase_table.setItem(row, column, item)
+
+        operations = ", ".join(f"{name} {op['seconds']:.2f} с ×{op['calls']}"
+                               for name, op in summary['operations'].items())
+        self.summary_label.setText(f"Трасса: {summary['elapsed']:.1f} с"
+                                   + (f"; операции: {operations}" if operations else ""))
+        counters = summary['counters']
+        parts = [f"прочитано {format_size(counters.get(trace.BYTES_IN, 0))}",
+                 f"записано {format_size(counters.get(trace.BYTES_OUT, 0))}"]
+        parts += [f"{name} {value}" for name, value in counters.items()
+                  if name not in (trace.BYTES_IN, trace.BYTES_OUT)]
+        self.counters_label.setText(", ".join(parts))
+
+    def save_trace(self):
+        """Сохраняет накопленную трассу в формате Chrome или сводкой JSON"""
+        if self._tracer is None:
+            return
+        path, selected = QFileDialog.getSaveFileName(self, "Сохранить трассу",
+                                                     "nova-trace.json", TRACE_FILTER)
+        if not path:
+            return
+        fmt = trace.TRACE_JSON if selected.startswith("Сводка") else trace.TRACE_CHROME
+        try:
+            self._tracer.write(path, fmt)
+        except OSError as e:
+            QMessageBox.critical(self, "Производительность",
+                                 f"Не удалось сохранить трассу: {e}")
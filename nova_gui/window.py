@@ -0,0 +1,633 @@
+# [file name]: nova_gui/window.py
+"""
+Главное окно Nova Archiver - тонкий клиент движка nova_core
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PyQt6.QtCore import QByteArray, Qt, QTimer, QUrl
+from PyQt6.QtGui import QAction, QDesktopServices, QKeySequence
+from PyQt6.QtWidgets import (QAbstractItemView, QFileDialog, QHeaderView,
+                             QInputDialog, QLabel, QLineEdit, QMainWindow, QMenu,
+                             QMessageBox, QProgressBar, QTableView, QToolBar,
+                             QVBoxLayout, QWidget)
+
+from nova_core import (ArchiveEntry, ArchiveError, ArchiveHandler, PasswordRequiredError,
+                       default_scheduler, trace)
+from nova_core.jobs import PRIORITY_LOW
+from nova_core.memberstore import MemberStore
+from nova_core.preview import default_preview_cache
+from nova_core.search import SearchResult
+from nova_core.streams import is_url
+from nova_core.verify import VerifyResult, find_manifest
+
+from .dialogs import PasswordDialog, SetPasswordDialog
+from .model import MemberTableModel, format_size
+from .perfpanel import PerformancePanel
+from .workers import ArchiveWorker
+
+SETTINGS_PATH = Path.home() / ".nova_archiver.json"
+MAX_RECENT_FILES = 10
+# Сколько поврежденных элементов перечислять в отчете о проверке
+MAX_REPORTED_PROBLEMS = 20
+
+ARCHIVE_FILTER = ("Архивы (*.zip *.sntr *.nv *.tar *.tar.gz *.tgz *.tar.bz2 "
+                  "*.tar.xz *.tar.zst *.7z *.7z.001 *.rar);;Все файлы (*)")
+NV2_FILTER = "Nova v2 с дедупликацией (*.nv)"
+CREATE_FILTER = ("Nova (*.nv);;" + NV2_FILTER + ";;ZIP (*.zip);;Sinter (*.sntr);;7-Zip (*.7z);;"
+                 "TAR (*.tar);;TAR.GZ (*.tar.gz);;TAR.BZ2 (*.tar.bz2);;TAR.XZ (*.tar.xz);;"
+                 "TAR.ZST (*.tar.zst)")
+
+STYLE_SHEET = """
+QMainWindow {
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 #0f172a, stop:1 #1e293b);
+}
+QWidget { color: #e2e8f0; font-size: 10pt; }
+QMenuBar, QMenu, QToolBar, QStatusBar { background: #111827; }
+QMenu::item:selected, QMenuBar::item:selected { background: #3b82f6; }
+QTableView {
+    background: #0b1220; alternate-background-color: #111a2e;
+    gridline-color: #1f2937; selection-background-color: #3b82f6;
+}
+QHeaderView::section { background: #1f2937; padding: 4px; border: none; }
+QProgressBar { border: 1px solid #334155; border-radius: 4px; text-align: center; }
+QProgressBar::chunk {
+    background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #3b82f6, stop:1 #8b5cf6);
+}
+QLabel#infoPanel { padding: 6px; background: #111827; border-radius: 4px; }
+"""
+
+
+class NovaArchiver(QMainWindow):
+    """Главное окно приложения с современным интерфейсом"""
+
+    def __init__(self, archive_path: Optional[str] = None):
+        super().__init__()
+        self.handler: Optional[ArchiveHandler] = None
+        self.session_passwords: Dict[str, str] = {}
+        self.settings = self.load_settings()
+        self._worker: Optional[ArchiveWorker] = None
+
+        self.setWindowTitle("Nova Archiver")
+        self.resize(1000, 650)
+        self.setAcceptDrops(True)
+        self.setStyleSheet(STYLE_SHEET)
+        self._init_ui()
+        self._restore_geometry()
+
+        # Копии для просмотра из прошлых сеансов чистятся в фоне
+        default_scheduler().submit(lambda progress: default_preview_cache().cleanup(),
+                                   title="Очистка кэша просмотра", priority=PRIORITY_LOW)
+
+        if archive_path:
+            self.open_archive(archive_path)
+
+    # ----- настройки -----
+
+    @staticmethod
+    def load_settings() -> dict:
+        """Загружает настройки из ~/.nova_archiver.json"""
+        try:
+            with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_settings(self):
+        """Сохраняет настройки"""
+        self.settings['geometry'] = bytes(self.saveGeometry().toBase64()).decode('ascii')
+        try:
+            with open(SETTINGS_PATH, 'w', encoding='utf-8') as f:
+                json.dump(self.settings, f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
+
+    def _restore_geometry(self):
+        geometry = self.settings.get('geometry')
+        if geometry:
+            self.restoreGeometry(QByteArray.fromBase64(geometry.encode('ascii')))
+
+    def add_recent_file(self, path: str):
+        """Добавляет архив в список недавних"""
+        recent = [p for p in self.settings.get('recent_files', []) if p != path]
+        recent.insert(0, path)
+        self.settings['recent_files'] = recent[:MAX_RECENT_FILES]
+        self._update_recent_menu()
+
+    # ----- интерфейс -----
+
+    def _init_ui(self):
+        self.performance_panel = PerformancePanel(self)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.performance_panel)
+        self.performance_panel.hide()
+        self._create_actions()
+        self._create_menu()
+        self._create_toolbar()
+
+        central = QWidget()
+        layout = QVBoxLayout(central)
+
+        self.info_label = QLabel("Откройте архив или перетащите его в окно")
+        self.info_label.setObjectName("infoPanel")
+        layout.addWidget(self.info_label)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Фильтр по имени...")
+        self.filter_edit.setClearButtonEnabled(True)
+        # Фильтр пересчитывается после паузы в наборе, а не на каждую букву
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(250)
+        self._filter_timer.timeout.connect(lambda: self.model.set_filter(self.filter_edit.text()))
+        self.filter_edit.textChanged.connect(self._filter_timer.start)
+        layout.addWidget(self.filter_edit)
+
+        # Таблица виртуальная: строки берутся из MemberStore по мере прокрутки
+        self.model = MemberTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setAlternatingRowColors(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.horizontalHeader().setSortIndicatorShown(True)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self._show_context_menu)
+        self.table.doubleClicked.connect(lambda index: self.view_selected())
+        layout.addWidget(self.table)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        self.setCentralWidget(central)
+        self.statusBar().showMessage("Готово")
+        self._update_actions()
+
+    def _create_actions(self):
+        self.open_action = QAction("Открыть...", self)
+        self.open_action.setShortcut(QKeySequence.StandardKey.Open)
+        self.open_action.triggered.connect(self.choose_archive)
+
+        self.open_url_action = QAction("Открыть по адресу...", self)
+        self.open_url_action.triggered.connect(self.choose_url)
+
+        self.create_action = QAction("Создать архив...", self)
+        self.create_action.setShortcut(QKeySequence.StandardKey.New)
+        self.create_action.triggered.connect(self.create_archive)
+
+        self.extract_all_action = QAction("Извлечь всё...", self)
+        self.extract_all_action.triggered.connect(self.extract_all)
+
+        self.extract_selected_action = QAction("Извлечь выбранное...", self)
+        self.extract_selected_action.triggered.connect(self.extract_selected)
+
+        self.view_action = QAction("Просмотреть", self)
+        self.view_action.setShortcut(QKeySequence(Qt.Key.Key_F3))
+        self.view_action.triggered.connect(self.view_selected)
+
+        self.add_files_action = QAction("Добавить файлы...", self)
+        self.add_files_action.triggered.connect(self.add_files)
+
+        self.search_action = QAction("Найти в файлах...", self)
+        self.search_action.setShortcut(QKeySequence.StandardKey.Find)
+        self.search_action.triggered.connect(self.search_archive)
+
+        self.compact_action = QAction("Оптимизировать архив", self)
+        self.compact_action.triggered.connect(self.compact_archive)
+
+        self.verify_action = QAction("Проверить архив", self)
+        self.verify_action.setShortcut(QKeySequence("Ctrl+T"))
+        self.verify_action.triggered.connect(self.verify_archive)
+
+        self.remove_action = QAction("Удалить из архива", self)
+        self.remove_action.setShortcut(QKeySequence.StandardKey.Delete)
+        self.remove_action.triggered.connect(self.remove_selected)
+
+        self.password_action = QAction("Пароль...", self)
+        self.password_action.triggered.connect(self.set_password)
+
+        self.remove_password_action = QAction("Удалить пароль...", self)
+        self.remove_password_action.triggered.connect(self.remove_password)
+
+        self.cancel_action = QAction("Отменить операцию", self)
+        self.cancel_action.setShortcut(QKeySequence(Qt.Key.Key_Escape))
+        self.cancel_action.triggered.connect(self.cancel_operation)
+
+        self.properties_action = QAction("Свойства", self)
+        self.properties_action.triggered.connect(self.show_properties)
+
+        self.exit_action = QAction("Выход", self)
+        self.exit_action.triggered.connect(self.close)
+
+    def _create_menu(self):
+        file_menu = self.menuBar().addMenu("Файл")
+        file_menu.addAction(self.open_action)
+        file_menu.addAction(self.open_url_action)
+        file_menu.addAction(self.create_action)
+        self.recent_menu = file_menu.addMenu("Недавние файлы")
+        file_menu.addSeparator()
+        file_menu.addAction(self.exit_action)
+        self._update_recent_menu()
+
+        archive_menu = self.menuBar().addMenu("Архив")
+        archive_menu.addAction(self.view_action)
+        archive_menu.addAction(self.extract_all_action)
+        archive_menu.addAction(self.extract_selected_action)
+        archive_menu.addAction(self.search_action)
+        archive_menu.addAction(self.add_files_action)
+        archive_menu.addAction(self.remove_action)
+        archive_menu.addAction(self.compact_action)
+        archive_menu.addAction(self.verify_action)
+        archive_menu.addAction(self.cancel_action)
+        archive_menu.addSeparator()
+        archive_menu.addAction(self.password_action)
+        archive_menu.addAction(self.remove_password_action)
+
+        view_menu = self.menuBar().addMenu("Вид")
+        view_menu.addAction(self.performance_panel.toggleViewAction())
+
+        help_menu = self.menuBar().addMenu("Справка")
+        about_action = help_menu.addAction("О программе")
+        about_action.triggered.connect(self.show_about)
+
+    def _create_toolbar(self):
+        toolbar = QToolBar("Основные действия")
+        toolbar.setMovable(False)
+        for action in (self.open_action, self.create_action, self.extract_all_action,
+                       self.extract_selected_action, self.remove_action, self.password_action,
+                       self.cancel_action):
+            toolbar.addAction(action)
+        self.addToolBar(toolbar)
+
+    def _update_recent_menu(self):
+        self.recent_menu.clear()
+        for path in self.settings.get('recent_files', []):
+            action = self.recent_menu.addAction(path)
+            action.triggered.connect(lambda checked=False, p=path: self.open_archive(p))
+        self.recent_menu.setEnabled(bool(self.settings.get('recent_files')))
+
+    def _update_actions(self):
+        has_archive = self.handler is not None
+        busy = self._worker is not None
+        writable = has_archive and self.handler.is_writable
+        self.open_action.setEnabled(not busy)
+        self.open_url_action.setEnabled(not busy)
+        self.create_action.setEnabled(not busy)
+        self.extract_all_action.setEnabled(has_archive and not busy)
+        self.extract_selected_action.setEnabled(has_archive and not busy)
+        self.view_action.setEnabled(has_archive and not busy)
+        self.search_action.setEnabled(has_archive and not busy)
+        self.verify_action.setEnabled(has_archive and not busy)
+        self.remove_action.setEnabled(writable and not busy)
+        updatable = writable and self.handler.supports_update and not busy
+        self.add_files_action.setEnabled(updatable)
+        self.compact_action.setEnabled(updatable)
+        self.password_action.setEnabled(writable and self.handler.format == 'zip' and not busy)
+        self.remove_password_action.setEnabled(self.password_action.isEnabled())
+        self.properties_action.setEnabled(has_archive)
+        self.cancel_action.setEnabled(busy)
+
+    # ----- фоновые операции -----
+
+    def run_operation(self, title: str, func, *args, on_success=None, **kwargs):
+        """Запускает операцию движка в фоне с отображением прогресса"""
+        self._worker = ArchiveWorker(func, *args, parent=self, title=title, **kwargs)
+        self._worker.progress.connect(self._on_progress)
+        self._worker.succeeded.connect(lambda result: self._on_finished(title, result, on_success))
+        self._worker.failed.connect(lambda error: self._on_failed(title, error))
+        self._worker.cancelled.connect(lambda: self._on_cancelled(title))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.statusBar().showMessage(f"{title}...")
+        self._update_actions()
+        self._worker.start()
+
+    def _on_progress(self, done, total, name):
+        with trace.span(trace.PHASE_UI):
+            if total:
+                self.progress_bar.setMaximum(1000)
+                self.progress_bar.setValue(int(done * 1000 / total))
+            else:
+                self.progress_bar.setMaximum(0)
+            if name:
+                self.statusBar().showMessage(name)
+
+    def _finish_worker(self):
+        self._worker = None
+        self.progress_bar.setVisible(False)
+        self._update_actions()
+
+    def _on_finished(self, title, result, on_success):
+        self._finish_worker()
+        self.statusBar().showMessage(f"{title}: готово", 5000)
+        if on_success is not None:
+            on_success(result)
+
+    def cancel_operation(self):
+        """Отменяет текущую операцию (срабатывает при следующем событии прогресса)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self.statusBar().showMessage("Отмена...")
+
+    def _on_cancelled(self, title):
+        self._finish_worker()
+        self.statusBar().showMessage(f"{title}: отменено", 5000)
+
+    def _on_failed(self, title, error):
+        self._finish_worker()
+        if isinstance(error, PasswordRequiredError) and self.handler is not None:
+            if self._ask_password(self.handler):
+                return
+        self.statusBar().showMessage(f"{title}: ошибка", 5000)
+        QMessageBox.critical(self, "Nova Archiver", f"{title}: {error}")
+
+    # ----- операции с архивом -----
+
+    def choose_archive(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Открыть архив", "", ARCHIVE_FILTER)
+        if path:
+            self.open_archive(path)
+
+    def choose_url(self):
+        """Открывает архив на сервере: читаются только каталог и нужные файлы"""
+        url, ok = QInputDialog.getText(self, "Открыть по адресу", "Адрес архива (http, https):")
+        url = url.strip()
+        if ok and url:
+            self.open_archive(url)
+
+    def open_archive(self, path: str):
+        """Открывает архив (файл или адрес на сервере) и загружает список файлов"""
+        if not is_url(path):
+            path = os.path.abspath(path)
+        try:
+            handler = ArchiveHandler(path, password=self.session_passwords.get(path))
+        except ArchiveError as e:
+            QMessageBox.critical(self, "Nova Archiver", str(e))
+            return
+        if self.handler is not None:
+            self.handler.close()
+        self.handler = handler
+        self.add_recent_file(path)
+        self.model.set_matches(None)
+        self.setWindowTitle(f"Nova Archiver - {handler.path.name}")
+
+        self._load_entries(handler)
+
+    def _load_entries(self, handler: ArchiveHandler):
+        """Читает список в фоне (из кэша, если архив не менялся)"""
+        self.run_operation("Чтение архива", lambda progress: handler.member_store(),
+                           on_success=lambda store: self._on_listed(handler, store))
+
+    def _on_listed(self, handler: ArchiveHandler, store: MemberStore):
+        if handler is not self.handler:
+            return
+        self._show_entries(store)
+        if handler.from_cache:
+            # Список из кэша уже показан, сверяем его с архивом в фоне
+            self.run_operation("Проверка списка", self._revalidate, handler,
+                               on_success=lambda store: self._on_revalidated(handler, store))
+
+    @staticmethod
+    def _revalidate(handler: ArchiveHandler, progress=None) -> Optional[MemberStore]:
+        if handler.revalidate() is None:
+            return None
+        return handler.member_store()
+
+    def _on_revalidated(self, handler: ArchiveHandler, store: Optional[MemberStore]):
+        if store is not None and handler is self.handler:
+            self._show_entries(store)
+
+    def _ask_password(self, handler: ArchiveHandler) -> bool:
+        """Запрашивает пароль и повторно открывает архив"""
+        dialog = PasswordDialog(handler.path.name, self)
+        if dialog.exec() != PasswordDialog.DialogCode.Accepted:
+            return False
+        if dialog.remember():
+            self.session_passwords[str(handler.location)] = dialog.password()
+        handler.set_session_password(dialog.password())
+        self._load_entries(handler)
+        return True
+
+    def _show_entries(self, store: MemberStore):
+        self.model.set_store(store)
+        lock = "🔒 " if store.encrypted else ""
+        self.info_label.setText(
+            f"{lock}<b>{self.handler.path.name}</b> · {self.handler.format.upper()} · "
+            f"файлов: {store.file_count} · "
+            f"размер: {format_size(store.total_size)} · сжато: {format_size(store.packed_size)}")
+        self._update_actions()
+
+    def selected_entries(self) -> List[ArchiveEntry]:
+        """Элементы, выбранные в таблице"""
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        return self.model.entries(sorted(rows))
+
+    def extract_all(self):
+        self._extract(None)
+
+    def extract_selected(self):
+        selected = self.selected_entries()
+        if not selected:
+            QMessageBox.information(self, "Извлечение", "Выберите файлы в таблице")
+            return
+        self._extract([e.name for e in selected])
+
+    def _extract(self, members):
+        dest = QFileDialog.getExistingDirectory(self, "Папка для извлечения")
+        if dest:
+            self.run_operation("Извлечение", self.handler.extract, dest, members)
+
+    def view_selected(self):
+        """Открывает выбранный файл в связанной программе (через кэш просмотра)"""
+        if self.handler is None or self._worker is not None:
+            return
+        selected = [e for e in self.selected_entries() if not e.is_dir]
+        if not selected:
+            return
+        self.run_operation("Открытие файла", self.handler.preview, selected[0].name,
+                           on_success=self._on_previewed)
+
+    def _on_previewed(self, path):
+        if not QDesktopServices.openUrl(QUrl.fromLocalFile(str(path))):
+            QMessageBox.information(self, "Просмотр", f"Нет программы для открытия файла:\n{path}")
+
+    def search_archive(self):
+        """Показывает только файлы, в содержимом которых есть текст"""
+        text, ok = QInputDialog.getText(self, "Поиск в файлах",
+                                        "Текст (без учета регистра; пусто - показать все файлы):")
+        if not ok:
+            return
+        if not text:
+            self.model.set_matches(None)
+            self.statusBar().showMessage("Показаны все файлы", 5000)
+            return
+        self.run_operation("Поиск в файлах", self.handler.search, text, ignore_case=True,
+                           names_only=True, use_index=True,
+                           on_success=lambda result: self._on_searched(text, result))
+
+    def _on_searched(self, text: str, result: SearchResult):
+        if not result.matched:
+            QMessageBox.information(self, "Поиск в файлах", f"«{text}» не найден")
+            return
+        self.model.set_matches(set(result.matched))
+        self.statusBar().showMessage(
+            f"«{text}»: найдено в файлах: {len(result.matched)} (Ctrl+F с пустым текстом "
+            f"- показать все)")
+
+    def create_archive(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Файлы для архивации")
+        if not files:
+            return
+        path, selected = QFileDialog.getSaveFileName(self, "Сохранить архив", "", CREATE_FILTER)
+        if not path:
+            return
+        fmt = 'nv2' if selected == NV2_FILTER else None
+        self.run_operation("Создание архива", ArchiveHandler.create, path, files, fmt=fmt,
+                           on_success=lambda handler: self.open_archive(str(handler.path)))
+
+    def remove_selected(self):
+        selected = self.selected_entries()
+        if not selected:
+            return
+        answer = QMessageBox.question(self, "Удаление",
+                                      f"Удалить из архива элементов: {len(selected)}?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.run_operation("Удаление", self.handler.remove_members, [e.name for e in selected],
+                           on_success=lambda result: self.open_archive(str(self.handler.path)))
+
+    def add_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Добавить в архив")
+        if not files:
+            return
+        path = str(self.handler.path)
+        self.run_operation("Добавление", self.handler.update, files,
+                           on_success=lambda result: self._on_updated(path, result))
+
+    def _on_updated(self, path: str, result):
+        self.open_archive(path)
+        self.statusBar().showMessage(
+            f"Добавлено: {result.added}, заменено: {result.replaced}, "
+            f"без изменений: {result.unchanged}", 5000)
+
+    def compact_archive(self):
+        path = str(self.handler.path)
+        self.run_operation("Оптимизация", self.handler.compact,
+                           on_success=lambda freed: self._on_compacted(path, freed))
+
+    def _on_compacted(self, path: str, freed: int):
+        self.open_archive(path)
+        self.statusBar().showMessage(f"Освобождено: {format_size(freed)}", 5000)
+
+    def verify_archive(self):
+        self.run_operation("Проверка архива", self._verify, self.handler,
+                           on_success=self._on_verified)
+
+    @staticmethod
+    def _verify(handler: ArchiveHandler, progress=None) -> VerifyResult:
+        # Если в архиве есть манифест хэшей, сверяем и с ним
+        manifest = find_manifest(e.name for e in handler.list_entries())
+        return handler.verify(progress, manifest=manifest)
+
+    def _on_verified(self, result: VerifyResult):
+        checked = result.checked + result.resumed
+        if result.ok:
+            text = f"Ошибок не найдено. Проверено файлов: {checked}"
+            if result.manifest:
+                text += f"\nХэши сверены с манифестом {result.manifest}"
+            QMessageBox.information(self, "Проверка архива", text)
+            return
+        lines = [f"{p.name}: {p.message}" for p in result.problems[:MAX_REPORTED_PROBLEMS]]
+        if len(result.problems) > MAX_REPORTED_PROBLEMS:
+            lines.append(f"... и еще {len(result.problems) - MAX_REPORTED_PROBLEMS}")
+        QMessageBox.warning(self, "Проверка архива",
+                            f"Повреждено файлов: {len(result.problems)} из {checked}\n\n"
+                            + "\n".join(lines))
+
+    def set_password(self):
+        dialog = SetPasswordDialog(self)
+        if dialog.exec() != SetPasswordDialog.DialogCode.Accepted:
+            return
+        if dialog.encryption() != SetPasswordDialog.ENCRYPTION_AES:
+            QMessageBox.information(self, "Пароль",
+                                    "Запись ZIP шифрования не поддерживается, будет использован AES-256")
+        path = str(self.handler.path)
+        self.session_passwords[path] = dialog.password()
+        self.run_operation("Установка пароля", self.handler.set_password, dialog.password(),
+                           on_success=lambda result: self.open_archive(path))
+
+    def remove_password(self):
+        password, ok = QInputDialog.getText(self, "Удалить пароль", "Текущий пароль:",
+                                            echo=QLineEdit.EchoMode.Password)
+        if not ok:
+            return
+        path = str(self.handler.path)
+        self.handler.set_session_password(password)
+        self.session_passwords.pop(path, None)
+        self.run_operation("Удаление пароля", self.handler.set_password, None,
+                           on_success=lambda result: self.open_archive(path))
+
+    def show_properties(self):
+        selected = self.selected_entries()
+        if not selected:
+            return
+        entry = selected[0]
+        modified = entry.modified.strftime("%d.%m.%Y %H:%M:%S") if entry.modified else "-"
+        lines = [
+            f"Имя: {entry.name}",
+            f"Размер: {format_size(entry.size)} ({entry.size} байт)",
+            f"Сжатый размер: {format_size(entry.compressed_size)}",
+            f"Сжатие: {entry.ratio:.1f}%",
+            f"Изменен: {modified}",
+            f"CRC32: {entry.crc:08X}" if entry.crc is not None else "CRC32: -",
+            f"Метод: {entry.method}",
+            f"Зашифрован: {'да' if entry.encrypted else 'нет'}",
+        ]
+        QMessageBox.information(self, "Свойства", "\n".join(lines))
+
+    def show_about(self):
+        from nova_archiver import __version__
+        QMessageBox.about(self, "О программе",
+                          f"<b>Nova Archiver {__version__}</b><br>"
+                          "Универсальный архиватор с поддержкой всех форматов")
+
+    def _show_context_menu(self, pos):
+        if self.handler is None:
+            return
+        menu = QMenu(self)
+        menu.addAction(self.view_action)
+        menu.addAction(self.extract_selected_action)
+        menu.addAction(self.remove_action)
+        menu.addSeparator()
+        menu.addAction(self.properties_action)
+        menu.exec(self.table.viewport().mapToGlobal(pos))
+
+    # ----- события окна -----
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        urls = event.mimeData().urls()
+        if urls:
+            self.open_archive(urls[0].toLocalFile())
+
+    def closeEvent(self, event):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker.wait()
+        self.model.wait()
+        if self.handler is not None:
+            self.handler.close()
+        default_preview_cache().clear_session()
+        self.save_settings()
+        super().closeEvent(event)
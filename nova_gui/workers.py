@@ -0,0 +1,59 @@
+# [file name]: nova_gui/workers.py
+"""
+Фоновое выполнение операций движка, чтобы не блокировать интерфейс
+"""
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from nova_core import OperationCancelled, default_scheduler
+from nova_core.jobs import PRIORITY_NORMAL
+
+
+class ArchiveWorker(QObject):
+    """Выполняет функцию движка в общем планировщике задач nova_core.
+
+    Функция получает именованный аргумент progress(done, total, name);
+    события прогресса уже прорежены планировщиком до ~30 Гц. Сигналы
+    доставляются в поток интерфейса.
+    """
+
+    progress = pyqtSignal(object, object, str)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, func, *args, parent=None, title: str = '',
+                 priority: int = PRIORITY_NORMAL, **kwargs):
+        super().__init__(parent)
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._title = title
+        self._priority = priority
+        self.job = None
+
+    def start(self):
+        self.job = default_scheduler().submit(
+            self._func, *self._args, title=self._title, priority=self._priority,
+            on_progress=self.progress.emit, on_done=self._on_done, **self._kwargs)
+
+    def cancel(self):
+        """Запрашивает отмену операции"""
+        if self.job is not None:
+            self.job.cancel()
+
+    def wait(self, timeout=None):
+        """Дожидается завершения задачи (без доставки ее сигналов)"""
+        if self.job is not None:
+            self.job.join(timeout)
+
+    def _on_done(self, job):
+        # Вызывается в потоке планировщика, сигналы уйдут в поток интерфейса
+        if isinstance(job.error, OperationCancelled):
+            self.cancelled.emit()
+        elif job.error is not None:
+            self.failed.emit(job.error)
+        else:
+            self.succeeded.emit(job.result)
+        self.finished.emit()
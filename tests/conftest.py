@@ -0,0 +1,24 @@
+# [file name]: tests/conftest.py
+"""
+Общие фикстуры тестов nova_core
+"""
+
+from pathlib import Path
+
+import pytest
+
+from helpers import make_tree
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch) -> Path:
+    """Кэш списков и индексов - во временном каталоге, а не в ~/.cache"""
+    path = tmp_path_factory.mktemp('cache')
+    monkeypatch.setenv('NOVA_CACHE_DIR', str(path))
+    return path
+
+
+@pytest.fixture
+def source_tree(tmp_path) -> Path:
+    """Дерево исходных файлов для архивации (см. helpers.make_tree)"""
+    return make_tree(tmp_path)
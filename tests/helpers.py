@@ -0,0 +1,37 @@
+# [file name]: tests/helpers.py
+"""
+Вспомогательные функции тестов: исходные деревья и сравнение содержимого
+"""
+
+import random
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from nova_core import backends
+
+
+def make_tree(root: Path) -> Path:
+    """Небольшое дерево: текст, случайные данные, пустые файл и папка, вложенность"""
+    rnd = random.Random(1)
+    src = root / 'src'
+    (src / 'docs' / 'deep').mkdir(parents=True)
+    (src / 'empty_dir').mkdir()
+    (src / 'readme.txt').write_text('Nova Archiver\n' * 200, encoding='utf-8')
+    (src / 'docs' / 'notes.md').write_text('# заметки\n' + 'строка\n' * 500, encoding='utf-8')
+    (src / 'docs' / 'deep' / 'data.bin').write_bytes(rnd.randbytes(300_000))
+    (src / 'docs' / 'deep' / 'empty.txt').write_bytes(b'')
+    (src / 'mixed.log').write_bytes(b'x' * 100_000 + rnd.randbytes(50_000))
+    return src
+
+
+def tree_files(root: Path) -> Dict[str, bytes]:
+    """Файлы дерева: путь относительно root -> содержимое"""
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+
+def requires_backend(name: str):
+    """Пропускает тест без необязательной библиотеки"""
+    return pytest.mark.skipif(not backends.is_available(name), reason=f"нет {name}")
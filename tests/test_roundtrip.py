@@ -0,0 +1,99 @@
+# [file name]: tests/test_roundtrip.py
+"""
+Создание, список и извлечение архивов всех записываемых форматов
+"""
+
+import pytest
+
+from helpers import requires_backend, tree_files
+from nova_core.errors import ArchiveError
+from nova_core.handler import ArchiveHandler
+
+# (имя файла архива, формат, нужная библиотека)
+FORMATS = [
+    ('a.zip', 'zip', None),
+    ('a.sntr', 'zip', None),
+    ('a.nv', 'zip', None),
+    ('a.nv', 'nv2', None),
+    ('a.tar', 'tar', None),
+    ('a.tar.gz', 'tar.gz', None),
+    ('a.tar.bz2', 'tar.bz2', None),
+    ('a.tar.xz', 'tar.xz', None),
+    ('a.tar.zst', 'tar.zst', 'zstandard'),
+    ('a.7z', '7z', 'py7zr'),
+]
+
+
+def _format_params(formats=FORMATS):
+    return [pytest.param(name, fmt, marks=requires_backend(backend) if backend else (),
+                         id=f"{fmt}-{name}")
+            for name, fmt, backend in formats]
+
+
+@pytest.mark.parametrize('name, fmt', _format_params())
+def test_create_list_extract(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    with ArchiveHandler.create(path, [source_tree], fmt=fmt) as archive:
+        assert archive.format == fmt
+        names = {e.name.rstrip('/') for e in archive.list_entries()}
+        archive.extract(tmp_path / 'out')
+    assert {'src/readme.txt', 'src/docs/deep/empty.txt', 'src/empty_dir'} <= names
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+    assert (tmp_path / 'out' / 'src' / 'empty_dir').is_dir()
+
+
+@pytest.mark.parametrize('name, fmt', _format_params())
+def test_reopen_detects_format(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    ArchiveHandler.create(path, [source_tree], fmt=fmt).close()
+    with ArchiveHandler(path) as archive:
+        assert archive.format == fmt
+        with archive.open_member('src/docs/notes.md') as stream:
+            assert stream.read() == (source_tree / 'docs' / 'notes.md').read_bytes()
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_extract_selected_members(tmp_path, source_tree, workers):
+    path = tmp_path / 'a.zip'
+    with ArchiveHandler.create(path, [source_tree]) as archive:
+        archive.extract(tmp_path / 'out', ['src/docs/', 'src/readme.txt'], workers=workers)
+    assert sorted(tree_files(tmp_path / 'out' / 'src')) == [
+        'docs/deep/data.bin', 'docs/deep/empty.txt', 'docs/notes.md', 'readme.txt']
+
+
+def test_extract_unknown_member(tmp_path, source_tree):
+    with ArchiveHandler.create(tmp_path / 'a.zip', [source_tree]) as archive:
+        with pytest.raises(ArchiveError):
+            archive.extract(tmp_path / 'out', ['src/missing.txt'])
+
+
+@pytest.mark.parametrize('name, fmt', _format_params([
+    ('a.nv', 'nv2', None),
+    ('a.7z', '7z', 'py7zr'),
+]))
+def test_solid_blocks(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    with ArchiveHandler.create(path, [source_tree], fmt=fmt, solid_size=64 * 1024) as archive:
+        archive.extract(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+
+
+@pytest.mark.parametrize('name, fmt', _format_params([
+    ('b.zip', 'zip', None),
+    ('b.nv', 'nv2', None),
+    ('b.tar.xz', 'tar.xz', None),
+    ('b.7z', '7z', 'py7zr'),
+]))
+def test_convert(tmp_path, source_tree, name, fmt):
+    with ArchiveHandler.create(tmp_path / 'a.tar.gz', [source_tree]) as archive:
+        converted = archive.convert(tmp_path / name, fmt=fmt)
+    with converted:
+        assert converted.format == fmt
+        converted.extract(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+
+
+def test_convert_to_itself(tmp_path, source_tree):
+    with ArchiveHandler.create(tmp_path / 'a.zip', [source_tree]) as archive:
+        with pytest.raises(ArchiveError):
+            archive.convert(tmp_path / 'a.zip')
@@ -0,0 +1,79 @@
+# [file name]: tests/test_seekindex.py
+"""
+Индекс произвольного доступа к сжатым TAR: точки входа и чтение с середины
+"""
+
+import tarfile
+
+import pytest
+
+from helpers import tree_files
+from nova_core import seekindex
+from nova_core.handler import ArchiveHandler
+from nova_core.seekindex import DEFAULT_SPAN, SeekIndex
+
+SPAN = 64 * 1024
+
+
+def _check_members(index: SeekIndex, source_tree):
+    files = {e.name: e for e in index.entries() if not e.is_dir}
+    expected = tree_files(source_tree)
+    assert sorted(files) == sorted(f"src/{name}" for name in expected)
+    for name, data in expected.items():
+        with index.open_member(f"src/{name}") as stream:
+            assert stream.read() == data
+
+
+@pytest.mark.skipif(seekindex._load_libz() is None, reason="нет системной zlib")
+def test_gzip_checkpoints(tmp_path, source_tree):
+    path = tmp_path / 'a.tar.gz'
+    ArchiveHandler.create(path, [source_tree]).close()
+    index = SeekIndex.build(path, 'tar.gz', span=SPAN)
+    assert len(index.points) > 1
+    _check_members(index, source_tree)
+
+
+def test_bz2_blocks(tmp_path, source_tree):
+    path = tmp_path / 'a.tar.bz2'
+    # Уровень 1 - блоки bz2 по 100 КБ
+    ArchiveHandler.create(path, [source_tree], level=1).close()
+    index = SeekIndex.build(path, 'tar.bz2')
+    assert len(index.points) > 1
+    _check_members(index, source_tree)
+
+
+def test_nova_tar_xz_has_split_points(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+    # Больше двух шагов индекса: Nova пишет .tar.xz потоками по DEFAULT_SPAN
+    for i in range(3):
+        (src / f"part{i}.bin").write_bytes(bytes([65 + i]) * (DEFAULT_SPAN - 1000))
+    path = tmp_path / 'a.tar.xz'
+    ArchiveHandler.create(path, [src], level=0).close()
+
+    with tarfile.open(path) as tar:
+        assert len(tar.getnames()) == 4
+    index = SeekIndex.build(path, 'tar.xz')
+    assert len(index.points) >= 3
+    with index.open_member('src/part2.bin') as stream:
+        assert stream.read(16) == b'C' * 16
+    with index.open_range(DEFAULT_SPAN * 2 + 100, 8) as stream:
+        assert len(stream.read()) == 8
+
+
+def test_save_and_load(tmp_path, source_tree):
+    path = tmp_path / 'a.tar.bz2'
+    ArchiveHandler.create(path, [source_tree], level=1).close()
+    built = seekindex.load_or_build(path, 'tar.bz2')
+    location = seekindex.index_location(path)
+    assert location.exists()
+
+    loaded = SeekIndex.load(location, path)
+    assert loaded is not None
+    assert loaded.points == built.points
+    _check_members(loaded, source_tree)
+
+    # Измененный архив делает индекс устаревшим
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 512)
+    assert SeekIndex.load(location, path) is None
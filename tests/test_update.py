@@ -0,0 +1,125 @@
+# [file name]: tests/test_update.py
+"""
+Изменение архивов на месте: обновление, удаление, сжатие и смена пароля
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+from helpers import requires_backend, tree_files
+from nova_core.errors import PasswordRequiredError
+from nova_core.handler import ArchiveHandler
+from nova_core.update import JOURNAL_SUFFIX
+
+UPDATABLE = [pytest.param('a.zip', 'zip', id='zip'), pytest.param('a.nv', 'nv2', id='nv2')]
+
+
+def _touch_later(path, data: bytes):
+    """Меняет файл так, чтобы его время изменения точно отличалось"""
+    path.write_bytes(data)
+    later = time.time() + 10
+    os.utime(path, (later, later))
+
+
+@pytest.mark.parametrize('name, fmt', UPDATABLE)
+def test_update_adds_and_replaces(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    ArchiveHandler.create(path, [source_tree], fmt=fmt).close()
+    _touch_later(source_tree / 'readme.txt', b'new readme\n')
+    (source_tree / 'added.txt').write_text('added', encoding='utf-8')
+
+    with ArchiveHandler(path, fmt=fmt) as archive:
+        result = archive.update([source_tree])
+        assert (result.added, result.replaced) == (1, 1)
+        if fmt == 'zip':
+            # В .nv v2 мелкие файлы лежат общими пачками, и пачка остается живой
+            assert archive.dead_bytes() > 0
+        archive.extract(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+
+
+@pytest.mark.parametrize('name, fmt', UPDATABLE)
+def test_update_unchanged_is_noop(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    ArchiveHandler.create(path, [source_tree], fmt=fmt).close()
+    with ArchiveHandler(path, fmt=fmt) as archive:
+        result = archive.update([source_tree])
+    assert (result.added, result.replaced) == (0, 0)
+
+
+@pytest.mark.parametrize('name, fmt', UPDATABLE + [
+    pytest.param('a.tar.gz', 'tar.gz', id='tar.gz'),
+    pytest.param('a.7z', '7z', id='7z', marks=requires_backend('py7zr')),
+])
+def test_remove_members(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    with ArchiveHandler.create(path, [source_tree], fmt=fmt) as archive:
+        archive.remove_members(['src/docs/', 'src/mixed.log'])
+        names = {e.name.rstrip('/') for e in archive.list_entries()}
+    assert not any(n.startswith('src/docs') for n in names)
+    assert 'src/mixed.log' not in names
+    with ArchiveHandler(path, fmt=fmt) as archive:
+        archive.extract(tmp_path / 'out')
+    assert sorted(tree_files(tmp_path / 'out' / 'src')) == ['readme.txt']
+
+
+@pytest.mark.parametrize('name, fmt', UPDATABLE)
+def test_compact_reclaims_dead_space(tmp_path, source_tree, name, fmt):
+    path = tmp_path / name
+    with ArchiveHandler.create(path, [source_tree], fmt=fmt) as archive:
+        archive.remove_members(['src/docs/deep/data.bin'])
+        dead = archive.dead_bytes()
+        size = path.stat().st_size
+        assert dead > 0
+        # compact освобождает и место в каталоге, поэтому не меньше dead
+        freed = archive.compact()
+        assert freed >= dead
+        assert archive.dead_bytes() == 0
+        assert path.stat().st_size == size - freed
+        archive.extract(tmp_path / 'out')
+    expected = tree_files(source_tree)
+    del expected['docs/deep/data.bin']
+    assert tree_files(tmp_path / 'out' / 'src') == expected
+
+
+def test_interrupted_update_is_rolled_back(tmp_path, source_tree):
+    path = tmp_path / 'a.zip'
+    ArchiveHandler.create(path, [source_tree]).close()
+    original = path.read_bytes()
+    # Сбой после дописывания: хвост в архиве и журнал с прежним размером
+    with open(path, 'ab') as f:
+        f.write(b'PK\x03\x04' + os.urandom(4096))
+    with open(f"{path}{JOURNAL_SUFFIX}", 'w', encoding='utf-8') as f:
+        json.dump({'size': len(original)}, f)
+
+    with ArchiveHandler(path) as archive:
+        assert len(archive.list_entries()) > 0
+    assert path.read_bytes() == original
+    assert not os.path.exists(f"{path}{JOURNAL_SUFFIX}")
+
+
+@requires_backend('pycryptodomex')
+def test_set_and_change_password(tmp_path, source_tree):
+    path = tmp_path / 'a.zip'
+    with ArchiveHandler.create(path, [source_tree]) as archive:
+        archive.set_password('first')
+    with ArchiveHandler(path) as archive:
+        assert archive.needs_password()
+        with pytest.raises(PasswordRequiredError):
+            archive.extract(tmp_path / 'nopass')
+
+    with ArchiveHandler(path, password='first') as archive:
+        archive.set_password('second')
+    with ArchiveHandler(path, password='second') as archive:
+        archive.extract(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+
+    with ArchiveHandler(path, password='second') as archive:
+        archive.set_password(None)
+    with ArchiveHandler(path) as archive:
+        assert not archive.needs_password()
+        archive.extract(tmp_path / 'plain')
+    assert tree_files(tmp_path / 'plain' / 'src') == tree_files(source_tree)
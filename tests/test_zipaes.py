@@ -0,0 +1,75 @@
+# [file name]: tests/test_zipaes.py
+"""
+Совместимость WinZip AES: архивы Nova читает pyzipper, архивы pyzipper - Nova
+"""
+
+import zipfile
+
+import pytest
+
+from helpers import requires_backend, tree_files
+from nova_core import zipaes
+from nova_core.errors import ArchiveError
+from nova_core.handler import ArchiveHandler
+
+pytestmark = requires_backend('pycryptodomex')
+
+PASSWORD = 'пароль-123'
+
+
+def test_encrypt_decrypt_member():
+    data = b'secret payload ' * 1000
+    blob = zipaes.encrypt_member(PASSWORD, data)
+    assert zipaes.decrypt_member(PASSWORD, blob, zipaes.STRENGTH_256) == data
+    with pytest.raises(ArchiveError):
+        zipaes.decrypt_member('wrong', blob, zipaes.STRENGTH_256)
+
+
+def test_nova_archive_uses_winzip_aes(tmp_path, source_tree):
+    path = tmp_path / 'a.zip'
+    ArchiveHandler.create(path, [source_tree], password=PASSWORD).close()
+    with zipfile.ZipFile(path) as zf:
+        files = [info for info in zf.infolist() if not info.is_dir()]
+    assert files and all(info.compress_type == zipaes.METHOD_AES for info in files)
+    fields = {info.filename: zipaes.parse_extra(info.extra) for info in files}
+    assert all(field is not None for field in fields.values())
+    # Короткие файлы пишутся AE-2: CRC не выдает их содержимое
+    assert fields['src/docs/deep/empty.txt'].version == zipaes.AE_2
+    assert fields['src/readme.txt'].version == zipaes.AE_1
+
+
+@requires_backend('pyzipper')
+def test_pyzipper_reads_nova_archive(tmp_path, source_tree):
+    import pyzipper
+    path = tmp_path / 'a.zip'
+    ArchiveHandler.create(path, [source_tree], password=PASSWORD).close()
+    with pyzipper.AESZipFile(path) as zf:
+        zf.setpassword(PASSWORD.encode('utf-8'))
+        zf.extractall(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == tree_files(source_tree)
+
+
+@requires_backend('pyzipper')
+def test_nova_reads_pyzipper_archive(tmp_path, source_tree):
+    import pyzipper
+    path = tmp_path / 'a.zip'
+    expected = tree_files(source_tree)
+    with pyzipper.AESZipFile(path, 'w', compression=pyzipper.ZIP_DEFLATED,
+                             encryption=pyzipper.WZ_AES) as zf:
+        zf.setpassword(PASSWORD.encode('utf-8'))
+        for name, data in expected.items():
+            zf.writestr(f"src/{name}", data)
+
+    with ArchiveHandler(path, password=PASSWORD) as archive:
+        assert archive.needs_password()
+        assert all(e.encrypted for e in archive.list_entries())
+        archive.extract(tmp_path / 'out')
+    assert tree_files(tmp_path / 'out' / 'src') == expected
+
+
+def test_wrong_password(tmp_path, source_tree):
+    path = tmp_path / 'a.zip'
+    ArchiveHandler.create(path, [source_tree], password=PASSWORD).close()
+    with ArchiveHandler(path, password='wrong') as archive:
+        with pytest.raises(ArchiveError):
+            archive.extract(tmp_path / 'out')